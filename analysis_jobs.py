@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Background analysis jobs on a process pool, with progress and cancellation.
+
+``AnalysisJobManager.submit`` queues a module-level function on a pool of
+worker processes and returns an ``AnalysisJob`` right away. Analysis is
+CPU-bound Scapy work; in worker processes it does not compete with the API
+event loop for the GIL. Workers import the ``preload`` modules (scapy,
+network_analyzer) once at start-up, so a job does not pay for that import.
+
+The function runs in the worker and receives a ``JobProgress`` handle::
+
+    def pipeline(job, path):
+        job.start_stage('load')
+        ...
+        job.update(fraction=0.5, packets_processed=1200)
+        job.start_stage('save')
+        ...
+        return {'packet_count': 1200}
+
+Large outputs go to files (the analysis writes its results into the
+session directory); only the small return value is pickled back. Progress
+travels the same way: the worker rewrites ``progress.json`` in a per-job
+directory, and the API process reads it when a job is polled. ``cancel()``
+creates a ``cancel`` file there, which the worker turns into
+``JobCancelled`` at the next ``start_stage`` / ``check_cancelled``.
+
+A stage has a weight (its expected share of the run time), so ``progress``
+and ``eta_seconds`` are meaningful before the packet count is known.
+Admission is bounded: once ``max_workers + max_queued`` jobs are unfinished,
+``submit`` raises ``JobQueueFull`` with a retry-after estimate.
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+TERMINAL_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+PROGRESS_FILE = 'progress.json'
+CANCEL_FILE = 'cancel'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function once the job has been cancelled."""
+
+
+class JobQueueFull(Exception):
+    """Raised by ``submit`` when every worker is busy and the queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f'analysis queue is full, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+class JobProgress:
+    """Worker-side handle: writes progress to the job directory, reads cancellation from it."""
+
+    def __init__(self, job_dir: str, min_interval: float = 0.2):
+        self.job_dir = job_dir
+        self.min_interval = min_interval
+        self.stage = None
+        self.fraction = 0.0
+        self.packets_processed = 0
+        self.total_packets = None
+        self.started_at = time.time()
+        self._written_at = 0.0
+        self._cancel_path = os.path.join(job_dir, CANCEL_FILE)
+        self._write(force=True)
+
+    def start_stage(self, name: str) -> None:
+        self.check_cancelled()
+        self.stage = name
+        self.fraction = 0.0
+        self._write(force=True)
+
+    def update(self, fraction: float = None, packets_processed: int = None, total_packets: int = None) -> None:
+        """Report progress within the current stage (``fraction`` in 0..1)."""
+        if fraction is not None:
+            self.fraction = min(1.0, max(0.0, fraction))
+        if packets_processed is not None:
+            self.packets_processed = packets_processed
+        if total_packets is not None:
+            self.total_packets = total_packets
+        self._write()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return os.path.exists(self._cancel_path)
+
+    def check_cancelled(self) -> None:
+        if self.cancel_requested:
+            raise JobCancelled(os.path.basename(self.job_dir))
+
+    def _write(self, force: bool = False) -> None:
+        now = time.time()
+        if not force and now - self._written_at < self.min_interval:
+            return
+        self._written_at = now
+        state = {
+            'stage': self.stage,
+            'fraction': self.fraction,
+            'packets_processed': self.packets_processed,
+            'total_packets': self.total_packets,
+            'started_at': self.started_at,
+        }
+        path = os.path.join(self.job_dir, PROGRESS_FILE)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump(state, handle)
+        os.replace(temp_path, path)
+
+
+def _preload_worker(modules) -> None:
+    """Process pool initializer: import the heavy modules once per worker."""
+    for name in modules:
+        importlib.import_module(name)
+
+
+def _run_in_worker(func, job_dir, args):
+    return func(JobProgress(job_dir), *args)
+
+
+class AnalysisJob:
+    """API-side view of one queued/running analysis; thread-safe."""
+
+    def __init__(self, session_id: str, stages, job_dir: str):
+        self.id = os.path.basename(job_dir)
+        self.session_id = session_id
+        self.job_dir = job_dir
+        self.status = JOB_QUEUED
+        self.stage = None
+        self.packets_processed = 0
+        self.total_packets = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Bumped on every change so pollers (SSE) can tell when to send an update
+        self.version = 0
+        self.future = None
+        self._weights = OrderedDict(stages)
+        self._total_weight = sum(self._weights.values()) or 1.0
+        self._stage_fraction = 0.0
+        self._progress_mtime = None
+        self._cancel_requested = False
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    def cancel(self) -> bool:
+        """Request cancellation; returns False if the job already finished.
+
+        A job still waiting in the queue is cancelled at once; a running job
+        stops at its next stage boundary and ends up ``cancelled`` when the
+        worker returns.
+        """
+        with self._lock:
+            if self.status in TERMINAL_STATES:
+                return False
+            self._cancel_requested = True
+            self.version += 1
+        try:
+            open(os.path.join(self.job_dir, CANCEL_FILE), 'w').close()
+        except OSError:
+            pass
+        if self.future is not None and self.future.cancel():
+            self._finish(JOB_CANCELLED)
+        return True
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the job reaches a terminal state."""
+        return self._finished.wait(timeout)
+
+    @property
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    @property
+    def progress(self) -> float:
+        with self._lock:
+            self._refresh_locked()
+            return self._progress_locked()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._refresh_locked()
+            progress = self._progress_locked()
+            now = self.finished_at or time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+            eta = None
+            if self.status == JOB_RUNNING and progress > 0.02:
+                eta = round(elapsed * (1.0 - progress) / progress, 1)
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'stage': self.stage,
+                'stages': list(self._weights),
+                'progress': round(progress, 4),
+                'packets_processed': self.packets_processed,
+                'total_packets': self.total_packets,
+                'elapsed_seconds': round(elapsed, 1),
+                'eta_seconds': eta,
+                'cancel_requested': self._cancel_requested,
+                'result': self.result,
+                'error': self.error,
+                'version': self.version,
+            }
+
+    def _finish(self, status: str, result=None, error: str = None) -> bool:
+        with self._lock:
+            if self.status in TERMINAL_STATES:
+                return False
+            self._refresh_locked()
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            if status == JOB_COMPLETED:
+                self.stage = None
+            self.version += 1
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+        self._finished.set()
+        return True
+
+    def _refresh_locked(self) -> None:
+        """Pick up the worker's latest progress.json."""
+        if self.status in TERMINAL_STATES:
+            return
+        path = os.path.join(self.job_dir, PROGRESS_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == self._progress_mtime:
+                return
+            with open(path, encoding='utf-8') as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            return
+        self._progress_mtime = mtime
+        if self.status == JOB_QUEUED:
+            self.status = JOB_RUNNING
+            self.started_at = state.get('started_at') or time.time()
+        self.stage = state.get('stage')
+        self._stage_fraction = state.get('fraction') or 0.0
+        self.packets_processed = state.get('packets_processed') or 0
+        self.total_packets = state.get('total_packets')
+        self.version += 1
+
+    def _progress_locked(self) -> float:
+        if self.status == JOB_COMPLETED:
+            return 1.0
+        if self.stage not in self._weights:
+            return 0.0
+        done = 0.0
+        for name, weight in self._weights.items():
+            if name == self.stage:
+                break
+            done += weight
+        current = self._weights[self.stage] * self._stage_fraction
+        return min(1.0, (done + current) / self._total_weight)
+
+
+class AnalysisJobManager:
+    """Process pool of analysis workers plus a registry of recent jobs.
+
+    At most ``max_workers`` jobs run at once and ``max_queued`` more may
+    wait; beyond that ``submit`` raises ``JobQueueFull``. Finished jobs are
+    kept for polling until ``history`` newer jobs have been submitted.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queued: int = 8, history: int = 64,
+                 preload=('scapy.all', 'network_analyzer'), work_dir: str = None):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.history = history
+        self.preload = tuple(preload)
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='analysis-jobs-')
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._session_jobs = {}
+        self._durations = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    def submit(self, session_id: str, stages, func, *args, on_result=None) -> AnalysisJob:
+        """Queue ``func(progress, *args)`` on a worker; its return value becomes ``job.result``.
+
+        ``func`` and ``args`` must be picklable (``func`` defined at module level).
+        ``on_result(job, result)``, if given, runs in this process before the
+        job is marked completed and its return value is stored instead, so
+        large parts of the result can be taken out of the public snapshot.
+        """
+        with self._lock:
+            self._check_admission_locked(session_id)
+            job_dir = os.path.join(self.work_dir, uuid.uuid4().hex)
+            os.makedirs(job_dir)
+            job = AnalysisJob(session_id, stages, job_dir)
+            try:
+                job.future = self._pool().submit(_run_in_worker, func, job_dir, args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                logger.warning('Analysis process pool broken; restarting it')
+                self._executor = None
+                job.future = self._pool().submit(_run_in_worker, func, job_dir, args)
+            self._jobs[job.id] = job
+            self._session_jobs[session_id] = job
+            self._prune_locked()
+        job.future.add_done_callback(lambda future: self._on_done(job, future, on_result))
+        return job
+
+    def check_admission(self, session_id: str = None) -> None:
+        """Raise ``JobQueueFull`` if a new job would not be admitted.
+
+        The session's own unfinished job does not count, since a new upload
+        cancels it.
+        """
+        with self._lock:
+            self._check_admission_locked(session_id)
+
+    def get(self, job_id: str) -> AnalysisJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def session_job(self, session_id: str) -> AnalysisJob | None:
+        """The most recently submitted job of a session."""
+        with self._lock:
+            return self._session_jobs.get(session_id)
+
+    def cancel_session(self, session_id: str) -> AnalysisJob | None:
+        """Cancel the session's unfinished job, if any, and return it."""
+        job = self.session_job(session_id)
+        if job is not None and job.cancel():
+            return job
+        return None
+
+    def shutdown(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            executor, self._executor = self._executor, None
+        for job in jobs:
+            job.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # ── internals ──
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: the API process runs threads (event loop, scheduler), which fork does not copy safely
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_preload_worker,
+                initargs=(self.preload,),
+            )
+        return self._executor
+
+    def _check_admission_locked(self, session_id) -> None:
+        pending = sum(1 for job in self._jobs.values()
+                      if not job.done and job.session_id != session_id)
+        if pending >= self.max_workers + self.max_queued:
+            raise JobQueueFull(self._retry_after_locked())
+
+    def _retry_after_locked(self) -> int:
+        """Seconds until a worker is likely free, from recent job durations."""
+        average = sum(self._durations) / len(self._durations) if self._durations else 10.0
+        return max(1, min(300, math.ceil(average / self.max_workers)))
+
+    def _on_done(self, job: AnalysisJob, future, on_result=None) -> None:
+        if future.cancelled():
+            job._finish(JOB_CANCELLED)
+            return
+        exc = future.exception()
+        result = future.result() if exc is None else None
+        if exc is None and on_result is not None:
+            try:
+                result = on_result(job, result)
+            except Exception as callback_exc:
+                exc = callback_exc
+        if exc is None:
+            finished = job._finish(JOB_COMPLETED, result=result)
+        elif isinstance(exc, JobCancelled):
+            finished = job._finish(JOB_CANCELLED)
+        else:
+            logger.error('Analysis job %s failed: %s: %s', job.id, type(exc).__name__, exc)
+            finished = job._finish(JOB_FAILED, error=f'{type(exc).__name__}: {exc}')
+        if finished and job.started_at:
+            with self._lock:
+                self._durations.append(job.finished_at - job.started_at)
+
+    def _prune_locked(self) -> None:
+        while len(self._jobs) > self.history:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if not oldest.done:
+                break
+            del self._jobs[oldest_id]
+            if self._session_jobs.get(oldest.session_id) is oldest:
+                del self._session_jobs[oldest.session_id]
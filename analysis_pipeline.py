@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""The PCAP analysis pipeline run by the API's analysis workers.
+
+Kept out of ``analysis_server`` so worker processes can import it without
+building the FastAPI app. ``analyze_pcap`` runs every NetworkAnalyzer
+phase, writes the results and the capture model (record offsets, flow
+index, packet table; see capture_model) into the session directory and
+returns only a small summary.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict
+
+from capture_model import CAPTURE_MODEL_DIR, save_capture_model
+from network_analyzer import NetworkAnalyzer
+
+# Pipeline stages: (stage, NetworkAnalyzer method, relative weight for progress/ETA).
+# 'load' and 'save' are handled separately; weights are rough shares of run time.
+ANALYSIS_STAGES = [
+    ('basic_statistics', 'basic_statistics', 5),
+    ('packet_loss', 'detect_packet_loss', 4),
+    ('latency', 'analyze_latency', 3),
+    ('attacks', 'detect_attacks', 8),
+    ('mind_map', 'build_mind_map', 2),
+    ('protocol_timelines', 'generate_protocol_timelines', 20),
+    ('statistics_summary', 'generate_statistics_summary', 4),   # Phase 5
+    ('expert_info', 'extract_expert_info', 5),                  # Phase 6
+    ('tls_info', 'extract_tls_info', 4),                        # Phase 10
+    ('performance_score', 'compute_performance_score', 1),      # Phase 11
+    ('geo_info', 'enrich_geo_info', 1),                         # Phase 12
+    ('dns_analysis', 'analyze_dns', 2),                         # Phase 13
+]
+STAGE_WEIGHTS = [('load', 30)] + [(name, weight) for name, _, weight in ANALYSIS_STAGES] + [('save', 6)]
+
+
+def analyze_pcap(job, pcap_path: Path, session_dir: Path) -> Dict[str, Any]:
+    """Run the full analysis of ``pcap_path`` and save it into ``session_dir``.
+
+    ``job`` (an analysis_jobs.JobProgress, or None) receives per-stage
+    progress; cancellation is checked between stages and between packet
+    chunks while loading.
+    """
+    analyzer = NetworkAnalyzer(str(pcap_path))
+
+    progress = None
+    if job is not None:
+        job.start_stage('load')
+
+        def progress(packets_read, bytes_read, total_bytes):
+            job.update(fraction=bytes_read / total_bytes if total_bytes else None,
+                       packets_processed=packets_read)
+            return not job.cancel_requested
+
+    if not analyzer.load_packets(progress=progress):
+        if job is not None:
+            job.check_cancelled()
+        message = analyzer.last_error or 'Failed to load packets'
+        raise ValueError(message)
+
+    packet_count = len(analyzer.packets)
+    for stage, method, _ in ANALYSIS_STAGES:
+        if job is not None:
+            job.start_stage(stage)
+            job.update(packets_processed=packet_count, total_packets=packet_count)
+        getattr(analyzer, method)()
+
+    if job is not None:
+        job.start_stage('save')
+    analyzer.save_results(
+        output_file=str(session_dir / 'network_analysis_results.json'),
+        public_output_dir=str(session_dir),
+    )
+    model = analyzer.build_capture_model()
+    if model is not None:
+        save_capture_model(model, str(session_dir / CAPTURE_MODEL_DIR))
+
+    return {
+        'packet_count': packet_count,
+        'timeline_count': len(analyzer.protocol_timelines) if hasattr(analyzer, 'protocol_timelines') else 0,
+    }
@@ -7,16 +7,25 @@ import json
 import logging
 import os
 import re
-import threading
+import sys
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from pathlib import Path
-from tempfile import NamedTemporaryFile
 from typing import Any, Dict
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, File, HTTPException, Request, UploadFile, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from starlette.middleware.sessions import SessionMiddleware
 
+from analysis_jobs import TERMINAL_STATES, AnalysisJob, AnalysisJobManager, JobQueueFull
+from analysis_pipeline import STAGE_WEIGHTS, analyze_pcap
+from capture_model import CAPTURE_MODEL_DIR, open_capture_model
+from columnar_store import open_table
+from result_db import RESULT_DB_FILE, connection_packet_indices, open_result_db, with_relative_time
+from memory_cache import ByteBudgetLRU
 from network_analyzer import NetworkAnalyzer
 
 logger = logging.getLogger(__name__)
@@ -28,10 +37,25 @@ load_dotenv()
 # Caches loaded NetworkAnalyzer instances per session to avoid re-reading
 # the PCAP file on every /api/packet-detail request.
 # Key: session_id, Value: (pcap_mtime, NetworkAnalyzer, matched_indices_cache)
-#   matched_indices_cache: Dict[connection_id, set] — cached packet index lookups
-_analyzer_cache: Dict[str, tuple] = {}
-_analyzer_cache_lock = threading.Lock()
-_ANALYZER_CACHE_MAX = 8  # max concurrent sessions cached
+#   matched_indices_cache: ByteBudgetLRU[connection_id, list] — cached packet index lookups (sorted)
+# A loaded capture costs far more than its file size (every packet is a Scapy
+# object tree), so entries are sized as file bytes + packets * per-packet
+# estimate and evicted least-recently-used against ANALYZER_CACHE_MAX_BYTES.
+# After /api/analyze the worker saves a capture model (record offsets, flow
+# index, packet table) into the session directory; any API worker process
+# memory-maps it instead, packets are re-read from disk on demand, and the
+# entry is sized by the lazy packet list's own estimate.
+# Each entry also reserves the ceilings of the caches that fill while it is
+# served: connection lookups plus the analyzer's reassembled-stream and
+# per-flow HTTP LRUs (NetworkAnalyzer.STREAM_CACHE_MAX_BYTES,
+# HTTP_FLOW_CACHE_MAX_BYTES).
+_analyzer_cache = ByteBudgetLRU(
+    max_bytes=int(os.getenv('ANALYZER_CACHE_MAX_BYTES', str(1024 * 1024 * 1024))),
+    max_entries=8,  # max concurrent sessions cached
+)
+_ANALYZER_BYTES_PER_PACKET = 4608  # measured ~4.5 KB per dissected Scapy packet
+_MATCHED_CACHE_MAX = 256  # connection lookups kept per session
+_MATCHED_CACHE_MAX_BYTES = 16 * 1024 * 1024
 
 # Regex for validating connection_id format (protocol-ip-port-ip-port[-extra])
 _IP_PART = r'(?:\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}|\[[0-9a-fA-F:]+\])'
@@ -48,39 +72,286 @@ _CONNECTION_ID_MAX_LEN = 256
 
 def _get_cached_analyzer(session_id: str, pcap_path: Path) -> tuple | None:
     """Return (analyzer, matched_cache) if the PCAP hasn't changed, else None."""
-    with _analyzer_cache_lock:
-        if session_id not in _analyzer_cache:
-            return None
-        cached_mtime, analyzer, matched_cache = _analyzer_cache[session_id]
-        try:
-            current_mtime = pcap_path.stat().st_mtime
-        except OSError:
-            return None
-        if cached_mtime == current_mtime:
-            return analyzer, matched_cache
-        # PCAP changed — invalidate
-        del _analyzer_cache[session_id]
+    try:
+        current_mtime = pcap_path.stat().st_mtime
+    except OSError:
+        return None
+    # PCAP changed — the stale entry is dropped by the cache
+    entry = _analyzer_cache.get(session_id, is_fresh=lambda entry: entry[0] == current_mtime)
+    if entry is None:
         return None
+    _, analyzer, matched_cache = entry
+    return analyzer, matched_cache
 
 
-def _put_cached_analyzer(session_id: str, pcap_path: Path, analyzer: NetworkAnalyzer) -> None:
-    """Store an analyzer in the cache, evicting oldest if at capacity."""
+def _put_cached_analyzer(session_id: str, pcap_path: Path, analyzer: NetworkAnalyzer) -> ByteBudgetLRU:
+    """Store an analyzer in the cache; returns the session's (new) connection lookup cache."""
+    matched_cache = ByteBudgetLRU(max_bytes=_MATCHED_CACHE_MAX_BYTES, max_entries=_MATCHED_CACHE_MAX)
     try:
-        mtime = pcap_path.stat().st_mtime
+        stat = pcap_path.stat()
     except OSError:
         logger.warning(f"Cannot stat PCAP path for caching: {pcap_path}")
-        return
-    with _analyzer_cache_lock:
-        if len(_analyzer_cache) >= _ANALYZER_CACHE_MAX and session_id not in _analyzer_cache:
-            # Evict oldest entry (first key inserted)
-            oldest_key = next(iter(_analyzer_cache))
-            del _analyzer_cache[oldest_key]
-        _analyzer_cache[session_id] = (mtime, analyzer, {})
+        return matched_cache
+    packets_bytes = getattr(analyzer.packets, 'nbytes', None)  # LazyPacketList knows its own footprint
+    if packets_bytes is None:
+        packets_bytes = stat.st_size + len(analyzer.packets) * _ANALYZER_BYTES_PER_PACKET
+    size = (packets_bytes + _MATCHED_CACHE_MAX_BYTES
+            + NetworkAnalyzer.STREAM_CACHE_MAX_BYTES + NetworkAnalyzer.HTTP_FLOW_CACHE_MAX_BYTES)
+    if not _analyzer_cache.put(session_id, (stat.st_mtime, analyzer, matched_cache), size):
+        logger.info(f"Capture too large for analyzer cache ({size} bytes estimated): {pcap_path}")
+    return matched_cache
+
+
+def _matched_indices_bytes(indices) -> int:
+    return sys.getsizeof(indices) + 32 * len(indices)
+
+
+def _connection_indices(analyzer: NetworkAnalyzer, matched_cache: ByteBudgetLRU, connection_id: str) -> list:
+    """Sorted packet indices of a connection, via the session's lookup cache."""
+    matched_indices = matched_cache.get(connection_id)
+    if matched_indices is None:
+        matched_indices = sorted(analyzer._find_packets_by_connection_id(connection_id))
+        matched_cache.put(connection_id, matched_indices, _matched_indices_bytes(matched_indices))
+    return matched_indices
+
+
+def _open_mapped_analyzer(session_id: str, pcap_path: Path) -> tuple | None:
+    """Cache an analyzer over the session's memory-mapped capture model, if the analysis saved one."""
+    model = open_capture_model(str(pcap_path.parent / CAPTURE_MODEL_DIR), str(pcap_path))
+    if model is None:
+        return None
+    analyzer = NetworkAnalyzer.from_capture_model(model)
+    return analyzer, _put_cached_analyzer(session_id, pcap_path, analyzer)
+
+
+def _load_session_analyzer(session_id: str, pcap_path: Path) -> tuple | None:
+    """(analyzer, matched_cache) for the session's PCAP: cached, mapped model, else a full load.
+
+    Returns None if the PCAP cannot be loaded.
+    """
+    cached = _get_cached_analyzer(session_id, pcap_path)
+    if cached is None:
+        # Another worker process analyzed this session: share its mapped model
+        cached = _open_mapped_analyzer(session_id, pcap_path)
+    if cached is None:
+        analyzer = NetworkAnalyzer(str(pcap_path))
+        if not analyzer.load_packets():
+            return None
+        cached = analyzer, _put_cached_analyzer(session_id, pcap_path, analyzer)
+    return cached
+
+
+def _warm_analyzer_cache(job: AnalysisJob, result: dict, pcap_path: Path) -> dict:
+    """Job result hook: cache the saved capture model so the first packet-detail/stream request is fast."""
+    if _analysis_jobs.session_job(job.session_id) is job and _open_mapped_analyzer(job.session_id, pcap_path):
+        logger.debug(f"Analyzer cache warmed for session {job.session_id}")
+    return result
+
+
+# ── Packet Details Cache ────────────────────────────────────────────
+# Analysis only records which packets belong to each connection;
+# /api/packets/{connection_id} and /api/packets/batch extract the details of
+# the requested page from the capture (via the session analyzer) and keep
+# them here. After each page the next one is extracted in the background, so
+# paging forward is served from the cache.
+# Key: (session_id, packet_index), Value: (pcap_mtime, details)
+# Cached details are shared between requests — callers must not mutate them.
+_packet_details_cache = ByteBudgetLRU(int(os.getenv('PACKET_DETAILS_CACHE_MAX_BYTES', str(64 * 1024 * 1024))))
+_PACKET_DETAILS_BYTES = 4096  # measured ~3.3-3.7 KB per details dict (payload preview included)
+_packet_readahead = ThreadPoolExecutor(max_workers=1, thread_name_prefix='packet-readahead')
+
+
+# ── Deep Detail Cache ───────────────────────────────────────────────
+# /api/packet-detail results (full layer walk + hex dump) per packet, same
+# keys and invalidation as the packet details above. BatchPacketViewer steps
+# through neighbouring packets, so each request also prefetches the
+# _DEEP_DETAIL_PREFETCH packets before and after it in the same connection.
+_deep_detail_cache = ByteBudgetLRU(int(os.getenv('DEEP_DETAIL_CACHE_MAX_BYTES', str(32 * 1024 * 1024))))
+_DEEP_DETAIL_BYTES = 16384  # measured ~16 KB per layer tree, plus the hex dump itself
+_DEEP_DETAIL_PREFETCH = int(os.getenv('DEEP_DETAIL_PREFETCH', '3'))
+
+
+def _cached_per_packet(cache: ByteBudgetLRU, extract, size_of, session_id: str, pcap_mtime: float, indices) -> list:
+    """``extract(idx)`` of each packet, served from / stored in ``cache``; None results are skipped."""
+    results = []
+    for idx in indices:
+        key = (session_id, idx)
+        entry = cache.get(key, is_fresh=lambda entry: entry[0] == pcap_mtime)
+        if entry is None:
+            value = extract(idx)
+            entry = (pcap_mtime, value)
+            cache.put(key, entry, size_of(value))
+        if entry[1]:
+            results.append(entry[1])
+    return results
+
+
+def _packet_details(session_id: str, pcap_mtime: float, analyzer: NetworkAnalyzer, indices) -> list:
+    """Details of the given packets, extracting and caching the ones not cached yet."""
+    return _cached_per_packet(_packet_details_cache, analyzer._extract_packet_details,
+                              lambda details: _PACKET_DETAILS_BYTES, session_id, pcap_mtime, indices)
+
+
+def _deep_details(session_id: str, pcap_mtime: float, analyzer: NetworkAnalyzer, indices) -> list:
+    """Deep details (layer tree + hex dump) of the given packets, cached like _packet_details."""
+    return _cached_per_packet(_deep_detail_cache, analyzer._extract_packet_deep_detail,
+                              lambda detail: _DEEP_DETAIL_BYTES + len((detail or {}).get('rawHex', '')),
+                              session_id, pcap_mtime, indices)
+
+
+def _read_ahead(fill, session_id: str, pcap_mtime: float, analyzer: NetworkAnalyzer, indices) -> None:
+    """Background task: ``fill`` (_packet_details / _deep_details) the cache for ``indices``."""
+    try:
+        fill(session_id, pcap_mtime, analyzer, indices)
+    except Exception:
+        logger.exception(f"Packet read-ahead failed for session {session_id}")
+
+
+def _connection_pages(session_id: str, session_dir: Path, db, requests: dict) -> dict:
+    """{connection_id: (total_packets, packets) or None} for {connection_id: (offset, limit)}.
+
+    Looks up each page's packet indices in the session store, extracts their
+    details on demand and queues the following page for read-ahead.
+    """
+    pages = {}
+    for connection_id, (offset, limit) in requests.items():
+        # One range query covers the page and the page after it
+        pages[connection_id] = connection_packet_indices(db, connection_id, offset, 2 * limit)
+    if not any(found and found[2] for found in pages.values()):
+        return {connection_id: found and (found[0], []) for connection_id, found in pages.items()}
+
+    pcap_path = session_dir / 'uploaded.pcap'
+    try:
+        pcap_mtime = pcap_path.stat().st_mtime
+    except OSError:
+        raise HTTPException(status_code=404, detail='No PCAP file found. Please upload a PCAP file first.')
+    cached = _load_session_analyzer(session_id, pcap_path)
+    if cached is None:
+        raise HTTPException(status_code=500, detail='Failed to load PCAP file.')
+    analyzer, _ = cached
+
+    results = {}
+    read_ahead = []
+    for connection_id, found in pages.items():
+        if found is None:
+            results[connection_id] = None
+            continue
+        total, first_timestamp, indices = found
+        limit = requests[connection_id][1]
+        packets = _packet_details(session_id, pcap_mtime, analyzer, indices[:limit])
+        results[connection_id] = (total, with_relative_time(packets, first_timestamp))
+        read_ahead.extend(indices[limit:])
+    if read_ahead:
+        _packet_readahead.submit(_read_ahead, _packet_details, session_id, pcap_mtime, analyzer, read_ahead)
+    return results
+
+
+# ── Parsed Results Cache ────────────────────────────────────────────
+# The dashboard fires /api/analysis, /api/attacks, /api/expert-info, ... at
+# once and each needs one key of the same results file, so keep the parsed
+# JSON per session instead of json.load-ing the whole file per request.
+# Key: (session_id, file name), Value: (st_mtime_ns, st_size, parsed_data)
+# The budget is counted in on-disk JSON bytes (the parsed objects are a few
+# times larger); least recently used entries go first.
+# Cached objects are shared between requests — callers must not mutate them.
+_results_cache = ByteBudgetLRU(int(os.getenv('RESULTS_CACHE_MAX_BYTES', str(64 * 1024 * 1024))))
+
+
+def _load_session_json(session_id: str, path: Path) -> Any | None:
+    """Return the parsed JSON file, reusing the cached parse while the file is unchanged.
+
+    Returns None if the file does not exist.
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    key = (session_id, path.name)
+    # File rewritten (re-analysis) — the stale entry is dropped by the cache
+    entry = _results_cache.get(
+        key, is_fresh=lambda entry: entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size)
+    if entry is not None:
+        return entry[2]
+
+    with path.open('r', encoding='utf-8') as handle:
+        data = json.load(handle)
+    _results_cache.put(key, (stat.st_mtime_ns, stat.st_size, data), stat.st_size)
+    return data
+
+
+def _evict_session_results(session_id: str) -> None:
+    """Drop every cached results file and packet (deep) details of a session."""
+    _results_cache.discard_where(lambda key: key[0] == session_id)
+    _packet_details_cache.discard_where(lambda key: key[0] == session_id)
+    _deep_detail_cache.discard_where(lambda key: key[0] == session_id)
+
+
+def _load_session_section(session_id: str, session_dir: Path, section: str) -> Any | None:
+    """Return one top-level section of the session's analysis results.
+
+    Reads only sections/<name>.json listed in the manifest written by
+    save_results(); sessions analyzed before sections existed fall back to
+    the combined results file. Returns None if the section is not available.
+    """
+    sections_dir = session_dir / NetworkAnalyzer.RESULT_SECTIONS_DIR
+    manifest = _load_session_json(session_id, sections_dir / NetworkAnalyzer.RESULT_MANIFEST_FILE)
+    if manifest is None:
+        data = _load_session_json(session_id, session_dir / 'network_analysis_results.json')
+        return data.get(section) if data is not None else None
+    entry = manifest.get('sections', {}).get(section)
+    if entry is None:
+        return None
+    return _load_session_json(session_id, sections_dir / entry['file'])
+
+
+def _open_session_table(session_id: str, session_dir: Path, table: str):
+    """Open one table of the session's columnar result store (see columnar_store).
+
+    Returns None for sessions analyzed before tables existed, or when the
+    table's format cannot be read here (Arrow file without pyarrow).
+    """
+    tables_dir = session_dir / NetworkAnalyzer.RESULT_TABLES_DIR
+    manifest = _load_session_json(session_id, tables_dir / NetworkAnalyzer.RESULT_MANIFEST_FILE)
+    entry = (manifest or {}).get('tables', {}).get(table)
+    if entry is None:
+        return None
+    return open_table(str(tables_dir / entry['file']))
+
+
+def _statistics_packets_from_table(packets, memberships, connection_ids) -> tuple:
+    """(packets, connection count) for /api/packets/statistics from the column tables.
+
+    ``memberships`` lists (connection_id, packet_index) pairs; only the three
+    packet columns the statistics need are read from ``packets``.
+    """
+    if memberships.num_rows == 0:
+        return [], 0
+    row_of = {idx: row for row, idx in enumerate(packets.column('index'))}
+    timestamps, lengths, flags = (packets.column(name) for name in ('timestamp', 'length', 'tcp_flags'))
+    wanted = set(connection_ids) if connection_ids else None
+    seen = set()
+    result = []
+    for conn_id, idx in zip(memberships.column('connection_id'), memberships.column('packet_index')):
+        if wanted is not None and conn_id not in wanted:
+            continue
+        seen.add(conn_id)
+        row = row_of[idx]
+        if timestamps[row] is not None:
+            result.append({
+                'timestamp': timestamps[row],
+                'length': lengths[row],
+                'tcp_flags': flags[row],
+                'connection_id': conn_id
+            })
+    return result, len(seen)
+
 
 DATA_DIR = Path('public/data')
 RESULT_FILE = DATA_DIR / 'network_analysis_results.json'
 MINDMAP_FILE = DATA_DIR / 'network_mind_map.json'
 TIMELINE_FILE = DATA_DIR / 'protocol_timeline_sample.json'
+# Sections /api/analysis returns unless the client asks for others
+ANALYSIS_OVERVIEW_SECTIONS = ('basic_stats', 'packet_loss', 'latency', 'mind_map')
 SUPPORTED_EXTENSIONS = {'.pcap', '.pcapng'}
 
 app = FastAPI(title='Network Analyzer Service', version='1.0.0')
@@ -239,8 +510,8 @@ def cleanup_expired_sessions(max_age_seconds: int = 14400):
                 # Session has expired, delete it
                 shutil.rmtree(session_dir)
                 # Also evict from analyzer cache
-                with _analyzer_cache_lock:
-                    _analyzer_cache.pop(session_dir.name, None)
+                _analyzer_cache.pop(session_dir.name)
+                _evict_session_results(session_dir.name)
                 cleaned_count += 1
                 logger.info(f"Cleaned up expired session: {session_dir.name} (age: {age:.0f}s)")
         except Exception as e:
@@ -252,57 +523,6 @@ def cleanup_expired_sessions(max_age_seconds: int = 14400):
         logger.debug("No expired sessions found")
 
 
-def _run_analysis(pcap_path: Path) -> Dict[str, Any]:
-    capture_path = pcap_path
-    temp_copy = None
-    try:
-        if not capture_path.exists():
-            raise ValueError('???????')
-
-        try:
-            str(capture_path).encode('ascii')
-        except UnicodeEncodeError:
-            with NamedTemporaryFile(delete=False, suffix=capture_path.suffix) as temp_handle:
-                temp_handle.write(capture_path.read_bytes())
-                temp_copy = Path(temp_handle.name)
-            capture_path = temp_copy
-
-        analyzer = NetworkAnalyzer(str(capture_path))
-        if not analyzer.load_packets():
-            message = analyzer.last_error or '????????'
-            raise ValueError(message)
-    finally:
-        if temp_copy is not None:
-            Path(temp_copy).unlink(missing_ok=True)
-
-    analyzer.basic_statistics()
-    analyzer.detect_packet_loss()
-    analyzer.analyze_latency()
-    analyzer.detect_attacks()  # 攻擊偵測
-    analyzer.build_mind_map()
-    analyzer.generate_protocol_timelines()
-    analyzer.generate_statistics_summary()  # Phase 5
-    analyzer.extract_expert_info()          # Phase 6
-    analyzer.extract_tls_info()             # Phase 10
-    analyzer.compute_performance_score()    # Phase 11
-    analyzer.enrich_geo_info()              # Phase 12
-
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    analyzer.save_results(
-        output_file=str(RESULT_FILE),
-        public_output_dir=str(DATA_DIR),
-    )
-
-    return analyzer.analysis_results
-
-
-def _load_cached_results() -> Dict[str, Any] | None:
-    if RESULT_FILE.exists():
-        with RESULT_FILE.open('r', encoding='utf-8') as handle:
-            return json.load(handle)
-    return None
-
-
 def _load_timeline_fixture() -> Dict[str, Any] | None:
     if TIMELINE_FILE.exists():
         with TIMELINE_FILE.open("r", encoding="utf-8") as handle:
@@ -320,22 +540,40 @@ def health_check() -> Dict[str, str]:
     }
 
 
+@app.get('/api/cache-stats')
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters and memory use of the in-process caches (no session required)"""
+    return {
+        'analyzer_cache': _analyzer_cache.stats(),
+        'packet_details_cache': _packet_details_cache.stats(),
+        'deep_detail_cache': _deep_detail_cache.stats(),
+        'results_cache': _results_cache.stats(),
+    }
+
+
 @app.get('/api/analysis')
 async def get_analysis(
     request: Request,
-    session_id: str = Depends(require_session)
+    session_id: str = Depends(require_session),
+    sections: str | None = None
 ) -> Dict[str, Any]:
-    """Get cached analysis results (requires session)"""
-    session_dir = get_session_data_dir(request)
-    result_file = session_dir / 'network_analysis_results.json'
+    """Get the overview sections of the analysis results (requires session)
 
-    if not result_file.exists():
+    ``sections`` is an optional comma-separated list of section names; by
+    default only ANALYSIS_OVERVIEW_SECTIONS are returned. Each section is read
+    from its own file, never from one combined results file.
+    """
+    session_dir = get_session_data_dir(request)
+    if not (session_dir / 'network_analysis_results.json').exists():
         raise HTTPException(status_code=404, detail='No analysis has been generated yet for this session')
 
-    with result_file.open('r', encoding='utf-8') as handle:
-        cached = json.load(handle)
-
-    return {'analysis': cached}
+    names = [name for name in sections.split(',') if name] if sections else ANALYSIS_OVERVIEW_SECTIONS
+    analysis = {}
+    for name in names:
+        data = _load_session_section(session_id, session_dir, name)
+        if data is not None:
+            analysis[name] = data
+    return {'analysis': analysis}
 
 
 @app.get('/api/timelines')
@@ -345,20 +583,15 @@ async def get_timelines(
 ) -> Dict[str, Any]:
     """Get protocol timeline data (requires session)"""
     session_dir = get_session_data_dir(request)
-    timeline_file = session_dir / 'protocol_timeline_sample.json'
 
     # Try session-specific timeline first
-    if timeline_file.exists():
-        with timeline_file.open('r', encoding='utf-8') as handle:
-            data = json.load(handle)
-            # 嘗試附加攻擊分析數據
-            analysis_file = session_dir / 'network_analysis_results.json'
-            if analysis_file.exists():
-                with analysis_file.open('r', encoding='utf-8') as af:
-                    analysis_data = json.load(af)
-                    if 'attack_analysis' in analysis_data:
-                        data['attackAnalysis'] = analysis_data['attack_analysis']
-            return data
+    data = _load_session_section(session_id, session_dir, 'protocol_timelines')
+    if data is not None:
+        # 嘗試附加攻擊分析數據（淺拷貝，不修改快取內容）
+        attack_analysis = _load_session_section(session_id, session_dir, 'attack_analysis')
+        if attack_analysis is not None:
+            data = {**data, 'attackAnalysis': attack_analysis}
+        return data
 
     # Fallback to static fixture if no session-specific data exists
     fixture = _load_timeline_fixture()
@@ -374,19 +607,8 @@ async def get_attack_analysis(
 ) -> Dict[str, Any]:
     """Get attack detection analysis (requires session)"""
     session_dir = get_session_data_dir(request)
-    analysis_file = session_dir / 'network_analysis_results.json'
 
-    if not analysis_file.exists():
-        return {
-            'metrics': {}, 'tcp_flags': {}, 'top_sources': [], 'top_targets': [],
-            'attack_detection': {'detected': False, 'type': None, 'description': None,
-                                 'severity': 'normal', 'confidence': 0, 'anomaly_score': 0}
-        }
-
-    with analysis_file.open('r', encoding='utf-8') as handle:
-        data = json.load(handle)
-
-    attack_analysis = data.get('attack_analysis')
+    attack_analysis = _load_session_section(session_id, session_dir, 'attack_analysis')
     if not attack_analysis:
         return {
             'metrics': {},
@@ -415,15 +637,8 @@ async def get_statistics_summary(
 ) -> Dict[str, Any]:
     """Get protocol hierarchy, endpoint and conversation statistics."""
     session_dir = get_session_data_dir(request)
-    analysis_file = session_dir / 'network_analysis_results.json'
-
-    if not analysis_file.exists():
-        raise HTTPException(status_code=404, detail='No analysis data available')
-
-    with analysis_file.open('r', encoding='utf-8') as handle:
-        data = json.load(handle)
 
-    summary = data.get('statistics_summary')
+    summary = _load_session_section(session_id, session_dir, 'statistics_summary')
     if not summary:
         raise HTTPException(status_code=404, detail='No statistics summary available')
     return summary
@@ -438,15 +653,8 @@ async def get_expert_info(
 ) -> Dict[str, Any]:
     """Get expert information events (retransmissions, RST, ZeroWindow, etc.)."""
     session_dir = get_session_data_dir(request)
-    analysis_file = session_dir / 'network_analysis_results.json'
-
-    if not analysis_file.exists():
-        return {'events': [], 'summary': {'total': 0, 'errors': 0, 'warnings': 0, 'notes': 0}}
-
-    with analysis_file.open('r', encoding='utf-8') as handle:
-        data = json.load(handle)
 
-    events = data.get('expert_info', [])
+    events = _load_session_section(session_id, session_dir, 'expert_info') or []
     error_count = sum(1 for e in events if e['severity'] == 'error')
     warning_count = sum(1 for e in events if e['severity'] == 'warning')
     note_count = sum(1 for e in events if e['severity'] == 'note')
@@ -471,15 +679,8 @@ async def get_geo_info(
 ) -> Dict[str, Any]:
     """Get IP geolocation/classification info."""
     session_dir = get_session_data_dir(request)
-    analysis_file = session_dir / 'network_analysis_results.json'
-
-    if not analysis_file.exists():
-        return {}
-
-    with analysis_file.open('r', encoding='utf-8') as handle:
-        data = json.load(handle)
-
-    return data.get('geo_info', {})
+    geo_info = _load_session_section(session_id, session_dir, 'geo_info')
+    return geo_info if geo_info is not None else {}
 
 
 # ── Phase 10: TLS Info ─────────────────────────────────────────────
@@ -491,15 +692,10 @@ async def get_tls_info(
 ) -> Dict[str, Any]:
     """Get TLS handshake information."""
     session_dir = get_session_data_dir(request)
-    analysis_file = session_dir / 'network_analysis_results.json'
-
-    if not analysis_file.exists():
+    tls_info = _load_session_section(session_id, session_dir, 'tls_info')
+    if tls_info is None:
         return {'tls_sessions': [], 'summary': {'total_tls_connections': 0, 'tls_versions': {}, 'unique_snis': []}}
-
-    with analysis_file.open('r', encoding='utf-8') as handle:
-        data = json.load(handle)
-
-    return data.get('tls_info', {'tls_sessions': [], 'summary': {'total_tls_connections': 0, 'tls_versions': {}, 'unique_snis': []}})
+    return tls_info
 
 
 # ── Phase 11: Network Performance Score ────────────────────────────
@@ -511,30 +707,34 @@ async def get_performance(
 ) -> Dict[str, Any]:
     """Get network performance score (latency, packet loss, throughput)."""
     session_dir = get_session_data_dir(request)
-    analysis_file = session_dir / 'network_analysis_results.json'
-
-    if not analysis_file.exists():
-        return {}
-
-    with analysis_file.open('r', encoding='utf-8') as handle:
-        data = json.load(handle)
-
-    return data.get('performance_score', {})
+    performance = _load_session_section(session_id, session_dir, 'performance_score')
+    return performance if performance is not None else {}
 
 
 # ── Phase 8: Follow TCP Stream ─────────────────────────────────────
 
+_STREAM_PAGE_MAX_BYTES = 1024 * 1024
+
 @app.get('/api/stream/{connection_id}')
 async def get_tcp_stream(
     connection_id: str,
     request: Request,
-    session_id: str = Depends(require_session)
+    session_id: str = Depends(require_session),
+    offset: int = 0,
+    limit: int = NetworkAnalyzer.STREAM_PAGE_BYTES
 ) -> Dict[str, Any]:
-    """Reassemble and return TCP stream data for a connection."""
+    """Reassemble and return TCP stream data for a connection.
+
+    Args:
+        offset: First byte of each direction's stream to return (default: 0)
+        limit: Maximum bytes per direction (default: 64 KiB, at most 1 MiB)
+    """
     if not connection_id or len(connection_id) > _CONNECTION_ID_MAX_LEN:
         raise HTTPException(status_code=400, detail='Invalid connection_id length.')
     if not _CONNECTION_ID_RE.match(connection_id):
         raise HTTPException(status_code=400, detail='Invalid connection_id format.')
+    if offset < 0 or not 1 <= limit <= _STREAM_PAGE_MAX_BYTES:
+        raise HTTPException(status_code=400, detail='Invalid offset or limit.')
 
     session_dir = get_session_data_dir(request)
     pcap_files = list(session_dir.glob('*.pcap')) + list(session_dir.glob('*.pcapng'))
@@ -542,16 +742,12 @@ async def get_tcp_stream(
         raise HTTPException(status_code=404, detail='No PCAP file found in session')
 
     pcap_path = pcap_files[0]
-    cached = _get_cached_analyzer(session_id, pcap_path)
-    if cached:
-        analyzer, _ = cached
-    else:
-        analyzer = NetworkAnalyzer(str(pcap_path))
-        if not analyzer.load_packets():
-            raise HTTPException(status_code=500, detail='Failed to load PCAP')
-        _put_cached_analyzer(session_id, pcap_path, analyzer)
+    cached = await asyncio.to_thread(_load_session_analyzer, session_id, pcap_path)
+    if cached is None:
+        raise HTTPException(status_code=500, detail='Failed to load PCAP')
+    analyzer, _ = cached
 
-    result = analyzer.reassemble_tcp_stream(connection_id)
+    result = await asyncio.to_thread(analyzer.reassemble_tcp_stream, connection_id, offset=offset, limit=limit)
     if result is None:
         raise HTTPException(status_code=404, detail='No stream data found for this connection')
     return result
@@ -585,35 +781,49 @@ async def get_batch_packets(
     # Parse request body
     body = await request.json()
     connection_ids = body.get('connection_ids', [])
-    packets_per_connection = min(body.get('packets_per_connection', 20), 100)  # Max 100 per connection
+    packets_per_connection = body.get('packets_per_connection', 20)
 
     # Validate
+    if not isinstance(packets_per_connection, int) or packets_per_connection < 1:
+        raise HTTPException(status_code=400, detail='packets_per_connection must be a positive integer')
+    packets_per_connection = min(packets_per_connection, 100)  # Max 100 per connection
+
     if not connection_ids:
         raise HTTPException(status_code=400, detail='connection_ids is required')
 
     if len(connection_ids) > 100:
         raise HTTPException(status_code=400, detail='Maximum 100 connections per batch request')
 
-    # Check if connection_packets file exists
-    if not packets_file.exists():
-        raise HTTPException(
-            status_code=404,
-            detail='No packet data available. Please analyze a PCAP file first.'
-        )
+    db = open_result_db(str(session_dir / RESULT_DB_FILE))
+    if db is not None:
+        # Indexed lookups, details extracted for the returned packets only
+        with closing(db):
+            found = await asyncio.to_thread(_connection_pages, session_id, session_dir, db,
+                                            {conn_id: (0, packets_per_connection) for conn_id in connection_ids})
+    else:
+        # Check if connection_packets file exists
+        if not packets_file.exists():
+            raise HTTPException(
+                status_code=404,
+                detail='No packet data available. Please analyze a PCAP file first.'
+            )
 
-    # Load all connection packets
-    with packets_file.open('r', encoding='utf-8') as handle:
-        all_connection_packets = json.load(handle)
+        # Load all connection packets
+        with packets_file.open('r', encoding='utf-8') as handle:
+            all_connection_packets = json.load(handle)
+        found = {conn_id: (len(all_connection_packets[conn_id]),
+                           all_connection_packets[conn_id][:packets_per_connection])
+                 for conn_id in connection_ids if conn_id in all_connection_packets}
 
     # Build batch results
     results = {}
     for conn_id in connection_ids:
-        if conn_id in all_connection_packets:
-            packets = all_connection_packets[conn_id]
+        if found.get(conn_id) is not None:
+            total_packets, packets = found[conn_id]
             results[conn_id] = {
-                'packets': packets[:packets_per_connection],
-                'total_packets': len(packets),
-                'returned_packets': min(len(packets), packets_per_connection)
+                'packets': packets,
+                'total_packets': total_packets,
+                'returned_packets': min(total_packets, packets_per_connection)
             }
         else:
             results[conn_id] = {
@@ -670,34 +880,41 @@ async def get_packet_statistics(
     connection_ids = body.get('connection_ids', None)  # None means all connections
     time_bucket_ms = min(body.get('time_bucket_ms', 100), 1000)  # Max 1 second buckets
 
-    # Check if connection_packets file exists
-    if not packets_file.exists():
-        raise HTTPException(
-            status_code=404,
-            detail='No packet data available. Please analyze a PCAP file first.'
-        )
+    packets_table = _open_session_table(session_id, session_dir, 'packets')
+    memberships = _open_session_table(session_id, session_dir, 'connection_packets')
+    if packets_table is not None and memberships is not None:
+        # Columnar store: scan just the columns used below
+        all_packets, connection_count = _statistics_packets_from_table(packets_table, memberships, connection_ids)
+    else:
+        # Check if connection_packets file exists
+        if not packets_file.exists():
+            raise HTTPException(
+                status_code=404,
+                detail='No packet data available. Please analyze a PCAP file first.'
+            )
 
-    # Load all connection packets
-    with packets_file.open('r', encoding='utf-8') as handle:
-        all_connection_packets = json.load(handle)
+        # Load all connection packets
+        with packets_file.open('r', encoding='utf-8') as handle:
+            all_connection_packets = json.load(handle)
 
-    # Filter connections if specified
-    if connection_ids:
-        filtered_packets = {k: v for k, v in all_connection_packets.items() if k in connection_ids}
-    else:
-        filtered_packets = all_connection_packets
-
-    # Collect all packets with timestamps
-    all_packets = []
-    for conn_id, packets in filtered_packets.items():
-        for packet in packets:
-            if 'timestamp' in packet:
-                all_packets.append({
-                    'timestamp': packet['timestamp'],
-                    'length': packet.get('length', 0),
-                    'tcp_flags': packet.get('headers', {}).get('tcp', {}).get('flags', ''),
-                    'connection_id': conn_id
-                })
+        # Filter connections if specified
+        if connection_ids:
+            filtered_packets = {k: v for k, v in all_connection_packets.items() if k in connection_ids}
+        else:
+            filtered_packets = all_connection_packets
+        connection_count = len(filtered_packets)
+
+        # Collect all packets with timestamps
+        all_packets = []
+        for conn_id, packets in filtered_packets.items():
+            for packet in packets:
+                if 'timestamp' in packet:
+                    all_packets.append({
+                        'timestamp': packet['timestamp'],
+                        'length': packet.get('length', 0),
+                        'tcp_flags': packet.get('headers', {}).get('tcp', {}).get('flags', ''),
+                        'connection_id': conn_id
+                    })
 
     if not all_packets:
         return {
@@ -855,7 +1072,7 @@ async def get_packet_statistics(
         'summary': {
             'total_packets': total_packets,
             'total_bytes': total_bytes,
-            'total_connections': len(filtered_packets),
+            'total_connections': connection_count,
             'duration_ms': duration_ms,
             'duration_seconds': round(duration_seconds, 2),
             'peak_rate': peak_rate,
@@ -909,37 +1126,25 @@ async def get_packet_deep_detail(
     session_dir = get_session_data_dir(request)
     pcap_path = session_dir / 'uploaded.pcap'
 
-    if not pcap_path.exists():
+    try:
+        pcap_mtime = pcap_path.stat().st_mtime
+    except OSError:
         raise HTTPException(
             status_code=404,
             detail='No PCAP file found. Please upload a PCAP file first.'
         )
 
-    # Try cache first, then load from disk
-    cached = _get_cached_analyzer(session_id, pcap_path)
-    if cached is not None:
-        analyzer, matched_cache = cached
-    else:
-        analyzer = NetworkAnalyzer(str(pcap_path))
-        if not analyzer.load_packets():
-            raise HTTPException(
-                status_code=500,
-                detail='Failed to load PCAP file.'
-            )
-        _put_cached_analyzer(session_id, pcap_path, analyzer)
-        matched_cache = {}
-        # Retrieve the cache dict from the stored tuple
-        with _analyzer_cache_lock:
-            entry = _analyzer_cache.get(session_id)
-            if entry:
-                matched_cache = entry[2]
+    # Try cache first, then the mapped capture model, then load from disk
+    cached = await asyncio.to_thread(_load_session_analyzer, session_id, pcap_path)
+    if cached is None:
+        raise HTTPException(
+            status_code=500,
+            detail='Failed to load PCAP file.'
+        )
+    analyzer, matched_cache = cached
 
     # Use cached matched_indices or compute and cache
-    if connection_id in matched_cache:
-        matched_indices = matched_cache[connection_id]
-    else:
-        matched_indices = analyzer._find_packets_by_connection_id(connection_id)
-        matched_cache[connection_id] = matched_indices
+    matched_indices = await asyncio.to_thread(_connection_indices, analyzer, matched_cache, connection_id)
 
     if not matched_indices:
         raise HTTPException(
@@ -947,19 +1152,27 @@ async def get_packet_deep_detail(
             detail=f'Connection "{connection_id}" not found in PCAP.'
         )
 
-    if packet_index not in matched_indices:
+    position = bisect_left(matched_indices, packet_index)
+    if position == len(matched_indices) or matched_indices[position] != packet_index:
         raise HTTPException(
             status_code=404,
             detail=f'Packet index {packet_index} does not belong to connection "{connection_id}".'
         )
 
-    # Extract deep detail
-    detail = analyzer._extract_packet_deep_detail(packet_index)
-    if detail is None:
+    # Extract deep detail (cached), then warm the neighbours the viewer steps to next
+    details = await asyncio.to_thread(_deep_details, session_id, pcap_mtime, analyzer, [packet_index])
+    if not details:
         raise HTTPException(
             status_code=404,
             detail=f'Packet index {packet_index} out of range.'
         )
+    detail = details[0]
+
+    k = _DEEP_DETAIL_PREFETCH
+    neighbours = matched_indices[max(0, position - k):position] + matched_indices[position + 1:position + 1 + k]
+    neighbours = [idx for idx in neighbours if (session_id, idx) not in _deep_detail_cache]
+    if neighbours:
+        _packet_readahead.submit(_read_ahead, _deep_details, session_id, pcap_mtime, analyzer, neighbours)
 
     return {
         'connection_id': connection_id,
@@ -967,6 +1180,127 @@ async def get_packet_deep_detail(
     }
 
 
+_DEEP_DETAIL_BATCH_MAX = 500  # packets per /api/packet-detail/batch request
+
+
+def _iter_batch_deep_details(session_id: str, pcap_mtime: float, analyzer: NetworkAnalyzer,
+                             matched_cache: ByteBudgetLRU, pairs: list):
+    """Yield one result object per (connection_id, packet_index) pair, in request order."""
+    for connection_id, packet_index in pairs:
+        item = {'connection_id': connection_id, 'packet_index': packet_index}
+        matched_indices = _connection_indices(analyzer, matched_cache, connection_id)
+        position = bisect_left(matched_indices, packet_index)
+        if position == len(matched_indices) or matched_indices[position] != packet_index:
+            item['error'] = 'Packet does not belong to connection'
+        else:
+            details = _deep_details(session_id, pcap_mtime, analyzer, [packet_index])
+            if details:
+                item['packet_detail'] = details[0]
+            else:
+                item['error'] = 'Packet index out of range'
+        yield item
+
+
+@app.post('/api/packet-detail/batch')
+async def get_batch_packet_deep_details(
+    request: Request,
+    session_id: str = Depends(require_session)
+):
+    """Deep dissection of many packets in one request (requires session)
+
+    Request body, either explicit pairs:
+        {
+            "packets": [{"connection_id": "tcp-...", "packet_index": 12}, ...]
+        }
+    or every packet of one connection in a capture index range [start, end):
+        {
+            "connection_id": "tcp-...", "start": 0, "end": 200
+        }
+    At most 500 packets per request. With "stream": true the results are
+    sent as NDJSON (one result object per line) as soon as each packet is
+    dissected.
+
+    Returns:
+        {
+            "results": [
+                {"connection_id": "tcp-...", "packet_index": 12, "packet_detail": {...}},
+                {"connection_id": "tcp-...", "packet_index": 99, "error": "Packet does not belong to connection"}
+            ],
+            "total": 2
+        }
+    """
+    body = await request.json()
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail='Request body must be a JSON object')
+
+    def _check_connection_id(connection_id):
+        if (not isinstance(connection_id, str) or not connection_id
+                or len(connection_id) > _CONNECTION_ID_MAX_LEN or not _CONNECTION_ID_RE.match(connection_id)):
+            raise HTTPException(status_code=400, detail='Invalid connection_id.')
+
+    def _check_index(value, name):
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise HTTPException(status_code=400, detail=f'{name} must be a non-negative integer')
+
+    if 'packets' in body:
+        items = body['packets']
+        if not isinstance(items, list) or not items:
+            raise HTTPException(status_code=400, detail='packets must be a non-empty list')
+        if len(items) > _DEEP_DETAIL_BATCH_MAX:
+            raise HTTPException(status_code=400, detail=f'Maximum {_DEEP_DETAIL_BATCH_MAX} packets per batch request')
+        pairs = []
+        for item in items:
+            if not isinstance(item, dict):
+                raise HTTPException(status_code=400, detail='Each packet must be an object')
+            _check_connection_id(item.get('connection_id'))
+            _check_index(item.get('packet_index'), 'packet_index')
+            pairs.append((item['connection_id'], item['packet_index']))
+    elif 'connection_id' in body:
+        connection_id = body['connection_id']
+        _check_connection_id(connection_id)
+        start = body.get('start', 0)
+        end = body.get('end', start + _DEEP_DETAIL_BATCH_MAX)
+        _check_index(start, 'start')
+        _check_index(end, 'end')
+        if end - start > _DEEP_DETAIL_BATCH_MAX:
+            raise HTTPException(status_code=400, detail=f'Maximum {_DEEP_DETAIL_BATCH_MAX} packets per batch request')
+        pairs = None
+    else:
+        raise HTTPException(status_code=400, detail='packets or connection_id is required')
+
+    session_dir = get_session_data_dir(request)
+    pcap_path = session_dir / 'uploaded.pcap'
+    try:
+        pcap_mtime = pcap_path.stat().st_mtime
+    except OSError:
+        raise HTTPException(status_code=404, detail='No PCAP file found. Please upload a PCAP file first.')
+
+    # Loading the capture and dissecting packets are blocking: keep them off the event loop
+    cached = await asyncio.to_thread(_load_session_analyzer, session_id, pcap_path)
+    if cached is None:
+        raise HTTPException(status_code=500, detail='Failed to load PCAP file.')
+    analyzer, matched_cache = cached
+
+    if pairs is None:
+        matched_indices = await asyncio.to_thread(_connection_indices, analyzer, matched_cache, connection_id)
+        pairs = [(connection_id, idx)
+                 for idx in matched_indices[bisect_left(matched_indices, start):bisect_left(matched_indices, end)]]
+
+    results = _iter_batch_deep_details(session_id, pcap_mtime, analyzer, matched_cache, pairs)
+    if body.get('stream'):
+        # Starlette iterates a sync generator in its threadpool, one packet per line
+        lines = (json.dumps(item, ensure_ascii=False) + '\n' for item in results)
+        return StreamingResponse(lines, media_type='application/x-ndjson')
+    results = await asyncio.to_thread(list, results)
+    return {
+        'results': results,
+        'total': len(results)
+    }
+
+
+_CONNECTION_PAGE_MAX = 1000  # packets per /api/packets/{connection_id} page
+
+
 # Dynamic route MUST come AFTER static routes (/api/packets/batch, /api/packets/statistics)
 # to avoid route conflicts where 'batch' or 'statistics' gets matched as {connection_id}
 @app.get('/api/packets/{connection_id}')
@@ -982,38 +1316,46 @@ async def get_connection_packets(
     Args:
         connection_id: The connection ID (e.g., 'tcp-10.1.1.14-5434-210.71.227.211-443')
         offset: Starting index for pagination (default: 0)
-        limit: Maximum number of packets to return (default: 100)
+        limit: Maximum number of packets to return (default: 100, at most 1000)
 
     Returns:
         Dictionary containing connection_id and list of packet details
     """
+    if offset < 0 or not 1 <= limit <= _CONNECTION_PAGE_MAX:
+        raise HTTPException(status_code=400, detail='Invalid offset or limit.')
+
     session_dir = get_session_data_dir(request)
     packets_file = session_dir / 'connection_packets.json'
 
-    # Check if connection_packets file exists
-    if not packets_file.exists():
-        raise HTTPException(
-            status_code=404,
-            detail='No packet data available. Please analyze a PCAP file first.'
-        )
+    db = open_result_db(str(session_dir / RESULT_DB_FILE))
+    if db is not None:
+        # Indexed query + on-demand details: cost scales with the page, not the capture.
+        # Details are extracted from the capture, so keep that off the event loop
+        with closing(db):
+            pages = await asyncio.to_thread(_connection_pages, session_id, session_dir, db,
+                                            {connection_id: (offset, limit)})
+        found = pages[connection_id]
+    else:
+        # Check if connection_packets file exists
+        if not packets_file.exists():
+            raise HTTPException(
+                status_code=404,
+                detail='No packet data available. Please analyze a PCAP file first.'
+            )
 
-    # Load connection packets data
-    with packets_file.open('r', encoding='utf-8') as handle:
-        all_connection_packets = json.load(handle)
+        # Load connection packets data
+        with packets_file.open('r', encoding='utf-8') as handle:
+            all_connection_packets = json.load(handle)
+        packets = all_connection_packets.get(connection_id)
+        found = None if packets is None else (len(packets), packets[offset:offset + limit])
 
     # Check if the requested connection exists
-    if connection_id not in all_connection_packets:
+    if found is None:
         raise HTTPException(
             status_code=404,
             detail=f'Connection "{connection_id}" not found'
         )
-
-    # Get packets for this connection
-    packets = all_connection_packets[connection_id]
-
-    # Apply pagination
-    total_packets = len(packets)
-    paginated_packets = packets[offset:offset + limit]
+    total_packets, paginated_packets = found
 
     return {
         'connection_id': connection_id,
@@ -1024,46 +1366,41 @@ async def get_connection_packets(
     }
 
 
-def _analyze_pcap_sync(pcap_path: Path, session_dir: Path) -> Dict[str, Any]:
-    """Synchronous analysis pipeline — intended to run in a thread pool via asyncio.to_thread."""
-    analyzer = NetworkAnalyzer(str(pcap_path))
-    if not analyzer.load_packets():
-        message = analyzer.last_error or 'Failed to load packets'
-        raise ValueError(message)
-
-    analyzer.basic_statistics()
-    analyzer.detect_packet_loss()
-    analyzer.analyze_latency()
-    analyzer.detect_attacks()
-    analyzer.build_mind_map()
-    analyzer.generate_protocol_timelines()
-    analyzer.generate_statistics_summary()  # Phase 5
-    analyzer.extract_expert_info()          # Phase 6
-    analyzer.extract_tls_info()             # Phase 10
-    analyzer.compute_performance_score()    # Phase 11
-    analyzer.enrich_geo_info()              # Phase 12
-
-    analyzer.save_results(
-        output_file=str(session_dir / 'network_analysis_results.json'),
-        public_output_dir=str(session_dir),
-    )
-
-    return {
-        'packet_count': len(analyzer.packets),
-        'timeline_count': len(analyzer.protocol_timelines) if hasattr(analyzer, 'protocol_timelines') else 0,
-    }
+# Analysis runs in worker processes (analysis_jobs) so CPU-bound Scapy work
+# does not hold the GIL of the API process; extra uploads beyond
+# ANALYSIS_WORKERS running + ANALYSIS_QUEUE_MAX waiting get 429.
+_analysis_jobs = AnalysisJobManager(
+    max_workers=int(os.getenv('ANALYSIS_WORKERS', '2')),
+    max_queued=int(os.getenv('ANALYSIS_QUEUE_MAX', '8')),
+)
+_JOB_EVENT_INTERVAL = 0.5  # seconds between SSE progress checks
 
 
 MAX_PCAP_SIZE = 50 * 1024 * 1024  # 50 MB
+# A re-upload waits at most this long for the session's cancelled job to stop
+PREVIOUS_JOB_STOP_TIMEOUT = float(os.getenv('PREVIOUS_JOB_STOP_TIMEOUT', '10'))
 
 
-@app.post('/api/analyze')
+def _queue_full_error(exc: JobQueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail='Analysis queue is full, please retry later',
+        headers={'Retry-After': str(exc.retry_after)},
+    )
+
+
+@app.post('/api/analyze', status_code=status.HTTP_202_ACCEPTED)
 async def analyze_capture(
     request: Request,
     file: UploadFile = File(...),
     session_id: str = Depends(require_session)
 ) -> Dict[str, Any]:
-    """Upload and analyze PCAP file (requires session)"""
+    """Upload a PCAP file and queue its analysis (requires session).
+
+    Returns a job id right away; follow it with GET /api/jobs/{job_id} or the
+    SSE stream at /api/jobs/{job_id}/events. A new upload cancels the
+    session's previous job.
+    """
     logger.debug(f"/api/analyze called, session_id={session_id}, file={file.filename}")
 
     filename = file.filename or ''
@@ -1080,14 +1417,32 @@ async def analyze_capture(
     if len(data) > MAX_PCAP_SIZE:
         raise HTTPException(status_code=413, detail='PCAP file too large (max 50 MB)')
 
+    # Reject before touching the session's files if no worker slot is available
+    try:
+        _analysis_jobs.check_admission(session_id)
+    except JobQueueFull as exc:
+        raise _queue_full_error(exc) from exc
+
     # Get session directory and clean up old files
     session_dir = get_session_data_dir(request)
 
+    # Cancel the session's running job and let it stop before its files are replaced;
+    # a job stuck inside a long stage is not waited for indefinitely
+    previous = _analysis_jobs.cancel_session(session_id)
+    if previous is not None:
+        logger.debug(f"Cancelled previous analysis job {previous.id}")
+        if not await asyncio.to_thread(previous.wait, PREVIOUS_JOB_STOP_TIMEOUT):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail='The previous analysis of this session is still stopping, please retry',
+                headers={'Retry-After': str(max(1, int(PREVIOUS_JOB_STOP_TIMEOUT)))},
+            )
+
     # Clean up old files in current session before saving new file
     cleanup_session_directory(session_dir)
     # Invalidate cached analyzer for this session
-    with _analyzer_cache_lock:
-        _analyzer_cache.pop(session_id, None)
+    _analyzer_cache.pop(session_id)
+    _evict_session_results(session_id)
 
     # Save uploaded file to session directory
     pcap_path = session_dir / 'uploaded.pcap'
@@ -1097,20 +1452,79 @@ async def analyze_capture(
     logger.debug(f"PCAP saved to {pcap_path}")
 
     try:
-        # Run blocking analysis in a thread pool so the event loop stays responsive
-        analysis_result = await asyncio.to_thread(_analyze_pcap_sync, pcap_path, session_dir)
-        logger.debug(f"Analysis complete: {analysis_result}")
+        job = _analysis_jobs.submit(session_id, STAGE_WEIGHTS, analyze_pcap, pcap_path, session_dir,
+                                    on_result=lambda job, result: _warm_analyzer_cache(job, result, pcap_path))
+    except JobQueueFull as exc:
+        raise _queue_full_error(exc) from exc
+    return {
+        'message': 'PCAP file queued for analysis',
+        'session_id': session_id,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}',
+        'events_url': f'/api/jobs/{job.id}/events',
+    }
 
-        return {
-            'message': 'PCAP file analyzed successfully',
-            'session_id': session_id,
-            **analysis_result,
-        }
-    except Exception as exc:
-        import traceback
-        error_detail = f"{type(exc).__name__}: {str(exc)}\n{traceback.format_exc()}"
-        print(f"ERROR in /api/analyze: {error_detail}")
-        raise HTTPException(status_code=500, detail=f"{type(exc).__name__}: {str(exc)}") from exc
+
+def _get_session_job(job_id: str, session_id: str) -> AnalysisJob:
+    job = _analysis_jobs.get(job_id)
+    if job is None or job.session_id != session_id:
+        raise HTTPException(status_code=404, detail='Analysis job not found')
+    return job
+
+
+@app.get('/api/jobs/{job_id}')
+async def get_analysis_job(
+    job_id: str,
+    request: Request,
+    session_id: str = Depends(require_session)
+) -> Dict[str, Any]:
+    """Poll an analysis job: status, current stage, progress, packets processed and ETA."""
+    return _get_session_job(job_id, session_id).snapshot()
+
+
+@app.get('/api/jobs/{job_id}/events')
+async def stream_analysis_job(
+    job_id: str,
+    request: Request,
+    session_id: str = Depends(require_session)
+):
+    """Server-sent events for an analysis job.
+
+    Sends a ``progress`` event whenever the job changes and a final event
+    named after its terminal status (completed / failed / cancelled).
+    """
+    job = _get_session_job(job_id, session_id)
+
+    async def events():
+        version = None
+        while True:
+            snapshot = job.snapshot()
+            if snapshot['version'] != version:
+                version = snapshot['version']
+                event = snapshot['status'] if snapshot['status'] in TERMINAL_STATES else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            if snapshot['status'] in TERMINAL_STATES or await request.is_disconnected():
+                return
+            await asyncio.sleep(_JOB_EVENT_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@app.delete('/api/jobs/{job_id}')
+async def cancel_analysis_job(
+    job_id: str,
+    request: Request,
+    session_id: str = Depends(require_session)
+) -> Dict[str, Any]:
+    """Cancel a queued or running analysis job; it stops at the next stage boundary."""
+    job = _get_session_job(job_id, session_id)
+    job.cancel()
+    return job.snapshot()
 
 
 # Global scheduler reference for proper cleanup
@@ -1157,3 +1571,6 @@ async def shutdown_cleanup_scheduler():
         _scheduler.shutdown(wait=False)  # Don't wait for jobs to complete
         logger.info("Session cleanup scheduler stopped")
         _scheduler = None
+
+    # Cancel queued/running analysis jobs
+    _analysis_jobs.shutdown()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compact, ready-to-query index of an analyzed capture.
+
+A fully loaded ``NetworkAnalyzer`` holds every packet as a Scapy object
+tree (~4.5 KB each). Packet detail and Follow TCP Stream only ever touch a
+handful of packets, so after analysis we keep just:
+
+* the byte offset of every packet record in the pcap/pcapng file,
+* the flow index (direction-independent 5-tuple key -> packet indices), and
+* a columnar packet table (timestamp, wire length, flow id per packet).
+
+``LazyPacketList`` turns the offsets back into a random-access packet
+sequence that re-reads and dissects a record only when it is indexed.
+
+The analysis worker saves the model into the session directory as flat
+native-endian arrays (``save_capture_model``). ``open_capture_model``
+memory-maps them, so every API worker process can serve a session from the
+same page-cache pages instead of each reloading the capture.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from scapy.all import PcapReader
+
+CAPTURE_MODEL_DIR = 'capture_model'
+CAPTURE_MODEL_MANIFEST = 'manifest.json'
+CAPTURE_MODEL_VERSION = 1
+NO_FLOW = 0xFFFFFFFF  # flow column value of packets outside any TCP/UDP flow
+
+# Packet table columns: name -> array typecode
+PACKET_COLUMNS = {'time': 'd', 'wirelen': 'I', 'flow': 'I'}
+
+_PCAP_MAGICS = {
+    b'\xd4\xc3\xb2\xa1': '<', b'\xa1\xb2\xc3\xd4': '>',   # microsecond timestamps
+    b'\x4d\x3c\xb2\xa1': '<', b'\xa1\xb2\x3c\x4d': '>',   # nanosecond timestamps
+}
+_PCAPNG_SHB = b'\x0a\x0d\x0d\x0a'
+_PCAPNG_PACKET_BLOCKS = (2, 3, 6)  # obsolete packet, simple packet, enhanced packet
+
+
+def scan_record_offsets(path: str) -> array | None:
+    """Byte offset of every packet record, walking only record/block headers.
+
+    Returns None for files that are neither pcap nor pcapng.
+    """
+    offsets = array('Q')
+    with open(path, 'rb') as handle:
+        magic = handle.read(4)
+        if magic in _PCAP_MAGICS:
+            endian = _PCAP_MAGICS[magic]
+            position = 24
+            handle.seek(position)
+            while True:
+                header = handle.read(16)
+                if len(header) < 16:
+                    break
+                caplen = struct.unpack(endian + 'I', header[8:12])[0]
+                offsets.append(position)
+                position += 16 + caplen
+                handle.seek(position)
+            return offsets
+        if magic != _PCAPNG_SHB:
+            return None
+
+        endian = '<'
+        position = 0
+        while True:
+            handle.seek(position)
+            header = handle.read(12)
+            if len(header) < 12:
+                break
+            if header[:4] == _PCAPNG_SHB:
+                # Byte-order magic decides the endianness of this section
+                endian = '<' if header[8:12] == b'\x4d\x3c\x2b\x1a' else '>'
+            block_type, block_length = struct.unpack(endian + 'II', header[:8])
+            if block_length < 12:
+                break
+            if block_type in _PCAPNG_PACKET_BLOCKS:
+                offsets.append(position)
+            position += block_length
+    return offsets
+
+
+class CaptureModel:
+    """Record offsets, flow index and packet table of one capture file; picklable unless memory-mapped."""
+
+    __slots__ = ('path', 'offsets', 'flow_index', 'columns')
+
+    def __init__(self, path: str, offsets, flow_index, columns: dict = None):
+        self.path = path
+        self.offsets = offsets
+        # flow key -> packet indices (array('I') or mapped memoryview), in capture order
+        self.flow_index = flow_index
+        # PACKET_COLUMNS name -> per-packet values
+        self.columns = columns or {}
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+
+class MappedFlowIndex(Mapping):
+    """Read-only flow index over CSR arrays: flow i owns packets[starts[i]:starts[i + 1]]."""
+
+    def __init__(self, keys, starts, packets):
+        self._ids = {key: flow_id for flow_id, key in enumerate(keys)}
+        self._starts = starts
+        self._packets = packets
+
+    def __getitem__(self, key):
+        flow_id = self._ids[key]
+        return self._packets[self._starts[flow_id]:self._starts[flow_id + 1]]
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+def save_capture_model(model: CaptureModel, directory: str) -> None:
+    """Write the model as flat arrays plus a manifest; the directory is replaced atomically."""
+    stat = os.stat(model.path)
+    keys = list(model.flow_index)
+    starts = array('Q', [0])
+    packets = array('I')
+    for key in keys:
+        packets.extend(model.flow_index[key])
+        starts.append(len(packets))
+
+    arrays = {'offsets': array('Q', model.offsets), 'flow_starts': starts, 'flow_packets': packets}
+    for name, typecode in PACKET_COLUMNS.items():
+        if name in model.columns:
+            arrays[name] = array(typecode, model.columns[name])
+
+    staging = f'{directory}.tmp-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, values in arrays.items():
+        with open(os.path.join(staging, f'{name}.bin'), 'wb') as handle:
+            values.tofile(handle)
+    with open(os.path.join(staging, 'flows.json'), 'w', encoding='utf-8') as handle:
+        json.dump(keys, handle, separators=(',', ':'))
+    manifest = {
+        'version': CAPTURE_MODEL_VERSION,
+        'byteorder': sys.byteorder,
+        'packet_count': len(model.offsets),
+        'flow_count': len(keys),
+        'pcap': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns},
+        'arrays': {name: values.typecode for name, values in arrays.items()},
+    }
+    with open(os.path.join(staging, CAPTURE_MODEL_MANIFEST), 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+
+
+def open_capture_model(directory: str, pcap_path: str) -> CaptureModel | None:
+    """Memory-map a saved model; None if missing, unreadable or written for a different capture."""
+    try:
+        with open(os.path.join(directory, CAPTURE_MODEL_MANIFEST), encoding='utf-8') as handle:
+            manifest = json.load(handle)
+        stat = os.stat(pcap_path)
+    except (OSError, ValueError):
+        return None
+    if (manifest.get('version') != CAPTURE_MODEL_VERSION or manifest.get('byteorder') != sys.byteorder
+            or manifest.get('pcap') != {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}):
+        return None
+
+    try:
+        arrays = {name: _map_array(os.path.join(directory, f'{name}.bin'), typecode)
+                  for name, typecode in manifest['arrays'].items()}
+        with open(os.path.join(directory, 'flows.json'), encoding='utf-8') as handle:
+            keys = [tuple(tuple(endpoint) for endpoint in key) for key in json.load(handle)]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if len(arrays['offsets']) != manifest['packet_count'] or len(keys) != manifest['flow_count']:
+        return None
+
+    flow_index = MappedFlowIndex(keys, arrays['flow_starts'], arrays['flow_packets'])
+    columns = {name: arrays[name] for name in PACKET_COLUMNS if name in arrays}
+    return CaptureModel(pcap_path, arrays['offsets'], flow_index, columns)
+
+
+def _map_array(path: str, typecode: str):
+    """Zero-copy read-only view of a flat array file."""
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return array(typecode)  # mmap cannot map an empty file
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast(typecode)
+
+
+class LazyPacketList:
+    """Read-only packet sequence backed by a capture file and its record offsets.
+
+    ``packets[i]`` seeks to record ``i`` and dissects just that record; the
+    last ``cache_size`` dissected packets are kept. Iteration streams the
+    file from the start.
+    """
+
+    PACKET_BYTES_ESTIMATE = 4608
+
+    def __init__(self, path: str, offsets: array, cache_size: int = 128):
+        self.path = path
+        self.offsets = offsets
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self.offsets)
+        if not 0 <= index < len(self.offsets):
+            raise IndexError('packet index out of range')
+        with self._lock:
+            packet = self._cache.get(index)
+            if packet is not None:
+                self._cache.move_to_end(index)
+                return packet
+            packet = self._read_at(self.offsets[index])
+            self._cache[index] = packet
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return packet
+
+    def __iter__(self):
+        with PcapReader(self.path) as reader:
+            for _ in range(len(self.offsets)):
+                try:
+                    yield reader.read_packet()
+                except EOFError:
+                    return
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.itemsize * len(self.offsets) + self.cache_size * self.PACKET_BYTES_ESTIMATE
+
+    def close(self) -> None:
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+            self._cache.clear()
+
+    def _read_at(self, offset: int):
+        if self._reader is None:
+            self._reader = PcapReader(self.path)
+            # pcapng: reading the first packet loads the interface descriptions
+            # that later packet blocks refer to
+            self._reader.read_packet()
+        self._reader.f.seek(offset)
+        return self._reader.read_packet()
+
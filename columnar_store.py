@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Binary columnar files for the large analysis result tables.
+
+The results JSON is convenient for the static frontend, but endpoints that
+scan a per-packet table (/api/packets/statistics) only need a few columns
+of it. ``write_table`` stores a table column by column; readers
+memory-map the file and touch only the columns they project.
+
+Two on-disk formats share one reader interface (``open_table``):
+
+* ``arrow`` – Arrow IPC file, used when pyarrow is installed.
+* ``cols``  – a small built-in format: an 8-byte magic, a length-prefixed
+  JSON header and one 8-byte aligned block per column. ``int``/``float``
+  columns are native-endian int64/float64 arrays; ``str`` and ``json``
+  (anything else, JSON-encoded per value) columns are a uint64 offset array
+  followed by UTF-8 data. Numeric columns are read as zero-copy memoryviews,
+  text values are decoded only when accessed.
+"""
+
+from __future__ import annotations
+
+import abc
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+try:  # pragma: no cover - optional dependency
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - user environment specific
+    pa = None
+
+FORMAT_ARROW = 'arrow'
+FORMAT_COLS = 'cols'
+DEFAULT_FORMAT = FORMAT_ARROW if pa is not None else FORMAT_COLS
+FILE_EXTENSIONS = {FORMAT_ARROW: '.arrow', FORMAT_COLS: '.cols'}
+
+_COLS_MAGIC = b'PNACOLS1'
+_NUMERIC_TYPECODES = {'int': 'q', 'float': 'd'}
+_INT64_RANGE = (-2 ** 63, 2 ** 63)
+_FLOAT_EXACT_INT = 2 ** 53  # ints mixed into a float column must survive the conversion
+
+
+def columns_from_records(records, extra: dict = None) -> dict:
+    """Turn a list of dicts into ``{column: values}``; keys in first-seen order, gaps filled with None.
+
+    ``extra`` maps additional column names to ``fn(record)``.
+    """
+    names = {}
+    for record in records:
+        for key in record:
+            names.setdefault(key, None)
+    columns = {name: [record.get(name) for record in records] for name in names}
+    for name, fn in (extra or {}).items():
+        columns[name] = [fn(record) for record in records]
+    return columns
+
+
+def write_table(path: str, columns: dict, fmt: str = None) -> str:
+    """Write ``{column: values}`` (equal-length lists) to ``path`` + format extension; returns the file path."""
+    fmt = fmt or DEFAULT_FORMAT
+    if fmt == FORMAT_ARROW and pa is None:
+        raise ValueError('pyarrow is not installed')
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError('columns must have the same length')
+
+    kinds = {name: _column_kind(values) for name, values in columns.items()}
+    file_path = path + FILE_EXTENSIONS[fmt]
+    tmp_path = f'{file_path}.tmp-{os.getpid()}'
+    if fmt == FORMAT_ARROW:
+        _write_arrow(tmp_path, columns, kinds)
+    else:
+        _write_cols(tmp_path, columns, kinds, lengths.pop() if lengths else 0)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def open_table(file_path: str) -> ColumnTable | None:
+    """Open a table written by write_table; None if missing, unreadable or its format is unavailable."""
+    try:
+        if file_path.endswith(FILE_EXTENSIONS[FORMAT_ARROW]):
+            if pa is None:
+                return None
+            return _ArrowTable(file_path)
+        return _ColsTable(file_path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class ColumnTable(abc.ABC):
+    """Read-only table; ``column(name)`` returns a sequence of Python values."""
+
+    num_rows = 0
+    kinds: dict = {}
+
+    @property
+    def column_names(self) -> list:
+        return list(self.kinds)
+
+    @abc.abstractmethod
+    def column(self, name: str):
+        """Column ``name`` as a sequence; numeric columns are zero-copy memoryviews."""
+
+    def rows(self, columns=None, start: int = 0, stop: int = None) -> list:
+        """Rows ``start:stop`` as dicts restricted to ``columns`` (default: all)."""
+        names = list(columns) if columns is not None else self.column_names
+        start, stop, _ = slice(start, stop).indices(self.num_rows)
+        projected = [self.column(name)[start:stop] for name in names]
+        return [dict(zip(names, values)) for values in zip(*projected)] if names else [{} for _ in range(start, stop)]
+
+
+class _ColsTable(ColumnTable):
+    def __init__(self, file_path: str):
+        with open(file_path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:8] != _COLS_MAGIC:
+            raise ValueError(f'not a column table: {file_path}')
+        header_len = struct.unpack('<I', self._map[8:12])[0]
+        header = json.loads(self._map[12:12 + header_len])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError('column table written on a host with different byte order')
+        self.num_rows = header['rows']
+        self._base = _align(12 + header_len)
+        self._columns = {entry['name']: entry for entry in header['columns']}
+        self.kinds = {name: entry['kind'] for name, entry in self._columns.items()}
+        self._view = memoryview(self._map)
+
+    def column(self, name: str):
+        entry = self._columns[name]
+        start = self._base + entry['offset']
+        if entry['kind'] in _NUMERIC_TYPECODES:
+            return self._view[start:start + 8 * self.num_rows].cast(_NUMERIC_TYPECODES[entry['kind']])
+        offsets = self._view[start:start + 8 * (self.num_rows + 1)].cast('Q')
+        data_start = start + 8 * (self.num_rows + 1)
+        return _TextColumn(offsets, self._view[data_start:data_start + offsets[-1]], entry['kind'] == 'json')
+
+
+class _TextColumn:
+    """Lazily decoded str/json column over an offset array and UTF-8 data."""
+
+    def __init__(self, offsets, data, is_json: bool):
+        self._offsets = offsets
+        self._data = data
+        self._is_json = is_json
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        text = bytes(self._data[self._offsets[index]:self._offsets[index + 1]]).decode('utf-8')
+        return json.loads(text) if self._is_json else text
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class _ArrowTable(ColumnTable):
+    def __init__(self, file_path: str):
+        source = pa.memory_map(file_path, 'r')
+        self._table = pa.ipc.open_file(source).read_all()
+        metadata = self._table.schema.metadata or {}
+        self.kinds = json.loads(metadata[b'column_kinds'])
+        self.num_rows = self._table.num_rows
+
+    def column(self, name: str):
+        # Columns are written without nulls, so only the value (and offset) buffers
+        # matter; both are views into the memory-mapped file
+        values = self._table.column(name).combine_chunks()
+        kind = self.kinds[name]
+        start, stop = values.offset, values.offset + len(values)
+        if kind in _NUMERIC_TYPECODES:
+            return memoryview(values.buffers()[1] or b'').cast(_NUMERIC_TYPECODES[kind])[start:stop]
+        offsets = memoryview(values.buffers()[1] or b'\0' * 4).cast('i')[start:stop + 1]
+        return _TextColumn(offsets, memoryview(values.buffers()[2] or b''), kind == 'json')
+
+
+def _column_kind(values) -> str:
+    if all(type(value) is int and _INT64_RANGE[0] <= value < _INT64_RANGE[1] for value in values):
+        return 'int'
+    if all(type(value) is float or (type(value) is int and abs(value) <= _FLOAT_EXACT_INT)
+           for value in values):
+        return 'float'
+    if all(type(value) is str for value in values):
+        return 'str'
+    return 'json'
+
+
+def _encode_text(values, kind: str) -> list:
+    if kind == 'json':
+        return [json.dumps(value, ensure_ascii=False, default=str, separators=(',', ':')) for value in values]
+    return values
+
+
+def _write_arrow(path: str, columns: dict, kinds: dict) -> None:  # pragma: no cover - needs pyarrow
+    arrays = {}
+    for name, values in columns.items():
+        kind = kinds[name]
+        if kind == 'int':
+            arrays[name] = pa.array(values, type=pa.int64())
+        elif kind == 'float':
+            arrays[name] = pa.array([float(value) for value in values], type=pa.float64())
+        else:
+            arrays[name] = pa.array(_encode_text(values, kind), type=pa.string())
+    table = pa.table(arrays).replace_schema_metadata({'column_kinds': json.dumps(kinds)})
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _write_cols(path: str, columns: dict, kinds: dict, num_rows: int) -> None:
+    blocks = []
+    entries = []
+    offset = 0
+    for name, values in columns.items():
+        kind = kinds[name]
+        if kind in _NUMERIC_TYPECODES:
+            typecode = _NUMERIC_TYPECODES[kind]
+            block = array(typecode, [float(value) for value in values] if kind == 'float' else values).tobytes()
+        else:
+            encoded = [text.encode('utf-8') for text in _encode_text(values, kind)]
+            offsets = array('Q', [0])
+            for item in encoded:
+                offsets.append(offsets[-1] + len(item))
+            block = offsets.tobytes() + b''.join(encoded)
+        entries.append({'name': name, 'kind': kind, 'offset': offset})
+        blocks.append(block + b'\0' * (_align(len(block)) - len(block)))
+        offset += len(blocks[-1])
+
+    header = json.dumps({'rows': num_rows, 'byteorder': sys.byteorder, 'columns': entries},
+                        separators=(',', ':')).encode('utf-8')
+    prefix = _COLS_MAGIC + struct.pack('<I', len(header)) + header
+    with open(path, 'wb') as handle:
+        handle.write(prefix + b'\0' * (_align(len(prefix)) - len(prefix)))
+        for block in blocks:
+            handle.write(block)
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
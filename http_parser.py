@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Incremental HTTP/1.x message parser for reassembled TCP byte streams.
+
+``HttpMessageParser`` consumes one direction of a connection (fed in any
+number of chunks) and emits complete messages with their byte offsets in the
+stream. Bodies are framed by Content-Length, chunked transfer coding or, for
+responses, connection close. ``pair_transactions`` matches requests to
+responses in order, which covers keep-alive and pipelined connections.
+"""
+
+from __future__ import annotations
+
+HTTP_METHODS = (b'GET', b'POST', b'PUT', b'DELETE', b'HEAD', b'OPTIONS', b'PATCH',
+                b'CONNECT', b'TRACE')
+_REQUEST_PREFIXES = tuple(method + b' ' for method in HTTP_METHODS)
+MAX_HEADER_BYTES = 64 * 1024
+
+
+def looks_like_http(data: bytes) -> bool:
+    """True if ``data`` starts like an HTTP/1.x request or response."""
+    return data.startswith(_REQUEST_PREFIXES) or data.startswith(b'HTTP/1.')
+
+
+def _parse_headers(block: bytes):
+    lines = block.decode('iso-8859-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            key = key.strip().lower()
+            value = value.strip()
+            # Repeated headers are folded into one comma-separated value
+            headers[key] = f'{headers[key]}, {value}' if key in headers else value
+    return lines[0], headers
+
+
+class HttpMessageParser:
+    """Parse one direction of an HTTP/1.x connection incrementally.
+
+    ``kind`` is ``'request'`` or ``'response'``. For responses, call
+    ``expect(method)`` for each request sent so HEAD responses and CONNECT
+    tunnels are framed correctly. Messages are returned by ``feed()`` and
+    ``close()`` as dicts with ``start``/``headerEnd``/``end`` stream offsets.
+    Parsing stops (``failed`` is set) when the stream stops looking like HTTP.
+    """
+
+    def __init__(self, kind: str):
+        if kind not in ('request', 'response'):
+            raise ValueError(f'unknown message kind: {kind}')
+        self.kind = kind
+        self.failed = False
+        self.upgraded = False
+        self._buffer = bytearray()
+        self._base = 0          # stream offset of self._buffer[0]
+        self._pos = 0           # parse position within self._buffer
+        self._current = None    # message whose body is being read
+        self._methods = []      # request methods awaiting a response
+
+    def expect(self, method: str) -> None:
+        self._methods.append(method)
+
+    def feed(self, data) -> list:
+        if self.failed or self.upgraded:
+            return []
+        self._buffer += data
+        messages = []
+        while True:
+            if self._current is None:
+                if not self._read_head():
+                    break
+            if not self._read_body():
+                break
+            messages.append(self._finish_message())
+            if self.upgraded:
+                break
+        self._compact()
+        return messages
+
+    def close(self) -> list:
+        """End of stream: complete a close-delimited body or report a truncated message."""
+        if self._current is None:
+            return []
+        message = self._current
+        if message['_framing'] == 'close' or not self.failed:
+            self._pos = len(self._buffer)
+            message['complete'] = message['_framing'] == 'close'
+            return [self._finish_message()]
+        return []
+
+    # ── internals ──
+
+    def _read_head(self) -> bool:
+        buf = self._buffer
+        pos = self._pos
+        # Tolerate stray CRLFs between messages (RFC 9112 §2.2)
+        while buf[pos:pos + 2] == b'\r\n':
+            pos += 2
+        self._pos = pos
+        if len(buf) - pos < 8:
+            return False
+        head = bytes(buf[pos:pos + 9])
+        if not (head.startswith(_REQUEST_PREFIXES) if self.kind == 'request' else head.startswith(b'HTTP/1.')):
+            self.failed = True
+            return False
+        end = buf.find(b'\r\n\r\n', pos, pos + MAX_HEADER_BYTES)
+        if end < 0:
+            if len(buf) - pos >= MAX_HEADER_BYTES:
+                self.failed = True
+            return False
+        start_line, headers = _parse_headers(bytes(buf[pos:end]))
+        message = {'type': self.kind, 'start': self._base + pos,
+                   'headerEnd': self._base + end + 4, 'headers': headers, 'complete': True}
+        parts = start_line.split(' ', 2)
+        if self.kind == 'request':
+            if len(parts) < 2:
+                self.failed = True
+                return False
+            message['method'] = parts[0]
+            message['path'] = parts[1]
+            message['version'] = parts[2] if len(parts) > 2 else 'HTTP/1.0'
+        else:
+            try:
+                message['status'] = int(parts[1])
+            except (IndexError, ValueError):
+                self.failed = True
+                return False
+            message['version'] = parts[0]
+            message['statusText'] = parts[2] if len(parts) > 2 else ''
+        message['_framing'], message['_remaining'] = self._framing(message)
+        message['bodyLength'] = 0
+        message['chunked'] = message['_framing'] == 'chunked'
+        self._pos = end + 4
+        self._current = message
+        return True
+
+    def _framing(self, message):
+        headers = message['headers']
+        if self.kind == 'response':
+            status = message['status']
+            method = self._methods[0] if self._methods else None
+            if 100 <= status < 200 or status in (204, 304) or method == 'HEAD':
+                return 'none', 0
+            if method == 'CONNECT' and 200 <= status < 300:
+                return 'none', 0
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            return 'chunked', 0
+        length = headers.get('content-length')
+        if length is not None:
+            try:
+                return 'length', max(0, int(length.split(',')[0]))
+            except ValueError:
+                pass
+        return ('close', 0) if self.kind == 'response' else ('none', 0)
+
+    def _read_body(self) -> bool:
+        message = self._current
+        framing = message['_framing']
+        available = len(self._buffer) - self._pos
+        if framing == 'none':
+            return True
+        if framing == 'length':
+            take = min(available, message['_remaining'])
+            self._pos += take
+            message['bodyLength'] += take
+            message['_remaining'] -= take
+            return message['_remaining'] == 0
+        if framing == 'close':
+            self._pos += available
+            message['bodyLength'] += available
+            return False
+        return self._read_chunks()
+
+    def _read_chunks(self) -> bool:
+        message = self._current
+        buf = self._buffer
+        while True:
+            if message['_remaining'] > 0:
+                take = min(len(buf) - self._pos, message['_remaining'])
+                self._pos += take
+                message['bodyLength'] += take
+                message['_remaining'] -= take
+                if message['_remaining']:
+                    return False
+                continue
+            line_end = buf.find(b'\r\n', self._pos)
+            if line_end < 0:
+                return False
+            size_field = bytes(buf[self._pos:line_end]).split(b';', 1)[0].strip()
+            if message.get('_trailers'):
+                self._pos = line_end + 2
+                if not size_field:
+                    return True
+                continue
+            try:
+                size = int(size_field, 16)
+            except ValueError:
+                self.failed = True
+                return False
+            self._pos = line_end + 2
+            if size == 0:
+                message['_trailers'] = True
+                continue
+            # Chunk data plus its trailing CRLF
+            message['_remaining'] = size + 2
+            message['bodyLength'] -= 2
+
+    def _finish_message(self) -> dict:
+        message = self._current
+        self._current = None
+        message['end'] = self._base + self._pos
+        if self.kind == 'response':
+            status = message['status']
+            if status == 101 or (self._methods and self._methods[0] == 'CONNECT' and 200 <= status < 300):
+                # The connection stops carrying HTTP after an upgrade or tunnel
+                self.upgraded = True
+            if not 100 <= status < 200 and self._methods:
+                self._methods.pop(0)
+        for key in ('_framing', '_remaining', '_trailers'):
+            message.pop(key, None)
+        return message
+
+    def _compact(self) -> None:
+        if self._pos > 65536 and self._current is None:
+            del self._buffer[:self._pos]
+            self._base += self._pos
+            self._pos = 0
+
+
+def parse_http_stream(client_data, server_data):
+    """Parse both directions of a connection; returns (requests, responses)."""
+    request_parser = HttpMessageParser('request')
+    requests = request_parser.feed(client_data) + request_parser.close()
+    response_parser = HttpMessageParser('response')
+    for request in requests:
+        response_parser.expect(request['method'])
+    responses = response_parser.feed(server_data) + response_parser.close()
+    return requests, responses
+
+
+def pair_transactions(requests, responses) -> list:
+    """Pair requests with final responses in order (HTTP/1.x has no IDs).
+
+    Interim 1xx responses other than 101 are attached to the request they
+    precede rather than consuming it.
+    """
+    pairs = []
+    pending = iter(responses)
+    for request in requests:
+        interim = []
+        response = next(pending, None)
+        while response is not None and 100 <= response['status'] < 200 and response['status'] != 101:
+            interim.append(response)
+            response = next(pending, None)
+        pairs.append((request, response, interim))
+        if response is None:
+            # Remaining requests never got an answer in this capture
+            pairs.extend((req, None, []) for req in requests[len(pairs):])
+            break
+    return pairs
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Incremental analysis for continuously arriving packets.
+
+``IncrementalAnalyzer`` runs the same accumulators that back the batch
+phases of ``NetworkAnalyzer`` (basic statistics, packet loss, latency,
+attack detection, expert events, DNS transactions, generic TCP timelines),
+but takes packets in batches instead of a finished capture::
+
+    analyzer = IncrementalAnalyzer('eth0')
+    for batch in source:
+        analyzer.feed(batch)
+        publish(analyzer.snapshot())
+    results = analyzer.close()
+
+Packets are not retained; every accumulator does constant work per packet
+and keeps state per flow/source/window. ``snapshot()`` returns
+``analysis_results`` in the usual schema at any point. Sections that need
+the packets themselves — per-connection packet details, TCP stream
+reassembly, HTTP and TLS parsing, protocol hierarchy — are left out.
+Protocol timelines come from the generic TCP/flood grouping only.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timezone
+
+from scapy.all import IP, TCP
+
+from network_analyzer import (NetworkAnalyzer, _AttackAccumulator, _BasicStatsAccumulator, _DnsTransactionTable,
+                              _ExpertEventAccumulator, _GenericTcpClassifier, _LatencyAccumulator,
+                              _PacketLossAccumulator)
+
+
+class IncrementalAnalyzer(NetworkAnalyzer):
+    """NetworkAnalyzer fed packet batches with ``feed()`` instead of ``load_packets()``."""
+
+    def __init__(self, source_name: str = 'live', cardinality_mode: str = None,
+                 keep_per_packet_series: bool = None):
+        super().__init__(source_name, cardinality_mode=cardinality_mode,
+                         keep_per_packet_series=keep_per_packet_series)
+        self.packet_count = 0
+        self.closed = False
+        self._first_time = None
+        self._last_time = None
+        self._basic = _BasicStatsAccumulator(self)
+        self._loss = _PacketLossAccumulator()
+        self._latency = _LatencyAccumulator(self.KEEP_PER_PACKET_SERIES)
+        self._attacks = _AttackAccumulator(self)
+        self._expert = _ExpertEventAccumulator()
+        self._dns = _DnsTransactionTable(self.DNS_TIMEOUT_SECONDS, self.CARDINALITY_MODE)
+        self._tcp_groups = _GenericTcpClassifier(
+            self.CARDINALITY_MODE,
+            max_connection_refs=self.GENERIC_TCP_MAX_PACKET_REFS,
+            flood_sample_size=self.FLOOD_SAMPLE_SIZE,
+        )
+
+    def load_packets(self) -> bool:
+        raise TypeError('IncrementalAnalyzer takes packets through feed()')
+
+    def feed(self, packets) -> int:
+        """Add a batch of packets (any iterable); returns the total packet count so far.
+
+        Packet indices in the results (packetRefs, packetIndex, ...) count
+        from the first packet ever fed.
+        """
+        if self.closed:
+            raise RuntimeError('IncrementalAnalyzer is closed')
+        for packet in packets:
+            index = self.packet_count
+            self.packet_count += 1
+            ts = float(packet.time)
+            if self._first_time is None:
+                self._first_time = ts
+            self._last_time = ts
+
+            self._basic.observe(packet)
+            self._loss.observe(index, packet)
+            self._latency.observe(packet)
+            self._attacks.observe(packet, index)
+            self._expert.observe(index, packet)
+            self._dns.observe(index, packet)
+            if packet.haslayer(IP) and packet.haslayer(TCP):
+                ip = packet[IP]
+                tcp = packet[TCP]
+                self._tcp_groups.observe(index, ts, len(packet), ip.src, tcp.sport, ip.dst, tcp.dport,
+                                         int(tcp.flags))
+        return self.packet_count
+
+    def snapshot(self) -> dict:
+        """Current ``analysis_results``; DNS queries still in flight are left out."""
+        self._build_results(final=False)
+        return self.analysis_results
+
+    def close(self) -> dict:
+        """Finish the capture (in-flight DNS queries become timeouts) and return the results."""
+        if not self.closed:
+            self.closed = True
+            self._build_results(final=True)
+        return self.analysis_results
+
+    def _capture_time_span(self):
+        if self._first_time is None:
+            return 0, 0
+        return self._first_time, self._last_time
+
+    def _build_results(self, final):
+        self.analysis_results = {}
+        if not self.packet_count:
+            return
+
+        self._store_basic_stats(self._basic)
+        self.analysis_results['packet_loss'] = self._loss.result()
+        self.analysis_results['latency'] = self._latency.result()
+        # _get_dns_transactions() returns this cached table to analyze_dns() and the attack checks
+        self._dns_transactions = self._dns.result(final=final)
+        self.analysis_results['attack_analysis'] = self._attacks.result(self._detect_dns_amplification(), final=final)
+        self.build_mind_map()
+
+        timelines = self._tcp_groups.timelines()
+        self.protocol_timelines = timelines
+        self.analysis_results['protocol_timelines'] = {
+            'sourceFiles': [os.path.basename(self.pcap_file)],
+            'generatedAt': datetime.now(timezone.utc).isoformat(),
+            'timelines': timelines
+        }
+
+        self.analysis_results['expert_info'] = self._compose_expert_info(
+            self.analysis_results['packet_loss'], self._expert.result(),
+            self.analysis_results['attack_analysis'])
+        self.compute_performance_score()
+        self.enrich_geo_info()
+        self.analyze_dns()
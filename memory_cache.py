@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""In-process LRU cache bounded by estimated bytes.
+
+The API server keeps expensive per-session objects (parsed result files,
+loaded NetworkAnalyzer instances) in memory. Their sizes differ by orders
+of magnitude, so a fixed entry count says little about memory use.
+``ByteBudgetLRU`` takes a size estimate with every ``put`` and evicts the
+least recently used entries until the total fits ``max_bytes`` (and
+``max_entries``, if set). Hit/miss/eviction counters are kept for
+``stats()``.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class ByteBudgetLRU:
+    """Thread-safe LRU mapping whose entries carry an estimated size in bytes."""
+
+    def __init__(self, max_bytes: int, max_entries: int = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, is_fresh=None):
+        """Return the cached value and mark it most recently used.
+
+        ``is_fresh(value)`` may reject a stale entry, which is then dropped
+        and counted as a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and is_fresh is not None and not is_fresh(entry[0]):
+                self._remove_locked(key)
+                self.invalidations += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size: int) -> bool:
+        """Insert or replace an entry; returns False if it alone exceeds the budget."""
+        size = max(0, int(size))
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._entries and (self._bytes > self.max_bytes or
+                                     (self.max_entries is not None and len(self._entries) > self.max_entries)):
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self.evictions += 1
+            return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            self._remove_locked(key)
+            return entry[0]
+
+    def discard_where(self, predicate) -> int:
+        """Drop every entry whose key satisfies ``predicate``; returns how many."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove_locked(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def keys(self) -> list:
+        """Keys from least to most recently used."""
+        with self._lock:
+            return list(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove_locked(self, key) -> None:
+        _, size = self._entries.pop(key)
+        self._bytes -= size
@@ -5,150 +5,685 @@
 import os
 import sys
 import json
+import shutil
+import threading
+from array import array
 from datetime import datetime, timezone
-from collections import Counter, defaultdict
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict, deque
 
 try:
-    from scapy.all import rdpcap, IP, IPv6, TCP, UDP, ICMP, Ether, Raw, DNS, DNSQR, DNSRR, ARP
+    from scapy.all import rdpcap, PacketList, PcapReader, IP, IPv6, TCP, UDP, ICMP, Ether, Raw, DNS, DNSQR, DNSRR, ARP
 except ImportError:  # pragma: no cover - user environment specific
     print("Please install scapy: pip install scapy")
     sys.exit(1)
 
+from capture_model import NO_FLOW, CaptureModel, LazyPacketList, scan_record_offsets
+from columnar_store import DEFAULT_FORMAT, columns_from_records, write_table
+from result_db import RESULT_DB_FILE, with_relative_time, write_result_db
+from http_parser import looks_like_http, pair_transactions, parse_http_stream
+from memory_cache import ByteBudgetLRU
+from tcp_reassembly import TcpStreamReassembler, printable_ascii
+from tls_parser import (HANDSHAKE_CLIENT_HELLO, HANDSHAKE_SERVER_HELLO, RECORD_APPLICATION_DATA,
+                        RECORD_CHANGE_CIPHER_SPEC, client_version, is_grease, ja3, ja3s, ja4,
+                        looks_like_tls, parse_client_hello, parse_server_hello, parse_stream)
+from scan_detector import ScanDetector
+from sketches import (CARDINALITY_MODES, LogHistogram, QuantileSketch, ReservoirSample, distinct_counter,
+                      frequency_counter)
+
+
+_SEVERITY_RANK = {'normal': 0, 'low': 1, 'medium': 2, 'high': 3}
+
+
+class _AttackWindowTracker:
+    """Tumbling-window TCP attack metrics for a single window size.
+
+    Only the currently open window and the incident it may extend are held,
+    so memory is O(active windows) no matter how long the capture is. Each
+    closed window is classified with the same rules as the capture-wide
+    verdict; consecutive flagged windows of the same type merge into one
+    incident.
+    """
+
+    def __init__(self, window_seconds, classifiers, cardinality_mode='auto'):
+        self.window_seconds = window_seconds
+        self.classifiers = classifiers
+        self.cardinality_mode = cardinality_mode
+        self.incidents = []
+        self._window = None
+        self._open_incident = None
+
+    def _new_window(self, start):
+        mode = self.cardinality_mode
+        return {
+            'start': start,
+            'first_index': None,
+            'tcp_packets': 0,
+            'syn': 0,
+            'syn_ack': 0,
+            'fin': 0,
+            'rst': 0,
+            'psh': 0,
+            'connections': distinct_counter(mode),
+            # teardown-without-data = |term ∪ data| - |data|
+            'term_or_data_connections': distinct_counter(mode),
+            'data_connections': distinct_counter(mode),
+            'sources': frequency_counter(mode, capacity=64),
+            'target_ports': distinct_counter(mode),
+        }
 
-class NetworkAnalyzer:
-    """Analyze pcap files and produce structured network insights."""
+    def observe(self, ts, src_ip, conn_key, dst_port, flags, index=None):
+        start = (ts // self.window_seconds) * self.window_seconds
+        # 時間倒退的封包（合併或多介面 pcapng 常見）併入目前窗口，避免切碎事件或重複產生窗口
+        if self._window is None or start > self._window['start']:
+            self._close_window()
+            self._window = self._new_window(start)
+
+        w = self._window
+        if w['first_index'] is None:
+            w['first_index'] = index
+        is_syn = bool(flags & 0x02)
+        is_ack = bool(flags & 0x10)
+        w['tcp_packets'] += 1
+        if is_syn and not is_ack:
+            w['syn'] += 1
+        if is_syn and is_ack:
+            w['syn_ack'] += 1
+        if flags & 0x01:
+            w['fin'] += 1
+        if flags & 0x04:
+            w['rst'] += 1
+        if flags & 0x08:
+            w['psh'] += 1
+            w['data_connections'].add(conn_key)
+            w['term_or_data_connections'].add(conn_key)
+        elif flags & 0x05:
+            w['term_or_data_connections'].add(conn_key)
+        w['connections'].add(conn_key)
+        w['sources'].add(src_ip)
+        w['target_ports'].add(dst_port)
+
+    def _window_metrics(self, w):
+        total = w['tcp_packets']
+        connections = len(w['connections'])
+        teardown_without_data = max(0, len(w['term_or_data_connections']) - len(w['data_connections']))
+        top = w['sources'].most_common(1)
+        return {
+            'total_tcp_packets': total,
+            'syn_count': w['syn'],
+            'fin_count': w['fin'],
+            'rst_ratio': w['rst'] / total if total else 0,
+            'psh_ratio': w['psh'] / total if total else 0,
+            'handshake_completion_rate': w['syn_ack'] / w['syn'] if w['syn'] else 1,
+            'teardown_without_data_rate': teardown_without_data / connections if connections else 0,
+            'connections_per_second': connections / self.window_seconds,
+            'source_concentration': top[0][1] / w['sources'].total if top else 0,
+            'unique_target_ports': len(w['target_ports']),
+        }
 
-    def __init__(self, pcap_file: str):
-        self.pcap_file = pcap_file
-        self.packets = []
-        self.analysis_results = {}
-        self.last_error = None
+    def _close_window(self):
+        w = self._window
+        self._window = None
+        if w is None:
+            return
 
-    @staticmethod
-    def _safe_print(message: str) -> None:
-        try:
-            print(message)
-        except UnicodeEncodeError:
-            safe_message = message.encode('ascii', 'backslashreplace').decode('ascii')
-            print(safe_message)
+        metrics = self._window_metrics(w)
+        verdict = None
+        for classify in self.classifiers:
+            verdict = classify(metrics)
+            if verdict is not None:
+                break
 
-    def load_packets(self) -> bool:
-        """Load packets from the provided pcap/pcapng file."""
-        self.last_error = None
+        incident = self._open_incident
+        if verdict is None:
+            self._finish_incident()
+            return
+
+        attack_type, description, severity, confidence = verdict
+        end = w['start'] + self.window_seconds
+        if incident is not None and (incident['type'] != attack_type or incident['end'] != w['start']):
+            self._finish_incident()
+            incident = None
+
+        if incident is None:
+            incident = self._open_incident = {
+                'type': attack_type,
+                'description': description,
+                'severity': severity,
+                'confidence': confidence,
+                'window_seconds': self.window_seconds,
+                'start': w['start'],
+                'end': end,
+                'first_packet_index': w['first_index'],
+                'window_count': 0,
+                'peak_metrics': {
+                    'packets_per_second': 0,
+                    'syn_count': 0,
+                    'connections_per_second': 0,
+                    'rst_ratio': 0,
+                    'psh_ratio': 0,
+                    'teardown_without_data_rate': 0,
+                    'handshake_completion_rate': 1,
+                },
+            }
+
+        incident['end'] = end
+        incident['window_count'] += 1
+        if _SEVERITY_RANK[severity] > _SEVERITY_RANK[incident['severity']]:
+            incident['severity'] = severity
+            incident['description'] = description
+        incident['confidence'] = max(incident['confidence'], confidence)
+
+        peak = incident['peak_metrics']
+        peak['packets_per_second'] = max(peak['packets_per_second'], metrics['total_tcp_packets'] / self.window_seconds)
+        peak['syn_count'] = max(peak['syn_count'], metrics['syn_count'])
+        for key in ('connections_per_second', 'rst_ratio', 'psh_ratio', 'teardown_without_data_rate'):
+            peak[key] = max(peak[key], metrics[key])
+        # 握手完成率越低越異常，取最小值作為峰值
+        peak['handshake_completion_rate'] = min(peak['handshake_completion_rate'], metrics['handshake_completion_rate'])
+
+    def _finish_incident(self):
+        incident = self._open_incident
+        self._open_incident = None
+        if incident is None:
+            return
+        incident['duration_seconds'] = round(incident['end'] - incident['start'], 3)
+        incident['startEpochMs'] = int(incident['start'] * 1000)
+        incident['endEpochMs'] = int(incident['end'] * 1000)
+        incident['confidence'] = round(incident['confidence'], 2)
+        incident['peak_metrics'] = {key: round(value, 3) for key, value in incident['peak_metrics'].items()}
+        self.incidents.append(incident)
+
+    def close(self):
+        """Flush the open window and incident; returns all incidents."""
+        self._close_window()
+        self._finish_incident()
+        return self.incidents
+
+    def snapshot(self):
+        """Incidents as if the capture ended now; the open window and incident stay open."""
+        window, incident, incidents = self._window, self._open_incident, self.incidents
+        if incident is not None:
+            self._open_incident = dict(incident, peak_metrics=dict(incident['peak_metrics']))
+        self.incidents = list(incidents)
         try:
-            self._safe_print(f"Loading {self.pcap_file} ...")
-            self.packets = rdpcap(self.pcap_file)
-            self._safe_print(f"Loaded {len(self.packets)} packets")
-            return True
-        except Exception as exc:  # pragma: no cover - runtime safety
-            self.last_error = str(exc)
-            self._safe_print(f"Failed to load capture: {exc}")
-            return False
+            return self.close()
+        finally:
+            self._window, self._open_incident, self.incidents = window, incident, incidents
+
+
+class _GenericTcpClassifier:
+    """Single-pass grouping for the generic TCP fallback timelines.
+
+    Packets are counted into two groupings at once: connections (normalized
+    4-tuple, per direction) and flood groups (src, dst, dst port — source
+    port ignored, since floods randomize it). Each group holds counters, a
+    bounded prefix of packet refs and, for flood groups, a reservoir sample,
+    so memory grows with the number of groups rather than packets. Which
+    direction of a connection was absorbed by a flood is only known at the
+    end, which is why connections keep their per-direction counts apart.
+    """
+
+    # 攻擊 timeline 的三個動畫階段各取 10 個封包
+    FLOOD_STAGE_REFS = 30
+
+    def __init__(self, cardinality_mode='auto', max_connection_refs=200, flood_sample_size=200):
+        self.cardinality_mode = cardinality_mode
+        self.max_connection_refs = max_connection_refs
+        self.flood_sample_size = flood_sample_size
+        self.connections = {}   # key: ((ip, port), (ip, port)) sorted - 標準 5-tuple
+        self.flood_groups = {}  # key: (src_ip, dst_ip, dst_port) - Flood 攻擊分組（忽略 source port）
+
+    def observe(self, index, ts, length, src_ip, sport, dst_ip, dport, flags):
+        # === 標準 5-tuple 分組 ===
+        endpoint1 = (src_ip, sport)
+        endpoint2 = (dst_ip, dport)
+        if endpoint1 <= endpoint2:
+            normalized_key, direction = (endpoint1, endpoint2), 0
+        else:
+            normalized_key, direction = (endpoint2, endpoint1), 1
+
+        conn = self.connections.get(normalized_key)
+        if conn is None:
+            conn = self.connections[normalized_key] = {
+                'start_time': ts,
+                'end_time': ts,
+                'packet_counts': [0, 0],
+                'refs': ([], []),
+                'total_bytes': 0,
+                'flags_seen': set(),
+                'psh_count': 0,
+                'syn_count': 0
+            }
+        conn['end_time'] = max(conn['end_time'], ts)
+        conn['packet_counts'][direction] += 1
+        refs = conn['refs'][direction]
+        if len(refs) < self.max_connection_refs:
+            refs.append(index)
+        conn['total_bytes'] += length
+
+        # 記錄看到的 flags 並計數
+        if flags & 0x02:  # SYN
+            conn['flags_seen'].add('SYN')
+            conn['syn_count'] += 1
+        if flags & 0x01:  # FIN
+            conn['flags_seen'].add('FIN')
+        if flags & 0x04:  # RST
+            conn['flags_seen'].add('RST')
+        if flags & 0x10:  # ACK
+            conn['flags_seen'].add('ACK')
+        if flags & 0x08:  # PSH
+            conn['flags_seen'].add('PSH')
+            conn['psh_count'] += 1
+
+        # === Flood 攻擊分組（忽略 source port）===
+        # 用於檢測每個封包使用不同 source port 的攻擊模式
+        flood_key = (src_ip, dst_ip, dport)  # 注意：不包含 source port
+        fg = self.flood_groups.get(flood_key)
+        if fg is None:
+            fg = self.flood_groups[flood_key] = {
+                'start_time': ts,
+                'end_time': ts,
+                'packet_count': 0,
+                'head_refs': [],
+                'sample': ReservoirSample(self.flood_sample_size),
+                'total_bytes': 0,
+                'flags_seen': set(),
+                'psh_count': 0,
+                'syn_count': 0,
+                'urg_count': 0,
+                'fin_count': 0,
+                'ack_count': 0,
+                'rst_count': 0,
+                'unique_sports': distinct_counter(self.cardinality_mode)  # 追蹤不同的 source ports
+            }
+        fg['end_time'] = max(fg['end_time'], ts)
+        fg['packet_count'] += 1
+        if len(fg['head_refs']) < self.FLOOD_STAGE_REFS:
+            fg['head_refs'].append(index)
+        fg['sample'].add(index)
+        fg['total_bytes'] += length
+        fg['unique_sports'].add(sport)
+
+        if flags & 0x02:  # SYN
+            fg['flags_seen'].add('SYN')
+            fg['syn_count'] += 1
+        if flags & 0x01:  # FIN
+            fg['flags_seen'].add('FIN')
+            fg['fin_count'] += 1
+        if flags & 0x20:  # URG
+            fg['flags_seen'].add('URG')
+            fg['urg_count'] += 1
+        if flags & 0x08:  # PSH
+            fg['flags_seen'].add('PSH')
+            fg['psh_count'] += 1
+        if flags & 0x10:  # ACK
+            fg['flags_seen'].add('ACK')
+            fg['ack_count'] += 1
+        if flags & 0x04:  # RST
+            fg['flags_seen'].add('RST')
+            fg['rst_count'] += 1
 
-    def basic_statistics(self):
-        """Compute basic statistics for the capture."""
-        if not self.packets:
+    @staticmethod
+    def _is_flood(fg):
+        # Flood 攻擊特徵：
+        # 1. 大量封包 (> 50)
+        # 2. 使用很多不同的 source ports（幾乎每個封包都不同）
+        # 3. unique_ports / total_packets 比例 > 0.8
+        total_packets = fg['packet_count']
+        unique_ports = len(fg['unique_sports'])
+        return total_packets > 50 and unique_ports > 20 and unique_ports / total_packets > 0.8
+
+    def timelines(self):
+        timelines = []
+        flood_keys = set()
+
+        # === 第一階段：檢測 Flood 攻擊 ===
+        for flood_key, fg in self.flood_groups.items():
+            if not self._is_flood(fg):
+                continue
+            flood_keys.add(flood_key)
+            timelines.append(self._flood_timeline(flood_key, fg))
+
+        # === 第二階段：處理正常連線（排除已被 Flood 處理的方向）===
+        for key, conn in self.connections.items():
+            timeline = self._connection_timeline(key, conn, flood_keys)
+            if timeline is not None:
+                timelines.append(timeline)
+
+        return timelines
+
+    @staticmethod
+    def _flood_type(fg):
+        total_packets = fg['packet_count']
+        psh_ratio = fg['psh_count'] / total_packets
+        syn_ratio = fg['syn_count'] / total_packets
+        urg_ratio = fg['urg_count'] / total_packets
+        fin_ratio = fg['fin_count'] / total_packets
+        ack_ratio = fg['ack_count'] / total_packets
+        rst_ratio = fg['rst_count'] / total_packets
+
+        # URG+PSH+FIN 攻擊（異常旗標組合）
+        if urg_ratio > 0.5 and psh_ratio > 0.5 and fin_ratio > 0.5:
+            protocol_type = 'urg-psh-fin-flood'
+        # ACK+FIN 複合攻擊
+        elif ack_ratio > 0.5 and fin_ratio > 0.5:
+            protocol_type = 'ack-fin-flood'
+        # PSH Flood
+        elif psh_ratio > 0.6:
+            protocol_type = 'psh-flood'
+        # SYN Flood
+        elif syn_ratio > 0.8:
+            protocol_type = 'syn-flood'
+        # ACK Flood
+        elif ack_ratio > 0.8:
+            protocol_type = 'ack-flood'
+        # RST Flood
+        elif rst_ratio > 0.8:
+            protocol_type = 'rst-flood'
+        # FIN Flood
+        elif fin_ratio > 0.8:
+            protocol_type = 'fin-flood'
+        else:
+            protocol_type = 'tcp-flood'  # 通用 Flood
+        ratios = {
+            'pshRatio': round(psh_ratio, 3),
+            'synRatio': round(syn_ratio, 3),
+            'finRatio': round(fin_ratio, 3),
+            'urgRatio': round(urg_ratio, 3),
+            'ackRatio': round(ack_ratio, 3),
+            'rstRatio': round(rst_ratio, 3),
+        }
+        return protocol_type, ratios
+
+    def _flood_timeline(self, flood_key, fg):
+        protocol_type, ratios = self._flood_type(fg)
+        src_ip, dst_ip, dst_port = flood_key
+        start_time = fg['start_time']
+        end_time = fg['end_time']
+        duration_ms = max(1000, int((end_time - start_time) * 1000))
+        head = fg['head_refs']
+
+        # 創建 Flood 攻擊 timeline
+        stages = [
+            {
+                'key': 'attack',
+                'label': f'{protocol_type.upper()} 攻擊',
+                'direction': 'forward',
+                'durationMs': duration_ms // 3,
+                'packetRefs': head[:10]
+            },
+            {
+                'key': 'flood',
+                'label': '洪水攻擊中',
+                'direction': 'forward',
+                'durationMs': duration_ms // 3,
+                'packetRefs': head[10:20]
+            },
+            {
+                'key': 'overload',
+                'label': '資源過載',
+                'direction': 'forward',
+                'durationMs': duration_ms // 3,
+                'packetRefs': head[20:30]
+            }
+        ]
+
+        # Stage packetRefs only cover 30 packets (animation frames); the statistics
+        # endpoint needs a larger representative sample to cross the detection threshold
+        # and compute accurate flag ratios, so allPacketRefs is a uniform reservoir sample.
+        return {
+            'id': f"flood-{src_ip}-0-{dst_ip}-{dst_port}",  # 添加虛擬 srcPort=0 以符合前端解析格式
+            'protocol': 'tcp',
+            'protocolType': protocol_type,
+            'startEpochMs': int(start_time * 1000),
+            'endEpochMs': int(end_time * 1000),
+            'stages': stages,
+            'allPacketRefs': sorted(fg['sample'].items),
+            'metrics': {
+                'durationMs': duration_ms,
+                'packetCount': fg['packet_count'],
+                'totalBytes': fg['total_bytes'],
+                'uniquePorts': len(fg['unique_sports']),
+                'flagsSeen': list(fg['flags_seen']),
+                **ratios,
+                'isFlood': True
+            }
+        }
+
+    def _connection_timeline(self, key, conn, flood_keys):
+        endpoint1, endpoint2 = key
+        # 方向 0 為 endpoint1 -> endpoint2；被 Flood 分組吸收的方向不再重複輸出
+        direction_flood_keys = (
+            (endpoint1[0], endpoint2[0], endpoint2[1]),
+            (endpoint2[0], endpoint1[0], endpoint1[1]),
+        )
+        kept = [d for d in (0, 1) if direction_flood_keys[d] not in flood_keys]
+        total_packets = sum(conn['packet_counts'][d] for d in kept)
+        if total_packets < 2:
             return None
+        # 兩個方向各保留前 N 個封包，合併後取前 N 個即為剩餘封包的前 N 個
+        refs = sorted(ref for d in kept for ref in conn['refs'][d])[:self.max_connection_refs]
+
+        start_time = conn['start_time']
+        end_time = conn['end_time']
+        duration_ms = max(1, int((end_time - start_time) * 1000))
+
+        # 使用原始的 flag 計數（因為我們是按連線計算，不是按封包）
+        all_packets = sum(conn['packet_counts'])
+        psh_ratio = conn['psh_count'] / all_packets
+        syn_ratio = conn['syn_count'] / all_packets
+
+        flags_seen = conn['flags_seen']
+
+        # 決定 protocolType
+        if psh_ratio > 0.6 and syn_ratio < 0.4 and total_packets > 20:
+            protocol_type = 'psh-flood'
+        elif 'SYN' in flags_seen and 'FIN' in flags_seen:
+            protocol_type = 'tcp-session'
+        elif 'SYN' in flags_seen:
+            protocol_type = 'tcp-handshake'
+        elif 'FIN' in flags_seen or 'RST' in flags_seen:
+            protocol_type = 'tcp-teardown'
+        else:
+            protocol_type = 'tcp-data'
 
-        stats = {
-            'total_packets': len(self.packets),
-            'protocols': Counter(),
-            'packet_sizes': [],
-            'time_intervals': [],
-            'src_ips': Counter(),
-            'dst_ips': Counter(),
-            'src_ports': Counter(),
-            'dst_ports': Counter()
+        half_duration = max(800, duration_ms // 2)
+        stages = [
+            {
+                'key': 'transfer',
+                'label': 'Data Transfer',
+                'direction': 'forward',
+                'durationMs': half_duration,
+                'packetRefs': refs[:len(refs)//2] or refs[:1]
+            },
+            {
+                'key': 'response',
+                'label': 'Response',
+                'direction': 'backward',
+                'durationMs': half_duration,
+                'packetRefs': refs[len(refs)//2:] or refs[-1:]
+            },
+        ]
+
+        return {
+            'id': f"tcp-data-{endpoint1[0]}-{endpoint1[1]}-{endpoint2[0]}-{endpoint2[1]}",
+            'protocol': 'tcp',
+            'protocolType': protocol_type,
+            'startEpochMs': int(start_time * 1000),
+            'endEpochMs': int(end_time * 1000),
+            'stages': stages,
+            'metrics': {
+                'durationMs': duration_ms,
+                'packetCount': total_packets,
+                'totalBytes': conn['total_bytes'],
+                'flagsSeen': list(flags_seen),
+                'pshRatio': round(psh_ratio, 3),
+                'synRatio': round(syn_ratio, 3),
+            }
         }
 
-        connection_counts = Counter()
-        protocol_details = defaultdict(lambda: {
+
+class _BasicStatsAccumulator:
+    """Running counters behind basic_statistics().
+
+    ``observe`` is O(1) per packet; ``result`` builds the basic_stats dict from
+    the current counters without consuming them, so it can be called between
+    batches of a live capture.
+    """
+
+    def __init__(self, analyzer):
+        self.keep_series = analyzer.KEEP_PER_PACKET_SERIES
+        self.sidecar_files = analyzer.SERIES_SIDECAR_FILES
+        self.counter_to_list = analyzer.counter_to_list
+        self.total_packets = 0
+        self.total_bytes = 0
+        self.protocols = Counter()
+        self.src_ips = Counter()
+        self.dst_ips = Counter()
+        self.src_ports = Counter()
+        self.dst_ports = Counter()
+        self.size_sketch = QuantileSketch()
+        self.interval_sketch = QuantileSketch()
+        self.size_histogram = LogHistogram(*analyzer.PACKET_SIZE_HISTOGRAM)
+        self.interval_histogram = LogHistogram(*analyzer.TIME_INTERVAL_HISTOGRAM_MS)
+        self.size_series = array(self.sidecar_files['packet_sizes'][1])
+        self.interval_series = array(self.sidecar_files['time_intervals'][1])
+        self.connection_counts = Counter()
+        self.protocol_details = defaultdict(lambda: {
             'sources': Counter(),
             'destinations': Counter(),
             'conversations': Counter()
         })
+        self.prev_time = None
+
+    def observe(self, packet):
+        self.total_packets += 1
+        packet_len = len(packet)
+        self.total_bytes += packet_len
+        self.size_sketch.add(packet_len)
+        self.size_histogram.add(packet_len)
+        if self.keep_series:
+            self.size_series.append(packet_len)
+
+        packet_time = float(packet.time)
+        if self.prev_time is not None:
+            interval = packet_time - self.prev_time
+            self.interval_sketch.add(interval)
+            self.interval_histogram.add(interval * 1000)
+            if self.keep_series:
+                self.interval_series.append(interval)
+        self.prev_time = packet_time
+
+        has_ip = packet.haslayer(IP)
+        has_ipv6 = packet.haslayer(IPv6)
+        if not has_ip and not has_ipv6:
+            self.protocols['Non-IP'] += 1
+            return
 
-        prev_time = None
+        ip_layer = packet[IP] if has_ip else packet[IPv6]
+        src_ip = ip_layer.src
+        dst_ip = ip_layer.dst
 
-        for packet in self.packets:
-            packet_len = len(packet)
-            stats['packet_sizes'].append(packet_len)
+        self.src_ips[src_ip] += 1
+        self.dst_ips[dst_ip] += 1
 
-            packet_time = float(packet.time)
-            if prev_time is not None:
-                stats['time_intervals'].append(packet_time - prev_time)
-            prev_time = packet_time
+        protocol_name = None
+        src_port = None
+        dst_port = None
 
-            has_ip = packet.haslayer(IP)
-            has_ipv6 = packet.haslayer(IPv6)
-            if has_ip or has_ipv6:
-                ip_layer = packet[IP] if has_ip else packet[IPv6]
-                src_ip = ip_layer.src
-                dst_ip = ip_layer.dst
+        if packet.haslayer(TCP):
+            protocol_name = 'TCP'
+            tcp_layer = packet[TCP]
+            src_port = tcp_layer.sport
+            dst_port = tcp_layer.dport
+        elif packet.haslayer(UDP):
+            protocol_name = 'UDP'
+            udp_layer = packet[UDP]
+            src_port = udp_layer.sport
+            dst_port = udp_layer.dport
+        elif packet.haslayer(ICMP):
+            protocol_name = 'ICMP'
+        else:
+            protocol_name = 'Other IP'
 
-                stats['src_ips'][src_ip] += 1
-                stats['dst_ips'][dst_ip] += 1
+        self.protocols[protocol_name] += 1
 
-                protocol_name = None
-                src_port = None
-                dst_port = None
+        if src_port is not None:
+            self.src_ports[src_port] += 1
+        if dst_port is not None:
+            self.dst_ports[dst_port] += 1
 
-                if packet.haslayer(TCP):
-                    protocol_name = 'TCP'
-                    tcp_layer = packet[TCP]
-                    src_port = tcp_layer.sport
-                    dst_port = tcp_layer.dport
-                elif packet.haslayer(UDP):
-                    protocol_name = 'UDP'
-                    udp_layer = packet[UDP]
-                    src_port = udp_layer.sport
-                    dst_port = udp_layer.dport
-                elif packet.haslayer(ICMP):
-                    protocol_name = 'ICMP'
-                else:
-                    protocol_name = 'Other IP'
+        details = self.protocol_details[protocol_name]
+        details['sources'][src_ip] += 1
+        details['destinations'][dst_ip] += 1
 
-                stats['protocols'][protocol_name] += 1
+        if src_port is not None and dst_port is not None:
+            conversation_label = f"{src_ip}:{src_port} -> {dst_ip}:{dst_port}"
+        elif src_port is not None:
+            conversation_label = f"{src_ip}:{src_port} -> {dst_ip}"
+        elif dst_port is not None:
+            conversation_label = f"{src_ip} -> {dst_ip}:{dst_port}"
+        else:
+            conversation_label = f"{src_ip} -> {dst_ip}"
 
-                if src_port is not None:
-                    stats['src_ports'][src_port] += 1
-                if dst_port is not None:
-                    stats['dst_ports'][dst_port] += 1
+        details['conversations'][conversation_label] += 1
 
-                details = protocol_details[protocol_name]
-                details['sources'][src_ip] += 1
-                details['destinations'][dst_ip] += 1
+        connection_key = (protocol_name, src_ip, src_port, dst_ip, dst_port)
+        self.connection_counts[connection_key] += 1
 
-                if src_port is not None and dst_port is not None:
-                    conversation_label = f"{src_ip}:{src_port} -> {dst_ip}:{dst_port}"
-                elif src_port is not None:
-                    conversation_label = f"{src_ip}:{src_port} -> {dst_ip}"
-                elif dst_port is not None:
-                    conversation_label = f"{src_ip} -> {dst_ip}:{dst_port}"
-                else:
-                    conversation_label = f"{src_ip} -> {dst_ip}"
-
-                details['conversations'][conversation_label] += 1
+    def series(self):
+        """Raw per-packet series (only filled when keep_series is set)."""
+        if not self.keep_series:
+            return {}
+        return {'packet_sizes': self.size_series, 'time_intervals': self.interval_series}
 
-                connection_key = (protocol_name, src_ip, src_port, dst_ip, dst_port)
-                connection_counts[connection_key] += 1
-            else:
-                stats['protocols']['Non-IP'] += 1
+    def result(self):
+        stats = {
+            'total_packets': self.total_packets,
+            'protocols': Counter(self.protocols),
+            'src_ips': Counter(self.src_ips),
+            'dst_ips': Counter(self.dst_ips),
+            'src_ports': Counter(self.src_ports),
+            'dst_ports': Counter(self.dst_ports),
+            'total_bytes': self.total_bytes,
+        }
 
+        size_sketch = self.size_sketch
+        size_summary = size_sketch.summary()
         stats['packet_size_summary'] = {
-            'average': self.calculate_average(stats['packet_sizes']) if stats['packet_sizes'] else 0,
-            'min': min(stats['packet_sizes']) if stats['packet_sizes'] else 0,
-            'max': max(stats['packet_sizes']) if stats['packet_sizes'] else 0
+            'average': size_summary['mean'],
+            'min': size_sketch.min if size_sketch.count else 0,
+            'max': size_sketch.max if size_sketch.count else 0,
+            'std': size_summary['std'],
+            **{key: size_summary[key] for key in ('p50', 'p90', 'p99', 'p999')}
         }
 
+        interval_summary = self.interval_sketch.summary(scale=1000)
         stats['time_interval_summary'] = {
-            'average_ms': self.calculate_average(stats['time_intervals']) * 1000 if stats['time_intervals'] else 0,
-            'min_ms': min(stats['time_intervals']) * 1000 if stats['time_intervals'] else 0,
-            'max_ms': max(stats['time_intervals']) * 1000 if stats['time_intervals'] else 0
+            'average_ms': interval_summary['mean'],
+            'min_ms': interval_summary['min'],
+            'max_ms': interval_summary['max'],
+            'std_ms': interval_summary['std'],
+            **{f'{key}_ms': interval_summary[key] for key in ('p50', 'p90', 'p99', 'p999')}
         }
+        stats['packet_size_histogram'] = self.size_histogram.to_dict()
+        stats['time_interval_histogram_ms'] = self.interval_histogram.to_dict()
+
+        series = self.series()
+        if series:
+            stats['series_sidecar'] = {}
+            for name, values in series.items():
+                filename, _, dtype = self.sidecar_files[name]
+                stats['series_sidecar'][name] = {
+                    'file': filename,
+                    'dtype': dtype,
+                    'byteorder': sys.byteorder,
+                    'count': len(values)
+                }
 
         serialized_details = {}
-        for protocol, detail in protocol_details.items():
+        for protocol, detail in self.protocol_details.items():
             serialized_details[protocol] = {
                 'sources': self.counter_to_list(detail['sources'], top_n=10),
                 'destinations': self.counter_to_list(detail['destinations'], top_n=10),
@@ -165,9 +700,951 @@ class NetworkAnalyzer:
                 'dst_port': dst_port,
                 'packet_count': count
             }
-            for (proto, src_ip, src_port, dst_ip, dst_port), count in connection_counts.most_common(500)
+            for (proto, src_ip, src_port, dst_ip, dst_port), count in self.connection_counts.most_common(500)
         ]
+        return stats
+
+
+class _PacketLossAccumulator:
+    """Per-stream sequence tracking behind detect_packet_loss().
+
+    Each directional stream keeps only its previous segment, so memory grows
+    with the number of streams, not packets. Segments are compared in arrival
+    order. Indicators from streams that have not yet reached three packets
+    are held back, matching the batch rule that ignores such short streams.
+    """
+
+    _SEQ_MAX = 2 ** 32
+    _SEQ_HALF = _SEQ_MAX // 2
+
+    def __init__(self):
+        self.streams = {}
+        self.indicators = []
+
+    def observe(self, index, packet):
+        if not packet.haslayer(TCP):
+            return
+        has_ip = packet.haslayer(IP)
+        has_ipv6 = packet.haslayer(IPv6)
+        if not has_ip and not has_ipv6:
+            return
+        tcp_layer = packet[TCP]
+        ip_layer = packet[IP] if has_ip else packet[IPv6]
+        flags = int(tcp_layer.flags)
+        syn = bool(flags & 0x02)
+        fin = bool(flags & 0x01)
+        # Actual TCP payload length from IP/TCP headers (handles variable TCP options)
+        if has_ip:
+            ip_payload = ip_layer.len - (ip_layer.ihl * 4)
+        else:
+            ip_payload = ip_layer.plen
+        tcp_hdr = tcp_layer.dataofs * 4
+        data_len = max(0, ip_payload - tcp_hdr)
+        # SYN and FIN each consume one sequence number even without data
+        seq_advance = data_len + (1 if syn else 0) + (1 if fin else 0)
+
+        stream_id = f"{ip_layer.src}:{tcp_layer.sport}-{ip_layer.dst}:{tcp_layer.dport}"
+        curr = {
+            'packet_index': index,
+            'seq': tcp_layer.seq,
+            'time': float(packet.time),
+            'seq_advance': seq_advance,
+        }
+        state = self.streams.get(stream_id)
+        if state is None:
+            self.streams[stream_id] = {'count': 1, 'prev': curr, 'held': []}
+            return
+
+        prev = state['prev']
+        found = []
+        # Retransmission detection using 32-bit modular arithmetic.
+        # Skip control-only packets (pure ACK, no payload, no SYN/FIN)
+        if curr['seq_advance'] != 0:
+            # Positive modular diff means forward; > half means wrapped backward
+            diff = (curr['seq'] - prev['seq']) % self._SEQ_MAX
+            if diff > self._SEQ_HALF:
+                found.append({
+                    'type': 'retransmission',
+                    'stream': stream_id,
+                    'packet_index': curr['packet_index'],
+                    'time': curr['time']
+                })
+        # Sequence gap detection: skip when the previous packet didn't advance seq
+        if prev['seq_advance'] != 0:
+            expected_seq = (prev['seq'] + prev['seq_advance']) % self._SEQ_MAX
+            gap = (curr['seq'] - expected_seq) % self._SEQ_MAX
+            # Gap is a forward jump of more than 1000 bytes (not wraparound)
+            if 0 < gap < self._SEQ_HALF and gap > 1000:
+                found.append({
+                    'type': 'sequence_gap',
+                    'stream': stream_id,
+                    'packet_index': curr['packet_index'],
+                    'time': curr['time'],
+                    'gap_size': gap
+                })
+
+        state['count'] += 1
+        state['prev'] = curr
+        held = state['held']
+        if held is not None:
+            held.extend(found)
+            if state['count'] < 3:
+                return
+            found = held
+            state['held'] = None
+        self.indicators.extend(found)
+
+    def result(self):
+        return list(self.indicators)
+
+
+class _LatencyAccumulator:
+    """Running state behind analyze_latency().
+
+    Echo requests are remembered only for the last PING_LOOKBACK packets (the
+    batch search window), handshakes in flight by connection id (at most
+    MAX_PENDING_HANDSHAKES, dropped once completed), and ping RTTs, handshake
+    times and inter-packet delays as QuantileSketches; the per-event lists
+    are only filled when keep_series is set.
+    """
+
+    PING_LOOKBACK = 100
+    # Half-open handshakes remembered at once; a SYN flood evicts the oldest
+    MAX_PENDING_HANDSHAKES = 4096
+
+    def __init__(self, keep_series=False):
+        self.keep_series = keep_series
+        self.index = 0
+        self.ping_responses = []
+        self.tcp_handshake_times = []
+        self.inter_packet_delays = []
+        self._echo_requests = deque()  # (packet index, icmp id, time)
+        self._handshakes = OrderedDict()  # connection id -> [syn_time, syn_ack_time], oldest first
+        self.delay_sketch = QuantileSketch()
+        self.handshake_sketch = QuantileSketch()
+        self.ping_sketch = QuantileSketch()
+        self.high_delay_count = 0
+        self.prev_time = None
+
+    def observe(self, packet):
+        idx = self.index
+        self.index += 1
+        current_time = float(packet.time)
+
+        if packet.haslayer(ICMP):
+            icmp_layer = packet[ICMP]
+            requests = self._echo_requests
+            while requests and requests[0][0] < idx - self.PING_LOOKBACK:
+                requests.popleft()
+            if icmp_layer.type == 0:  # echo reply
+                for _, icmp_id, request_time in requests:
+                    if icmp_id == icmp_layer.id:
+                        rtt = (current_time - request_time) * 1000
+                        self.ping_sketch.add(rtt)
+                        if self.keep_series:
+                            self.ping_responses.append({'rtt': rtt, 'time': current_time})
+                        break
+            elif icmp_layer.type == 8:
+                requests.append((idx, icmp_layer.id, current_time))
+
+        if packet.haslayer(TCP) and packet.haslayer(IP):
+            tcp_layer = packet[TCP]
+            ip_layer = packet[IP]
+            connection_id = f"{ip_layer.src}:{tcp_layer.sport}-{ip_layer.dst}:{tcp_layer.dport}"
+
+            flags = int(tcp_layer.flags)
+            is_syn = bool(flags & 0x02)
+            is_ack = bool(flags & 0x10)
+            handshakes = self._handshakes
+            if is_syn and not is_ack:  # SYN (ECN bits tolerated)
+                handshakes[connection_id] = [current_time, None]  # [syn_time, syn_ack_time]
+                handshakes.move_to_end(connection_id)
+                if len(handshakes) > self.MAX_PENDING_HANDSHAKES:
+                    handshakes.popitem(last=False)  # oldest half-open handshake
+            elif is_syn and is_ack:  # SYN-ACK, sent by the server back to the client
+                handshake = handshakes.get(f"{ip_layer.dst}:{tcp_layer.dport}-{ip_layer.src}:{tcp_layer.sport}")
+                if handshake is not None:
+                    handshake[1] = current_time
+            elif is_ack and not is_syn:  # ACK
+                handshake = handshakes.get(connection_id)
+                if handshake is not None and handshake[1] is not None:
+                    del handshakes[connection_id]
+                    handshake_time = (current_time - handshake[0]) * 1000
+                    self.handshake_sketch.add(handshake_time)
+                    if self.keep_series:
+                        self.tcp_handshake_times.append({'handshake_time': handshake_time, 'time': current_time})
+
+        if self.prev_time is not None:
+            delay = (current_time - self.prev_time) * 1000
+            if delay < 1000:
+                self.delay_sketch.add(delay)
+                if delay > 100:
+                    self.high_delay_count += 1
+                if self.keep_series:
+                    self.inter_packet_delays.append({'delay': delay, 'time': current_time})
+        self.prev_time = current_time
+
+    def result(self):
+        latency_data = {
+            'ping_responses': list(self.ping_responses),
+            'tcp_handshakes': list(self.tcp_handshake_times),
+            'inter_packet_delays': list(self.inter_packet_delays)
+        }
+        delay_summary = self.delay_sketch.summary()
+        delay_summary['count_over_100ms'] = self.high_delay_count
+        latency_data['inter_packet_delay_summary'] = delay_summary
+        latency_data['handshake_summary'] = self.handshake_sketch.summary()
+        latency_data['ping_summary'] = self.ping_sketch.summary()
+        rtt_sketch = QuantileSketch()
+        rtt_sketch.merge(self.handshake_sketch)
+        rtt_sketch.merge(self.ping_sketch)
+        latency_data['rtt_summary'] = rtt_sketch.summary()
+        return latency_data
+
+
+class _DnsTransactionTable:
+    """Single-pass DNS query/response matcher behind _get_dns_transactions().
+
+    Queries are keyed on (txid, client, server, qname). A repeated query
+    with the same key is a retry; a query left unanswered for ``timeout``
+    seconds becomes a 'timeout' row, and a response with no pending query is
+    recorded as 'unsolicited'. Byte totals for the amplification check are
+    accumulated in the same pass.
+    """
+
+    def __init__(self, timeout, cardinality_mode='auto'):
+        self.timeout = timeout
+        self.rows = []
+        self.pending = OrderedDict()  # key -> row, in last-sent order
+        self.amp = {'query_bytes': 0, 'response_bytes': 0, 'total_queries': 0, 'total_responses': 0}
+        self.response_sources = distinct_counter(cardinality_mode)
+        self.response_targets = frequency_counter(cardinality_mode)
+
+    def _expire(self, now):
+        pending = self.pending
+        while pending:
+            key, row = next(iter(pending.items()))
+            if now - row['_lastSent'] <= self.timeout:
+                break
+            pending.popitem(last=False)
+            row['status'] = 'timeout'
+
+    def observe(self, index, packet):
+        if not packet.haslayer(UDP) or not packet.haslayer(DNS):
+            return
+        udp = packet[UDP]
+        if udp.sport != 53 and udp.dport != 53:
+            return
+        has_ip = packet.haslayer(IP)
+        if not has_ip and not packet.haslayer(IPv6):
+            return
+        ip = packet[IP] if has_ip else packet[IPv6]
+        dns = packet[DNS]
+        ts = float(packet.time)
+        pkt_len = len(packet)
+        amp = self.amp
+        self._expire(ts)
+
+        qname, qtype = '', None
+        if packet.haslayer(DNSQR):
+            qr = packet[DNSQR]
+            qname = qr.qname.decode('utf-8', errors='replace') if isinstance(qr.qname, bytes) else str(qr.qname)
+            qtype = NetworkAnalyzer._dns_qtype_name(qr.qtype)
+
+        if not dns.qr:
+            amp['query_bytes'] += pkt_len
+            amp['total_queries'] += 1
+            key = (dns.id, ip.src, ip.dst, qname)
+            row = self.pending.get(key)
+            if row is not None:
+                row['retries'] += 1
+                row['_lastSent'] = ts
+                self.pending.move_to_end(key)  # keep pending ordered by last attempt for _expire()
+                return
+            row = {
+                'time': ts, 'txid': dns.id, 'client': ip.src, 'clientPort': udp.sport,
+                'server': ip.dst, 'qname': qname, 'qtype': qtype, 'rcode': None,
+                'latencyMs': None, 'answerCount': 0, 'querySize': pkt_len, 'responseSize': 0,
+                'retries': 0, 'status': 'pending', 'queryPacket': index, 'responsePacket': None,
+                '_lastSent': ts,
+            }
+            self.pending[key] = row
+            self.rows.append(row)
+            return
+
+        amp['response_bytes'] += pkt_len
+        amp['total_responses'] += 1
+        self.response_sources.add(ip.src)
+        self.response_targets.add(ip.dst)
+        row = self.pending.pop((dns.id, ip.dst, ip.src, qname), None)
+        if row is None:
+            row = {
+                'time': ts, 'txid': dns.id, 'client': ip.dst, 'clientPort': udp.dport,
+                'server': ip.src, 'qname': qname, 'qtype': qtype, 'querySize': 0,
+                'retries': 0, 'status': 'unsolicited', 'queryPacket': None, 'latencyMs': None,
+            }
+            self.rows.append(row)
+        else:
+            row['status'] = 'answered'
+            row['latencyMs'] = round((ts - row['_lastSent']) * 1000, 3)
+        row['rcode'] = NetworkAnalyzer._dns_rcode_name(dns.rcode)
+        row['answerCount'] = dns.ancount
+        row['responseSize'] = pkt_len
+        row['responsePacket'] = index
+
+    def result(self, final=True):
+        """Rows plus amplification totals.
+
+        With ``final`` the still-pending queries become timeouts (end of
+        capture). Otherwise they are left out: they may yet be answered.
+        """
+        if final:
+            for row in self.pending.values():
+                row['status'] = 'timeout'
+            self.pending.clear()
+        rows = []
+        for row in self.rows:
+            if row['status'] == 'pending':
+                continue
+            row = dict(row)
+            row.pop('_lastSent', None)
+            rows.append(row)
+
+        amp = dict(self.amp)
+        amp['amplification_ratio'] = amp['response_bytes'] / amp['query_bytes'] if amp['query_bytes'] else 0
+        amp['response_source_count'] = len(self.response_sources)
+        amp['target_ip'] = self.response_targets.most_common(1)[0][0] if self.response_targets else None
+        return {'rows': rows, 'amplification': amp}
+
+
+class _SlowlorisTracker:
+    """Per-source HTTP socket counters behind _detect_slowloris().
+
+    Sources live in an LRU table of at most max_sources entries; an evicted
+    source is classified before it is dropped (like scan_detector.ScanDetector),
+    so a flood of spoofed sources cannot grow the table without bound.
+    """
+
+    HTTP_PORTS = {80, 443, 8080, 8443}
+    MAX_DETAILS = 100
+
+    def __init__(self, cardinality_mode='auto', max_sources=4096):
+        self.cardinality_mode = cardinality_mode
+        self.max_sources = max_sources
+        self.connections = OrderedDict()
+        self.evicted_sources = 0
+        self._findings = {}
+
+    def observe(self, packet):
+        if not packet.haslayer(TCP) or not packet.haslayer(IP):
+            return
+        ip = packet[IP]
+        tcp = packet[TCP]
+        if tcp.dport not in self.HTTP_PORTS:
+            return
+        src_ip = ip.src
+        conn = self.connections.get(src_ip)
+        if conn is None:
+            conn = self.connections[src_ip] = {
+                'sockets': distinct_counter(self.cardinality_mode), 'data_bytes': 0, 'packet_count': 0,
+                'first_time': None, 'last_time': None,
+                'has_fin': False, 'has_rst': False
+            }
+            if len(self.connections) > self.max_sources:
+                old_ip, old_conn = self.connections.popitem(last=False)
+                self.evicted_sources += 1
+                finding = self._classify(old_ip, old_conn)
+                if finding is not None:
+                    self._findings[old_ip] = finding
+        self.connections.move_to_end(src_ip)
+        conn['sockets'].add((ip.dst, tcp.dport, tcp.sport))
+        conn['packet_count'] += 1
+        ts = float(packet.time)
+        if conn['first_time'] is None:
+            conn['first_time'] = ts
+        conn['last_time'] = ts
+        if packet.haslayer(Raw):
+            conn['data_bytes'] += len(packet[Raw])
+        flags = int(tcp.flags)
+        if flags & 0x01:
+            conn['has_fin'] = True
+        if flags & 0x04:
+            conn['has_rst'] = True
+
+    @staticmethod
+    def _classify(src_ip, info):
+        num_sockets = len(info['sockets'])
+        if num_sockets < 10:
+            return None
+        duration = (info['last_time'] - info['first_time']) if info['first_time'] and info['last_time'] else 0
+        avg_data = info['data_bytes'] / num_sockets if num_sockets > 0 else 0
+        no_termination = not info['has_fin'] and not info['has_rst']
+        if avg_data < 200 and duration > 30 and no_termination:
+            return {'ip': src_ip, 'connections': num_sockets,
+                    'avg_data': round(avg_data, 1), 'duration': round(duration, 1)}
+        return None
+
+    def result(self):
+        findings = dict(self._findings)
+        for src_ip, info in self.connections.items():
+            finding = self._classify(src_ip, info)
+            if finding is not None:
+                findings[src_ip] = finding
+        details = sorted(findings.values(), key=lambda item: -item['connections'])
+        return {
+            'detected': bool(findings),
+            'suspicious_sources': len(findings),
+            'details': details[:self.MAX_DETAILS],
+            'evicted_sources': self.evicted_sources,
+        }
+
+
+class _ArpSpoofTracker:
+    """IP -> MAC mappings from ARP replies, behind _detect_arp_spoofing()."""
+
+    def __init__(self):
+        self.ip_mac_map = defaultdict(set)
+
+    def observe(self, packet):
+        if not packet.haslayer(ARP):
+            return
+        arp = packet[ARP]
+        if arp.op == 2:  # ARP reply
+            self.ip_mac_map[arp.psrc].add(str(arp.hwsrc).lower())
+
+    def result(self):
+        result = {'detected': False, 'conflicting_ips': 0, 'details': []}
+        for ip_addr, macs in self.ip_mac_map.items():
+            if len(macs) > 1:
+                result['conflicting_ips'] += 1
+                result['details'].append({'ip': ip_addr, 'macs': list(macs)})
+
+        result['detected'] = result['conflicting_ips'] > 0
+        return result
+
+
+class _AttackAccumulator:
+    """Running counters behind detect_attacks().
+
+    ``observe`` updates flag/connection counters, the windowed incident
+    trackers, the scan detector and the Slowloris / ARP trackers in one step.
+    ``result`` derives the metrics and verdict from the current state; open
+    windows are classified on copies, so it can be called between batches.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        mode = analyzer.CARDINALITY_MODE
+        # 初始化計數器
+        self.tcp_flags = {
+            'syn': 0,
+            'syn_ack': 0,
+            'ack': 0,
+            'fin': 0,
+            'rst': 0,
+            'psh': 0
+        }
+
+        # 連線數與「無資料即結束」連線數改用 DistinctCounter（與 _AttackWindowTracker 相同），
+        # 隨機來源/端口洪泛時記憶體不隨偽造連線數成長
+        # teardown-without-data = |term ∪ data| - |data|
+        self.connections = distinct_counter(mode)
+        self.term_or_data_connections = distinct_counter(mode)
+        self.data_connections = distinct_counter(mode)
+
+        # 來源/端口頻率只保留高頻項目，唯一數量改用 DistinctCounter（避免隨機來源洪泛時記憶體暴增）
+        self.source_ips = frequency_counter(mode)
+        self.target_ports = frequency_counter(mode)
+        self.unique_source_ips = distinct_counter(mode)
+        self.unique_target_ports = distinct_counter(mode)
+        self.total_tcp_packets = 0
+
+        # 時間範圍
+        self.first_packet_time = None
+        self.last_packet_time = None
+
+        # 時間窗口偵測：同一次掃描中逐窗口計算相同指標，避免短時間攻擊被整段擷取平均掉
+        self.window_trackers = [
+            _AttackWindowTracker(size, (analyzer._classify_flood_metrics, analyzer._classify_source_metrics), mode)
+            for size in analyzer.ATTACK_WINDOWS
+        ]
+        self.scan_detector = ScanDetector(
+            window_seconds=analyzer.SCAN_WINDOW_SECONDS,
+            max_sources=analyzer.SCAN_MAX_SOURCES,
+            max_targets=analyzer.SCAN_MAX_TARGETS,
+            vertical_ports=analyzer.SCAN_VERTICAL_PORTS,
+            horizontal_hosts=analyzer.SCAN_HORIZONTAL_HOSTS,
+            distributed_ports=analyzer.SCAN_VERTICAL_PORTS,
+            distributed_sources=analyzer.SCAN_DISTRIBUTED_SOURCES,
+        )
+        # Phase 9: 進階偵測
+        self.slowloris = _SlowlorisTracker(mode, analyzer.SLOWLORIS_MAX_SOURCES)
+        self.arp_spoofing = _ArpSpoofTracker()
+
+    def observe(self, packet, index=None):
+        self.slowloris.observe(packet)
+        self.arp_spoofing.observe(packet)
+        if not packet.haslayer(IP):
+            return
+
+        ip_layer = packet[IP]
+        packet_time = float(packet.time)
+
+        if self.first_packet_time is None:
+            self.first_packet_time = packet_time
+        self.last_packet_time = packet_time
+
+        if packet.haslayer(TCP):
+            self.total_tcp_packets += 1
+            tcp_layer = packet[TCP]
+            flags = tcp_layer.flags
+
+            # 解析 TCP flags
+            is_syn = bool(flags & 0x02)
+            is_ack = bool(flags & 0x10)
+            is_fin = bool(flags & 0x01)
+            is_rst = bool(flags & 0x04)
+            is_psh = bool(flags & 0x08)
+
+            # 統計 flags
+            if is_syn and not is_ack:
+                self.tcp_flags['syn'] += 1
+            if is_syn and is_ack:
+                self.tcp_flags['syn_ack'] += 1
+            if is_ack and not is_syn:
+                self.tcp_flags['ack'] += 1
+            if is_fin:
+                self.tcp_flags['fin'] += 1
+            if is_rst:
+                self.tcp_flags['rst'] += 1
+            if is_psh:
+                self.tcp_flags['psh'] += 1
+
+            # 連線追蹤
+            src_ip = ip_layer.src
+            dst_ip = ip_layer.dst
+            src_port = tcp_layer.sport
+            dst_port = tcp_layer.dport
+
+            # 標準化連線 key（雙向）
+            conn_key = tuple(sorted([(src_ip, src_port), (dst_ip, dst_port)]))
+            self.connections.add(conn_key)
+            if is_psh:
+                self.data_connections.add(conn_key)
+                self.term_or_data_connections.add(conn_key)
+            elif is_fin or is_rst:
+                self.term_or_data_connections.add(conn_key)
+
+            for tracker in self.window_trackers:
+                tracker.observe(packet_time, src_ip, conn_key, dst_port, int(flags), index)
+            self.scan_detector.observe(packet_time, src_ip, dst_ip, dst_port, int(flags))
+
+            # 來源統計
+            self.source_ips.add(src_ip)
+            self.target_ports.add(dst_port)
+            self.unique_source_ips.add(src_ip)
+            self.unique_target_ports.add(dst_port)
+
+    def result(self, dns_amp, final=True):
+        """Attack analysis for the packets seen so far.
+
+        With ``final`` the open windows are closed (end of capture); otherwise
+        they are classified without closing, so later packets keep accumulating.
+        """
+        analyzer = self.analyzer
+        tcp_flags = dict(self.tcp_flags)
+        source_ips = self.source_ips
+        target_ports = self.target_ports
+        unique_source_ips = self.unique_source_ips
+        unique_target_ports = self.unique_target_ports
+        total_tcp_packets = self.total_tcp_packets
+        first_packet_time = self.first_packet_time
+        last_packet_time = self.last_packet_time
+        if final:
+            incidents = [incident for tracker in self.window_trackers for incident in tracker.close()]
+            port_scans = self.scan_detector.close()
+        else:
+            incidents = [incident for tracker in self.window_trackers for incident in tracker.snapshot()]
+            port_scans = self.scan_detector.snapshot()
+        incidents.sort(key=lambda item: (item['start'], item['window_seconds']))
+
+        # 計算攻擊指標
+        duration_seconds = (last_packet_time - first_packet_time) if first_packet_time and last_packet_time else 1
+        duration_seconds = max(duration_seconds, 0.001)  # 避免除以零
+
+        total_connections = len(self.connections)
+
+        # Flag 比例
+        rst_ratio = tcp_flags['rst'] / total_tcp_packets if total_tcp_packets > 0 else 0
+        psh_ratio = tcp_flags['psh'] / total_tcp_packets if total_tcp_packets > 0 else 0
+
+        # 每秒連線數
+        connections_per_second = total_connections / duration_seconds
+
+        # 握手完成率（有 SYN 且有對應 SYN-ACK 的比例）
+        handshake_completion_rate = tcp_flags['syn_ack'] / tcp_flags['syn'] if tcp_flags['syn'] > 0 else 1
+
+        # 無資料傳輸的連線比例
+        teardown_without_data = max(0, len(self.term_or_data_connections) - len(self.data_connections))
+        teardown_without_data_rate = teardown_without_data / total_connections if total_connections > 0 else 0
+
+        # 來源 IP 集中度（最大來源佔總流量的比例）
+        max_source_count = source_ips.most_common(1)[0][1] if source_ips else 0
+        total_source_packets = source_ips.total
+        source_concentration = max_source_count / total_source_packets if total_source_packets > 0 else 0
+
+        # 目標端口集中度
+        max_target_count = target_ports.most_common(1)[0][1] if target_ports else 0
+        total_target_packets = target_ports.total
+        target_concentration = max_target_count / total_target_packets if total_target_packets > 0 else 0
+
+        # Phase 9: 進階偵測
+        slowloris = self.slowloris.result()
+        arp_spoof = self.arp_spoofing.result()
+
+        # 攻擊類型判斷
+        rule_metrics = {
+            'total_tcp_packets': total_tcp_packets,
+            'syn_count': tcp_flags['syn'],
+            'fin_count': tcp_flags['fin'],
+            'rst_ratio': rst_ratio,
+            'psh_ratio': psh_ratio,
+            'handshake_completion_rate': handshake_completion_rate,
+            'teardown_without_data_rate': teardown_without_data_rate,
+            'connections_per_second': connections_per_second,
+            'source_concentration': source_concentration,
+            'unique_target_ports': len(unique_target_ports),
+        }
+        verdict = analyzer._classify_flood_metrics(rule_metrics)
+
+        if verdict is None:
+            # DNS Amplification 檢測
+            if dns_amp['amplification_ratio'] > 3 and dns_amp['total_responses'] > 50 and dns_amp['response_source_count'] > 5:
+                amp_r = dns_amp['amplification_ratio']
+                src_c = dns_amp['response_source_count']
+                verdict = (
+                    'DNS Amplification',
+                    f'DNS 放大攻擊：回應/查詢位元組比 {amp_r:.1f}x，來自 {src_c} 個不同 DNS 伺服器',
+                    'high' if amp_r > 10 else 'medium',
+                    min(0.9, amp_r / 20 + src_c / 50),
+                )
+
+            # Slowloris 檢測
+            elif slowloris['detected']:
+                sl_count = slowloris['suspicious_sources']
+                verdict = (
+                    'Slowloris',
+                    f'疑似 Slowloris 慢速攻擊：{sl_count} 個來源 IP 維持大量低流量長連線',
+                    'high' if sl_count > 3 else 'medium',
+                    min(0.85, 0.5 + sl_count * 0.1),
+                )
+
+            # ARP Spoofing 檢測
+            elif arp_spoof['detected']:
+                arp_count = arp_spoof['conflicting_ips']
+                verdict = (
+                    'ARP Spoofing',
+                    f'偵測到 ARP 欺騙：{arp_count} 個 IP 位址對應到多個 MAC 位址',
+                    'high' if arp_count > 2 else 'medium',
+                    min(0.9, 0.6 + arp_count * 0.15),
+                )
+
+            elif port_scans['detected']:
+                verdict = analyzer._classify_port_scans(port_scans)
+
+            else:
+                verdict = analyzer._classify_source_metrics(rule_metrics)
+
+        attack_type, attack_description, severity, confidence = verdict or (None, None, 'normal', 0.0)
+
+        # 異常分數計算（0-100）
+        anomaly_score = 0
+        if rst_ratio > 0.3:
+            anomaly_score += rst_ratio * 30
+        if handshake_completion_rate < 0.5:
+            anomaly_score += (1 - handshake_completion_rate) * 25
+        if teardown_without_data_rate > 0.5:
+            anomaly_score += teardown_without_data_rate * 25
+        if connections_per_second > 20:
+            anomaly_score += min(20, connections_per_second / 5)
+        if psh_ratio > 0.6:
+            anomaly_score += psh_ratio * 25
+        if source_concentration > 0.9 and total_tcp_packets > 100:
+            anomaly_score += source_concentration * 15
+        if dns_amp['amplification_ratio'] > 3:
+            anomaly_score += min(20, dns_amp['amplification_ratio'] * 2)
+        if slowloris['suspicious_sources'] > 0:
+            anomaly_score += min(20, slowloris['suspicious_sources'] * 5)
+        if arp_spoof['conflicting_ips'] > 0:
+            anomaly_score += min(25, arp_spoof['conflicting_ips'] * 10)
+        if port_scans['detected']:
+            anomaly_score += min(15, len(port_scans['scans']) * 5)
+
+        anomaly_score = min(100, anomaly_score)
+
+        # 構建結果
+        attack_analysis = {
+            'metrics': {
+                'total_tcp_packets': total_tcp_packets,
+                'total_connections': total_connections,
+                'duration_seconds': round(duration_seconds, 2),
+                'connections_per_second': round(connections_per_second, 2),
+                'rst_ratio': round(rst_ratio, 3),
+                'fin_ratio': round(tcp_flags['fin'] / total_tcp_packets if total_tcp_packets > 0 else 0, 3),
+                'handshake_completion_rate': round(handshake_completion_rate, 3),
+                'teardown_without_data_rate': round(teardown_without_data_rate, 3),
+                'source_concentration': round(source_concentration, 3),
+                'target_concentration': round(target_concentration, 3),
+                'unique_source_ips': len(unique_source_ips),
+                'unique_target_ports': len(unique_target_ports),
+                'dns_amplification_ratio': round(dns_amp['amplification_ratio'], 1),
+                'slowloris_sources': slowloris['suspicious_sources'],
+                'arp_conflicts': arp_spoof['conflicting_ips'],
+                'port_scans': len(port_scans['scans'])
+            },
+            'tcp_flags': tcp_flags,
+            'top_sources': [{'ip': ip, 'count': count} for ip, count in source_ips.most_common(5)],
+            'top_targets': [{'port': port, 'count': count} for port, count in target_ports.most_common(5)],
+            'attack_detection': {
+                'detected': attack_type is not None,
+                'type': attack_type,
+                'description': attack_description,
+                'severity': severity,
+                'confidence': round(confidence, 2),
+                'anomaly_score': round(anomaly_score, 1)
+            },
+            'incidents': incidents,
+            'port_scans': port_scans
+        }
+        return attack_analysis
+
+
+class _ExpertEventAccumulator:
+    """Per-packet expert events (RST, Zero Window, anomalous TTL) for extract_expert_info()."""
+
+    def __init__(self):
+        self.events = []
+
+    def observe(self, idx, packet):
+        if not packet.haslayer(IP):
+            if not packet.haslayer(IPv6):
+                return
+        ts = float(packet.time)
+
+        ip = packet[IP] if packet.haslayer(IP) else packet[IPv6]
+        ttl = getattr(ip, 'ttl', getattr(ip, 'hlim', 64))
+
+        if packet.haslayer(TCP):
+            tcp = packet[TCP]
+            flags = int(tcp.flags)
+            stream = f"{ip.src}:{tcp.sport}-{ip.dst}:{tcp.dport}"
+
+            if flags & 0x04:  # RST
+                self.events.append({
+                    'severity': 'error',
+                    'type': 'RST',
+                    'message': f'Connection reset {stream}',
+                    'packetIndex': idx,
+                    'timestamp': ts,
+                    'stream': stream
+                })
+            if tcp.window == 0 and not (flags & 0x02):  # ZeroWindow (not SYN)
+                self.events.append({
+                    'severity': 'error',
+                    'type': 'Zero Window',
+                    'message': f'Zero window advertised by {ip.src} in {stream}',
+                    'packetIndex': idx,
+                    'timestamp': ts,
+                    'stream': stream
+                })
+
+        if ttl <= 2:
+            self.events.append({
+                'severity': 'note',
+                'type': 'Anomalous TTL',
+                'message': f'Very low TTL ({ttl}) from {ip.src}',
+                'packetIndex': idx,
+                'timestamp': ts,
+                'stream': ''
+            })
+
+    def result(self):
+        return list(self.events)
+
+
+class NetworkAnalyzer:
+    """Analyze pcap files and produce structured network insights."""
 
+    # Distinct counts (unique sources, ports, sockets) use sketches.DistinctCounter:
+    # 'exact' keeps full sets, 'approx' uses HyperLogLog, 'auto' switches to
+    # HyperLogLog once a set grows large (e.g. randomized-source floods).
+    CARDINALITY_MODE = 'auto'
+
+    # Tumbling window sizes (seconds) for localized attack incidents in detect_attacks().
+    ATTACK_WINDOWS = (1.0, 10.0)
+    # Port scan detection (scan_detector.ScanDetector): per-window thresholds and how
+    # many source / target windows may be open at once
+    SCAN_WINDOW_SECONDS = 60.0
+    SCAN_MAX_SOURCES = 4096
+    SCAN_MAX_TARGETS = 1024
+    SCAN_VERTICAL_PORTS = 50
+    SCAN_HORIZONTAL_HOSTS = 30
+    SCAN_DISTRIBUTED_SOURCES = 5
+    # Slowloris detection keeps per-source HTTP socket counters for at most this many
+    # sources (LRU); evicted sources are classified before being dropped
+    SLOWLORIS_MAX_SOURCES = 4096
+
+    # Per-packet series (packet sizes, intervals, inter-packet delays) are summarized
+    # with QuantileSketch; the raw lists are only filled when explicitly requested.
+    KEEP_PER_PACKET_SERIES = False
+    # Fixed log-scale histogram ranges (lo, hi, bins per decade) for basic_stats,
+    # so histograms of different captures share the same bins.
+    PACKET_SIZE_HISTOGRAM = (1, 262144, 8)
+    TIME_INTERVAL_HISTOGRAM_MS = (0.001, 10_000_000, 8)
+    # basic_stats raw series are written next to the results JSON, never into it:
+    # name -> (file name, array typecode, dtype label)
+    SERIES_SIDECAR_FILES = {
+        'packet_sizes': ('packet_sizes.u32.bin', 'I', 'uint32'),
+        'time_intervals': ('time_intervals.f64.bin', 'd', 'float64'),
+    }
+    # load_packets(progress=...) reports after every this many packets
+    LOAD_PROGRESS_CHUNK = 5000
+    # save_results() writes each top-level section to <dir>/sections/<name>.json
+    # with a manifest, so the server can load only the section an endpoint serves;
+    # the combined results file only lists the sections (paths relative to it)
+    RESULT_SECTIONS_DIR = 'sections'
+    RESULT_MANIFEST_FILE = 'manifest.json'
+    # ... and the per-packet tables as binary column files in <dir>/tables/ (columnar_store).
+    # connection_packets / packet_summary are not written as sections: they live in
+    # the packets tables and the SQLite store (<dir>/results.sqlite, see result_db)
+    RESULT_TABLES_DIR = 'tables'
+    RESULT_TABLE_ONLY_SECTIONS = ('connection_packets', 'packet_summary')
+    # Follow TCP Stream: default page size, per-direction reassembly cap and
+    # how many reassembled streams (and estimated bytes) to keep for paging;
+    # a stream larger than the byte budget is served but not kept
+    STREAM_PAGE_BYTES = 65536
+    STREAM_MAX_BYTES = 64 * 1024 * 1024
+    STREAM_CACHE_SIZE = 4
+    STREAM_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    STREAM_SEGMENT_BYTES = 640  # per segment record kept by the reassembler
+    # TLS handshakes are parsed from at most this much of each direction
+    TLS_REASSEMBLY_BYTES = 16 * 1024
+    TLS_MAX_PACKETS_PER_FLOW = 64
+    # HTTP timelines list at most this many transactions per connection
+    HTTP_TIMELINE_MAX_TRANSACTIONS = 100
+    # On-demand packet details parse HTTP only for the packet's own flow and keep
+    # the per-flow results in an LRU of this many bytes (estimated per message)
+    HTTP_FLOW_CACHE_MAX_BYTES = 8 * 1024 * 1024
+    HTTP_MESSAGE_BYTES = 2048  # measured ~1.5-2.6 KB per summary with headers
+    # Generic TCP fallback timelines: packet refs kept per connection and the
+    # reservoir size of each flood timeline's allPacketRefs
+    GENERIC_TCP_MAX_PACKET_REFS = 200
+    FLOOD_SAMPLE_SIZE = 200
+    # DNS transactions: unanswered queries time out after this long; the results
+    # JSON keeps at most DNS_TABLE_MAX_ROWS table rows and DNS_MAX_SERVERS servers
+    DNS_TIMEOUT_SECONDS = 5.0
+    DNS_TABLE_MAX_ROWS = 10000
+    DNS_MAX_SERVERS = 50
+    DNS_TIMELINE_MAX_TRANSACTIONS = 100
+
+    def __init__(self, pcap_file: str, cardinality_mode: str = None, keep_per_packet_series: bool = None):
+        self.pcap_file = pcap_file
+        self.packets = []
+        self.analysis_results = {}
+        self.per_packet_series = {}
+        self.last_error = None
+        if keep_per_packet_series is not None:
+            self.KEEP_PER_PACKET_SERIES = keep_per_packet_series
+        if cardinality_mode is not None:
+            if cardinality_mode not in CARDINALITY_MODES:
+                raise ValueError(f'Unknown cardinality mode: {cardinality_mode}')
+            self.CARDINALITY_MODE = cardinality_mode
+
+    @staticmethod
+    def _safe_print(message: str) -> None:
+        try:
+            print(message)
+        except UnicodeEncodeError:
+            safe_message = message.encode('ascii', 'backslashreplace').decode('ascii')
+            print(safe_message)
+
+    @property
+    def _cache_lock(self):
+        """RLock guarding the lazily built flow index, HTTP and stream caches.
+
+        The API server shares one analyzer between request threads and the
+        packet read-ahead thread.
+        """
+        lock = self.__dict__.get('_lazy_cache_lock')
+        if lock is None:
+            lock = self.__dict__.setdefault('_lazy_cache_lock', threading.RLock())
+        return lock
+
+    def _capture_time_span(self):
+        """(first, last) packet timestamps; (0, 0) for an empty capture."""
+        if not self.packets:
+            return 0, 0
+        return float(self.packets[0].time), float(self.packets[-1].time)
+
+    def load_packets(self, progress=None) -> bool:
+        """Load packets from the provided pcap/pcapng file.
+
+        ``progress(packets_read, bytes_read, total_bytes)`` is called every
+        LOAD_PROGRESS_CHUNK packets; returning False stops loading.
+        """
+        self.last_error = None
+        try:
+            self._safe_print(f"Loading {self.pcap_file} ...")
+            if progress is None:
+                self.packets = rdpcap(self.pcap_file)
+            else:
+                packets = self._read_packets_with_progress(progress)
+                if packets is None:
+                    self.last_error = 'Loading cancelled'
+                    return False
+                self.packets = packets
+            self._flow_index = None
+            self._stream_cache = None
+            self._http_by_packet = None
+            self._http_flow_cache = None
+            self._dns_transactions = None
+            self._safe_print(f"Loaded {len(self.packets)} packets")
+            return True
+        except Exception as exc:  # pragma: no cover - runtime safety
+            self.last_error = str(exc)
+            self._safe_print(f"Failed to load capture: {exc}")
+            return False
+
+    def _read_packets_with_progress(self, progress):
+        total_bytes = os.path.getsize(self.pcap_file)
+        packets = []
+        with PcapReader(self.pcap_file) as reader:
+            while True:
+                chunk = reader.read_all(self.LOAD_PROGRESS_CHUNK)
+                if not chunk:
+                    break
+                packets.extend(chunk)
+                try:
+                    position = reader.f.tell()
+                except (AttributeError, OSError, ValueError):
+                    position = total_bytes
+                if progress(len(packets), position, total_bytes) is False:
+                    return None
+        return PacketList(packets, name=os.path.basename(self.pcap_file))
+
+    def basic_statistics(self):
+        """Compute basic statistics for the capture."""
+        if not self.packets:
+            return None
+
+        accumulator = _BasicStatsAccumulator(self)
+        for packet in self.packets:
+            accumulator.observe(packet)
+        return self._store_basic_stats(accumulator)
+
+    def _store_basic_stats(self, accumulator):
+        stats = accumulator.result()
+        self.per_packet_series = accumulator.series()
         self.analysis_results['basic_stats'] = stats
         self.analysis_results['connections'] = stats['top_connections']
         return stats
@@ -183,6 +1660,7 @@ class NetworkAnalyzer:
             }
             self.analysis_results['protocol_timelines'] = payload
             self.analysis_results['connection_packets'] = {}
+            self.analysis_results['packet_summary'] = {}
             self.protocol_timelines = timelines  # Set as attribute for easy access
             return payload
 
@@ -511,325 +1989,58 @@ class NetworkAnalyzer:
                     'packetRefs': [info.get('ack2_packet', info['fin1_packet'])]
                 })
 
-            # RST 結束（如果有）
-            if 'rst_time' in info:
-                stages.append({
-                    'key': 'rst',
-                    'label': 'RST (Force Close)',
-                    'direction': 'both',
-                    'durationMs': max(600, 1),
-                    'packetRefs': [info.get('rst_packet', info['fin1_packet'])]
-                })
-
-            timeline = {
-                'id': f"tcp-teardown-{key[0]}-{key[1]}-{key[2]}-{key[3]}",
-                'protocol': 'tcp',
-                'protocolType': 'tcp-teardown',
-                'startEpochMs': int(start_time * 1000),
-                'endEpochMs': int(end_time * 1000),
-                'stages': stages,
-                'metrics': {
-                    'teardownDurationMs': max(1, int((end_time - start_time) * 1000)),
-                    'packetCount': len(info['packets'])
-                }
-            }
-            timelines.append(timeline)
-
-        return timelines
-
-    def _extract_generic_tcp_connections(self):
-        """提取通用 TCP 連線（作為 fallback）
-
-        當其他特定協議檢測沒有結果時，按 5-tuple 分組所有 TCP 封包，
-        創建基本的資料傳輸 timeline。
-
-        同時支援 Flood 攻擊檢測（按目標分組，忽略 source port）。
-        """
-        connections = {}  # key: (src_ip, src_port, dst_ip, dst_port) - 標準 5-tuple
-        flood_groups = {}  # key: (src_ip, dst_ip, dst_port) - Flood 攻擊分組（忽略 source port）
-
-        for index, packet in enumerate(self.packets):
-            if not packet.haslayer(IP) or not packet.haslayer(TCP):
-                continue
-
-            ip = packet[IP]
-            tcp = packet[TCP]
-            ts = float(packet.time)
-            length = len(packet)
-            flags = int(tcp.flags)
-
-            # === 標準 5-tuple 分組 ===
-            endpoint1 = (ip.src, tcp.sport)
-            endpoint2 = (ip.dst, tcp.dport)
-            normalized_key = tuple(sorted([endpoint1, endpoint2]))
-
-            if normalized_key not in connections:
-                connections[normalized_key] = {
-                    'start_time': ts,
-                    'end_time': ts,
-                    'packets': [],
-                    'total_bytes': 0,
-                    'flags_seen': set(),
-                    'psh_count': 0,
-                    'syn_count': 0
-                }
-
-            conn = connections[normalized_key]
-            conn['end_time'] = max(conn['end_time'], ts)
-            conn['packets'].append(index)
-            conn['total_bytes'] += length
-
-            # 記錄看到的 flags 並計數
-            if flags & 0x02:  # SYN
-                conn['flags_seen'].add('SYN')
-                conn['syn_count'] += 1
-            if flags & 0x01:  # FIN
-                conn['flags_seen'].add('FIN')
-            if flags & 0x04:  # RST
-                conn['flags_seen'].add('RST')
-            if flags & 0x10:  # ACK
-                conn['flags_seen'].add('ACK')
-            if flags & 0x08:  # PSH
-                conn['flags_seen'].add('PSH')
-                conn['psh_count'] += 1
-
-            # === Flood 攻擊分組（忽略 source port）===
-            # 用於檢測每個封包使用不同 source port 的攻擊模式
-            flood_key = (ip.src, ip.dst, tcp.dport)  # 注意：不包含 source port
-            if flood_key not in flood_groups:
-                flood_groups[flood_key] = {
-                    'start_time': ts,
-                    'end_time': ts,
-                    'packets': [],
-                    'total_bytes': 0,
-                    'flags_seen': set(),
-                    'psh_count': 0,
-                    'syn_count': 0,
-                    'urg_count': 0,
-                    'fin_count': 0,
-                    'ack_count': 0,
-                    'rst_count': 0,
-                    'unique_sports': set()  # 追蹤不同的 source ports
-                }
-
-            fg = flood_groups[flood_key]
-            fg['end_time'] = max(fg['end_time'], ts)
-            fg['packets'].append(index)
-            fg['total_bytes'] += length
-            fg['unique_sports'].add(tcp.sport)
-
-            if flags & 0x02:  # SYN
-                fg['flags_seen'].add('SYN')
-                fg['syn_count'] += 1
-            if flags & 0x01:  # FIN
-                fg['flags_seen'].add('FIN')
-                fg['fin_count'] += 1
-            if flags & 0x20:  # URG
-                fg['flags_seen'].add('URG')
-                fg['urg_count'] += 1
-            if flags & 0x08:  # PSH
-                fg['flags_seen'].add('PSH')
-                fg['psh_count'] += 1
-            if flags & 0x10:  # ACK
-                fg['flags_seen'].add('ACK')
-                fg['ack_count'] += 1
-            if flags & 0x04:  # RST
-                fg['flags_seen'].add('RST')
-                fg['rst_count'] += 1
-
-        timelines = []
-        processed_packets = set()  # 追蹤已被 Flood 檢測處理的封包
-
-        # === 第一階段：檢測 Flood 攻擊 ===
-        for flood_key, fg in flood_groups.items():
-            total_packets = len(fg['packets'])
-            unique_ports = len(fg['unique_sports'])
-
-            # Flood 攻擊特徵：
-            # 1. 大量封包 (> 50)
-            # 2. 使用很多不同的 source ports（幾乎每個封包都不同）
-            # 3. unique_ports / total_packets 比例 > 0.8
-            is_flood_pattern = (
-                total_packets > 50 and
-                unique_ports > 20 and
-                unique_ports / total_packets > 0.8
-            )
-
-            if not is_flood_pattern:
-                continue
-
-            # 判斷 Flood 類型
-            psh_ratio = fg['psh_count'] / total_packets if total_packets > 0 else 0
-            syn_ratio = fg['syn_count'] / total_packets if total_packets > 0 else 0
-            urg_ratio = fg['urg_count'] / total_packets if total_packets > 0 else 0
-            fin_ratio = fg['fin_count'] / total_packets if total_packets > 0 else 0
-            ack_ratio = fg['ack_count'] / total_packets if total_packets > 0 else 0
-            rst_ratio = fg['rst_count'] / total_packets if total_packets > 0 else 0
-
-            # URG+PSH+FIN 攻擊（異常旗標組合）
-            if urg_ratio > 0.5 and psh_ratio > 0.5 and fin_ratio > 0.5:
-                protocol_type = 'urg-psh-fin-flood'
-            # ACK+FIN 複合攻擊
-            elif ack_ratio > 0.5 and fin_ratio > 0.5:
-                protocol_type = 'ack-fin-flood'
-            # PSH Flood
-            elif psh_ratio > 0.6:
-                protocol_type = 'psh-flood'
-            # SYN Flood
-            elif syn_ratio > 0.8:
-                protocol_type = 'syn-flood'
-            # ACK Flood
-            elif ack_ratio > 0.8:
-                protocol_type = 'ack-flood'
-            # RST Flood
-            elif rst_ratio > 0.8:
-                protocol_type = 'rst-flood'
-            # FIN Flood
-            elif fin_ratio > 0.8:
-                protocol_type = 'fin-flood'
-            else:
-                protocol_type = 'tcp-flood'  # 通用 Flood
-
-            src_ip, dst_ip, dst_port = flood_key
-            start_time = fg['start_time']
-            end_time = fg['end_time']
-            duration_ms = max(1000, int((end_time - start_time) * 1000))
-
-            # 標記這些封包已被處理
-            for pkt_idx in fg['packets']:
-                processed_packets.add(pkt_idx)
-
-            # 創建 Flood 攻擊 timeline
-            stages = [
-                {
-                    'key': 'attack',
-                    'label': f'{protocol_type.upper()} 攻擊',
-                    'direction': 'forward',
-                    'durationMs': duration_ms // 3,
-                    'packetRefs': fg['packets'][:10]
-                },
-                {
-                    'key': 'flood',
-                    'label': '洪水攻擊中',
-                    'direction': 'forward',
-                    'durationMs': duration_ms // 3,
-                    'packetRefs': fg['packets'][10:20] if len(fg['packets']) > 10 else []
-                },
-                {
-                    'key': 'overload',
-                    'label': '資源過載',
-                    'direction': 'forward',
-                    'durationMs': duration_ms // 3,
-                    'packetRefs': fg['packets'][20:30] if len(fg['packets']) > 20 else []
-                }
-            ]
-
-            # Sample up to 200 evenly-distributed packet indices for statistics endpoint.
-            # Stage packetRefs only cover 30 packets (animation frames); the statistics
-            # endpoint needs a larger representative sample to cross the detection threshold
-            # and compute accurate flag ratios.
-            _all_count = len(fg['packets'])
-            _step = max(1, _all_count // 200)
-            stats_packet_sample = fg['packets'][::_step][:200]
-
-            timeline = {
-                'id': f"flood-{src_ip}-0-{dst_ip}-{dst_port}",  # 添加虛擬 srcPort=0 以符合前端解析格式
-                'protocol': 'tcp',
-                'protocolType': protocol_type,
-                'startEpochMs': int(start_time * 1000),
-                'endEpochMs': int(end_time * 1000),
-                'stages': stages,
-                'allPacketRefs': stats_packet_sample,
-                'metrics': {
-                    'durationMs': duration_ms,
-                    'packetCount': total_packets,
-                    'totalBytes': fg['total_bytes'],
-                    'uniquePorts': unique_ports,
-                    'flagsSeen': list(fg['flags_seen']),
-                    'pshRatio': round(psh_ratio, 3),
-                    'synRatio': round(syn_ratio, 3),
-                    'finRatio': round(fin_ratio, 3),
-                    'urgRatio': round(urg_ratio, 3),
-                    'ackRatio': round(ack_ratio, 3),
-                    'rstRatio': round(rst_ratio, 3),
-                    'isFlood': True
-                }
-            }
-            timelines.append(timeline)
-
-        # === 第二階段：處理正常連線（排除已被 Flood 處理的封包）===
-        for key, conn in connections.items():
-            # 過濾掉已被 Flood 檢測處理的封包
-            remaining_packets = [p for p in conn['packets'] if p not in processed_packets]
-
-            if len(remaining_packets) < 2:
-                continue
-
-            # 重新計算統計（基於剩餘封包）
-            start_time = conn['start_time']
-            end_time = conn['end_time']
-            duration_ms = max(1, int((end_time - start_time) * 1000))
-
-            total_packets = len(remaining_packets)
-            # 使用原始的 flag 計數（因為我們是按連線計算，不是按封包）
-            psh_ratio = conn['psh_count'] / len(conn['packets']) if len(conn['packets']) > 0 else 0
-            syn_ratio = conn['syn_count'] / len(conn['packets']) if len(conn['packets']) > 0 else 0
-
-            flags_seen = conn['flags_seen']
-
-            # 決定 protocolType
-            if psh_ratio > 0.6 and syn_ratio < 0.4 and total_packets > 20:
-                protocol_type = 'psh-flood'
-            elif 'SYN' in flags_seen and 'FIN' in flags_seen:
-                protocol_type = 'tcp-session'
-            elif 'SYN' in flags_seen:
-                protocol_type = 'tcp-handshake'
-            elif 'FIN' in flags_seen or 'RST' in flags_seen:
-                protocol_type = 'tcp-teardown'
-            else:
-                protocol_type = 'tcp-data'
-
-            # 創建 timeline
-            stages = []
-            half_duration = max(800, duration_ms // 2)
-
-            stages.append({
-                'key': 'transfer',
-                'label': 'Data Transfer',
-                'direction': 'forward',
-                'durationMs': half_duration,
-                'packetRefs': remaining_packets[:len(remaining_packets)//2] or remaining_packets[:1]
-            })
-
-            stages.append({
-                'key': 'response',
-                'label': 'Response',
-                'direction': 'backward',
-                'durationMs': half_duration,
-                'packetRefs': remaining_packets[len(remaining_packets)//2:] or remaining_packets[-1:]
-            })
+            # RST 結束（如果有）
+            if 'rst_time' in info:
+                stages.append({
+                    'key': 'rst',
+                    'label': 'RST (Force Close)',
+                    'direction': 'both',
+                    'durationMs': max(600, 1),
+                    'packetRefs': [info.get('rst_packet', info['fin1_packet'])]
+                })
 
-            endpoint1, endpoint2 = key
             timeline = {
-                'id': f"tcp-data-{endpoint1[0]}-{endpoint1[1]}-{endpoint2[0]}-{endpoint2[1]}",
+                'id': f"tcp-teardown-{key[0]}-{key[1]}-{key[2]}-{key[3]}",
                 'protocol': 'tcp',
-                'protocolType': protocol_type,
+                'protocolType': 'tcp-teardown',
                 'startEpochMs': int(start_time * 1000),
                 'endEpochMs': int(end_time * 1000),
                 'stages': stages,
                 'metrics': {
-                    'durationMs': duration_ms,
-                    'packetCount': len(remaining_packets),
-                    'totalBytes': conn['total_bytes'],
-                    'flagsSeen': list(flags_seen),
-                    'pshRatio': round(psh_ratio, 3),
-                    'synRatio': round(syn_ratio, 3),
+                    'teardownDurationMs': max(1, int((end_time - start_time) * 1000)),
+                    'packetCount': len(info['packets'])
                 }
             }
             timelines.append(timeline)
 
         return timelines
 
+    def _extract_generic_tcp_connections(self):
+        """提取通用 TCP 連線（作為 fallback）
+
+        當其他特定協議檢測沒有結果時，按 5-tuple 分組所有 TCP 封包，
+        創建基本的資料傳輸 timeline。
+
+        同時支援 Flood 攻擊檢測（按目標分組，忽略 source port）。
+        兩種分組在同一次掃描中以計數器累積（見 _GenericTcpClassifier），
+        記憶體只隨分組數成長，不隨封包數成長。
+        """
+        classifier = _GenericTcpClassifier(
+            self.CARDINALITY_MODE,
+            max_connection_refs=self.GENERIC_TCP_MAX_PACKET_REFS,
+            flood_sample_size=self.FLOOD_SAMPLE_SIZE,
+        )
+
+        for index, packet in enumerate(self.packets):
+            if not packet.haslayer(IP) or not packet.haslayer(TCP):
+                continue
+            ip = packet[IP]
+            tcp = packet[TCP]
+            classifier.observe(index, float(packet.time), len(packet),
+                               ip.src, tcp.sport, ip.dst, tcp.dport, int(tcp.flags))
+
+        return classifier.timelines()
+
     def _extract_udp_transfers(self):
         transfers = {}
 
@@ -843,176 +2054,386 @@ class NetworkAnalyzer:
 
             ip = packet[IP] if has_ip else packet[IPv6]
             udp = packet[UDP]
+            # DNS 由交易表處理（見 _build_dns_timelines）
+            if (udp.sport == 53 or udp.dport == 53) and packet.haslayer(DNS):
+                continue
             ts = float(packet.time)
             key = (ip.src, udp.sport, ip.dst, udp.dport)
             info = transfers.setdefault(key, {
                 'start': ts,
                 'end': ts,
                 'count': 0,
-                'first_packet': index,
-                'dns_queries': [],
-                'dns_answers': [],
-                'dns_rcode': None
+                'first_packet': index
             })
             info['end'] = ts
             info['count'] += 1
 
-            # Extract DNS details if present
-            if packet.haslayer(DNS):
-                dns = packet[DNS]
-                if not dns.qr and packet.haslayer(DNSQR):
-                    qr = packet[DNSQR]
-                    qname = qr.qname.decode('utf-8', errors='replace') if isinstance(qr.qname, bytes) else str(qr.qname)
-                    info['dns_queries'].append({'name': qname, 'type': self._dns_qtype_name(qr.qtype)})
-                elif dns.qr:
-                    info['dns_rcode'] = self._dns_rcode_name(dns.rcode)
-                    if packet.haslayer(DNSRR):
-                        rr = dns.an
-                        for _ in range(dns.ancount):
-                            if rr is None:
-                                break
-                            try:
-                                rdata = rr.rdata if hasattr(rr, 'rdata') else str(rr.payload)
-                            except Exception:
-                                rdata = '(unparsed)'
-                            if isinstance(rdata, bytes):
-                                rdata = rdata.decode('utf-8', errors='replace')
-                            info['dns_answers'].append({
-                                'name': rr.rrname.decode('utf-8', errors='replace') if isinstance(rr.rrname, bytes) else str(rr.rrname),
-                                'type': self._dns_qtype_name(rr.type),
-                                'data': str(rdata),
-                                'ttl': rr.ttl
-                            })
-                            rr = rr.payload if hasattr(rr, 'payload') and isinstance(rr.payload, DNSRR) else None
-
         timelines = []
         for (src_ip, src_port, dst_ip, dst_port), info in transfers.items():
-            # 檢測 DNS (通常使用 UDP 53 port)
-            is_dns = src_port == 53 or dst_port == 53
-            protocol_type = 'dns-query' if is_dns else 'udp-transfer'
-
-            metrics = {'packetCount': info['count']}
-            if is_dns:
-                if info['dns_queries']:
-                    metrics['queries'] = info['dns_queries']
-                if info['dns_answers']:
-                    metrics['answers'] = info['dns_answers']
-                if info['dns_rcode']:
-                    metrics['rcode'] = info['dns_rcode']
-
             timeline = {
                 'id': f"udp-{src_ip}-{src_port}-{dst_ip}-{dst_port}",
-                'protocol': 'udp' if not is_dns else 'dns',
-                'protocolType': protocol_type,
+                'protocol': 'udp',
+                'protocolType': 'udp-transfer',
                 'startEpochMs': int(info['start'] * 1000),
                 'endEpochMs': int(info['end'] * 1000),
                 'stages': [
                     {
                         'key': 'send',
-                        'label': 'DNS Query' if protocol_type == 'dns-query' else 'UDP Transfer',
+                        'label': 'UDP Transfer',
                         'direction': 'forward',
                         'durationMs': max(1200, int((info['end'] - info['start']) * 1000)),
                         'packetRefs': [info['first_packet']]
                     }
                 ],
-                'metrics': metrics
+                'metrics': {'packetCount': info['count']}
             }
             timelines.append(timeline)
 
+        timelines.extend(self._build_dns_timelines())
+        return timelines
+
+    def _build_dns_timelines(self):
+        """One dns-query timeline per (client, client port, server) from the DNS transaction table."""
+        conversations = {}
+        for row in self._get_dns_transactions()['rows']:
+            key = (row['client'], row['clientPort'], row['server'])
+            conversations.setdefault(key, []).append(row)
+
+        timelines = []
+        for (client, client_port, server), rows in conversations.items():
+            start = min(row['time'] for row in rows)
+            end = start
+            packet_count = 0
+            latency = QuantileSketch()
+            for row in rows:
+                packet_count += (row['queryPacket'] is not None) + row['retries'] + (row['responsePacket'] is not None)
+                end = max(end, row['time'] + (row['latencyMs'] or 0) / 1000)
+                if row['latencyMs'] is not None:
+                    latency.add(row['latencyMs'])
+            queries = []
+            for row in rows:
+                query = {'name': row['qname'], 'type': row['qtype']}
+                if query not in queries:
+                    queries.append(query)
+            first_packet = min(row['queryPacket'] if row['queryPacket'] is not None else row['responsePacket']
+                               for row in rows)
+
+            metrics = {
+                'packetCount': packet_count,
+                'queries': queries[:self.DNS_TIMELINE_MAX_TRANSACTIONS],
+                'transactionCount': len(rows),
+                'timeouts': sum(1 for row in rows if row['status'] == 'timeout'),
+                'transactions': [{column: row.get(column) for column in self.DNS_TABLE_COLUMNS}
+                                 for row in rows[:self.DNS_TIMELINE_MAX_TRANSACTIONS]],
+            }
+            answered = [row for row in rows if row['rcode'] is not None]
+            if answered:
+                metrics['rcode'] = answered[-1]['rcode']
+            if latency.count:
+                metrics['latencyMs'] = latency.summary()
+
+            timelines.append({
+                'id': f"udp-{client}-{client_port}-{server}-53",
+                'protocol': 'dns',
+                'protocolType': 'dns-query',
+                'startEpochMs': int(start * 1000),
+                'endEpochMs': int(end * 1000),
+                'stages': [
+                    {
+                        'key': 'send',
+                        'label': 'DNS Query',
+                        'direction': 'forward',
+                        'durationMs': max(1200, int((end - start) * 1000)),
+                        'packetRefs': [first_packet]
+                    }
+                ],
+                'metrics': metrics
+            })
         return timelines
 
     def _detect_http_requests(self):
         """檢測 HTTP/HTTPS 請求和回應
 
-        修復：使用 processed_connections 追蹤已處理的連線，避免重複生成 timeline
+        每條連線只產生一個 timeline；HTTP/1.x 交易由重組後的位元組流解析
+        （見 _analyze_http_flows），HTTPS 則以 TLS 首個往返估算回應時間。
         """
-        timelines = []
-        http_sessions = {}
-        processed_connections = set()  # 追蹤已處理的連線（標準化 key）
+        self._analyze_http_flows()
+        return list(self._http_timelines)
 
-        for index, packet in enumerate(self.packets):
+    @staticmethod
+    def _offset_locator(stream):
+        """Return a function mapping a stream byte offset to the segment record carrying it."""
+        placed = [seg for seg in stream.segments if seg['newBytes']]
+        placed.sort(key=lambda seg: seg['offset'])
+        starts = [seg['offset'] for seg in placed]
+
+        def locate(offset):
+            if not placed:
+                return None
+            return placed[max(0, bisect_right(starts, offset) - 1)]
+        return locate
+
+    def _analyze_http_flows(self):
+        """Parse HTTP/1.x transactions once per TCP flow.
+
+        Builds self._http_timelines (one timeline per connection) and
+        self._http_by_packet (packet index -> summary of the first HTTP message
+        starting in that packet).
+        """
+        with self._cache_lock:
+            if getattr(self, '_http_by_packet', None) is not None:
+                return
+            timelines = []
+            http_by_packet = {}
+
+            for key, indices in self._get_flow_index().items():
+                payload = self._flow_first_payload(indices)
+                if payload is None:
+                    continue
+                ports = (key[0][1], key[1][1])
+                if looks_like_http(payload):
+                    timeline = self._build_http_timeline(indices, http_by_packet)
+                elif payload[:1] == b'\x16' or 443 in ports:
+                    timeline = self._build_https_timeline(indices)
+                else:
+                    continue
+                if timeline:
+                    timelines.append(timeline)
+
+            timelines.sort(key=lambda item: item['startEpochMs'])
+            self._http_timelines = timelines
+            self._http_by_packet = http_by_packet
+
+    def _flow_first_payload(self, indices):
+        """First TCP payload of a flow, or None (no payload, or not a TCP flow)."""
+        for idx in indices:
+            packet = self.packets[idx]
             if not packet.haslayer(TCP):
-                continue
-            has_ip = packet.haslayer(IP)
-            has_ipv6 = packet.haslayer(IPv6)
-            if not has_ip and not has_ipv6:
-                continue
+                return None
+            if packet[TCP].payload:
+                return bytes(packet[TCP].payload)
+        return None
 
-            ip = packet[IP] if has_ip else packet[IPv6]
-            tcp = packet[TCP]
-            ts = float(packet.time)
+    def _http_packet_info(self, packet_index, flow_key):
+        """HTTP summary of the message starting in packet_index, or None.
+
+        Reuses the capture-wide pass if it already ran; otherwise parses only
+        the packet's own flow, so an on-demand detail never reads the whole
+        capture. Parsed flows stay in a per-analyzer LRU bounded by
+        HTTP_FLOW_CACHE_MAX_BYTES.
+        """
+        with self._cache_lock:
+            if getattr(self, '_http_by_packet', None) is not None:
+                return self._http_by_packet.get(packet_index)
+            flows = getattr(self, '_http_flow_cache', None)
+            if flows is None:
+                flows = self._http_flow_cache = ByteBudgetLRU(self.HTTP_FLOW_CACHE_MAX_BYTES)
+            by_packet = flows.get(flow_key)
+            if by_packet is None:
+                by_packet = {}
+                indices = self._get_flow_index().get(flow_key, ())
+                payload = self._flow_first_payload(indices)
+                if payload is not None and looks_like_http(payload):
+                    self._build_http_timeline(indices, by_packet)
+                flows.put(flow_key, by_packet, (len(by_packet) + 1) * self.HTTP_MESSAGE_BYTES)
+            return by_packet.get(packet_index)
+
+    def _build_http_timeline(self, indices, http_by_packet):
+        reassembler = self._reassemble_packets(indices)
+        if reassembler is None:
+            return None
+        client, server = reassembler.client_stream, reassembler.server_stream
+        requests, responses = parse_http_stream(client.buffer, server.buffer)
+        locate_client = self._offset_locator(client)
+        locate_server = self._offset_locator(server)
+
+        transactions = []
+        stage_ms = {'request': 0, 'response': 0}  # upload / download time of the first transaction
+        ttfb_sketch = QuantileSketch()
+        for number, (request, response, interim) in enumerate(pair_transactions(requests, responses)):
+            req_first = locate_client(request['start'])
+            req_last = locate_client(max(request['start'], request['end'] - 1))
+            http_by_packet.setdefault(req_first['packetIndex'], self._http_message_summary(request, number))
+            txn = {
+                'method': request['method'],
+                'uri': request['path'],
+                'host': request['headers'].get('host'),
+                'version': request['version'],
+                'requestBytes': request['end'] - request['start'],
+                'requestBodyBytes': request['bodyLength'],
+                'requestPacket': req_first['packetIndex'],
+                'requestStartMs': int(req_first['timestamp'] * 1000),
+                'status': None,
+                'statusText': None,
+                'responseBytes': 0,
+                'responseBodyBytes': 0,
+                'responsePacket': None,
+                'ttfbMs': None,
+                'durationMs': None,
+                'complete': False,
+            }
+            for message in interim:
+                first = locate_server(message['start'])
+                http_by_packet.setdefault(first['packetIndex'], self._http_message_summary(message, number))
+            if response is not None:
+                resp_first = locate_server(response['start'])
+                resp_last = locate_server(max(response['start'], response['end'] - 1))
+                http_by_packet.setdefault(resp_first['packetIndex'], self._http_message_summary(response, number))
+                ttfb = max(0.0, (resp_first['timestamp'] - req_last['timestamp']) * 1000)
+                ttfb_sketch.add(ttfb)
+                txn.update({
+                    'status': response['status'],
+                    'statusText': response['statusText'],
+                    'contentType': response['headers'].get('content-type'),
+                    'chunked': response['chunked'],
+                    'responseBytes': response['end'] - response['start'],
+                    'responseBodyBytes': response['bodyLength'],
+                    'responsePacket': resp_first['packetIndex'],
+                    'ttfbMs': round(ttfb, 3),
+                    'durationMs': round(max(0.0, (resp_last['timestamp'] - req_first['timestamp']) * 1000), 3),
+                    'complete': request['complete'] and response['complete'],
+                })
+                if number == 0:
+                    stage_ms['request'] = (req_last['timestamp'] - req_first['timestamp']) * 1000
+                    stage_ms['response'] = (resp_last['timestamp'] - resp_first['timestamp']) * 1000
+            transactions.append(txn)
 
-            # 檢測 HTTP (80) 和 HTTPS (443) port
-            is_http = tcp.sport == 80 or tcp.dport == 80
-            is_https = tcp.sport == 443 or tcp.dport == 443
+        if not transactions:
+            return None
 
-            if not (is_http or is_https):
-                continue
+        client_ip, client_port = reassembler.client
+        server_ip, server_port = self._flow_peer(indices, reassembler.client)
+        first_ts = float(self.packets[indices[0]].time)
+        last_ts = float(self.packets[indices[-1]].time)
+        first_txn = transactions[0]
+        response_label = (f"{first_txn['status']} {first_txn['statusText']}".strip()
+                          if first_txn['status'] is not None else 'No Response')
+
+        answered = [txn for txn in transactions if txn['durationMs'] is not None]
+        metrics = {
+            'responseTimeMs': int(first_txn['durationMs'] or 0),
+            'ttfbMs': first_txn['ttfbMs'],
+            'packetCount': len(indices),
+            'transactionCount': len(transactions),
+            'answeredCount': len(answered),
+            'transactions': transactions[:self.HTTP_TIMELINE_MAX_TRANSACTIONS],
+        }
+        if ttfb_sketch.count:
+            metrics['ttfbSummary'] = ttfb_sketch.summary()
 
-            # 標準化連線 key（排序確保雙向一致）
-            normalized_key = tuple(sorted([(ip.src, tcp.sport), (ip.dst, tcp.dport)]))
+        return {
+            'id': f"http-{client_ip}-{client_port}-{server_ip}-{server_port}",
+            'protocol': 'http',
+            'protocolType': 'http-request',
+            'startEpochMs': int(first_ts * 1000),
+            'endEpochMs': int(last_ts * 1000),
+            'stages': [
+                {
+                    'key': 'request',
+                    'label': f"{first_txn['method']} {first_txn['uri']}"[:80],
+                    'direction': 'forward',
+                    'durationMs': max(600, int(stage_ms['request'])),  # 最小 600ms
+                    'packetRefs': [first_txn['requestPacket']]
+                },
+                {
+                    'key': 'processing',
+                    'label': 'Processing',
+                    'direction': 'wait',
+                    'durationMs': max(800, int(first_txn['ttfbMs'] or 0)),  # 最小 800ms
+                    'packetRefs': []
+                },
+                {
+                    'key': 'response',
+                    'label': response_label,
+                    'direction': 'backward',
+                    'durationMs': max(600, int(stage_ms['response'])),  # 最小 600ms
+                    'packetRefs': [first_txn['responsePacket']] if first_txn['responsePacket'] is not None else []
+                }
+            ],
+            'metrics': metrics
+        }
 
-            # 跳過已處理的連線
-            if normalized_key in processed_connections:
+    def _build_https_timeline(self, indices):
+        """TLS 連線無法解析內容：以第一個 client 資料封包到第一個 server 回應估算。"""
+        client = None
+        request = None
+        response = None
+        for idx in indices:
+            packet = self.packets[idx]
+            if not packet.haslayer(TCP) or not packet[TCP].payload:
                 continue
+            ip = packet[IP] if packet.haslayer(IP) else packet[IPv6]
+            endpoint = (ip.src, packet[TCP].sport)
+            if request is None:
+                client = endpoint
+                request = idx
+            elif endpoint != client:
+                response = idx
+                break
+        if response is None:
+            return None
 
-            # 識別請求和回應
-            conn_key = (ip.src, tcp.sport, ip.dst, tcp.dport)
-            if conn_key not in http_sessions and (is_http or is_https):
-                http_sessions[conn_key] = {
-                    'start_time': ts,
-                    'start_packet': index,
-                    'is_https': is_https,
-                    'src_ip': ip.src,
-                    'src_port': tcp.sport,
-                    'dst_ip': ip.dst,
-                    'dst_port': tcp.dport
-                }
-            elif conn_key in http_sessions:
-                session = http_sessions[conn_key]
-                duration = (ts - session['start_time']) * 1000
-
-                # 生成 HTTP/HTTPS timeline
-                protocol_type = 'https-request' if session['is_https'] else 'http-request'
-                timeline = {
-                    'id': f"http-{session['src_ip']}-{session['src_port']}-{session['dst_ip']}-{session['dst_port']}",
-                    'protocol': 'https' if session['is_https'] else 'http',
-                    'protocolType': protocol_type,
-                    'startEpochMs': int(session['start_time'] * 1000),
-                    'endEpochMs': int(ts * 1000),
-                    'stages': [
-                        {
-                            'key': 'request',
-                            'label': 'HTTP Request',
-                            'direction': 'forward',
-                            'durationMs': max(600, int(duration * 0.3)),  # 最小 600ms
-                            'packetRefs': [session['start_packet']]
-                        },
-                        {
-                            'key': 'processing',
-                            'label': 'Processing',
-                            'direction': 'wait',
-                            'durationMs': max(800, int(duration * 0.4)),  # 最小 800ms
-                            'packetRefs': []
-                        },
-                        {
-                            'key': 'response',
-                            'label': '200 OK',
-                            'direction': 'backward',
-                            'durationMs': max(600, int(duration * 0.3)),  # 最小 600ms
-                            'packetRefs': [index]
-                        }
-                    ],
-                    'metrics': {
-                        'responseTimeMs': int(duration),
-                        'packetCount': 2
-                    }
+        server_ip, server_port = self._flow_peer(indices, client)
+        start_ts = float(self.packets[request].time)
+        end_ts = float(self.packets[response].time)
+        duration = (end_ts - start_ts) * 1000
+        return {
+            'id': f"http-{client[0]}-{client[1]}-{server_ip}-{server_port}",
+            'protocol': 'https',
+            'protocolType': 'https-request',
+            'startEpochMs': int(start_ts * 1000),
+            'endEpochMs': int(end_ts * 1000),
+            'stages': [
+                {
+                    'key': 'request',
+                    'label': 'TLS Request',
+                    'direction': 'forward',
+                    'durationMs': max(600, int(duration * 0.3)),  # 最小 600ms
+                    'packetRefs': [request]
+                },
+                {
+                    'key': 'processing',
+                    'label': 'Processing',
+                    'direction': 'wait',
+                    'durationMs': max(800, int(duration * 0.4)),  # 最小 800ms
+                    'packetRefs': []
+                },
+                {
+                    'key': 'response',
+                    'label': 'Encrypted Response',
+                    'direction': 'backward',
+                    'durationMs': max(600, int(duration * 0.3)),  # 最小 600ms
+                    'packetRefs': [response]
                 }
-                timelines.append(timeline)
-                processed_connections.add(normalized_key)  # 標記為已處理
-                http_sessions.pop(conn_key)
+            ],
+            'metrics': {
+                'responseTimeMs': int(duration),
+                'packetCount': len(indices)
+            }
+        }
 
-        return timelines
+    def _flow_peer(self, indices, endpoint):
+        """Return the (ip, port) on the other side of ``endpoint`` in this flow."""
+        packet = self.packets[indices[0]]
+        ip = packet[IP] if packet.haslayer(IP) else packet[IPv6]
+        transport = packet[TCP]
+        if (ip.src, transport.sport) == tuple(endpoint):
+            return ip.dst, transport.dport
+        return ip.src, transport.sport
+
+    @staticmethod
+    def _http_message_summary(message, transaction_index):
+        """Per-packet HTTP info in the shape _extract_packet_details has always returned."""
+        info = {'type': message['type'], 'version': message['version'], 'transactionIndex': transaction_index}
+        if message['type'] == 'request':
+            info['method'] = message['method']
+            info['path'] = message['path']
+        else:
+            info['status'] = message['status']
+            info['statusText'] = message['statusText']
+        if message['headers']:
+            info['headers'] = dict(list(message['headers'].items())[:20])
+        return info
 
     def _detect_timeouts(self):
         """檢測連線超時情況
@@ -1110,148 +2531,21 @@ class NetworkAnalyzer:
         expected based on the previous packet's payload size, indicating lost packets.
         Both checks use modular arithmetic to handle 32-bit sequence wraparound.
         """
-        tcp_streams = defaultdict(list)
-        packet_loss_indicators = []
-
-        _SEQ_MAX = 2 ** 32
-        _SEQ_HALF = _SEQ_MAX // 2
-
+        accumulator = _PacketLossAccumulator()
         for index, packet in enumerate(self.packets):
-            if not packet.haslayer(TCP):
-                continue
-            has_ip = packet.haslayer(IP)
-            has_ipv6 = packet.haslayer(IPv6)
-            if not has_ip and not has_ipv6:
-                continue
-            tcp_layer = packet[TCP]
-            ip_layer = packet[IP] if has_ip else packet[IPv6]
-            flags = int(tcp_layer.flags)
-            syn = bool(flags & 0x02)
-            fin = bool(flags & 0x01)
-            # Actual TCP payload length from IP/TCP headers (handles variable TCP options)
-            if has_ip:
-                ip_payload = ip_layer.len - (ip_layer.ihl * 4)
-            else:
-                ip_payload = ip_layer.plen
-            tcp_hdr = tcp_layer.dataofs * 4
-            data_len = max(0, ip_payload - tcp_hdr)
-            # SYN and FIN each consume one sequence number even without data
-            seq_advance = data_len + (1 if syn else 0) + (1 if fin else 0)
-
-            stream_id = f"{ip_layer.src}:{tcp_layer.sport}-{ip_layer.dst}:{tcp_layer.dport}"
-            tcp_streams[stream_id].append({
-                'packet_index': index,
-                'seq': tcp_layer.seq,
-                'time': float(packet.time),
-                'seq_advance': seq_advance,
-            })
-
-        for stream_id, stream_packets in tcp_streams.items():
-            if len(stream_packets) < 3:
-                continue
-
-            stream_packets.sort(key=lambda item: item['time'])
-
-            # Retransmission detection using 32-bit modular arithmetic
-            for idx in range(1, len(stream_packets)):
-                curr = stream_packets[idx]
-                prev = stream_packets[idx - 1]
-                # Skip control-only packets (pure ACK, no payload, no SYN/FIN)
-                if curr['seq_advance'] == 0:
-                    continue
-                # Positive modular diff means forward; > half means wrapped backward
-                diff = (curr['seq'] - prev['seq']) % _SEQ_MAX
-                if diff > _SEQ_HALF:
-                    packet_loss_indicators.append({
-                        'type': 'retransmission',
-                        'stream': stream_id,
-                        'packet_index': curr['packet_index'],
-                        'time': curr['time']
-                    })
-
-            # Sequence gap detection: skip sender-side no-advance packets
-            for idx in range(1, len(stream_packets)):
-                prev = stream_packets[idx - 1]
-                curr = stream_packets[idx]
-                if prev['seq_advance'] == 0:
-                    continue  # Previous packet didn't advance seq, no gap to measure
-                expected_seq = (prev['seq'] + prev['seq_advance']) % _SEQ_MAX
-                actual_seq = curr['seq']
-                gap = (actual_seq - expected_seq) % _SEQ_MAX
-                # Gap is a forward jump of more than 1000 bytes (not wraparound)
-                if 0 < gap < _SEQ_HALF and gap > 1000:
-                    packet_loss_indicators.append({
-                        'type': 'sequence_gap',
-                        'stream': stream_id,
-                        'packet_index': curr['packet_index'],
-                        'time': curr['time'],
-                        'gap_size': gap
-                    })
+            accumulator.observe(index, packet)
 
+        packet_loss_indicators = accumulator.result()
         self.analysis_results['packet_loss'] = packet_loss_indicators
         return packet_loss_indicators
 
     def analyze_latency(self):
         """Extract latency-related metrics from the capture."""
-        latency_data = {
-            'ping_responses': [],
-            'tcp_handshakes': [],
-            'inter_packet_delays': []
-        }
-
-        for idx, packet in enumerate(self.packets):
-            if packet.haslayer(ICMP):
-                icmp_layer = packet[ICMP]
-                if icmp_layer.type == 0:  # echo reply
-                    for offset in range(max(0, idx - 100), idx):
-                        prev_packet = self.packets[offset]
-                        if (
-                            prev_packet.haslayer(ICMP)
-                            and prev_packet[ICMP].type == 8
-                            and prev_packet[ICMP].id == icmp_layer.id
-                        ):
-                            rtt = (float(packet.time) - float(prev_packet.time)) * 1000
-                            latency_data['ping_responses'].append({
-                                'rtt': rtt,
-                                'time': float(packet.time)
-                            })
-                            break
-
-        tcp_handshakes = {}
+        accumulator = _LatencyAccumulator(self.KEEP_PER_PACKET_SERIES)
         for packet in self.packets:
-            if packet.haslayer(TCP) and packet.haslayer(IP):
-                tcp_layer = packet[TCP]
-                ip_layer = packet[IP]
-                connection_id = f"{ip_layer.src}:{tcp_layer.sport}-{ip_layer.dst}:{tcp_layer.dport}"
-
-                flags = int(tcp_layer.flags)
-                is_syn = bool(flags & 0x02)
-                is_ack = bool(flags & 0x10)
-                if is_syn and not is_ack:  # SYN (ECN bits tolerated)
-                    tcp_handshakes[connection_id] = {'syn_time': float(packet.time)}
-                elif is_syn and is_ack and connection_id in tcp_handshakes:  # SYN-ACK
-                    tcp_handshakes[connection_id]['syn_ack_time'] = float(packet.time)
-                elif is_ack and not is_syn and connection_id in tcp_handshakes:  # ACK
-                    handshake = tcp_handshakes[connection_id]
-                    if 'syn_ack_time' in handshake:
-                        total_time = float(packet.time) - handshake['syn_time']
-                        latency_data['tcp_handshakes'].append({
-                            'handshake_time': total_time * 1000,
-                            'time': float(packet.time)
-                        })
-
-        prev_time = None
-        for packet in self.packets:
-            current_time = float(packet.time)
-            if prev_time is not None:
-                delay = (current_time - prev_time) * 1000
-                if delay < 1000:
-                    latency_data['inter_packet_delays'].append({
-                        'delay': delay,
-                        'time': current_time
-                    })
-            prev_time = current_time
+            accumulator.observe(packet)
 
+        latency_data = accumulator.result()
         self.analysis_results['latency'] = latency_data
         return latency_data
 
@@ -1280,379 +2574,124 @@ class NetworkAnalyzer:
 
     # ── Phase 9: Advanced attack detection helpers ─────────────────────
 
-    def _detect_dns_amplification(self):
-        """Detect DNS amplification/reflection attacks."""
-        result = {'amplification_ratio': 0, 'total_queries': 0, 'total_responses': 0,
-                  'response_source_count': 0, 'target_ip': None}
-        query_bytes = 0
-        response_bytes = 0
-        response_sources = set()
-        response_targets = Counter()
-
-        for packet in self.packets:
-            if not packet.haslayer(UDP) or not packet.haslayer(DNS):
-                continue
-            udp = packet[UDP]
-            if udp.sport != 53 and udp.dport != 53:
-                continue
-            dns = packet[DNS]
-            pkt_len = len(packet)
-            if not dns.qr:  # query
-                query_bytes += pkt_len
-                result['total_queries'] += 1
-            else:  # response
-                response_bytes += pkt_len
-                result['total_responses'] += 1
-                if packet.haslayer(IP):
-                    response_sources.add(packet[IP].src)
-                    response_targets[packet[IP].dst] += 1
-
-        result['amplification_ratio'] = response_bytes / query_bytes if query_bytes > 0 else 0
-        result['response_source_count'] = len(response_sources)
-        if response_targets:
-            result['target_ip'] = response_targets.most_common(1)[0][0]
-        return result
-
-    def _detect_slowloris(self):
-        """Detect Slowloris slow HTTP attacks (many concurrent low-data HTTP connections)."""
-        HTTP_PORTS = {80, 443, 8080, 8443}
-        result = {'detected': False, 'suspicious_sources': 0, 'details': []}
-        connections = defaultdict(lambda: {
-            'sockets': set(), 'data_bytes': 0, 'packet_count': 0,
-            'first_time': None, 'last_time': None,
-            'has_fin': False, 'has_rst': False
-        })
-
-        for packet in self.packets:
-            if not packet.haslayer(TCP) or not packet.haslayer(IP):
-                continue
-            ip = packet[IP]
-            tcp = packet[TCP]
-            if tcp.dport not in HTTP_PORTS:
-                continue
-            src_ip = ip.src
-            conn = connections[src_ip]
-            conn['sockets'].add((ip.dst, tcp.dport, tcp.sport))
-            conn['packet_count'] += 1
-            ts = float(packet.time)
-            if conn['first_time'] is None:
-                conn['first_time'] = ts
-            conn['last_time'] = ts
-            if packet.haslayer(Raw):
-                conn['data_bytes'] += len(packet[Raw])
-            flags = int(tcp.flags)
-            if flags & 0x01:
-                conn['has_fin'] = True
-            if flags & 0x04:
-                conn['has_rst'] = True
-
-        for src_ip, info in connections.items():
-            num_sockets = len(info['sockets'])
-            if num_sockets < 10:
-                continue
-            duration = (info['last_time'] - info['first_time']) if info['first_time'] and info['last_time'] else 0
-            avg_data = info['data_bytes'] / num_sockets if num_sockets > 0 else 0
-            no_termination = not info['has_fin'] and not info['has_rst']
-            if avg_data < 200 and duration > 30 and no_termination:
-                result['suspicious_sources'] += 1
-                result['details'].append({'ip': src_ip, 'connections': num_sockets,
-                                          'avg_data': round(avg_data, 1), 'duration': round(duration, 1)})
-
-        result['detected'] = result['suspicious_sources'] > 0
-        return result
-
-    def _detect_arp_spoofing(self):
-        """Detect ARP spoofing (IP-MAC mapping conflicts)."""
-        result = {'detected': False, 'conflicting_ips': 0, 'details': []}
-        ip_mac_map = defaultdict(set)
-
-        for packet in self.packets:
-            if not packet.haslayer(ARP):
-                continue
-            arp = packet[ARP]
-            if arp.op == 2:  # ARP reply
-                ip_mac_map[arp.psrc].add(str(arp.hwsrc).lower())
-
-        for ip_addr, macs in ip_mac_map.items():
-            if len(macs) > 1:
-                result['conflicting_ips'] += 1
-                result['details'].append({'ip': ip_addr, 'macs': list(macs)})
-
-        result['detected'] = result['conflicting_ips'] > 0
-        return result
-
-    def detect_attacks(self):
-        """偵測潛在的網路攻擊並計算攻擊指標。"""
-        if not self.packets:
-            return None
-
-        # 初始化計數器
-        tcp_flags = {
-            'syn': 0,
-            'syn_ack': 0,
-            'ack': 0,
-            'fin': 0,
-            'rst': 0,
-            'psh': 0
-        }
-
-        connections = defaultdict(lambda: {
-            'packets': 0,
-            'syn_count': 0,
-            'ack_count': 0,
-            'fin_count': 0,
-            'rst_count': 0,
-            'data_packets': 0,
-            'first_time': None,
-            'last_time': None
-        })
-
-        source_ips = Counter()
-        target_ports = Counter()
-        total_tcp_packets = 0
-
-        # 時間範圍
-        first_packet_time = None
-        last_packet_time = None
-
-        for packet in self.packets:
-            if not packet.haslayer(IP):
-                continue
-
-            ip_layer = packet[IP]
-            packet_time = float(packet.time)
-
-            if first_packet_time is None:
-                first_packet_time = packet_time
-            last_packet_time = packet_time
-
-            if packet.haslayer(TCP):
-                total_tcp_packets += 1
-                tcp_layer = packet[TCP]
-                flags = tcp_layer.flags
-
-                # 解析 TCP flags
-                is_syn = bool(flags & 0x02)
-                is_ack = bool(flags & 0x10)
-                is_fin = bool(flags & 0x01)
-                is_rst = bool(flags & 0x04)
-                is_psh = bool(flags & 0x08)
-
-                # 統計 flags
-                if is_syn and not is_ack:
-                    tcp_flags['syn'] += 1
-                if is_syn and is_ack:
-                    tcp_flags['syn_ack'] += 1
-                if is_ack and not is_syn:
-                    tcp_flags['ack'] += 1
-                if is_fin:
-                    tcp_flags['fin'] += 1
-                if is_rst:
-                    tcp_flags['rst'] += 1
-                if is_psh:
-                    tcp_flags['psh'] += 1
-
-                # 連線追蹤
-                src_ip = ip_layer.src
-                dst_ip = ip_layer.dst
-                src_port = tcp_layer.sport
-                dst_port = tcp_layer.dport
-
-                # 標準化連線 key（雙向）
-                conn_key = tuple(sorted([(src_ip, src_port), (dst_ip, dst_port)]))
-                conn = connections[conn_key]
-                conn['packets'] += 1
-
-                if is_syn and not is_ack:
-                    conn['syn_count'] += 1
-                if is_ack:
-                    conn['ack_count'] += 1
-                if is_fin:
-                    conn['fin_count'] += 1
-                if is_rst:
-                    conn['rst_count'] += 1
-                if is_psh:
-                    conn['data_packets'] += 1
-
-                if conn['first_time'] is None:
-                    conn['first_time'] = packet_time
-                conn['last_time'] = packet_time
-
-                # 來源統計
-                source_ips[src_ip] += 1
-                target_ports[dst_port] += 1
-
-        # 計算攻擊指標
-        duration_seconds = (last_packet_time - first_packet_time) if first_packet_time and last_packet_time else 1
-        duration_seconds = max(duration_seconds, 0.001)  # 避免除以零
-
-        total_connections = len(connections)
-
-        # Flag 比例
-        rst_ratio = tcp_flags['rst'] / total_tcp_packets if total_tcp_packets > 0 else 0
-        psh_ratio = tcp_flags['psh'] / total_tcp_packets if total_tcp_packets > 0 else 0
-
-        # 每秒連線數
-        connections_per_second = total_connections / duration_seconds
-
-        # 握手完成率（有 SYN 且有對應 SYN-ACK 的比例）
-        handshake_completion_rate = tcp_flags['syn_ack'] / tcp_flags['syn'] if tcp_flags['syn'] > 0 else 1
-
-        # 無資料傳輸的連線比例
-        teardown_without_data = sum(1 for c in connections.values()
-                                    if c['data_packets'] == 0 and (c['fin_count'] > 0 or c['rst_count'] > 0))
-        teardown_without_data_rate = teardown_without_data / total_connections if total_connections > 0 else 0
+    def _detect_dns_amplification(self):
+        """Detect DNS amplification/reflection attacks."""
+        amp = self._get_dns_transactions()['amplification']
+        return {key: amp[key] for key in ('amplification_ratio', 'total_queries', 'total_responses',
+                                          'response_source_count', 'target_ip')}
 
-        # 來源 IP 集中度（最大來源佔總流量的比例）
-        max_source_count = source_ips.most_common(1)[0][1] if source_ips else 0
-        total_source_packets = sum(source_ips.values())
-        source_concentration = max_source_count / total_source_packets if total_source_packets > 0 else 0
+    def _detect_slowloris(self):
+        """Detect Slowloris slow HTTP attacks (many concurrent low-data HTTP connections)."""
+        tracker = _SlowlorisTracker(self.CARDINALITY_MODE, self.SLOWLORIS_MAX_SOURCES)
+        for packet in self.packets:
+            tracker.observe(packet)
+        return tracker.result()
 
-        # 目標端口集中度
-        max_target_count = target_ports.most_common(1)[0][1] if target_ports else 0
-        total_target_packets = sum(target_ports.values())
-        target_concentration = max_target_count / total_target_packets if total_target_packets > 0 else 0
+    def _detect_arp_spoofing(self):
+        """Detect ARP spoofing (IP-MAC mapping conflicts)."""
+        tracker = _ArpSpoofTracker()
+        for packet in self.packets:
+            tracker.observe(packet)
+        return tracker.result()
 
-        # Phase 9: 進階偵測
-        dns_amp = self._detect_dns_amplification()
-        slowloris = self._detect_slowloris()
-        arp_spoof = self._detect_arp_spoofing()
+    @staticmethod
+    def _classify_flood_metrics(m):
+        """Match the TCP flag/rate flood rules against a metrics dict.
 
-        # 攻擊類型判斷
-        attack_type = None
-        attack_description = None
-        severity = 'normal'
-        confidence = 0.0
+        Shared by the capture-wide verdict in detect_attacks() and the
+        per-window incidents, so both use the same thresholds.
+        Returns (type, description, severity, confidence) or None.
+        """
+        total_tcp = m['total_tcp_packets']
+        hcr = m['handshake_completion_rate']
+        rst_ratio = m['rst_ratio']
+        psh_ratio = m['psh_ratio']
+        twd_rate = m['teardown_without_data_rate']
+        cps = m['connections_per_second']
 
         # SYN Flood 檢測
-        if tcp_flags['syn'] > 100 and handshake_completion_rate < 0.3:
-            attack_type = 'SYN Flood'
-            attack_description = '大量 SYN 請求但極少完成握手，典型的 SYN Flood 攻擊'
-            severity = 'high' if tcp_flags['syn'] > 500 else 'medium'
-            confidence = min(0.9, (1 - handshake_completion_rate) * 0.8 + 0.2)
+        if m['syn_count'] > 100 and hcr < 0.3:
+            return ('SYN Flood', '大量 SYN 請求但極少完成握手，典型的 SYN Flood 攻擊',
+                    'high' if m['syn_count'] > 500 else 'medium',
+                    min(0.9, (1 - hcr) * 0.8 + 0.2))
 
         # RST Flood 檢測
-        elif rst_ratio > 0.5 and total_tcp_packets > 50:
-            attack_type = 'RST Flood'
-            attack_description = '超過 50% 的封包是 RST，可能是 RST Flood 攻擊或連線重置攻擊'
-            severity = 'high' if rst_ratio > 0.7 else 'medium'
-            confidence = min(0.9, rst_ratio * 0.9)
+        if rst_ratio > 0.5 and total_tcp > 50:
+            return ('RST Flood', '超過 50% 的封包是 RST，可能是 RST Flood 攻擊或連線重置攻擊',
+                    'high' if rst_ratio > 0.7 else 'medium',
+                    min(0.9, rst_ratio * 0.9))
 
         # FIN Flood 檢測
-        elif tcp_flags['fin'] > 100 and teardown_without_data_rate > 0.8:
-            attack_type = 'FIN Flood'
-            attack_description = '大量 FIN 封包但無實際資料傳輸，可能是 FIN Flood 攻擊'
-            severity = 'high' if tcp_flags['fin'] > 500 else 'medium'
-            confidence = min(0.9, teardown_without_data_rate * 0.85)
+        if m['fin_count'] > 100 and twd_rate > 0.8:
+            return ('FIN Flood', '大量 FIN 封包但無實際資料傳輸，可能是 FIN Flood 攻擊',
+                    'high' if m['fin_count'] > 500 else 'medium',
+                    min(0.9, twd_rate * 0.85))
 
         # 連線耗盡攻擊檢測
-        elif connections_per_second > 50 and teardown_without_data_rate > 0.7:
-            attack_type = 'Connection Exhaustion'
-            attack_description = '高速建立大量短暫連線，意圖耗盡伺服器連線資源'
-            severity = 'high' if connections_per_second > 100 else 'medium'
-            confidence = min(0.85, connections_per_second / 200 + teardown_without_data_rate * 0.3)
+        if cps > 50 and twd_rate > 0.7:
+            return ('Connection Exhaustion', '高速建立大量短暫連線，意圖耗盡伺服器連線資源',
+                    'high' if cps > 100 else 'medium',
+                    min(0.85, cps / 200 + twd_rate * 0.3))
 
         # PSH Flood 檢測
-        elif psh_ratio > 0.6 and total_tcp_packets > 100:
-            attack_type = 'PSH Flood'
-            attack_description = '大量 PSH 封包淹沒目標，可能是 PSH Flood 攻擊'
-            severity = 'high' if psh_ratio > 0.8 else 'medium'
-            confidence = min(0.9, psh_ratio * 0.85)
-
-        # DNS Amplification 檢測
-        elif dns_amp['amplification_ratio'] > 3 and dns_amp['total_responses'] > 50 and dns_amp['response_source_count'] > 5:
-            amp_r = dns_amp['amplification_ratio']
-            src_c = dns_amp['response_source_count']
-            attack_type = 'DNS Amplification'
-            attack_description = f'DNS 放大攻擊：回應/查詢位元組比 {amp_r:.1f}x，來自 {src_c} 個不同 DNS 伺服器'
-            severity = 'high' if amp_r > 10 else 'medium'
-            confidence = min(0.9, amp_r / 20 + src_c / 50)
-
-        # Slowloris 檢測
-        elif slowloris['detected']:
-            sl_count = slowloris['suspicious_sources']
-            attack_type = 'Slowloris'
-            attack_description = f'疑似 Slowloris 慢速攻擊：{sl_count} 個來源 IP 維持大量低流量長連線'
-            severity = 'high' if sl_count > 3 else 'medium'
-            confidence = min(0.85, 0.5 + sl_count * 0.1)
-
-        # ARP Spoofing 檢測
-        elif arp_spoof['detected']:
-            arp_count = arp_spoof['conflicting_ips']
-            attack_type = 'ARP Spoofing'
-            attack_description = f'偵測到 ARP 欺騙：{arp_count} 個 IP 位址對應到多個 MAC 位址'
-            severity = 'high' if arp_count > 2 else 'medium'
-            confidence = min(0.9, 0.6 + arp_count * 0.15)
+        if psh_ratio > 0.6 and total_tcp > 100:
+            return ('PSH Flood', '大量 PSH 封包淹沒目標，可能是 PSH Flood 攻擊',
+                    'high' if psh_ratio > 0.8 else 'medium',
+                    min(0.9, psh_ratio * 0.85))
+
+        return None
+
+    @staticmethod
+    def _classify_source_metrics(m):
+        """Match the source/port concentration rules (port scan, single-source flood)."""
+        total_tcp = m['total_tcp_packets']
+        sc = m['source_concentration']
+        cps = m['connections_per_second']
+        unique_ports = m['unique_target_ports']
 
         # 端口掃描檢測
-        elif len(target_ports) > 50 and source_concentration > 0.8:
-            attack_type = 'Port Scan'
-            attack_description = '單一來源掃描大量端口，可能是偵察行為'
-            severity = 'low'
-            confidence = min(0.8, len(target_ports) / 100 * 0.5 + source_concentration * 0.3)
+        if unique_ports > 50 and sc > 0.8:
+            return ('Port Scan', '單一來源掃描大量端口，可能是偵察行為', 'low',
+                    min(0.8, unique_ports / 100 * 0.5 + sc * 0.3))
 
         # 高速單源洪泛（通用規則）
-        elif connections_per_second > 80 and source_concentration > 0.9 and total_tcp_packets > 200:
-            attack_type = 'Volumetric Flood'
-            attack_description = f'單一來源 IP 以 {connections_per_second:.0f} 連線/秒的速率發送大量封包'
-            severity = 'high' if connections_per_second > 150 else 'medium'
-            confidence = min(0.85, connections_per_second / 200 + source_concentration * 0.2)
+        if cps > 80 and sc > 0.9 and total_tcp > 200:
+            return ('Volumetric Flood', f'單一來源 IP 以 {cps:.0f} 連線/秒的速率發送大量封包',
+                    'high' if cps > 150 else 'medium',
+                    min(0.85, cps / 200 + sc * 0.2))
 
-        # 異常分數計算（0-100）
-        anomaly_score = 0
-        if rst_ratio > 0.3:
-            anomaly_score += rst_ratio * 30
-        if handshake_completion_rate < 0.5:
-            anomaly_score += (1 - handshake_completion_rate) * 25
-        if teardown_without_data_rate > 0.5:
-            anomaly_score += teardown_without_data_rate * 25
-        if connections_per_second > 20:
-            anomaly_score += min(20, connections_per_second / 5)
-        if psh_ratio > 0.6:
-            anomaly_score += psh_ratio * 25
-        if source_concentration > 0.9 and total_tcp_packets > 100:
-            anomaly_score += source_concentration * 15
-        if dns_amp['amplification_ratio'] > 3:
-            anomaly_score += min(20, dns_amp['amplification_ratio'] * 2)
-        if slowloris['suspicious_sources'] > 0:
-            anomaly_score += min(20, slowloris['suspicious_sources'] * 5)
-        if arp_spoof['conflicting_ips'] > 0:
-            anomaly_score += min(25, arp_spoof['conflicting_ips'] * 10)
+        return None
 
-        anomaly_score = min(100, anomaly_score)
+    @staticmethod
+    def _classify_port_scans(port_scans):
+        """Summarize ScanDetector findings as a verdict (the most confident scan wins)."""
+        scans = port_scans['scans']
+        top = max(scans, key=lambda item: item['confidence'])
+        counts = port_scans['counts']
+        sources = len({scan['source'] for scan in scans if scan['source']})
+        parts = []
+        if counts['vertical']:
+            parts.append(f"{counts['vertical']} 個垂直掃描")
+        if counts['horizontal']:
+            parts.append(f"{counts['horizontal']} 個水平掃描")
+        if counts['block']:
+            parts.append(f"{counts['block']} 個區塊掃描")
+        if counts['distributed']:
+            parts.append(f"{counts['distributed']} 個分散式掃描目標")
+        severity = 'medium' if counts['distributed'] or counts['block'] or sources > 3 else 'low'
+        return ('Port Scan', f"偵測到端口掃描：{'、'.join(parts)}（{sources} 個掃描來源）",
+                severity, top['confidence'])
 
-        # 構建結果
-        attack_analysis = {
-            'metrics': {
-                'total_tcp_packets': total_tcp_packets,
-                'total_connections': total_connections,
-                'duration_seconds': round(duration_seconds, 2),
-                'connections_per_second': round(connections_per_second, 2),
-                'rst_ratio': round(rst_ratio, 3),
-                'fin_ratio': round(tcp_flags['fin'] / total_tcp_packets if total_tcp_packets > 0 else 0, 3),
-                'handshake_completion_rate': round(handshake_completion_rate, 3),
-                'teardown_without_data_rate': round(teardown_without_data_rate, 3),
-                'source_concentration': round(source_concentration, 3),
-                'target_concentration': round(target_concentration, 3),
-                'unique_source_ips': len(source_ips),
-                'unique_target_ports': len(target_ports),
-                'dns_amplification_ratio': round(dns_amp['amplification_ratio'], 1),
-                'slowloris_sources': slowloris['suspicious_sources'],
-                'arp_conflicts': arp_spoof['conflicting_ips']
-            },
-            'tcp_flags': tcp_flags,
-            'top_sources': [{'ip': ip, 'count': count} for ip, count in source_ips.most_common(5)],
-            'top_targets': [{'port': port, 'count': count} for port, count in target_ports.most_common(5)],
-            'attack_detection': {
-                'detected': attack_type is not None,
-                'type': attack_type,
-                'description': attack_description,
-                'severity': severity,
-                'confidence': round(confidence, 2),
-                'anomaly_score': round(anomaly_score, 1)
-            }
-        }
+    def detect_attacks(self):
+        """偵測潛在的網路攻擊並計算攻擊指標。"""
+        if not self.packets:
+            return None
+
+        accumulator = _AttackAccumulator(self)
+        for index, packet in enumerate(self.packets):
+            accumulator.observe(packet, index)
 
+        attack_analysis = accumulator.result(self._detect_dns_amplification())
         self.analysis_results['attack_analysis'] = attack_analysis
         return attack_analysis
 
@@ -1751,14 +2790,20 @@ class NetworkAnalyzer:
             report.append(f"撠?蝮賣: {stats['total_packets']}")
             report.append(f"??蝯梯?: {dict(stats['protocols'])}")
 
-            if stats['packet_sizes']:
-                avg_size = self.calculate_average(stats['packet_sizes'])
+            size_summary = stats.get('packet_size_summary') or {}
+            if stats['total_packets']:
+                avg_size = size_summary.get('average', 0)
                 report.append(f"撟喳?撠?憭批?: {avg_size:.2f} bytes")
-                report.append(f"撠?憭批?蝭?: {min(stats['packet_sizes'])} - {max(stats['packet_sizes'])} bytes")
+                report.append(f"撠?憭批?蝭?: {size_summary.get('min', 0)} - {size_summary.get('max', 0)} bytes")
+                report.append(f"封包大小 P50/P90/P99: {size_summary.get('p50', 0):.0f} / "
+                              f"{size_summary.get('p90', 0):.0f} / {size_summary.get('p99', 0):.0f} bytes")
 
-            if stats['time_intervals']:
-                avg_interval = self.calculate_average(stats['time_intervals']) * 1000
+            interval_summary = stats.get('time_interval_summary') or {}
+            if stats['total_packets'] > 1:
+                avg_interval = interval_summary.get('average_ms', 0)
                 report.append(f"撟喳?撠???: {avg_interval:.2f} ms")
+                report.append(f"封包間隔 P50/P99: {interval_summary.get('p50_ms', 0):.2f} / "
+                              f"{interval_summary.get('p99_ms', 0):.2f} ms")
 
             report.append(f"銝餉?靘? IP: {list(stats['src_ips'].most_common(5))}")
             report.append(f"銝餉??桃? IP: {list(stats['dst_ips'].most_common(5))}")
@@ -1782,28 +2827,29 @@ class NetworkAnalyzer:
             latency = self.analysis_results['latency']
             report.append("## 撱園鞈?")
 
-            if latency['ping_responses']:
-                ping_rtts = [entry['rtt'] for entry in latency['ping_responses']]
-                avg_rtt = self.calculate_average(ping_rtts)
-                report.append(f"Ping 蝑: {len(ping_rtts)}")
-                report.append(f"撟喳? RTT: {avg_rtt:.2f} ms")
-                report.append(f"RTT 蝭?: {min(ping_rtts):.2f} - {max(ping_rtts):.2f} ms")
-
-            if latency['tcp_handshakes']:
-                handshake_times = [entry['handshake_time'] for entry in latency['tcp_handshakes']]
-                avg_handshake = self.calculate_average(handshake_times)
-                report.append(f"TCP 鈭斗甈⊥: {len(handshake_times)}")
-                report.append(f"撟喳?鈭斗??: {avg_handshake:.2f} ms")
-
-            if latency['inter_packet_delays']:
-                delays = [entry['delay'] for entry in latency['inter_packet_delays']]
-                avg_delay = self.calculate_average(delays)
-                std_delay = self.calculate_std(delays)
-                report.append(f"平均延遲: {avg_delay:.2f} ms")
-                report.append(f"延遲標準差: {std_delay:.2f} ms")
-                high_delays = [delay for delay in delays if delay > 100]
-                if high_delays:
-                    report.append(f"[WARNING] 發現 {len(high_delays)} 個超過100ms的延遲")
+            ping_summary = latency.get('ping_summary') or {}
+            if ping_summary.get('count'):
+                report.append(f"Ping 蝑: {ping_summary['count']}")
+                report.append(f"撟喳? RTT: {ping_summary['mean']:.2f} ms")
+                report.append(f"RTT 蝭?: {ping_summary['min']:.2f} - {ping_summary['max']:.2f} ms")
+                report.append(f"RTT P50/P90/P99: {ping_summary['p50']:.2f} / {ping_summary['p90']:.2f} / "
+                              f"{ping_summary['p99']:.2f} ms")
+
+            handshake_summary = latency.get('handshake_summary') or {}
+            if handshake_summary.get('count'):
+                report.append(f"TCP 鈭斗甈⊥: {handshake_summary['count']}")
+                report.append(f"撟喳?鈭斗??: {handshake_summary['mean']:.2f} ms")
+                report.append(f"交握時間 P50/P90/P99: {handshake_summary['p50']:.2f} / "
+                              f"{handshake_summary['p90']:.2f} / {handshake_summary['p99']:.2f} ms")
+
+            delay_summary = latency.get('inter_packet_delay_summary') or {}
+            if delay_summary.get('count'):
+                report.append(f"平均延遲: {delay_summary['mean']:.2f} ms")
+                report.append(f"延遲標準差: {delay_summary['std']:.2f} ms")
+                report.append(f"延遲 P50/P90/P99: {delay_summary['p50']:.2f} / {delay_summary['p90']:.2f} / "
+                              f"{delay_summary['p99']:.2f} ms")
+                if delay_summary.get('count_over_100ms'):
+                    report.append(f"[WARNING] 發現 {delay_summary['count_over_100ms']} 個超過100ms的延遲")
             report.append("")
 
         report.append("## 遊戲網路優化建議")
@@ -1819,9 +2865,9 @@ class NetworkAnalyzer:
 
         if 'latency' in self.analysis_results:
             latency = self.analysis_results['latency']
-            if latency['inter_packet_delays']:
-                avg_delay = self.calculate_average([entry['delay'] for entry in latency['inter_packet_delays']])
-                if avg_delay > 50:
+            delay_summary = latency.get('inter_packet_delay_summary') or {}
+            if delay_summary.get('count'):
+                if delay_summary['mean'] > 50:
                     report.append("- 選擇較近的伺服器")
                     report.append("- 設定路由器 QoS 優先級")
                     report.append("- 檢查網路連線穩定性")
@@ -1863,7 +2909,6 @@ class NetworkAnalyzer:
             },
             'streamId': None,  # TCP stream identifier
             'errorType': None,  # Error classification (ZeroWindow, RST, etc.)
-            'http': None,  # HTTP information (if applicable)
         }
 
         # Extract IP layer information
@@ -1893,15 +2938,6 @@ class NetworkAnalyzer:
                     src_port, dst_port = dst_port, src_port
                 details['streamId'] = f"tcp-{src_ip}:{src_port}-{dst_ip}:{dst_port}"
 
-                # Parse TCP flags
-                flags = []
-                if tcp.flags.S: flags.append('SYN')
-                if tcp.flags.A: flags.append('ACK')
-                if tcp.flags.F: flags.append('FIN')
-                if tcp.flags.R: flags.append('RST')
-                if tcp.flags.P: flags.append('PSH')
-                if tcp.flags.U: flags.append('URG')
-
                 # Detect error conditions
                 error_indicators = []
                 if tcp.flags.R:
@@ -1915,7 +2951,7 @@ class NetworkAnalyzer:
                     details['errorType'] = '|'.join(error_indicators)
 
                 details['headers']['tcp'] = {
-                    'flags': '|'.join(flags) if flags else 'NONE',
+                    'flags': self._tcp_flags_text(tcp),
                     'seq': tcp.seq,
                     'ack': tcp.ack,
                     'window': tcp.window,
@@ -1938,48 +2974,11 @@ class NetworkAnalyzer:
                     except:
                         details['payload']['ascii'] = ''
 
-                    # Try to parse HTTP headers
-                    try:
-                        payload_str = payload_bytes.decode('utf-8', errors='ignore')
-                        # Check if this looks like HTTP
-                        if payload_str.startswith('HTTP/') or \
-                           any(payload_str.startswith(m) for m in ['GET ', 'POST ', 'PUT ', 'DELETE ', 'HEAD ', 'OPTIONS ', 'PATCH ']):
-                            lines = payload_str.split('\r\n')
-                            if lines:
-                                first_line = lines[0]
-                                http_info = {}
-
-                                # Parse request line (e.g., "GET /path HTTP/1.1")
-                                if not first_line.startswith('HTTP/'):
-                                    parts = first_line.split(' ', 2)
-                                    if len(parts) >= 2:
-                                        http_info['method'] = parts[0]
-                                        http_info['path'] = parts[1]
-                                        http_info['version'] = parts[2] if len(parts) > 2 else 'HTTP/1.1'
-                                        http_info['type'] = 'request'
-                                # Parse response line (e.g., "HTTP/1.1 200 OK")
-                                else:
-                                    parts = first_line.split(' ', 2)
-                                    if len(parts) >= 2:
-                                        http_info['version'] = parts[0]
-                                        http_info['status'] = int(parts[1])
-                                        http_info['statusText'] = parts[2] if len(parts) > 2 else ''
-                                        http_info['type'] = 'response'
-
-                                # Parse headers (first few)
-                                headers = {}
-                                for line in lines[1:10]:  # Parse up to 10 headers
-                                    if ':' in line:
-                                        key, value = line.split(':', 1)
-                                        headers[key.strip().lower()] = value.strip()
-
-                                if headers:
-                                    http_info['headers'] = headers
-
-                                if http_info:
-                                    details['http'] = http_info
-                    except:
-                        pass  # Not HTTP or parsing failed
+                # HTTP messages are parsed per flow from the reassembled stream;
+                # only packets that start an HTTP message carry the 'http' key
+                http_info = self._http_packet_info(packet_index, self._flow_key(ip.src, tcp.sport, ip.dst, tcp.dport))
+                if http_info is not None:
+                    details['http'] = http_info
 
             # Extract UDP information
             elif packet.haslayer(UDP):
@@ -2457,10 +3456,11 @@ class NetworkAnalyzer:
         }
 
     def _find_packets_by_connection_id(self, connection_id: str) -> set:
-        """Find packet indices for a connection by parsing its ID and scanning packets.
+        """Find packet indices for a connection by parsing its ID and looking it up.
 
         This method handles all connection types by extracting the 5-tuple from the
-        connection ID and matching it against packets in both directions.
+        connection ID and matching it against packets in both directions. The
+        capture is scanned once to build a flow index; later lookups reuse it.
 
         Args:
             connection_id: Connection identifier in one of these formats:
@@ -2497,46 +3497,93 @@ class NetworkAnalyzer:
         except (ValueError, IndexError):
             return set()
 
-        # Scan packets to find matches
-        matched_indices = set()
-        for idx, packet in enumerate(self.packets):
-            has_ip = packet.haslayer(IP)
-            has_ipv6 = packet.haslayer(IPv6)
-            if not has_ip and not has_ipv6:
-                continue
+        flow_index = self._get_flow_index()
+        return set(flow_index.get(self._flow_key(src_ip, src_port, dst_ip, dst_port), ()))
 
-            ip = packet[IP] if has_ip else packet[IPv6]
+    @staticmethod
+    def _flow_key(ip_a, port_a, ip_b, port_b):
+        """Direction-independent key for a TCP/UDP 5-tuple (protocol not included)."""
+        a, b = (ip_a, port_a), (ip_b, port_b)
+        return (a, b) if a <= b else (b, a)
+
+    def _get_flow_index(self):
+        """Map flow key -> packet indices, built in one pass and reused for lookups."""
+        flow_index = getattr(self, '_flow_index', None)
+        if flow_index is not None:
+            return flow_index
+
+        with self._cache_lock:
+            # Another thread may have built it while this one waited
+            if getattr(self, '_flow_index', None) is not None:
+                return self._flow_index
+            flow_index = defaultdict(list)
+            for idx, packet in enumerate(self.packets):
+                has_ip = packet.haslayer(IP)
+                if not has_ip and not packet.haslayer(IPv6):
+                    continue
+                ip = packet[IP] if has_ip else packet[IPv6]
 
-            # Check TCP/UDP layer
-            transport_layer = None
-            if packet.haslayer(TCP):
-                transport_layer = packet[TCP]
-            elif packet.haslayer(UDP):
-                transport_layer = packet[UDP]
-            else:
-                continue
+                if packet.haslayer(TCP):
+                    transport_layer = packet[TCP]
+                elif packet.haslayer(UDP):
+                    transport_layer = packet[UDP]
+                else:
+                    continue
+                flow_index[self._flow_key(ip.src, transport_layer.sport, ip.dst, transport_layer.dport)].append(idx)
 
-            # Match 5-tuple (bidirectional)
-            matches = (
-                (ip.src == src_ip and transport_layer.sport == src_port and
-                 ip.dst == dst_ip and transport_layer.dport == dst_port)
-                or
-                (ip.src == dst_ip and transport_layer.sport == dst_port and
-                 ip.dst == src_ip and transport_layer.dport == src_port)
-            )
+            self._flow_index = dict(flow_index)
+            return self._flow_index
 
-            if matches:
-                matched_indices.add(idx)
+    def build_capture_model(self):
+        """Record offsets, flow index and packet table of the loaded capture, or None if they cannot be derived.
 
-        return matched_indices
+        The analysis worker saves the model next to the results; API workers
+        map it and rebuild a query-ready analyzer with from_capture_model.
+        """
+        try:
+            offsets = scan_record_offsets(self.pcap_file)
+        except OSError:
+            return None
+        if offsets is None or len(offsets) != len(self.packets):
+            return None
+        flow_index = {key: array('I', indices) for key, indices in self._get_flow_index().items()}
+
+        flow_column = array('I', [NO_FLOW]) * len(self.packets)
+        for flow_id, indices in enumerate(flow_index.values()):
+            for idx in indices:
+                flow_column[idx] = flow_id
+        times = array('d')
+        wirelens = array('I')
+        for packet in self.packets:
+            times.append(float(packet.time))
+            wirelens.append(getattr(packet, 'wirelen', None) or len(packet))
+        columns = {'time': times, 'wirelen': wirelens, 'flow': flow_column}
+        return CaptureModel(self.pcap_file, offsets, flow_index, columns)
+
+    @classmethod
+    def from_capture_model(cls, model):
+        """Analyzer for packet detail / stream queries whose packets are read from disk on demand."""
+        analyzer = cls(model.path)
+        analyzer.packets = LazyPacketList(model.path, model.offsets)
+        analyzer._flow_index = model.flow_index
+        return analyzer
 
     def _build_connection_packets(self, timelines):
-        """Build detailed packet information for each connection.
+        """Collect each connection's packet indices.
+
+        analysis_results['connection_packets'] maps connection id -> sorted packet
+        indices. Full packet details are not built here: the UI opens only a few
+        connections, so they are extracted on demand (_extract_packet_details /
+        connection_packet_details). analysis_results['packet_summary'] keeps just
+        timestamp, length and TCP flags of each referenced packet, which the
+        packet statistics and relativeTime need.
 
         Args:
             timelines: List of timeline objects
         """
         connection_packets = {}
+        packet_summary = {}
+        packet_count = len(self.packets)
 
         for timeline in timelines:
             connection_id = timeline['id']
@@ -2557,22 +3604,48 @@ class NetworkAnalyzer:
             if not packet_indices:
                 packet_indices = self._find_packets_by_connection_id(connection_id)
 
-            # Extract details for each packet
-            packets = []
-            for idx in sorted(packet_indices):
-                packet_detail = self._extract_packet_details(idx)
-                if packet_detail:
-                    packets.append(packet_detail)
-
-            # Calculate relative time from first packet
-            if packets:
-                first_time = packets[0]['timestamp']
-                for packet in packets:
-                    packet['relativeTime'] = f"{packet['timestamp'] - first_time:.3f}s"
+            indices = [idx for idx in sorted(packet_indices) if idx < packet_count]
+            for idx in indices:
+                if idx not in packet_summary:
+                    packet_summary[idx] = self._packet_summary(idx)
 
-            connection_packets[connection_id] = packets
+            connection_packets[connection_id] = indices
 
         self.analysis_results['connection_packets'] = connection_packets
+        self.analysis_results['packet_summary'] = packet_summary
+
+    def _packet_summary(self, packet_index):
+        """Timestamp, wire length and TCP flags of one packet (no payload or protocol parsing)."""
+        packet = self.packets[packet_index]
+        return {
+            'index': packet_index,
+            'timestamp': float(packet.time),
+            'length': len(packet),
+            'tcp_flags': self._tcp_flags_text(packet[TCP]) if packet.haslayer(TCP) else '',
+        }
+
+    @staticmethod
+    def _tcp_flags_text(tcp):
+        """TCP flags as pipe-separated names ('SYN|ACK'), 'NONE' if no flag is set."""
+        flags = []
+        if tcp.flags.S: flags.append('SYN')
+        if tcp.flags.A: flags.append('ACK')
+        if tcp.flags.F: flags.append('FIN')
+        if tcp.flags.R: flags.append('RST')
+        if tcp.flags.P: flags.append('PSH')
+        if tcp.flags.U: flags.append('URG')
+        return '|'.join(flags) if flags else 'NONE'
+
+    def connection_packet_details(self, connection_id, offset=0, limit=None):
+        """Details of a page of one connection's packets, with relativeTime; None if the connection is unknown."""
+        indices = self.analysis_results.get('connection_packets', {}).get(connection_id)
+        if indices is None:
+            return None
+        if not indices:
+            return []
+        stop = None if limit is None else offset + limit
+        details = [self._extract_packet_details(idx) for idx in indices[offset:stop]]
+        return with_relative_time([d for d in details if d], float(self.packets[indices[0]].time))
 
     # ── Phase 5: Statistics summary ────────────────────────────────────
 
@@ -2686,13 +3759,23 @@ class NetworkAnalyzer:
 
     def extract_expert_info(self):
         """Extract expert information events (retransmissions, RST, ZeroWindow, anomalous TTL)."""
-        events = []
-
         # Reuse packet loss data if available
         loss_data = self.analysis_results.get('packet_loss')
         if loss_data is None:
             loss_data = self.detect_packet_loss()
 
+        accumulator = _ExpertEventAccumulator()
+        for idx, packet in enumerate(self.packets):
+            accumulator.observe(idx, packet)
+
+        events = self._compose_expert_info(loss_data, accumulator.result(),
+                                           self.analysis_results.get('attack_analysis'))
+        self.analysis_results['expert_info'] = events
+        return events
+
+    def _compose_expert_info(self, loss_data, packet_events, attack_data):
+        """Merge packet-loss, per-packet and attack summary events, sorted by time."""
+        events = []
         for item in loss_data:
             if item['type'] == 'retransmission':
                 events.append({
@@ -2713,57 +3796,14 @@ class NetworkAnalyzer:
                     'stream': item['stream']
                 })
 
-        # Scan for RST, ZeroWindow, anomalous TTL
-        for idx, packet in enumerate(self.packets):
-            if not packet.haslayer(IP):
-                if not packet.haslayer(IPv6):
-                    continue
-            ts = float(packet.time)
-
-            ip = packet[IP] if packet.haslayer(IP) else packet[IPv6]
-            ttl = getattr(ip, 'ttl', getattr(ip, 'hlim', 64))
-
-            if packet.haslayer(TCP):
-                tcp = packet[TCP]
-                flags = int(tcp.flags)
-                stream = f"{ip.src}:{tcp.sport}-{ip.dst}:{tcp.dport}"
-
-                if flags & 0x04:  # RST
-                    events.append({
-                        'severity': 'error',
-                        'type': 'RST',
-                        'message': f'Connection reset {stream}',
-                        'packetIndex': idx,
-                        'timestamp': ts,
-                        'stream': stream
-                    })
-                if tcp.window == 0 and not (flags & 0x02):  # ZeroWindow (not SYN)
-                    events.append({
-                        'severity': 'error',
-                        'type': 'Zero Window',
-                        'message': f'Zero window advertised by {ip.src} in {stream}',
-                        'packetIndex': idx,
-                        'timestamp': ts,
-                        'stream': stream
-                    })
-
-            if ttl <= 2:
-                events.append({
-                    'severity': 'note',
-                    'type': 'Anomalous TTL',
-                    'message': f'Very low TTL ({ttl}) from {ip.src}',
-                    'packetIndex': idx,
-                    'timestamp': ts,
-                    'stream': ''
-                })
+        events.extend(packet_events)
 
         # 攻擊模式彙總事件（利用 detect_attacks() 的結果）
-        attack_data = self.analysis_results.get('attack_analysis')
         if attack_data:
             det = attack_data.get('attack_detection', {})
             metrics = attack_data.get('metrics', {})
             flags = attack_data.get('tcp_flags', {})
-            first_ts = float(self.packets[0].time) if self.packets else 0
+            first_ts = self._capture_time_span()[0]
 
             # 已偵測到攻擊 → error 事件
             if det.get('detected'):
@@ -2776,6 +3816,23 @@ class NetworkAnalyzer:
                     'stream': ''
                 })
 
+            # 時間窗口事件 → 以實際發生時間標記（只取最細粒度窗口，避免同一事件重複）
+            incidents = attack_data.get('incidents') or []
+            if incidents:
+                finest = min(item['window_seconds'] for item in incidents)
+                for incident in incidents:
+                    if incident['window_seconds'] != finest:
+                        continue
+                    events.append({
+                        'severity': 'error' if incident['severity'] == 'high' else 'warning',
+                        'type': incident['type'],
+                        'message': f"{incident['type']} 持續 {incident['duration_seconds']:.0f}s"
+                                   f"（峰值 {incident['peak_metrics']['packets_per_second']:.0f} pkt/s）",
+                        'packetIndex': incident.get('first_packet_index') or 0,
+                        'timestamp': incident['start'],
+                        'stream': ''
+                    })
+
             # 高連線速率 → warning 事件
             cps = metrics.get('connections_per_second', 0)
             if cps > 50:
@@ -2817,7 +3874,6 @@ class NetworkAnalyzer:
                 })
 
         events.sort(key=lambda e: e['timestamp'])
-        self.analysis_results['expert_info'] = events
         return events
 
     # ── Phase 10: TLS handshake parsing (raw bytes) ────────────────────
@@ -2851,179 +3907,42 @@ class NetworkAnalyzer:
         name = self.CIPHER_SUITES.get(code, 'Unknown')
         return f'0x{code:04x} ({name})'
 
-    def _extract_supported_version(self, data, offset):
-        """Extract TLS 1.3 supported_versions from ClientHello extensions."""
-        try:
-            sid_len = data[offset]
-            offset += 1 + sid_len
-            if offset + 2 > len(data):
-                return None
-            cs_len = int.from_bytes(data[offset:offset + 2], 'big')
-            offset += 2 + cs_len
-            if offset >= len(data):
-                return None
-            cm_len = data[offset]
-            offset += 1 + cm_len
-            if offset + 2 > len(data):
-                return None
-            ext_len = int.from_bytes(data[offset:offset + 2], 'big')
-            offset += 2
-            ext_end = min(offset + ext_len, len(data))
-            while offset + 4 <= ext_end:
-                ext_type = int.from_bytes(data[offset:offset + 2], 'big')
-                ext_data_len = int.from_bytes(data[offset + 2:offset + 4], 'big')
-                offset += 4
-                if ext_type == 0x002B and ext_data_len >= 3:  # supported_versions
-                    # First byte is list length, then 2-byte version entries
-                    if offset + 1 <= len(data):
-                        list_len = data[offset]
-                        for i in range(0, min(list_len, ext_data_len - 1), 2):
-                            if offset + 1 + i + 2 <= len(data):
-                                major = data[offset + 1 + i]
-                                minor = data[offset + 1 + i + 1]
-                                if (major, minor) == (3, 4):
-                                    return 'TLS 1.3'
-                offset += max(ext_data_len, 1)
-        except (IndexError, ValueError):
-            pass
-        return None
-
-    def _extract_sni(self, data, offset):
-        """Extract SNI from ClientHello extensions."""
-        try:
-            # Skip session_id
-            if offset >= len(data):
-                return None
-            sid_len = data[offset]
-            offset += 1 + sid_len
-            # Skip cipher suites
-            if offset + 2 > len(data):
-                return None
-            cs_len = int.from_bytes(data[offset:offset + 2], 'big')
-            offset += 2 + cs_len
-            # Skip compression methods
-            if offset >= len(data):
-                return None
-            cm_len = data[offset]
-            offset += 1 + cm_len
-            # Extensions
-            if offset + 2 > len(data):
-                return None
-            ext_len = int.from_bytes(data[offset:offset + 2], 'big')
-            offset += 2
-            ext_end = min(offset + ext_len, len(data))
-            while offset + 4 <= ext_end:
-                ext_type = int.from_bytes(data[offset:offset + 2], 'big')
-                ext_data_len = int.from_bytes(data[offset + 2:offset + 4], 'big')
-                offset += 4
-                if ext_type == 0x0000 and ext_data_len > 5:  # SNI
-                    if offset + 5 > len(data):
-                        break
-                    name_len = int.from_bytes(data[offset + 3:offset + 5], 'big')
-                    if offset + 5 + name_len <= len(data):
-                        return data[offset + 5:offset + 5 + name_len].decode('ascii', errors='replace')
-                offset += max(ext_data_len, 1)  # guard against zero-length infinite loop
-        except (IndexError, ValueError):
-            pass
-        return None
-
     def extract_tls_info(self):
-        """Extract TLS handshake info from raw packet bytes (no Scapy TLS dependency)."""
-        sessions = {}  # connection_id → session dict
-
-        for packet in self.packets:
-            if not packet.haslayer(TCP) or not packet.haslayer(Raw):
-                continue
-            has_ip = packet.haslayer(IP)
-            has_ipv6 = packet.haslayer(IPv6)
-            if not has_ip and not has_ipv6:
-                continue
-            tcp = packet[TCP]
-            if tcp.sport != 443 and tcp.dport != 443:
-                continue
-
-            ip = packet[IP] if has_ip else packet[IPv6]
-            # Normalize connection ID: server (port 443) always on one side
-            if tcp.sport == 443:
-                conn_id = f'{ip.src}:{tcp.sport}-{ip.dst}:{tcp.dport}'
-            else:
-                conn_id = f'{ip.dst}:{tcp.dport}-{ip.src}:{tcp.sport}'
-
-            data = bytes(packet[Raw].load)
-            if len(data) < 6:
-                continue
-
-            content_type = data[0]
-            if content_type not in (0x14, 0x15, 0x16, 0x17):
-                continue
-
-            if conn_id not in sessions:
-                sessions[conn_id] = {
-                    'connection_id': conn_id,
-                    'client_hello': None,
-                    'server_hello': None,
-                    'handshake_complete': False,
-                    'has_app_data': False,
-                }
-
-            sess = sessions[conn_id]
+        """Extract TLS handshake info and JA3/JA4 fingerprints from reassembled flows.
 
-            if content_type == 0x17:  # Application Data
-                sess['has_app_data'] = True
-                continue
-
-            if content_type == 0x14:  # ChangeCipherSpec
-                sess['handshake_complete'] = True
-                continue
-
-            if content_type != 0x16 or len(data) < 6:  # Not Handshake
+        TLS is detected by content (a TLS record header at the start of the
+        flow's first payload), not by port. Each candidate flow is reassembled
+        up to TLS_REASSEMBLY_BYTES per direction, so handshake messages split
+        across segments or records are parsed while the cost stays bounded.
+        """
+        tls_sessions = []
+        ja3_counts = Counter()
+        ja4_counts = Counter()
+
+        for indices in self._get_flow_index().values():
+            first_payload = None
+            for idx in indices[:self.TLS_MAX_PACKETS_PER_FLOW]:
+                packet = self.packets[idx]
+                if not packet.haslayer(TCP):
+                    break
+                if packet[TCP].payload:
+                    first_payload = bytes(packet[TCP].payload)
+                    break
+            if first_payload is None or not looks_like_tls(first_payload):
                 continue
 
-            # Validate record length to skip fragmented/truncated records
-            record_len = int.from_bytes(data[3:5], 'big')
-            if len(data) < 5 + record_len:
+            reassembler = self._reassemble_packets(indices, max_bytes=self.TLS_REASSEMBLY_BYTES,
+                                                   max_packets=self.TLS_MAX_PACKETS_PER_FLOW)
+            if reassembler is None:
                 continue
-
-            try:
-                hs_type = data[5]
-                record_version = self._parse_tls_version(data[1], data[2])
-
-                if hs_type == 1 and sess['client_hello'] is None:  # ClientHello
-                    client_version = self._parse_tls_version(data[9], data[10]) if len(data) > 10 else record_version
-                    # Count cipher suites
-                    cs_count = 0
-                    sni = None
-                    if len(data) > 43:
-                        sid_len = data[43]
-                        cs_offset = 44 + sid_len
-                        if cs_offset + 2 <= len(data):
-                            cs_bytes = int.from_bytes(data[cs_offset:cs_offset + 2], 'big')
-                            cs_count = cs_bytes // 2
-                        sni = self._extract_sni(data, 43)
-                    # TLS 1.3 advertises legacy_version=0x0303; check supported_versions extension
-                    real_version = self._extract_supported_version(data, 43)
-                    sess['client_hello'] = {
-                        'sni': sni,
-                        'tls_version': real_version or client_version,
-                        'cipher_suite_count': cs_count,
-                    }
-
-                elif hs_type == 2 and sess['server_hello'] is None:  # ServerHello
-                    server_version = self._parse_tls_version(data[9], data[10]) if len(data) > 10 else record_version
-                    cipher_code = None
-                    if len(data) > 43:
-                        sid_len = data[43]
-                        cs_offset = 44 + sid_len
-                        if cs_offset + 2 <= len(data):
-                            cipher_code = int.from_bytes(data[cs_offset:cs_offset + 2], 'big')
-                    sess['server_hello'] = {
-                        'tls_version': server_version,
-                        'cipher_suite': self._parse_cipher_suite(cipher_code) if cipher_code else 'Unknown',
-                    }
-            except (IndexError, ValueError):
+            session = self._parse_tls_session(reassembler, indices)
+            if session is None:
                 continue
-
-        tls_sessions = list(sessions.values())
+            tls_sessions.append(session)
+            client_hello = session['client_hello']
+            if client_hello:
+                ja3_counts[client_hello['ja3_hash']] += 1
+                ja4_counts[client_hello['ja4']] += 1
 
         # Build summary
         version_counts = {}
@@ -3041,12 +3960,88 @@ class NetworkAnalyzer:
                 'total_tls_connections': len(tls_sessions),
                 'tls_versions': version_counts,
                 'unique_snis': sorted(unique_snis),
+                'ja3_fingerprints': self.counter_to_list(ja3_counts, top_n=20),
+                'ja4_fingerprints': self.counter_to_list(ja4_counts, top_n=20),
             }
         }
 
         self.analysis_results['tls_info'] = result
         return result
 
+    def _parse_tls_session(self, reassembler, indices):
+        """Build one tls_sessions entry from a flow reassembled by _reassemble_packets."""
+        streams = {
+            'client': parse_stream(reassembler.client_stream.buffer),
+            'server': parse_stream(reassembler.server_stream.buffer),
+        }
+        # The side that sent the ClientHello is the TLS client, whoever opened the TCP connection
+        client_side = 'client'
+        if not any(hs[0] == HANDSHAKE_CLIENT_HELLO for hs in streams['client']['handshakes']) and \
+                any(hs[0] == HANDSHAKE_CLIENT_HELLO for hs in streams['server']['handshakes']):
+            client_side = 'server'
+        server_side = 'server' if client_side == 'client' else 'client'
+        client_stream = reassembler.stream_for(client_side)
+
+        endpoints = {'client': reassembler.client, 'server': self._flow_peer(indices, reassembler.client)}
+        server_ip, server_port = endpoints[server_side]
+        client_ip, client_port = endpoints[client_side]
+
+        session = {
+            'connection_id': f'{server_ip}:{server_port}-{client_ip}:{client_port}',
+            'client_hello': None,
+            'server_hello': None,
+            'handshake_complete': False,
+            'has_app_data': False,
+        }
+        record_types = streams['client']['record_types'] | streams['server']['record_types']
+        session['handshake_complete'] = RECORD_CHANGE_CIPHER_SPEC in record_types
+        session['has_app_data'] = RECORD_APPLICATION_DATA in record_types
+
+        for hs_type, body, end_offset in streams[client_side]['handshakes']:
+            if hs_type != HANDSHAKE_CLIENT_HELLO:
+                continue
+            try:
+                hello = parse_client_hello(body)
+            except ValueError:
+                break
+            ja3_text, ja3_hash = ja3(hello)
+            # How many TCP segments carried the ClientHello (large PQ key shares span several)
+            segments = sum(1 for seg in client_stream.segments
+                           if seg['newBytes'] and seg['offset'] < end_offset)
+            session['client_hello'] = {
+                'sni': hello['sni'],
+                'tls_version': self._parse_tls_version(*divmod(client_version(hello), 256)),
+                'cipher_suite_count': len([c for c in hello['ciphers'] if not is_grease(c)]),
+                'alpn': hello['alpn'],
+                'size': len(body) + 4,
+                'segments': segments,
+                'ja3': ja3_text,
+                'ja3_hash': ja3_hash,
+                'ja4': ja4(hello),
+            }
+            break
+
+        for hs_type, body, _ in streams[server_side]['handshakes']:
+            if hs_type != HANDSHAKE_SERVER_HELLO:
+                continue
+            try:
+                hello = parse_server_hello(body)
+            except ValueError:
+                break
+            ja3s_text, ja3s_hash = ja3s(hello)
+            version = hello['selected_version'] or hello['legacy_version']
+            session['server_hello'] = {
+                'tls_version': self._parse_tls_version(*divmod(version, 256)),
+                'cipher_suite': self._parse_cipher_suite(hello['cipher']),
+                'ja3s': ja3s_text,
+                'ja3s_hash': ja3s_hash,
+            }
+            break
+
+        if not session['client_hello'] and not session['server_hello'] and not record_types:
+            return None
+        return session
+
     # ── Phase 12: IP geolocation enrichment ─────────────────────────────
 
     def _classify_ip(self, ip_str):
@@ -3151,26 +4146,28 @@ class NetworkAnalyzer:
             return breakpoints[-1][1]
 
         # ── Latency score (40%) ──
-        rtt_samples = []
-        for h in latency.get('tcp_handshakes', []):
-            rtt_samples.append(h['handshake_time'])
-        for p in latency.get('ping_responses', []):
-            rtt_samples.append(p['rtt'])
-
-        if rtt_samples:
-            avg_rtt = sum(rtt_samples) / len(rtt_samples)
-        else:
-            avg_rtt = 0
-
-        # Lower RTT → higher score
+        # analyze_latency() already merged handshake + ping RTTs into rtt_summary
+        rtt = latency.get('rtt_summary')
+        if rtt is None:  # latency results without the summary (older results files)
+            rtt_sketch = QuantileSketch()
+            rtt_sketch.update(h['handshake_time'] for h in latency.get('tcp_handshakes', []))
+            rtt_sketch.update(p['rtt'] for p in latency.get('ping_responses', []))
+            rtt = rtt_sketch.summary()
+
+        # Lower RTT → higher score. Typical (p50) and tail (p90) latency weigh
+        # equally, so a few slow outliers cannot dominate the way they do a mean
         latency_breakpoints = [(0, 100), (20, 90), (50, 75), (100, 55), (200, 35), (500, 15), (2000, 5)]
-        latency_score = _interp(avg_rtt, latency_breakpoints) if rtt_samples else 50  # neutral when no data
+        scored_rtt = (rtt['p50'] + rtt['p90']) / 2
+        latency_score = _interp(scored_rtt, latency_breakpoints) if rtt['count'] else 50  # neutral when no data
 
         latency_result = {
             'score': round(latency_score, 1),
-            'avg_rtt_ms': round(avg_rtt, 1),
+            'avg_rtt_ms': round(rtt['mean'], 1),
+            'p50_rtt_ms': round(rtt['p50'], 1),
+            'p90_rtt_ms': round(rtt['p90'], 1),
+            'p99_rtt_ms': round(rtt['p99'], 1),
             'grade': _score_to_grade(latency_score),
-            'sample_count': len(rtt_samples),
+            'sample_count': rtt['count'],
         }
 
         # ── Packet loss score (35%) ──
@@ -3193,12 +4190,12 @@ class NetworkAnalyzer:
         }
 
         # ── Throughput score (25%) ──
-        packet_sizes = stats.get('packet_sizes', [])
-        total_bytes = sum(packet_sizes) if packet_sizes else 0
+        total_bytes = stats.get('total_bytes')
+        if total_bytes is None:
+            total_bytes = sum(stats.get('packet_sizes', []))
 
-        if len(self.packets) >= 2:
-            first_t = float(self.packets[0].time)
-            last_t = float(self.packets[-1].time)
+        first_t, last_t = self._capture_time_span()
+        if stats.get('total_packets', 0) >= 2:
             duration = max(last_t - first_t, 0.001)
         else:
             duration = 0.001
@@ -3232,115 +4229,321 @@ class NetworkAnalyzer:
         self.analysis_results['performance_score'] = result
         return result
 
-    # ── Phase 8: TCP stream reassembly ─────────────────────────────────
+    # ── Phase 13: DNS transactions ─────────────────────────────────────
 
-    def reassemble_tcp_stream(self, connection_id):
-        """Reassemble a TCP stream's payload for the given connection_id.
+    DNS_TABLE_COLUMNS = ('time', 'txid', 'client', 'clientPort', 'server', 'qname', 'qtype', 'rcode',
+                         'latencyMs', 'answerCount', 'querySize', 'responseSize', 'retries', 'status',
+                         'queryPacket', 'responsePacket')
 
-        Returns client→server and server→client data segments (max 4096 bytes each).
+    def _get_dns_transactions(self):
+        """Match DNS queries and responses over UDP/53 in a single pass.
+
+        See _DnsTransactionTable for the matching rules. The result is cached
+        until the capture is reloaded.
         """
-        indices = self._find_packets_by_connection_id(connection_id)
-        if not indices:
-            return None
+        cached = getattr(self, '_dns_transactions', None)
+        if cached is not None:
+            return cached
 
-        # Determine client/server from first SYN or first packet
-        first_idx = min(indices)
-        first_pkt = self.packets[first_idx]
-        if not first_pkt.haslayer(IP) or not first_pkt.haslayer(TCP):
-            return None
+        table = _DnsTransactionTable(self.DNS_TIMEOUT_SECONDS, self.CARDINALITY_MODE)
+        for index, packet in enumerate(self.packets):
+            table.observe(index, packet)
+
+        self._dns_transactions = table.result()
+        return self._dns_transactions
+
+    def analyze_dns(self):
+        """DNS transaction table plus per-server latency and error rates (Phase 13)."""
+        dns_data = self._get_dns_transactions()
+        rows = dns_data['rows']
+
+        def new_bucket():
+            return {'queries': 0, 'answered': 0, 'timeouts': 0, 'unsolicited': 0, 'retries': 0,
+                    'rcodes': Counter(), 'latency': QuantileSketch()}
+
+        overall = new_bucket()
+        per_server = defaultdict(new_bucket)
+        for row in rows:
+            for bucket in (overall, per_server[row['server']]):
+                if row['status'] == 'unsolicited':
+                    bucket['unsolicited'] += 1
+                    continue
+                bucket['queries'] += 1
+                bucket['retries'] += row['retries']
+                if row['status'] == 'timeout':
+                    bucket['timeouts'] += 1
+                    continue
+                bucket['answered'] += 1
+                bucket['rcodes'][row['rcode']] += 1
+                bucket['latency'].add(row['latencyMs'])
+
+        def summarize(bucket):
+            answered = bucket['answered']
+            rcodes = bucket['rcodes']
+            return {
+                'queries': bucket['queries'],
+                'answered': answered,
+                'timeouts': bucket['timeouts'],
+                'retries': bucket['retries'],
+                'unsolicited_responses': bucket['unsolicited'],
+                'timeout_rate': round(bucket['timeouts'] / bucket['queries'], 4) if bucket['queries'] else 0,
+                'nxdomain_rate': round(rcodes[self._dns_rcode_name(3)] / answered, 4) if answered else 0,
+                'servfail_rate': round(rcodes[self._dns_rcode_name(2)] / answered, 4) if answered else 0,
+                'rcodes': dict(rcodes),
+                'latency_ms': bucket['latency'].summary(),
+            }
+
+        servers = sorted(per_server.items(), key=lambda item: item[1]['queries'], reverse=True)
+        result = {
+            'summary': summarize(overall),
+            'servers': {server: summarize(bucket) for server, bucket in servers[:self.DNS_MAX_SERVERS]},
+            'amplification': dict(dns_data['amplification']),
+            'transactions': {
+                'columns': list(self.DNS_TABLE_COLUMNS),
+                'rows': [[row.get(column) for column in self.DNS_TABLE_COLUMNS]
+                         for row in rows[:self.DNS_TABLE_MAX_ROWS]],
+                'total': len(rows),
+            },
+        }
+        self.analysis_results['dns_analysis'] = result
+        return result
+
+    # ── Phase 8: TCP stream reassembly ─────────────────────────────────
+
+    def _get_reassembled_stream(self, connection_id):
+        """Reassemble (or fetch from the small LRU) the TCP stream for connection_id."""
+        with self._cache_lock:
+            cache = getattr(self, '_stream_cache', None)
+            if cache is None:
+                cache = self._stream_cache = ByteBudgetLRU(self.STREAM_CACHE_MAX_BYTES,
+                                                           max_entries=self.STREAM_CACHE_SIZE)
+            reassembler = cache.get(connection_id)
+            if reassembler is not None:
+                return reassembler
+
+            indices = self._find_packets_by_connection_id(connection_id)
+            if not indices:
+                return None
+            reassembler = self._reassemble_packets(sorted(indices))
+            if reassembler is None:
+                return None
+
+            size = (len(reassembler.client_stream.buffer) + len(reassembler.server_stream.buffer)
+                    + reassembler.segment_count * self.STREAM_SEGMENT_BYTES)
+            cache.put(connection_id, reassembler, size)
+            return reassembler
+
+    def _reassemble_packets(self, ordered, max_bytes=None, max_packets=None):
+        """Run TcpStreamReassembler over the given (sorted) packet indices of one flow.
 
-        client_ip = first_pkt[IP].src
-        client_port = first_pkt[TCP].sport
+        ``max_bytes`` caps each direction (default STREAM_MAX_BYTES) and
+        ``max_packets`` limits how many of the flow's packets are read; packets
+        stop being decoded once both directions are full.
+        """
+        if max_packets is not None:
+            ordered = ordered[:max_packets]
 
-        segments = []
-        for idx in sorted(indices):
+        def tcp_layers(idx):
             pkt = self.packets[idx]
-            if not pkt.haslayer(TCP) or not pkt.haslayer(IP):
+            if not pkt.haslayer(TCP) or not (pkt.haslayer(IP) or pkt.haslayer(IPv6)):
+                return pkt, None, None
+            return pkt, (pkt[IP] if pkt.haslayer(IP) else pkt[IPv6]), pkt[TCP]
+
+        # Client = sender of the first bare SYN, falling back to the first packet's sender.
+        # The handshake precedes any data, so the search stops at the first payload
+        # (a capture started mid-stream) and normally decodes just one packet
+        client = None
+        for idx in ordered:
+            _, ip, tcp = tcp_layers(idx)
+            if tcp is None:
                 continue
-            tcp = pkt[TCP]
-            ip = pkt[IP]
-            payload = bytes(tcp.payload) if tcp.payload else b''
-            if not payload:
+            flags = int(tcp.flags)
+            if client is None:
+                client = (ip.src, tcp.sport)
+            if flags & 0x02 and not flags & 0x10:
+                client = (ip.src, tcp.sport)
+                break
+            if tcp.payload:
+                break
+        if client is None:
+            return None
+
+        # Packets are decoded one at a time, so reading stops once both directions are full
+        reassembler = TcpStreamReassembler(client, max_bytes=max_bytes or self.STREAM_MAX_BYTES)
+        for idx in ordered:
+            if reassembler.client_stream.truncated and reassembler.server_stream.truncated:
+                break
+            pkt, ip, tcp = tcp_layers(idx)
+            if tcp is None:
                 continue
-            is_client = (ip.src == client_ip and tcp.sport == client_port)
-            segments.append({
-                'seq': tcp.seq,
-                'direction': 'client' if is_client else 'server',
-                'data': payload,
-                'index': idx,
-                'timestamp': float(pkt.time)
-            })
+            reassembler.add(
+                (ip.src, tcp.sport), tcp.seq, bytes(tcp.payload) if tcp.payload else b'',
+                syn=bool(int(tcp.flags) & 0x02),
+                packetIndex=idx, timestamp=float(pkt.time),
+            )
+        return reassembler.finish()
 
-        segments.sort(key=lambda s: s['timestamp'])
+    @staticmethod
+    def _stream_page(stream, offset, limit):
+        chunk = memoryview(stream.buffer)[offset:offset + limit]
+        return {
+            'hex': chunk.hex(),
+            'ascii': printable_ascii(chunk),
+            'length': len(chunk),
+            'offset': offset,
+            'totalLength': len(stream.buffer),
+            'hasMore': offset + len(chunk) < len(stream.buffer),
+            'duplicateBytes': stream.duplicate_bytes,
+            'gaps': stream.gaps,
+            'truncated': stream.truncated,
+        }
 
-        client_data = b''
-        server_data = b''
-        stream_entries = []
-        max_bytes = 4096
+    def reassemble_tcp_stream(self, connection_id, offset=0, limit=None):
+        """Reassemble a TCP stream's payload for the given connection_id.
 
-        for seg in segments:
-            if seg['direction'] == 'client' and len(client_data) < max_bytes:
-                chunk = seg['data'][:max_bytes - len(client_data)]
-                client_data += chunk
-            elif seg['direction'] == 'server' and len(server_data) < max_bytes:
-                chunk = seg['data'][:max_bytes - len(server_data)]
-                server_data += chunk
+        Segments are ordered by sequence number with retransmissions and
+        overlaps removed. ``offset``/``limit`` select a byte range (applied to
+        each direction) so long streams can be followed page by page; only the
+        segments whose data falls in that range are listed.
+        """
+        reassembler = self._get_reassembled_stream(connection_id)
+        if reassembler is None:
+            return None
+        offset = max(0, int(offset or 0))
+        limit = self.STREAM_PAGE_BYTES if limit is None else max(1, int(limit))
+        window_end = offset + limit
 
-            preview = seg['data'][:256]
+        stream_entries = []
+        for seg in reassembler.segments():
+            seg_start = seg['offset'] or 0
+            seg_end = seg_start + max(seg['newBytes'], 1)
+            if seg_end <= offset or seg_start >= window_end:
+                continue
+            stream = reassembler.stream_for(seg['direction'])
+            if seg['newBytes']:
+                preview = memoryview(stream.buffer)[seg_start:seg_start + min(seg['newBytes'], 256)]
+            else:
+                preview = b''
             stream_entries.append({
                 'direction': seg['direction'],
-                'length': len(seg['data']),
-                'packetIndex': seg['index'],
+                'length': seg['length'],
+                'packetIndex': seg['packetIndex'],
                 'timestamp': seg['timestamp'],
+                'streamOffset': seg['offset'],
+                'retransmission': seg['retransmission'],
                 'hex': preview.hex(),
-                'ascii': ''.join(chr(b) if 32 <= b < 127 else '.' for b in preview)
+                'ascii': printable_ascii(preview)
             })
 
+        client_page = self._stream_page(reassembler.client_stream, offset, limit)
+        server_page = self._stream_page(reassembler.server_stream, offset, limit)
         return {
             'connectionId': connection_id,
-            'clientData': {
-                'hex': client_data.hex(),
-                'ascii': ''.join(chr(b) if 32 <= b < 127 else '.' for b in client_data),
-                'length': len(client_data)
-            },
-            'serverData': {
-                'hex': server_data.hex(),
-                'ascii': ''.join(chr(b) if 32 <= b < 127 else '.' for b in server_data),
-                'length': len(server_data)
-            },
+            'offset': offset,
+            'limit': limit,
+            'hasMore': client_page['hasMore'] or server_page['hasMore'],
+            'clientData': client_page,
+            'serverData': server_page,
             'segments': stream_entries,
-            'totalSegments': len(stream_entries)
+            'totalSegments': reassembler.segment_count
         }
 
+    def _save_series_sidecars(self, directory: str) -> None:
+        """Write raw per-packet series as flat native-endian binary arrays."""
+        for name, values in getattr(self, 'per_packet_series', {}).items():
+            filename = self.SERIES_SIDECAR_FILES[name][0]
+            with open(os.path.join(directory, filename), 'wb') as handle:
+                values.tofile(handle)
+
+    def _save_sections(self, directory: str, encoded: dict) -> dict:
+        """Write each result section to its own file plus a manifest listing them.
+
+        Returns the manifest's {name: {'file', 'bytes'}} entries.
+        """
+        sections_dir = os.path.join(directory, self.RESULT_SECTIONS_DIR)
+        os.makedirs(sections_dir, exist_ok=True)
+        sections = {}
+        for name, text in encoded.items():
+            filename = f'{name}.json'
+            data = text.encode('utf-8')
+            with open(os.path.join(sections_dir, filename), 'wb') as handle:
+                handle.write(data)
+            sections[name] = {'file': filename, 'bytes': len(data)}
+        # manifest 最後寫入：讀取端以 manifest 為準
+        with open(os.path.join(sections_dir, self.RESULT_MANIFEST_FILE), 'w', encoding='utf-8') as handle:
+            json.dump({'version': 1, 'sections': sections}, handle, ensure_ascii=False)
+        return sections
+
+    def _result_tables(self) -> dict:
+        """Per-packet tables as {table: {column: values}} for the columnar store.
+
+        Only tables an endpoint reads are written (/api/packets/statistics
+        projects packets and connection_packets); smaller lists such as flows,
+        expert events and timelines are served from their result sections.
+        """
+        results = self.analysis_results
+        tables = {}
+        if 'packet_summary' in results:
+            summary = results['packet_summary']
+            tables['packets'] = columns_from_records([summary[idx] for idx in sorted(summary)])
+        if 'connection_packets' in results:
+            memberships = [(connection_id, idx) for connection_id, indices in results['connection_packets'].items()
+                           for idx in indices]
+            tables['connection_packets'] = {
+                'connection_id': [connection_id for connection_id, _ in memberships],
+                'packet_index': [idx for _, idx in memberships],
+            }
+        return tables
+
+    def _save_tables(self, directory: str, tables: dict) -> None:
+        """Write each table with columnar_store plus a manifest listing them."""
+        tables_dir = os.path.join(directory, self.RESULT_TABLES_DIR)
+        os.makedirs(tables_dir, exist_ok=True)
+        entries = {}
+        for name, columns in tables.items():
+            file_path = write_table(os.path.join(tables_dir, name), columns)
+            rows = len(next(iter(columns.values()))) if columns else 0
+            entries[name] = {'file': os.path.basename(file_path), 'rows': rows, 'columns': list(columns)}
+        with open(os.path.join(tables_dir, self.RESULT_MANIFEST_FILE), 'w', encoding='utf-8') as handle:
+            json.dump({'version': 1, 'format': DEFAULT_FORMAT, 'tables': entries}, handle, ensure_ascii=False)
+
     def save_results(self, output_file="network_analysis_results.json", public_output_dir="public/data"):
         os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
 
+        # 每個區段只序列化一次，寫入 sections/；合併檔只列出區段，不重複內容
+        encoded = {name: json.dumps(value, ensure_ascii=False, default=str)
+                   for name, value in self.analysis_results.items()
+                   if name not in self.RESULT_TABLE_ONLY_SECTIONS}
+        tables = self._result_tables()
+        sections = self._save_sections(os.path.dirname(output_file) or '.', encoded)
         with open(output_file, 'w', encoding='utf-8') as handle:
-            json.dump(self.analysis_results, handle, ensure_ascii=False, indent=2, default=str)
+            json.dump({
+                'version': 1,
+                'sections': {name: {'file': f'{self.RESULT_SECTIONS_DIR}/{entry["file"]}', 'bytes': entry['bytes']}
+                             for name, entry in sections.items()},
+            }, handle, ensure_ascii=False)
         self._safe_print(f'分析結果已儲存至 {output_file}')
+        self._save_series_sidecars(os.path.dirname(output_file) or '.')
+        self._save_tables(os.path.dirname(output_file) or '.', tables)
+        write_result_db(os.path.join(os.path.dirname(output_file) or '.', RESULT_DB_FILE), self.analysis_results)
 
         if public_output_dir:
             os.makedirs(public_output_dir, exist_ok=True)
             public_result_path = os.path.join(public_output_dir, os.path.basename(output_file))
-            with open(public_result_path, 'w', encoding='utf-8') as handle:
-                json.dump(self.analysis_results, handle, ensure_ascii=False, indent=2, default=str)
+            # The session server passes the same directory for both; copy instead of re-serializing
+            if not os.path.exists(public_result_path) or not os.path.samefile(output_file, public_result_path):
+                shutil.copyfile(output_file, public_result_path)
+                self._save_series_sidecars(public_output_dir)
+                self._save_sections(public_output_dir, encoded)
+                self._save_tables(public_output_dir, tables)
+                write_result_db(os.path.join(public_output_dir, RESULT_DB_FILE), self.analysis_results)
             self._safe_print(f'已同步輸出至 {public_result_path}')
 
-            if 'protocol_timelines' in self.analysis_results:
-                timeline_path = os.path.join(public_output_dir, 'protocol_timeline_sample.json')
-                with open(timeline_path, 'w', encoding='utf-8') as handle:
-                    json.dump(self.analysis_results['protocol_timelines'], handle, ensure_ascii=False, indent=2)
-                self._safe_print(f'已寫入協定時間軸範例至 {timeline_path}')
             if 'mind_map' in self.analysis_results:
                 mind_map_path = os.path.join(public_output_dir, 'network_mind_map.json')
                 with open(mind_map_path, 'w', encoding='utf-8') as handle:
-                    json.dump(self.analysis_results['mind_map'], handle, ensure_ascii=False, indent=2)
+                    json.dump(self.analysis_results['mind_map'], handle, ensure_ascii=False, separators=(',', ':'))
                 self._safe_print(f'心智圖已輸出至 {mind_map_path}')
-            if 'connection_packets' in self.analysis_results:
-                packets_path = os.path.join(public_output_dir, 'connection_packets.json')
-                with open(packets_path, 'w', encoding='utf-8') as handle:
-                    json.dump(self.analysis_results['connection_packets'], handle, ensure_ascii=False, indent=2)
-                self._safe_print(f'連線封包詳細資訊已輸出至 {packets_path}')
 
 def main():
     if len(sys.argv) > 1:
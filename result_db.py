@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Per-session SQLite store for the queryable analysis tables.
+
+``/api/packets/{connection_id}`` and ``/api/packets/batch`` used to
+``json.load`` all of connection_packets.json to return a page of one
+connection. ``write_result_db`` stores the packets of each connection in an
+indexed table instead, so a request reads only the rows it returns.
+
+``packets`` lists which packet indices belong to a connection, in order;
+the packet details themselves are extracted from the capture when a page is
+requested. Flows, expert events and timelines are not stored here: their
+endpoints return the whole list, which the result sections already serve.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+from pathlib import Path
+
+RESULT_DB_FILE = 'results.sqlite'
+RESULT_DB_VERSION = 3
+
+_SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE connections (
+    connection_id TEXT PRIMARY KEY,
+    packet_count INTEGER NOT NULL,
+    first_timestamp REAL               -- base of each packet's relativeTime
+) WITHOUT ROWID;
+CREATE TABLE packets (
+    connection_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,              -- position within the connection
+    packet_index INTEGER NOT NULL,
+    PRIMARY KEY (connection_id, seq)
+) WITHOUT ROWID;
+'''
+
+
+_PAGE_QUERY = 'SELECT packet_index FROM packets WHERE connection_id = ? AND seq >= ? ORDER BY seq LIMIT ?'
+
+
+def write_result_db(path: str, analysis_results: dict) -> None:
+    """(Re)create the store at ``path`` from NetworkAnalyzer.analysis_results; replaced atomically."""
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        with conn:
+            conn.execute('INSERT INTO meta VALUES (?, ?)', ('version', str(RESULT_DB_VERSION)))
+            connection_packets = analysis_results.get('connection_packets', {})
+            summary = analysis_results.get('packet_summary', {})
+            conn.executemany('INSERT INTO connections VALUES (?, ?, ?)', (
+                (cid, len(indices), summary[indices[0]]['timestamp'] if indices else None)
+                for cid, indices in connection_packets.items()))
+            conn.executemany('INSERT INTO packets VALUES (?, ?, ?)', (
+                (cid, seq, idx) for cid, indices in connection_packets.items() for seq, idx in enumerate(indices)))
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+def open_result_db(path: str) -> sqlite3.Connection | None:
+    """Read-only connection to a session store; None if it is missing or from another version."""
+    if not os.path.exists(path):
+        return None
+    try:
+        uri = Path(path).resolve().as_uri() + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    except sqlite3.Error:
+        return None
+    if row is None or row[0] != str(RESULT_DB_VERSION):
+        conn.close()
+        return None
+    return conn
+
+
+def with_relative_time(packets: list, first_timestamp: float = None) -> list:
+    """Copies of a connection's packet details with relativeTime (seconds since its first packet)."""
+    if not packets:
+        return []
+    if first_timestamp is None:
+        first_timestamp = packets[0]['timestamp']
+    return [{**packet, 'relativeTime': f"{packet['timestamp'] - first_timestamp:.3f}s"} for packet in packets]
+
+
+def connection_packet_indices(conn: sqlite3.Connection, connection_id: str, offset: int = 0, limit: int = 100):
+    """(total_packets, first_timestamp, indices[offset:offset + limit]) of one connection, or None if unknown."""
+    row = conn.execute('SELECT packet_count, first_timestamp FROM connections WHERE connection_id = ?',
+                       (connection_id,)).fetchone()
+    if row is None:
+        return None
+    # seq is the dense 0-based position within the connection, so a page is a
+    # primary-key range; LIMIT/OFFSET would walk and discard `offset` rows first.
+    # (SQLite treats a negative LIMIT as "no limit".)
+    rows = conn.execute(_PAGE_QUERY, (connection_id, max(0, offset), max(0, limit))).fetchall()
+    return row[0], row[1], [idx for idx, in rows]
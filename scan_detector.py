@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Per-source port/host scan detection with bounded memory.
+
+Each scanning source keeps, for its current time window, a bitmap of the
+destination ports it probed and a hashed bitmap of the hosts it probed.
+Each probed target keeps the same for the ports it was probed on and the
+sources probing it. From those cardinalities a closed window is classified:
+
+* vertical   — one source, many ports on one (or a few) hosts
+* horizontal — one source, one (or a few) ports across many hosts
+* block      — one source, many ports across many hosts
+* distributed — one target probed on many ports by many sources, none of
+  which carries most of the probes
+
+A probe is a TCP SYN without ACK. Browsing to hundreds of HTTPS servers
+looks like a horizontal sweep by cardinality alone, so windows where most
+probes were answered with a SYN-ACK are not reported. Sources and targets
+are kept in LRU tables of fixed size; an evicted entry has its window
+classified before it is dropped, so eviction loses history, not findings.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+
+from sketches import LinearCounter, TopKCounter
+
+PORT_SPACE = 65536
+
+
+class PortBitmap:
+    """Distinct destination ports as a set that becomes an 8 KB bitmap.
+
+    Most sources touch a handful of ports, so they stay a small set; only
+    sources past ``promote_at`` ports pay for the full 65536-bit bitmap.
+    ``count`` is exact either way.
+    """
+
+    __slots__ = ('promote_at', 'count', '_small', '_bits')
+
+    def __init__(self, promote_at: int = 64):
+        self.promote_at = promote_at
+        self.count = 0
+        self._small = set()
+        self._bits = None
+
+    def add(self, port: int) -> None:
+        if self._bits is None:
+            if port in self._small:
+                return
+            self._small.add(port)
+            self.count += 1
+            if self.count > self.promote_at:
+                self._bits = bytearray(PORT_SPACE // 8)
+                for value in self._small:
+                    self._bits[value >> 3] |= 1 << (value & 7)
+                self._small = None
+            return
+        mask = 1 << (port & 7)
+        byte = self._bits[port >> 3]
+        if not byte & mask:
+            self._bits[port >> 3] = byte | mask
+            self.count += 1
+
+    def __contains__(self, port: int) -> bool:
+        if self._bits is None:
+            return port in self._small
+        return bool(self._bits[port >> 3] & (1 << (port & 7)))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class _Window:
+    __slots__ = ('start', 'last', 'probes', 'answered', 'ports', 'peers', 'top_peers', 'last_peer')
+
+    def __init__(self, start: float, bitmap_bits: int, track_peers: bool):
+        self.start = start
+        self.last = start
+        self.probes = 0
+        self.answered = 0
+        self.ports = PortBitmap()
+        self.peers = LinearCounter(bitmap_bits)
+        self.top_peers = TopKCounter(capacity=8) if track_peers else None
+        self.last_peer = None
+
+
+class ScanDetector:
+    """Streaming scan detector; feed TCP packets with ``observe`` then ``close``.
+
+    Thresholds are per window. ``max_sources`` / ``max_targets`` bound how
+    many windows are open at once, so memory does not grow with the number
+    of distinct addresses in the capture.
+    """
+
+    def __init__(self, window_seconds: float = 60.0, max_sources: int = 4096, max_targets: int = 1024,
+                 vertical_ports: int = 50, horizontal_hosts: int = 30, narrow_limit: int = 3,
+                 distributed_ports: int = 50, distributed_sources: int = 5, max_answer_ratio: float = 0.5,
+                 max_findings: int = 100, bitmap_bits: int = 1024):
+        self.window_seconds = window_seconds
+        self.max_sources = max_sources
+        self.max_targets = max_targets
+        self.vertical_ports = vertical_ports
+        self.horizontal_hosts = horizontal_hosts
+        self.narrow_limit = narrow_limit
+        self.distributed_ports = distributed_ports
+        self.distributed_sources = distributed_sources
+        self.max_answer_ratio = max_answer_ratio
+        self.max_findings = max_findings
+        self.bitmap_bits = bitmap_bits
+        self.evicted_sources = 0
+        self.evicted_targets = 0
+        self.total_probes = 0
+        self.dropped_findings = 0
+        self._sources = OrderedDict()
+        self._targets = OrderedDict()
+        self._findings = {}
+
+    def observe(self, ts: float, src_ip: str, dst_ip: str, dst_port: int, flags: int) -> None:
+        is_syn = bool(flags & 0x02)
+        is_ack = bool(flags & 0x10)
+        if is_syn and is_ack:
+            # SYN-ACK from dst back to the prober: the probe hit an open port
+            self._mark_answered(self._sources, dst_ip)
+            self._mark_answered(self._targets, src_ip)
+            return
+        if not is_syn or is_ack:
+            return
+
+        self.total_probes += 1
+        window = self._window(self._sources, self.max_sources, src_ip, ts, 'source')
+        window.probes += 1
+        window.ports.add(dst_port)
+        window.peers.add(dst_ip)
+        window.last_peer = dst_ip
+        window.last = ts
+
+        window = self._window(self._targets, self.max_targets, dst_ip, ts, 'target')
+        window.probes += 1
+        window.ports.add(dst_port)
+        window.peers.add(src_ip)
+        window.top_peers.add(src_ip)
+        window.last = ts
+
+    def close(self) -> dict:
+        """Classify all open windows and return the findings."""
+        self._classify_open_windows()
+        self._sources.clear()
+        self._targets.clear()
+        return self._report()
+
+    def snapshot(self) -> dict:
+        """Findings as if the capture ended now; open windows and findings are left as they are."""
+        findings, dropped = self._findings, self.dropped_findings
+        self._findings = {key: dict(finding) for key, finding in findings.items()}
+        try:
+            self._classify_open_windows()
+            return self._report()
+        finally:
+            self._findings, self.dropped_findings = findings, dropped
+
+    # ── internals ──
+
+    def _classify_open_windows(self) -> None:
+        for key, window in self._sources.items():
+            self._classify_source(key, window)
+        for key, window in self._targets.items():
+            self._classify_target(key, window)
+
+    def _report(self) -> dict:
+        scans = sorted(self._findings.values(), key=lambda item: (item['first_seen'], item['type']))
+        for scan in scans:
+            scan['duration_seconds'] = round(scan['last_seen'] - scan['first_seen'], 3)
+            scan['startEpochMs'] = int(scan['first_seen'] * 1000)
+            scan['endEpochMs'] = int(scan['last_seen'] * 1000)
+            scan['answer_ratio'] = round(scan['answer_ratio'], 3)
+            scan['confidence'] = round(scan['confidence'], 2)
+        counts = {kind: 0 for kind in ('vertical', 'horizontal', 'block', 'distributed')}
+        for scan in scans:
+            counts[scan['type']] += 1
+        return {
+            'detected': bool(scans),
+            'window_seconds': self.window_seconds,
+            'total_probes': self.total_probes,
+            'counts': counts,
+            'scans': scans,
+            'evicted_sources': self.evicted_sources,
+            'evicted_targets': self.evicted_targets,
+            'dropped_findings': self.dropped_findings,
+        }
+
+    def _window(self, table, capacity, key, ts, role) -> _Window:
+        window = table.get(key)
+        if window is not None and ts - window.start >= self.window_seconds:
+            self._classify(role, key, window)
+            window = None
+        if window is None:
+            window = table[key] = _Window(ts, self.bitmap_bits, role == 'target')
+            if len(table) > capacity:
+                old_key, old_window = table.popitem(last=False)
+                self._classify(role, old_key, old_window)
+                if role == 'source':
+                    self.evicted_sources += 1
+                else:
+                    self.evicted_targets += 1
+        table.move_to_end(key)
+        return window
+
+    @staticmethod
+    def _mark_answered(table, key) -> None:
+        window = table.get(key)
+        if window is not None:
+            window.answered += 1
+
+    def _classify(self, role, key, window) -> None:
+        if role == 'source':
+            self._classify_source(key, window)
+        else:
+            self._classify_target(key, window)
+
+    @staticmethod
+    def _answer_ratio(window) -> float:
+        return min(1.0, window.answered / window.probes) if window.probes else 0.0
+
+    def _classify_source(self, src_ip, window) -> None:
+        ports = len(window.ports)
+        hosts = len(window.peers)
+        answer_ratio = self._answer_ratio(window)
+        if answer_ratio > self.max_answer_ratio:
+            return
+        wide_ports = ports >= self.vertical_ports
+        wide_hosts = hosts >= self.horizontal_hosts
+        if wide_ports and wide_hosts:
+            kind = 'block'
+        elif wide_ports and hosts <= self.narrow_limit:
+            kind = 'vertical'
+        elif wide_hosts and ports <= self.narrow_limit:
+            kind = 'horizontal'
+        else:
+            return
+        breadth = max(ports / self.vertical_ports, hosts / self.horizontal_hosts)
+        confidence = min(0.95, 0.5 + (1 - answer_ratio) * 0.2 + min(breadth, 2) * 0.1)
+        self._record(kind, src_ip, window, ports, hosts, answer_ratio, confidence,
+                     target=window.last_peer if kind == 'vertical' else None)
+
+    def _classify_target(self, dst_ip, window) -> None:
+        ports = len(window.ports)
+        sources = len(window.peers)
+        answer_ratio = self._answer_ratio(window)
+        if answer_ratio > self.max_answer_ratio:
+            return
+        if ports < self.distributed_ports or sources < self.distributed_sources:
+            return
+        top = window.top_peers.most_common(1)
+        # One source carrying most probes is a vertical scan, not a distributed one
+        if top and top[0][1] / window.probes > 0.8:
+            return
+        confidence = min(0.9, 0.4 + (1 - answer_ratio) * 0.2 + min(sources / self.distributed_sources, 4) * 0.05)
+        self._record('distributed', None, window, ports, sources, answer_ratio, confidence, target=dst_ip)
+
+    def _record(self, kind, source, window, ports, peers, answer_ratio, confidence, target=None) -> None:
+        key = (kind, source if kind != 'distributed' else target)
+        peer_key = 'peak_sources' if kind == 'distributed' else 'peak_hosts'
+        finding = self._findings.get(key)
+        if finding is None:
+            if len(self._findings) >= self.max_findings:
+                self.dropped_findings += 1
+                return
+            finding = self._findings[key] = {
+                'type': kind,
+                'source': source,
+                'target': target,
+                'first_seen': window.start,
+                'last_seen': window.last,
+                'windows': 0,
+                'probes': 0,
+                'peak_ports': 0,
+                peer_key: 0,
+                'answer_ratio': answer_ratio,
+                'confidence': confidence,
+            }
+            if kind == 'distributed':
+                finding['top_sources'] = []
+        finding['first_seen'] = min(finding['first_seen'], window.start)
+        finding['last_seen'] = max(finding['last_seen'], window.last)
+        finding['windows'] += 1
+        finding['probes'] += window.probes
+        finding['peak_ports'] = max(finding['peak_ports'], ports)
+        finding[peer_key] = max(finding[peer_key], peers)
+        finding['answer_ratio'] = min(finding['answer_ratio'], answer_ratio)
+        finding['confidence'] = max(finding['confidence'], confidence)
+        if kind == 'distributed':
+            finding['top_sources'] = [{'ip': ip, 'probes': count}
+                                      for ip, count in window.top_peers.most_common(5)]
@@ -27,6 +27,7 @@ import PacketParticleSystem from './lib/PacketParticleSystem'
 import { parseTimelineId, clamp, calculateCanvasSize, FORCE_PARAMS, calculateDynamicForceParams, calculateForces, applyForces, buildNodeLayout } from './lib/graphLayout.js'
 import { truncateIpLabel, getDepthLabel, computeSearchMatchedNodeIds, computeSearchMatchedConnectionIds } from './lib/nodeDashboard.js'
 import { computeConnectionHealth, computeNodeDegreeHealth, computeOverallHealthWithNodes, buildOverviewHealthFromDetailed, computeOverallHealthFromMapWithNodes } from './lib/connectionHealth.js'
+import { uploadAndAnalyze, formatJobProgress } from './lib/analysisJob.js'
 // PacketViewer 已整合到 BatchPacketViewer，不再單獨使用
 import BatchPacketViewer from './components/BatchPacketViewer'
 import TimelineControls from './components/TimelineControls'
@@ -53,8 +54,8 @@ import WrongAnswerReview from './learning/WrongAnswerReview'
 import { getCourse, courseList } from './learning/courses'
 
 const API_TIMELINES_URL = '/api/timelines'
-const STATIC_TIMELINES_URL = '/data/protocol_timeline_sample.json'
-const API_ANALYZE_URL = '/api/analyze'
+const STATIC_TIMELINES_URL = '/data/sections/protocol_timelines.json'
+const SAMPLE_TIMELINES_URL = '/data/protocol_timeline_sample.json'
 
 // 自動檢測後端 API 是否可用，不再依賴環境變數
 const ANALYZER_API_ENABLED = true
@@ -466,6 +467,7 @@ export default function MindMap({ isLearningMode = false }) {
   const [generatedAt, setGeneratedAt] = useState(null)
   const [loading, setLoading] = useState(true)
   const [uploading, setUploading] = useState(false)
+  const [uploadStatus, setUploadStatus] = useState('')
   const [error, setError] = useState(null)
   const [attackAnalysis, setAttackAnalysis] = useState(null) // 攻擊分析數據
   const [protocolFilters, setProtocolFilters] = useState({ tcp: true, udp: true, http: true, dns: true, icmp: true })
@@ -1239,7 +1241,7 @@ export default function MindMap({ isLearningMode = false }) {
     }
 
     if (!payload) {
-      payload = await fetchCandidate(STATIC_TIMELINES_URL)
+      payload = (await fetchCandidate(STATIC_TIMELINES_URL)) || (await fetchCandidate(SAMPLE_TIMELINES_URL))
     }
 
     if (!payload || !Array.isArray(payload.timelines)) {
@@ -1335,34 +1337,17 @@ export default function MindMap({ isLearningMode = false }) {
     setError(null)
 
     try {
-      const formData = new FormData()
-      formData.append('file', file)
-
-      const response = await fetch(API_ANALYZE_URL, {
-        method: 'POST',
-        body: formData
+      // 分析在後端背景執行，輪詢進度直到完成後再載入時間軸
+      await uploadAndAnalyze(file, {
+        onProgress: (job) => setUploadStatus(formatJobProgress(job))
       })
-
-      if (!response.ok) {
-        const errorText = await response.text()
-        throw new Error(`分析失敗 (${response.status}): ${errorText || '未知錯誤'}`)
-      }
-
-      const payload = await response.json()
-      const timelinePayload = payload?.analysis?.protocol_timelines
-
-      if (timelinePayload?.timelines?.length) {
-        setTimelines(timelinePayload.timelines)
-        setSourceFiles(timelinePayload.sourceFiles || [file.name])
-        setGeneratedAt(timelinePayload.generatedAt || new Date().toISOString())
-      } else {
-        await loadTimelines()
-      }
+      await loadTimelines()
     } catch (err) {
       console.error('上傳失敗:', err)
       setError(err?.message || '上傳封包檔案失敗，請確認後端服務是否正常運行')
     } finally {
       setUploading(false)
+      setUploadStatus('')
       event.target.value = ''
     }
   }
@@ -1799,6 +1784,7 @@ export default function MindMap({ isLearningMode = false }) {
       <div className="flex-1 overflow-auto">
       <HeaderToolbar
         uploading={uploading}
+        uploadStatus={uploadStatus}
         error={error}
         generatedAt={generatedAt}
         sourceFiles={sourceFiles}
@@ -12,15 +12,31 @@ import {
 } from 'lucide-react'
 import MindMap from './MindMap'
 import ProtocolTimelinePreview from './ProtocolTimelinePreview'
+import { uploadAndAnalyze, formatJobProgress } from './lib/analysisJob.js'
 
 const ANALYSIS_PATH = '/data/network_analysis_results.json'
 const MIND_MAP_PATH = '/data/network_mind_map.json'
 
 const API_ANALYSIS_URL = '/api/analysis'
-const API_ANALYZE_URL = '/api/analyze'
 
 const ANALYZER_API_ENABLED = import.meta.env.VITE_ANALYZER_API === 'true'
 
+// The results file only lists the per-section files; fetch the sections the overview renders
+const OVERVIEW_SECTIONS = ['basic_stats', 'packet_loss', 'latency', 'mind_map']
+
+const loadAnalysisSections = async (manifest) => {
+  if (!manifest?.sections) {
+    return manifest // results written before section files existed hold every section inline
+  }
+  const entries = await Promise.all(
+    OVERVIEW_SECTIONS.filter((name) => manifest.sections[name]).map(async (name) => {
+      const response = await fetch(`/data/${manifest.sections[name].file}`, { cache: 'no-store' }).catch(() => null)
+      return [name, response && response.ok ? await response.json() : null]
+    })
+  )
+  return Object.fromEntries(entries.filter(([, value]) => value !== null))
+}
+
 const toTopList = (raw, limit = 5) => {
   if (!raw) {
     return []
@@ -72,6 +88,17 @@ const computeLatencySummary = (latency) => {
     }
   }
 
+  const delaySummary = latency.inter_packet_delay_summary
+  if (delaySummary) {
+    return {
+      averageDelay: delaySummary.mean || 0,
+      stdDelay: delaySummary.std || 0,
+      p90Delay: delaySummary.p90 || 0,
+      handshakeCount: latency.handshake_summary?.count || 0,
+      pingCount: latency.ping_summary?.count || 0
+    }
+  }
+
   const delays = Array.isArray(latency.inter_packet_delays)
     ? latency.inter_packet_delays.map((entry) => entry.delay)
     : []
@@ -179,7 +206,7 @@ const NetworkAnalysisViewer = () => {
           throw new Error('????????????????')
         }
 
-        analysisJson = await analysisResponse.json()
+        analysisJson = await loadAnalysisSections(await analysisResponse.json())
 
         const mindMapResponse = await fetch(MIND_MAP_PATH, { cache: 'no-store' }).catch(() => null)
         if (mindMapResponse && mindMapResponse.ok) {
@@ -227,34 +254,21 @@ const NetworkAnalysisViewer = () => {
       setStatusMessage('正在處理封包...')
 
       try {
-        const formData = new FormData()
-        formData.append('file', selectedFile)
-
-        const response = await fetch(API_ANALYZE_URL, {
-          method: 'POST',
-          body: formData
+        // POST /api/analyze 只回傳 job id；輪詢到分析完成後再讀取本次 session 的分析區段
+        await uploadAndAnalyze(selectedFile, {
+          onProgress: (job) => setStatusMessage(formatJobProgress(job))
         })
 
-        let payload = null
-        try {
-          payload = await response.json()
-        } catch (parseError) {
-          payload = null
-        }
-
+        const response = await fetch(API_ANALYSIS_URL, { cache: 'no-store' })
         if (!response.ok) {
-          const detail = payload?.detail ???? '上傳封包失敗'
-          throw new Error(detail)
-        }
-
-        const analysisJson = payload?.analysis
-        if (!analysisJson) {
-          throw new Error('伺服器回傳分析錯誤')
+          throw new Error(`無法取得分析結果 (${response.status})`)
         }
+        const payload = await response.json()
+        const analysisJson = await loadAnalysisSections(payload.analysis ?? payload)
 
         setAnalysisData(analysisJson)
-        setMindMapData(analysisJson.mind_map ???? null)
-        setStatusMessage(`已選擇 ${selectedFile.name} 等待分析`)
+        setMindMapData(analysisJson.mind_map ?? null)
+        setStatusMessage(`已完成 ${selectedFile.name} 的分析`)
       } catch (err) {
         console.error(err)
         setStatusMessage('')
@@ -3,7 +3,8 @@ import { Activity, Loader2, RefreshCcw } from 'lucide-react'
 import { ProtocolAnimationController } from './lib/ProtocolAnimationController'
 
 const API_TIMELINES_URL = '/api/timelines'
-const STATIC_TIMELINES_URL = '/data/protocol_timeline_sample.json'
+const STATIC_TIMELINES_URL = '/data/sections/protocol_timelines.json'
+const SAMPLE_TIMELINES_URL = '/data/protocol_timeline_sample.json'
 
 const STAGE_LABEL_MAP = {
   'SYN Sent': 'SYN 已傳送',
@@ -93,7 +94,8 @@ const ProtocolTimelinePreview = () => {
       }
 
       const apiResult = await fetchCandidate(API_TIMELINES_URL)
-      const finalResult = apiResult || (await fetchCandidate(STATIC_TIMELINES_URL))
+      const finalResult =
+        apiResult || (await fetchCandidate(STATIC_TIMELINES_URL)) || (await fetchCandidate(SAMPLE_TIMELINES_URL))
 
       if (cancelled) {
         return
@@ -7,7 +7,7 @@ import {
 import { S } from '../lib/swiss-tokens'
 
 export default function HeaderToolbar({
-  uploading, error, generatedAt, sourceFiles,
+  uploading, uploadStatus, error, generatedAt, sourceFiles,
   isPaused, isFocusMode, selectedConnectionId,
   showLearningUI, showCourseSidebar, showTutorialOverlay,
   onReload, onTogglePause, onToggleFocus,
@@ -118,7 +118,7 @@ export default function HeaderToolbar({
             }}
           >
             {uploading ? <Loader2 size={14} className="animate-spin" /> : <UploadCloud size={14} />}
-            {uploading ? '上傳中...' : '上傳 PCAP'}
+            {uploading ? (uploadStatus || '上傳中...') : '上傳 PCAP'}
           </button>
 
           <button type="button" onClick={onReload} style={btnGhost}>
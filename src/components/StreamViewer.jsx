@@ -4,6 +4,15 @@ import { S } from '../lib/swiss-tokens'
 
 const BYTES_PER_ROW = 16
 
+// Append the next page of one direction's stream to what is already loaded
+const mergeStreamPage = (loaded, page) => ({
+  ...page,
+  hex: (loaded?.hex || '') + (page?.hex || ''),
+  ascii: (loaded?.ascii || '') + (page?.ascii || ''),
+  length: (loaded?.length || 0) + (page?.length || 0),
+  offset: loaded?.offset ?? page?.offset ?? 0,
+})
+
 /**
  * StreamViewer - TCP stream viewer (Follow TCP Stream)
  *
@@ -20,6 +29,7 @@ export default function StreamViewer({ connectionId, visible, onClose }) {
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
   const [activeTab, setActiveTab] = useState('ascii')
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     if (!connectionId || !visible) return
@@ -47,6 +57,28 @@ export default function StreamViewer({ connectionId, visible, onClose }) {
     return () => { cancelled = true }
   }, [connectionId, visible])
 
+  const handleLoadMore = useCallback(() => {
+    if (!streamData?.hasMore || loadingMore) return
+    const nextOffset = streamData.offset + streamData.limit
+    setLoadingMore(true)
+    fetch(`/api/stream/${encodeURIComponent(connectionId)}?offset=${nextOffset}&limit=${streamData.limit}`)
+      .then((res) => {
+        if (!res.ok) throw new Error(`HTTP ${res.status}: ${res.statusText}`)
+        return res.json()
+      })
+      .then((page) => {
+        setStreamData((prev) => ({
+          ...page,
+          offset: nextOffset,
+          clientData: mergeStreamPage(prev.clientData, page.clientData),
+          serverData: mergeStreamPage(prev.serverData, page.serverData),
+          segments: [...(prev.segments || []), ...(page.segments || [])],
+        }))
+      })
+      .catch((err) => setError(err.message))
+      .finally(() => setLoadingMore(false))
+  }, [connectionId, streamData, loadingMore])
+
   const handleDownload = useCallback((hex, filename) => {
     if (!hex) return
     const bytes = new Uint8Array(hex.length / 2)
@@ -148,6 +180,20 @@ export default function StreamViewer({ connectionId, visible, onClose }) {
                   onDownload={handleDownload}
                 />
               )}
+              {streamData.hasMore && (
+                <button
+                  onClick={handleLoadMore}
+                  disabled={loadingMore}
+                  style={{
+                    display: 'block', margin: '16px auto 0', padding: '6px 16px',
+                    fontSize: '0.75rem', background: 'transparent', color: S.text.secondary,
+                    border: `1px solid ${S.border}`, borderRadius: S.radius.sm,
+                    cursor: loadingMore ? 'wait' : 'pointer',
+                  }}
+                >
+                  {loadingMore ? 'Loading...' : `Load more (${streamData.clientData?.length ?? 0} / ${streamData.clientData?.totalLength ?? 0} client bytes)`}
+                </button>
+              )}
             </>
           )}
         </div>
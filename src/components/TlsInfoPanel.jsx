@@ -124,6 +124,11 @@ export default function TlsInfoPanel() {
                     套件: <span style={{ fontFamily: S.font.mono, color: S.text.primary }}>{cipher.split('(')[1]?.replace(')', '') || cipher}</span>
                   </span>
                 )}
+                {sess.client_hello?.ja4 && (
+                  <span className="truncate max-w-[260px]" title={sess.client_hello.ja3_hash ? `JA3 ${sess.client_hello.ja3_hash}` : undefined}>
+                    JA4: <span style={{ fontFamily: S.font.mono, color: S.text.primary }}>{sess.client_hello.ja4}</span>
+                  </span>
+                )}
               </div>
 
               <div className="flex gap-3 mt-1 text-[10px]">
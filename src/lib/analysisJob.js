@@ -0,0 +1,79 @@
+/**
+ * analysisJob.js
+ * 上傳 PCAP 並追蹤背景分析工作 — POST /api/analyze 立即回傳 job id，
+ * 之後輪詢 /api/jobs/{job_id} 取得階段、進度與預估剩餘時間，直到完成
+ */
+
+const API_ANALYZE_URL = '/api/analyze'
+const POLL_INTERVAL_MS = 500
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+/**
+ * 輪詢分析工作直到結束
+ * @param {string} jobId
+ * @param {{ onProgress?: (job: Object) => void, intervalMs?: number }} [options]
+ * @returns {Promise<Object>} 完成時的工作快照（result 內含 packet_count / timeline_count）
+ */
+export async function waitForAnalysisJob(jobId, { onProgress, intervalMs = POLL_INTERVAL_MS } = {}) {
+  for (;;) {
+    const response = await fetch(`/api/jobs/${encodeURIComponent(jobId)}`, { cache: 'no-store' })
+    if (!response.ok) {
+      throw new Error(`無法取得分析進度 (${response.status})`)
+    }
+    const job = await response.json()
+    onProgress?.(job)
+    if (job.status === 'completed') {
+      return job
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || '分析失敗')
+    }
+    if (job.status === 'cancelled') {
+      throw new Error('分析已取消')
+    }
+    await sleep(intervalMs)
+  }
+}
+
+/**
+ * 上傳封包檔並等待分析完成
+ * @param {File} file
+ * @param {{ onProgress?: (job: Object) => void }} [options]
+ * @returns {Promise<Object>} 完成時的工作快照
+ */
+export async function uploadAndAnalyze(file, { onProgress } = {}) {
+  const formData = new FormData()
+  formData.append('file', file)
+
+  const response = await fetch(API_ANALYZE_URL, { method: 'POST', body: formData })
+  let payload = null
+  try {
+    payload = await response.json()
+  } catch (parseError) {
+    payload = null
+  }
+  if (response.status === 429) {
+    const retryAfter = response.headers.get('Retry-After')
+    throw new Error(`分析佇列已滿，請於 ${retryAfter || '數'} 秒後重試`)
+  }
+  if (!response.ok || !payload?.job_id) {
+    throw new Error(payload?.detail ?? `分析失敗 (${response.status})`)
+  }
+  onProgress?.(payload)
+  return waitForAnalysisJob(payload.job_id, { onProgress })
+}
+
+/**
+ * 將工作快照轉為狀態文字，例如「分析中 42% · 約 8 秒」
+ * @param {Object} job
+ * @returns {string}
+ */
+export function formatJobProgress(job) {
+  if (!job || job.status === 'queued') {
+    return '排隊等待分析...'
+  }
+  const percent = Math.round((job.progress ?? 0) * 100)
+  const eta = typeof job.eta_seconds === 'number' ? ` · 約 ${Math.ceil(job.eta_seconds)} 秒` : ''
+  return `分析中 ${percent}%${eta}`
+}
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Sequence-ordered TCP stream reassembly.
+
+Segments are placed by sequence number (not capture time) into one
+``bytearray`` per direction. Sequence numbers are unwrapped across the 2**32
+boundary, retransmitted and overlapping bytes are dropped (the first copy
+wins, as in Wireshark), and out-of-order segments wait until the gap before
+them is filled. Gaps that never fill are recorded and skipped.
+"""
+
+from __future__ import annotations
+
+import heapq
+
+SEQ_MOD = 1 << 32
+_HALF_SEQ = SEQ_MOD // 2
+
+# Byte -> printable ASCII or '.', for bytes.translate()
+_ASCII_TABLE = bytes(b if 32 <= b < 127 else 0x2E for b in range(256))
+
+
+def printable_ascii(data) -> str:
+    """Render bytes the way Follow TCP Stream does: printable ASCII or '.'."""
+    return bytes(data).translate(_ASCII_TABLE).decode('ascii')
+
+
+class DirectionStream:
+    """Reassembly state for one direction of a TCP connection."""
+
+    __slots__ = ('base', 'from_syn', 'buffer', 'max_bytes', 'truncated', 'gaps',
+                 'duplicate_bytes', 'segments', '_pending', '_heap', '_high')
+
+    def __init__(self, max_bytes: int | None = None):
+        self.base = None            # sequence number of stream offset 0
+        self.from_syn = False       # base was taken from a SYN (ISN + 1)
+        self.buffer = bytearray()
+        self.max_bytes = max_bytes
+        self.truncated = False
+        self.gaps = []              # [{'offset': buffer offset, 'missing': bytes}]
+        self.duplicate_bytes = 0
+        self.segments = []          # per-packet records, in capture order
+        self._pending = {}          # unwrapped offset -> (payload, segment record)
+        self._heap = []
+        self._high = 0              # highest unwrapped offset seen, for unwrapping
+
+    def set_isn(self, seq: int) -> None:
+        if self.base is None:
+            self.base = (seq + 1) % SEQ_MOD
+            self.from_syn = True
+
+    def _unwrap(self, seq: int) -> int:
+        rel = (seq - self.base) % SEQ_MOD
+        offset = rel + self._high - self._high % SEQ_MOD
+        if offset - self._high > _HALF_SEQ:
+            offset -= SEQ_MOD
+        elif self._high - offset > _HALF_SEQ:
+            offset += SEQ_MOD
+        return offset
+
+    def add(self, seq: int, payload: bytes, segment: dict) -> None:
+        if self.base is None:
+            self.base = seq
+        offset = self._unwrap(seq)
+        segment['offset'] = None
+        segment['newBytes'] = 0
+        segment['retransmission'] = False
+        self.segments.append(segment)
+        if offset < 0 and not self.from_syn:
+            # Capture started mid-stream and an earlier segment arrived late
+            self._prepend(offset, payload, segment)
+            return
+        self._high = max(self._high, offset + len(payload))
+
+        expected = len(self.buffer) + self._skipped()
+        if self.truncated and offset >= expected:
+            return  # past max_bytes: neither kept nor queued
+        if offset > expected:
+            existing = self._pending.get(offset)
+            if existing is None or len(existing[0]) < len(payload):
+                if existing is None:
+                    heapq.heappush(self._heap, offset)
+                self._pending[offset] = (payload, segment)
+            else:
+                self._mark_duplicate(segment, offset, len(payload))
+            return
+        self._place(offset, payload, segment)
+        self._drain()
+
+    def _skipped(self) -> int:
+        return sum(gap['missing'] for gap in self.gaps)
+
+    def _prepend(self, offset: int, payload: bytes, segment: dict) -> None:
+        """Move stream offset 0 back to ``offset`` (< 0) and insert the payload there."""
+        shift = -offset
+        payload = payload[:shift]  # bytes at offset >= 0 are already known or pending
+        missing = shift - len(payload)
+        self.base = (self.base + offset) % SEQ_MOD
+        self._pending = {key + shift: value for key, value in self._pending.items()}
+        self._heap = list(self._pending)
+        heapq.heapify(self._heap)
+        self._high += shift
+        placed = len(payload)
+        for other in self.segments:
+            if other['offset'] is not None:
+                other['offset'] += placed
+        for gap in self.gaps:
+            gap['offset'] += placed
+        if missing:
+            self.gaps.insert(0, {'offset': placed, 'missing': missing})
+        self.buffer[0:0] = payload
+        segment['offset'] = 0
+        segment['newBytes'] = placed
+
+    def _mark_duplicate(self, segment: dict, offset: int, length: int) -> None:
+        segment['retransmission'] = True
+        segment['offset'] = max(0, offset - self._skipped())
+        self.duplicate_bytes += length
+
+    def _place(self, offset: int, payload: bytes, segment: dict) -> None:
+        # ``offset`` is in sequence space; buffer positions exclude skipped gaps
+        position = offset - self._skipped()
+        overlap = len(self.buffer) - position
+        if overlap >= len(payload):
+            self._mark_duplicate(segment, offset, len(payload))
+            return
+        if overlap > 0:
+            self.duplicate_bytes += overlap
+            segment['retransmission'] = True
+            payload = memoryview(payload)[overlap:]
+        if self.max_bytes is not None:
+            room = self.max_bytes - len(self.buffer)
+            if room <= 0:
+                self._truncate()
+                return
+            if len(payload) > room:
+                payload = payload[:room]
+                self._truncate()
+        segment['offset'] = len(self.buffer)
+        segment['newBytes'] = len(payload)
+        self.buffer += payload
+
+    def _truncate(self) -> None:
+        # Everything still queued lies beyond max_bytes and can never be placed
+        self.truncated = True
+        self._pending.clear()
+        self._heap.clear()
+
+    def _drain(self) -> None:
+        heap = self._heap
+        while heap and heap[0] <= len(self.buffer) + self._skipped():
+            offset = heapq.heappop(heap)
+            payload, segment = self._pending.pop(offset)
+            self._place(offset, payload, segment)
+
+    def finish(self) -> None:
+        """Flush segments stranded behind gaps that were never filled."""
+        heap = self._heap
+        while heap:
+            if self.max_bytes is not None and len(self.buffer) >= self.max_bytes:
+                self._truncate()  # no gaps are recorded past the cap
+                break
+            offset = heap[0]
+            expected = len(self.buffer) + self._skipped()
+            if offset > expected:
+                self.gaps.append({'offset': len(self.buffer), 'missing': offset - expected})
+            self._drain()
+
+    def summary(self) -> dict:
+        return {
+            'length': len(self.buffer),
+            'duplicateBytes': self.duplicate_bytes,
+            'gaps': list(self.gaps),
+            'truncated': self.truncated,
+        }
+
+
+class TcpStreamReassembler:
+    """Reassemble both directions of one TCP connection.
+
+    ``client`` is the ``(ip, port)`` of the initiating side; segments from
+    any other endpoint are treated as server data.
+    """
+
+    def __init__(self, client: tuple, max_bytes: int | None = None):
+        self.client = client
+        self.client_stream = DirectionStream(max_bytes)
+        self.server_stream = DirectionStream(max_bytes)
+        self.segment_count = 0
+
+    def stream_for(self, direction: str) -> DirectionStream:
+        return self.client_stream if direction == 'client' else self.server_stream
+
+    def add(self, src: tuple, seq: int, payload: bytes, syn: bool = False, **meta) -> None:
+        """Add one TCP segment; ``meta`` (packet index, timestamp, ...) is kept on the record."""
+        direction = 'client' if src == self.client else 'server'
+        stream = self.stream_for(direction)
+        if syn:
+            stream.set_isn(seq)
+        if not payload:
+            return
+        self.segment_count += 1
+        stream.add(seq, payload, {'direction': direction, 'length': len(payload), **meta})
+
+    def finish(self) -> 'TcpStreamReassembler':
+        self.client_stream.finish()
+        self.server_stream.finish()
+        return self
+
+    def segments(self) -> list:
+        """All payload-carrying segment records, in capture order."""
+        merged = self.client_stream.segments + self.server_stream.segments
+        merged.sort(key=lambda seg: (seg.get('timestamp', 0), seg.get('packetIndex', 0)))
+        return merged
@@ -28,7 +28,8 @@ if 'connection_packets' in analyzer.analysis_results:
     print(f"Built packets for {len(analyzer.analysis_results['connection_packets'])} connections")
 
     # Show sample of new fields
-    for conn_id, packets in list(analyzer.analysis_results['connection_packets'].items())[:3]:
+    for conn_id in list(analyzer.analysis_results['connection_packets'])[:3]:
+        packets = analyzer.connection_packet_details(conn_id)
         if packets:
             packet = packets[0]
             print(f"\n=== Sample from {conn_id} ===")
@@ -4,6 +4,7 @@
 import requests
 import json
 import os
+import time
 
 print("測試上傳和分析功能...\n")
 
@@ -18,16 +19,26 @@ with open('lostpakage.pcapng', 'rb') as f:
     files = {'file': ('lostpakage.pcapng', f, 'application/octet-stream')}
     upload_response = requests.post('http://localhost:8000/api/analyze', files=files)
 
-if upload_response.status_code == 200:
-    result = upload_response.json()
-    print(f"   ✓ 上傳成功!")
-    print(f"   Session ID: {result.get('session_id')}")
-    print(f"   封包數量: {result.get('packet_count')}")
-    print(f"   Timeline 數量: {result.get('timeline_count')}")
+if upload_response.status_code == 202:
+    queued = upload_response.json()
+    print(f"   ✓ 上傳成功，分析工作: {queued.get('job_id')}")
+    print(f"   Session ID: {queued.get('session_id')}")
 
     # 保存 session cookie
     session_cookie = upload_response.cookies.get('session_id')
 
+    # 等待背景分析完成
+    while True:
+        job = requests.get(f"http://localhost:8000{queued['status_url']}",
+                           cookies={'session_id': session_cookie}).json()
+        print(f"   {job['status']} {job.get('stage')} {job['progress'] * 100:.0f}%")
+        if job['status'] in ('completed', 'failed', 'cancelled'):
+            break
+        time.sleep(0.5)
+    result = job.get('result') or {}
+    print(f"   封包數量: {result.get('packet_count')}")
+    print(f"   Timeline 數量: {result.get('timeline_count')}")
+
     # 3. 取得 timelines
     print("\n3. 取得 timeline 資料...")
     cookies = {'session_id': session_cookie}
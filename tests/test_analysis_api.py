@@ -0,0 +1,348 @@
+"""End-to-end tests for the /api/analyze job flow in analysis_server."""
+
+import json
+import os
+import shutil
+import time
+from contextlib import closing
+
+import pytest
+
+pytest.importorskip('itsdangerous')  # SessionMiddleware dependency
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+
+from fastapi.testclient import TestClient  # noqa: E402
+from scapy.all import Ether, IP, TCP, wrpcap  # noqa: E402
+
+import analysis_server  # noqa: E402
+from analysis_jobs import AnalysisJobManager  # noqa: E402
+from network_analyzer import NetworkAnalyzer  # noqa: E402
+from result_db import open_result_db  # noqa: E402
+
+
+_REAL_ANALYZE = analysis_server.analyze_pcap
+
+
+def _wait_for_cancel(job, pcap_path, session_dir):
+    job.start_stage('load')
+    while True:
+        job.check_cancelled()
+        time.sleep(0.01)
+
+
+def _ignore_cancel(job, pcap_path, session_dir):
+    job.start_stage('load')
+    time.sleep(2)  # a long stage that never reaches a cancellation check
+    return {}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = AnalysisJobManager(max_workers=1, max_queued=0, work_dir=str(tmp_path / 'jobs'))
+    monkeypatch.setattr(analysis_server, '_analysis_jobs', manager)
+    yield TestClient(analysis_server.app)
+    manager.shutdown()
+
+
+@pytest.fixture
+def pcap_bytes(tmp_path):
+    packets = []
+    for i in range(40):
+        pkt = Ether() / IP(src='10.0.0.1', dst='10.0.0.2') / TCP(sport=40000 + i, dport=80, flags='S')
+        pkt.time = 100.0 + i * 0.01
+        packets.append(pkt)
+    path = tmp_path / 'upload.pcap'
+    wrpcap(str(path), packets)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def handshake_pcap_bytes(tmp_path):
+    packets = []
+    for c in range(3):
+        sport = 41000 + c
+        for src, dst, sp, dp, flags in [('10.0.0.1', '10.0.0.2', sport, 80, 'S'), ('10.0.0.2', '10.0.0.1', 80, sport, 'SA'),
+                                        ('10.0.0.1', '10.0.0.2', sport, 80, 'A'), ('10.0.0.1', '10.0.0.2', sport, 80, 'FA'),
+                                        ('10.0.0.2', '10.0.0.1', 80, sport, 'FA'), ('10.0.0.1', '10.0.0.2', sport, 80, 'A')]:
+            pkt = Ether() / IP(src=src, dst=dst) / TCP(sport=sp, dport=dp, flags=flags)
+            pkt.time = 100.0 + len(packets) * 0.01
+            packets.append(pkt)
+    path = tmp_path / 'handshakes.pcap'
+    wrpcap(str(path), packets)
+    return path.read_bytes()
+
+
+def _downgrade_to_json_results(session_dir):
+    """Turn a session into one analyzed before the stores existed: only connection_packets.json."""
+    analyzer = NetworkAnalyzer(str(session_dir / 'uploaded.pcap'))
+    assert analyzer.load_packets()
+    with closing(open_result_db(str(session_dir / 'results.sqlite'))) as db:
+        analyzer.analysis_results['connection_packets'] = {
+            connection_id: [idx for idx, in db.execute(
+                'SELECT packet_index FROM packets WHERE connection_id = ? ORDER BY seq', (connection_id,))]
+            for connection_id, in db.execute('SELECT connection_id FROM connections')}
+    legacy = {connection_id: analyzer.connection_packet_details(connection_id)
+              for connection_id in analyzer.analysis_results['connection_packets']}
+    (session_dir / 'connection_packets.json').write_text(json.dumps(legacy), encoding='utf-8')
+    (session_dir / 'results.sqlite').unlink()
+    shutil.rmtree(session_dir / 'tables')
+
+
+def _upload(client, data):
+    response = client.post('/api/analyze', files={'file': ('capture.pcap', data, 'application/octet-stream')})
+    assert response.status_code == 202
+    return response.json()
+
+
+class TestAnalyzeJobs:
+    def test_upload_returns_job_and_completes(self, client, pcap_bytes):
+        queued = _upload(client, pcap_bytes)
+        job = analysis_server._analysis_jobs.get(queued['job_id'])
+        assert job.wait(60)
+
+        status = client.get(queued['status_url']).json()
+        assert status['status'] == 'completed'
+        assert status['progress'] == 1.0
+        assert status['result']['packet_count'] == 40
+        assert status['total_packets'] == 40
+        assert client.get('/api/analysis').status_code == 200
+
+    def test_analysis_serves_section_files(self, client, pcap_bytes):
+        queued = _upload(client, pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+
+        analysis = client.get('/api/analysis').json()['analysis']
+        assert set(analysis) == set(analysis_server.ANALYSIS_OVERVIEW_SECTIONS)
+        assert analysis['basic_stats']['total_packets'] == 40
+        geo = client.get('/api/analysis', params={'sections': 'geo_info,unknown'}).json()['analysis']
+        assert set(geo) == {'geo_info'}
+        timelines = client.get('/api/timelines').json()
+        assert 'timelines' in timelines and 'attackAnalysis' in timelines
+
+    def test_completed_job_warms_analyzer_cache(self, client, pcap_bytes):
+        queued = _upload(client, pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        assert 'capture_model' not in client.get(queued['status_url']).json()['result']
+
+        _, analyzer, _ = analysis_server._analyzer_cache.get(queued['session_id'])
+        assert len(analyzer.packets) == 40
+        hits = analysis_server._analyzer_cache.hits
+        response = client.get('/api/packet-detail/tcp-10.0.0.1-40003-10.0.0.2-80/3')
+        assert response.status_code == 200
+        assert response.json()['packet_detail']['index'] == 3
+        assert analysis_server._analyzer_cache.hits == hits + 1
+
+    def test_other_worker_serves_from_mapped_model(self, client, pcap_bytes, monkeypatch):
+        queued = _upload(client, pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        # A fresh worker process: empty cache and no way to load the capture itself
+        analysis_server._analyzer_cache.clear()
+        monkeypatch.setattr(analysis_server.NetworkAnalyzer, 'load_packets', lambda self, progress=None: False)
+
+        response = client.get('/api/packet-detail/tcp-10.0.0.1-40005-10.0.0.2-80/5')
+        assert response.status_code == 200
+        assert response.json()['packet_detail']['index'] == 5
+        assert queued['session_id'] in analysis_server._analyzer_cache
+
+    def test_packet_statistics_from_table_match_json(self, client, handshake_pcap_bytes, tmp_path):
+        queued = _upload(client, handshake_pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        body = {'connection_ids': ['tcp-10.0.0.1-41000-10.0.0.2-80', 'tcp-teardown-10.0.0.1-41001-10.0.0.2-80']}
+
+        from_table = client.post('/api/packets/statistics', json=body).json()
+        assert from_table['summary']['total_connections'] == 2
+        assert from_table['summary']['total_packets'] == 5
+        assert from_table['summary']['syn_count'] == 2
+
+        # Sessions analyzed before the column tables existed still use connection_packets.json
+        _downgrade_to_json_results(tmp_path / 'public' / 'data' / queued['session_id'])
+        analysis_server._evict_session_results(queued['session_id'])
+        assert client.post('/api/packets/statistics', json=body).json() == from_table
+
+    def test_connection_packets_from_result_db_match_json(self, client, handshake_pcap_bytes, tmp_path):
+        queued = _upload(client, handshake_pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        connection_id = 'tcp-10.0.0.1-41000-10.0.0.2-80'
+        batch_body = {'connection_ids': [connection_id, 'tcp-10.9.9.9-1-10.9.9.8-2'], 'packets_per_connection': 2}
+
+        page = client.get(f'/api/packets/{connection_id}', params={'offset': 1, 'limit': 1}).json()
+        assert page['total_packets'] == 3
+        assert [packet['index'] for packet in page['packets']] == [1]
+        batch = client.post('/api/packets/batch', json=batch_body).json()
+        assert batch['results'][connection_id]['returned_packets'] == 2
+        assert batch['results']['tcp-10.9.9.9-1-10.9.9.8-2']['error'] == 'Connection not found'
+        assert client.get('/api/packets/tcp-10.9.9.9-1-10.9.9.8-2').status_code == 404
+
+        # Sessions analyzed before the SQLite store existed read connection_packets.json
+        _downgrade_to_json_results(tmp_path / 'public' / 'data' / queued['session_id'])
+        assert client.get(f'/api/packets/{connection_id}', params={'offset': 1, 'limit': 1}).json() == page
+        assert client.post('/api/packets/batch', json=batch_body).json() == batch
+
+    def test_packet_details_built_on_demand_with_read_ahead(self, client, handshake_pcap_bytes, monkeypatch):
+        queued = _upload(client, handshake_pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        session_id = queued['session_id']
+        connection_id = 'tcp-10.0.0.1-41002-10.0.0.2-80'
+
+        def cached():
+            return [key for key in analysis_server._packet_details_cache.keys() if key[0] == session_id]
+        assert not cached()
+
+        extracted = []
+        extract = NetworkAnalyzer._extract_packet_details
+        monkeypatch.setattr(NetworkAnalyzer, '_extract_packet_details',
+                            lambda self, idx: extracted.append(idx) or extract(self, idx))
+        first = client.get(f'/api/packets/{connection_id}', params={'offset': 0, 'limit': 1}).json()
+        analysis_server._packet_readahead.submit(lambda: None).result()  # wait for the read-ahead
+        assert first['total_packets'] == 3
+        assert [packet['relativeTime'] for packet in first['packets']] == ['0.000s']
+        assert extracted == [12, 13]
+
+        second = client.get(f'/api/packets/{connection_id}', params={'offset': 1, 'limit': 1}).json()
+        assert [packet['index'] for packet in second['packets']] == [13]
+        assert second['packets'][0]['relativeTime'] == '0.010s'
+        analysis_server._packet_readahead.submit(lambda: None).result()
+        assert extracted == [12, 13, 14]
+
+        # Re-analysis drops the session's cached details
+        assert cached()
+        analysis_server._evict_session_results(session_id)
+        assert not cached()
+
+    def test_deep_detail_cached_and_neighbours_prefetched(self, client, handshake_pcap_bytes, monkeypatch):
+        queued = _upload(client, handshake_pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        monkeypatch.setattr(analysis_server, '_DEEP_DETAIL_PREFETCH', 1)
+        extracted = []
+        extract = NetworkAnalyzer._extract_packet_deep_detail
+        monkeypatch.setattr(NetworkAnalyzer, '_extract_packet_deep_detail',
+                            lambda self, idx: extracted.append(idx) or extract(self, idx))
+
+        # Packets 6-11 belong to this connection
+        response = client.get('/api/packet-detail/tcp-10.0.0.1-41001-10.0.0.2-80/8')
+        assert response.json()['packet_detail']['index'] == 8
+        analysis_server._packet_readahead.submit(lambda: None).result()  # wait for the prefetch
+        assert extracted == [8, 7, 9]
+
+        for index in (9, 8):
+            response = client.get(f'/api/packet-detail/tcp-10.0.0.1-41001-10.0.0.2-80/{index}')
+            assert response.json()['packet_detail']['index'] == index
+        analysis_server._packet_readahead.submit(lambda: None).result()
+        assert extracted == [8, 7, 9, 10]
+        assert client.get('/api/packet-detail/tcp-10.0.0.1-41001-10.0.0.2-80/12').status_code == 404
+
+    def test_batch_deep_details(self, client, handshake_pcap_bytes):
+        queued = _upload(client, handshake_pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        first, second = 'tcp-10.0.0.1-41000-10.0.0.2-80', 'tcp-10.0.0.1-41001-10.0.0.2-80'
+        single = client.get(f'/api/packet-detail/{second}/7').json()['packet_detail']
+
+        pairs = {'packets': [{'connection_id': second, 'packet_index': 7},
+                             {'connection_id': first, 'packet_index': 2},
+                             {'connection_id': first, 'packet_index': 7}]}
+        batch = client.post('/api/packet-detail/batch', json=pairs).json()
+        assert batch['total'] == 3
+        assert batch['results'][0]['packet_detail'] == single
+        assert batch['results'][1]['packet_detail']['index'] == 2
+        assert batch['results'][2] == {'connection_id': first, 'packet_index': 7,
+                                       'error': 'Packet does not belong to connection'}
+
+        # Range form: the connection's packets with capture index in [start, end)
+        ranged = client.post('/api/packet-detail/batch', json={'connection_id': second, 'start': 3, 'end': 10}).json()
+        assert [item['packet_index'] for item in ranged['results']] == [6, 7, 8, 9]
+
+        response = client.post('/api/packet-detail/batch', json={**pairs, 'stream': True})
+        assert response.headers['content-type'].startswith('application/x-ndjson')
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines == batch['results']
+
+    def test_batch_deep_details_validation(self, client, handshake_pcap_bytes):
+        queued = _upload(client, handshake_pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        for body in ({}, {'packets': []}, {'packets': [{'connection_id': 'bad id', 'packet_index': 1}]},
+                     {'packets': [{'connection_id': 'tcp-10.0.0.1-41000-10.0.0.2-80', 'packet_index': -1}]},
+                     {'connection_id': 'tcp-10.0.0.1-41000-10.0.0.2-80', 'start': 0, 'end': 501},
+                     {'packets': [{'connection_id': 'tcp-10.0.0.1-41000-10.0.0.2-80', 'packet_index': 0}] * 501}):
+            assert client.post('/api/packet-detail/batch', json=body).status_code == 400
+
+    def test_packet_pages_are_bounded(self, client, handshake_pcap_bytes):
+        queued = _upload(client, handshake_pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        connection = 'tcp-10.0.0.1-41002-10.0.0.2-80'
+        for params in ({'limit': 0}, {'limit': 1001}, {'limit': -1}, {'offset': -1}):
+            assert client.get(f'/api/packets/{connection}', params=params).status_code == 400
+        assert client.get(f'/api/packets/{connection}', params={'limit': 1000}).status_code == 200
+        for per_connection in (0, -1, 'all'):
+            response = client.post('/api/packets/batch', json={'connection_ids': [connection],
+                                                               'packets_per_connection': per_connection})
+            assert response.status_code == 400
+
+    def test_stream_page_is_validated_before_loading(self, client, handshake_pcap_bytes, monkeypatch):
+        queued = _upload(client, handshake_pcap_bytes)
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        connection = 'tcp-10.0.0.1-41002-10.0.0.2-80'
+        loads = []
+        load = analysis_server._load_session_analyzer
+        monkeypatch.setattr(analysis_server, '_load_session_analyzer', lambda *args: loads.append(args) or load(*args))
+        for params in ({'limit': 0}, {'limit': 2 ** 30}, {'offset': -1}):
+            assert client.get(f'/api/stream/{connection}', params=params).status_code == 400
+        assert loads == []
+        assert client.get(f'/api/stream/{connection}', params={'limit': 16}).status_code == 200
+        assert len(loads) == 1
+
+    def test_event_stream_ends_with_terminal_event(self, client, pcap_bytes):
+        queued = _upload(client, pcap_bytes)
+        analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+
+        body = client.get(queued['events_url']).text
+        events = [block for block in body.split('\n\n') if block.strip()]
+        name, data = events[-1].split('\n')
+        assert name == 'event: completed'
+        assert json.loads(data[len('data: '):])['job_id'] == queued['job_id']
+
+    def test_jobs_are_scoped_to_session(self, client, pcap_bytes, tmp_path):
+        queued = _upload(client, pcap_bytes)
+        analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        other = TestClient(analysis_server.app)
+        assert other.get(queued['status_url']).status_code == 404
+        assert other.delete(queued['status_url']).status_code == 404
+
+    def test_new_upload_cancels_running_job(self, client, pcap_bytes, monkeypatch):
+        monkeypatch.setattr(analysis_server, 'analyze_pcap', _wait_for_cancel)
+        first = _upload(client, pcap_bytes)
+        monkeypatch.setattr(analysis_server, 'analyze_pcap', _REAL_ANALYZE)
+        second = _upload(client, pcap_bytes)
+
+        assert client.get(first['status_url']).json()['status'] == 'cancelled'
+        assert analysis_server._analysis_jobs.get(second['job_id']).wait(60)
+        assert client.get(second['status_url']).json()['status'] == 'completed'
+
+    def test_upload_does_not_wait_forever_for_previous_job(self, client, pcap_bytes, monkeypatch):
+        monkeypatch.setattr(analysis_server, 'analyze_pcap', _ignore_cancel)
+        monkeypatch.setattr(analysis_server, 'PREVIOUS_JOB_STOP_TIMEOUT', 0.1)
+        first = _upload(client, pcap_bytes)
+        while client.get(first['status_url']).json()['status'] == 'queued':
+            time.sleep(0.05)
+        response = client.post('/api/analyze', files={'file': ('capture.pcap', pcap_bytes, 'application/octet-stream')})
+        assert response.status_code == 409
+        assert int(response.headers['Retry-After']) >= 1
+        assert analysis_server._analysis_jobs.get(first['job_id']).wait(60)
+
+    def test_cancel_endpoint(self, client, pcap_bytes, monkeypatch):
+        monkeypatch.setattr(analysis_server, 'analyze_pcap', _wait_for_cancel)
+        queued = _upload(client, pcap_bytes)
+        response = client.delete(queued['status_url'])
+        assert response.status_code == 200
+        assert response.json()['cancel_requested']
+        assert analysis_server._analysis_jobs.get(queued['job_id']).wait(60)
+        assert client.get(queued['status_url']).json()['status'] == 'cancelled'
+
+    def test_full_queue_returns_429(self, client, pcap_bytes, monkeypatch):
+        monkeypatch.setattr(analysis_server, 'analyze_pcap', _wait_for_cancel)
+        busy = _upload(client, pcap_bytes)
+        other = TestClient(analysis_server.app)
+        response = other.post('/api/analyze', files={'file': ('capture.pcap', pcap_bytes, 'application/octet-stream')})
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        client.delete(busy['status_url'])
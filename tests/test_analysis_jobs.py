@@ -0,0 +1,145 @@
+"""Tests for the background analysis job queue (analysis_jobs).
+
+Job functions run in spawned worker processes, so they are defined at
+module level and coordinate with the test through files.
+"""
+
+import os
+import time
+
+import pytest
+
+from analysis_jobs import (CANCEL_FILE, JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED, AnalysisJob, AnalysisJobManager,
+                           JobProgress, JobQueueFull)
+
+STAGES = [('load', 3), ('work', 1)]
+
+
+def _finish(job, value):
+    job.start_stage('load')
+    job.update(fraction=1.0, packets_processed=7)
+    job.start_stage('work')
+    return {'value': value, 'pid': os.getpid()}
+
+
+def _fail(job):
+    raise ValueError('bad capture')
+
+
+def _block_until(job, release_path):
+    job.start_stage('load')
+    while not os.path.exists(release_path):
+        job.check_cancelled()
+        time.sleep(0.01)
+    job.start_stage('work')
+    return 'released'
+
+
+@pytest.fixture
+def manager(tmp_path):
+    m = AnalysisJobManager(max_workers=1, max_queued=1, preload=(), work_dir=str(tmp_path / 'jobs'))
+    yield m
+    m.shutdown()
+
+
+class TestAnalysisJob:
+    def test_progress_is_weighted_by_stage(self, tmp_path):
+        job_dir = tmp_path / 'job1'
+        job_dir.mkdir()
+        job = AnalysisJob('s1', STAGES, str(job_dir))
+        progress = JobProgress(str(job_dir), min_interval=0)
+        progress.start_stage('load')
+        progress.update(fraction=0.5, packets_processed=100)
+        assert job.progress == pytest.approx(0.375)
+
+        progress.start_stage('work')
+        os.utime(job_dir / 'progress.json', ns=(0, time.time_ns() + 10**6))
+        snapshot = job.snapshot()
+        assert snapshot['status'] == 'running'
+        assert snapshot['stage'] == 'work'
+        assert snapshot['progress'] == pytest.approx(0.75)
+        assert snapshot['packets_processed'] == 100
+        assert snapshot['eta_seconds'] is not None
+
+    def test_cancel_writes_flag_for_worker(self, tmp_path):
+        job = AnalysisJob('s1', STAGES, str(tmp_path))
+        progress = JobProgress(str(tmp_path))
+        assert job.cancel()
+        assert (tmp_path / CANCEL_FILE).exists()
+        assert progress.cancel_requested
+        with pytest.raises(Exception, match=os.path.basename(str(tmp_path))):
+            progress.start_stage('load')
+
+
+class TestAnalysisJobManager:
+    def test_runs_in_worker_process(self, manager):
+        job = manager.submit('s1', STAGES, _finish, 42)
+        assert job.wait(60)
+        snapshot = job.snapshot()
+        assert snapshot['status'] == JOB_COMPLETED
+        assert snapshot['result']['value'] == 42
+        assert snapshot['result']['pid'] != os.getpid()
+        assert snapshot['progress'] == 1.0
+        assert manager.get(job.id) is job
+        assert not os.path.exists(job.job_dir)
+
+    def test_on_result_replaces_result(self, manager):
+        seen = []
+
+        def on_result(job, result):
+            seen.append(job.done)
+            return {'value': result['value'] + 1}
+
+        job = manager.submit('s1', STAGES, _finish, 41, on_result=on_result)
+        assert job.wait(60)
+        assert seen == [False]
+        assert job.result == {'value': 42}
+
+    def test_failing_on_result_fails_job(self, manager):
+        def on_result(job, result):
+            raise RuntimeError('cache unavailable')
+
+        job = manager.submit('s1', STAGES, _finish, 1, on_result=on_result)
+        assert job.wait(60)
+        assert job.status == JOB_FAILED
+        assert job.error == 'RuntimeError: cache unavailable'
+
+    def test_failure_is_reported(self, manager):
+        job = manager.submit('s1', STAGES, _fail)
+        assert job.wait(60)
+        assert job.status == JOB_FAILED
+        assert job.error == 'ValueError: bad capture'
+
+    def test_cancel_running_job(self, manager, tmp_path):
+        job = manager.submit('s1', STAGES, _block_until, str(tmp_path / 'never'))
+        deadline = time.time() + 60
+        while job.snapshot()['stage'] != 'load' and time.time() < deadline:
+            time.sleep(0.02)
+        assert manager.cancel_session('s1') is job
+        assert job.wait(30)
+        assert job.status == JOB_CANCELLED
+        assert job.result is None
+
+    def test_queue_full_is_rejected_with_retry_after(self, manager, tmp_path):
+        release = tmp_path / 'release'
+        first = manager.submit('s1', STAGES, _block_until, str(release))
+        second = manager.submit('s2', STAGES, _block_until, str(release))
+        with pytest.raises(JobQueueFull) as excinfo:
+            manager.submit('s3', STAGES, _finish, 1)
+        assert excinfo.value.retry_after >= 1
+        # A session replacing its own job is not counted against the queue
+        manager.check_admission('s2')
+
+        release.touch()
+        assert first.wait(60) and second.wait(60)
+        assert first.result == 'released'
+        third = manager.submit('s3', STAGES, _finish, 1)
+        assert third.wait(60)
+        assert third.status == JOB_COMPLETED
+
+    def test_session_job_tracks_latest_submission(self, manager):
+        first = manager.submit('s1', STAGES, _finish, 1)
+        second = manager.submit('s1', STAGES, _finish, 2)
+        assert manager.session_job('s1') is second
+        assert first.wait(60) and second.wait(60)
+        assert manager.cancel_session('s1') is None
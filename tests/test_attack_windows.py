@@ -0,0 +1,179 @@
+"""Tests for time-windowed attack incidents produced by detect_attacks.
+
+A short SYN flood embedded in a long, mostly idle capture must be reported
+as a localized incident even though the capture-wide ratios look normal.
+"""
+
+import pytest
+from scapy.all import Ether, IP, TCP
+from network_analyzer import NetworkAnalyzer, _AttackAccumulator, _SlowlorisTracker
+
+
+def _tcp(ts, src, sport, dst, dport, flags):
+    pkt = Ether() / IP(src=src, dst=dst) / TCP(sport=sport, dport=dport, flags=flags)
+    pkt.time = ts
+    return pkt
+
+
+def _normal_session(ts, sport):
+    c, s = '10.0.0.2', '10.0.0.80'
+    return [
+        _tcp(ts, c, sport, s, 80, 'S'),
+        _tcp(ts + 0.01, s, 80, c, sport, 'SA'),
+        _tcp(ts + 0.02, c, sport, s, 80, 'A'),
+        _tcp(ts + 0.03, c, sport, s, 80, 'PA'),
+    ]
+
+
+@pytest.fixture(scope='module')
+def flood_in_long_capture():
+    packets = []
+    # 2 hours of light, healthy traffic: one full handshake every 10 seconds
+    for i in range(720):
+        packets.extend(_normal_session(1000.0 + i * 10, 20000 + i))
+    # 3-second SYN flood starting at t=4000.5
+    for i in range(900):
+        packets.append(_tcp(4000.5 + i * (3.0 / 900), f'172.16.{i % 250}.{i % 200 + 1}', 30000 + i,
+                            '10.0.0.80', 443, 'S'))
+    packets.sort(key=lambda p: p.time)
+
+    a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+    a.pcap_file = 'synthetic.pcap'
+    a.packets = packets
+    a.analysis_results = {}
+    return a.detect_attacks()
+
+
+class TestWindowedIncidents:
+    def test_incidents_key_present(self, flood_in_long_capture):
+        assert isinstance(flood_in_long_capture['incidents'], list)
+
+    def test_flood_localized_in_one_second_windows(self, flood_in_long_capture):
+        one_sec = [i for i in flood_in_long_capture['incidents'] if i['window_seconds'] == 1.0]
+        assert len(one_sec) == 1
+        incident = one_sec[0]
+        assert incident['type'] == 'SYN Flood'
+        assert 4000.0 <= incident['start'] <= 4001.0
+        assert 4003.0 <= incident['end'] <= 4004.0
+
+    def test_adjacent_windows_merge(self, flood_in_long_capture):
+        incident = next(i for i in flood_in_long_capture['incidents'] if i['window_seconds'] == 1.0)
+        assert incident['window_count'] >= 3
+        assert incident['duration_seconds'] == incident['end'] - incident['start']
+
+    def test_incident_has_peak_metrics(self, flood_in_long_capture):
+        incident = flood_in_long_capture['incidents'][0]
+        peak = incident['peak_metrics']
+        assert peak['syn_count'] > 100
+        assert peak['handshake_completion_rate'] < 0.3
+        assert incident['severity'] in ('low', 'medium', 'high')
+        assert incident['startEpochMs'] == int(incident['start'] * 1000)
+
+    def test_no_incidents_for_normal_traffic(self):
+        packets = []
+        for i in range(50):
+            packets.extend(_normal_session(1000.0 + i, 20000 + i))
+        a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+        a.pcap_file = 'synthetic.pcap'
+        a.packets = packets
+        a.analysis_results = {}
+        result = a.detect_attacks()
+        assert result['incidents'] == []
+
+
+class TestSnapshot:
+    def test_snapshot_does_not_close_windows(self):
+        a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+        a.pcap_file = 'synthetic.pcap'
+        a.analysis_results = {}
+        packets = [_tcp(4000.5 + i * (3.0 / 900), f'172.16.{i % 250}.{i % 200 + 1}', 30000 + i,
+                        '10.0.0.80', 443, 'S') for i in range(900)]
+        no_dns = {'amplification_ratio': 0, 'total_responses': 0, 'response_source_count': 0}
+        accumulator = _AttackAccumulator(a)
+        for index, packet in enumerate(packets[:450]):
+            accumulator.observe(packet, index)
+        partial = accumulator.result(no_dns, final=False)['incidents']
+        assert accumulator.result(no_dns, final=False)['incidents'] == partial
+        for index, packet in enumerate(packets[450:], 450):
+            accumulator.observe(packet, index)
+        incidents = accumulator.result(no_dns)['incidents']
+        one_sec = [i for i in incidents if i['window_seconds'] == 1.0]
+        # The incident open at the snapshot was extended, not split in two
+        assert len(one_sec) == 1 and one_sec[0]['window_count'] >= 3
+        assert len([i for i in partial if i['window_seconds'] == 1.0]) == 1
+
+
+class TestCaptureWideConnectionCounts:
+    def _analyze(self, packets):
+        a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+        a.pcap_file = 'synthetic.pcap'
+        a.packets = packets
+        a.analysis_results = {}
+        return a.detect_attacks()
+
+    def test_teardown_without_data_rate(self):
+        c, s = '10.0.0.2', '10.0.0.80'
+        packets = [
+            _tcp(1.0, c, 40001, s, 80, 'PA'), _tcp(1.1, s, 80, c, 40001, 'FA'),  # data, then FIN
+            _tcp(1.2, c, 40002, s, 80, 'S'), _tcp(1.3, c, 40002, s, 80, 'FA'),   # FIN without data
+            _tcp(1.4, c, 40003, s, 80, 'S'), _tcp(1.5, s, 80, c, 40003, 'R'),    # RST without data
+            _tcp(1.6, c, 40004, s, 80, 'S'),                                     # still open
+        ]
+        metrics = self._analyze(packets)['metrics']
+        assert metrics['total_connections'] == 4
+        assert metrics['teardown_without_data_rate'] == 0.5
+
+    def test_spoofed_flood_keeps_no_per_connection_state(self):
+        a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+        a.pcap_file = 'synthetic.pcap'
+        a.analysis_results = {}
+        accumulator = _AttackAccumulator(a)
+        for i in range(5000):
+            accumulator.observe(_tcp(1.0 + i * 1e-4, f'172.{i // 65536}.{i // 256 % 256}.{i % 256}', 1024 + i % 60000,
+                                     '10.0.0.80', 443, 'S'))
+        assert not isinstance(accumulator.connections, dict)
+        no_dns = {'amplification_ratio': 0, 'total_responses': 0, 'response_source_count': 0}
+        metrics = accumulator.result(no_dns)['metrics']
+        assert metrics['total_connections'] == pytest.approx(5000, rel=0.05)
+
+    def test_slowloris_sources_are_bounded(self):
+        tracker = _SlowlorisTracker(max_sources=64)
+        # Genuine slowloris: 20 idle sockets held open for a minute, then a spoofed flood
+        for i in range(20):
+            tracker.observe(_tcp(1.0 + i * 3, '10.9.9.9', 40000 + i, '10.0.0.80', 80, 'S'))
+        for i in range(2000):
+            tracker.observe(_tcp(100.0 + i * 1e-3, f'172.16.{i // 256}.{i % 256}', 1024 + i, '10.0.0.80', 80, 'S'))
+        assert len(tracker.connections) == 64
+        result = tracker.result()
+        assert result['evicted_sources'] == 2001 - 64
+        assert result['suspicious_sources'] == 1
+        assert result['details'][0]['ip'] == '10.9.9.9'
+
+
+class TestOutOfOrderAndPacketIndex:
+    def _flood(self, jitter_every=None):
+        packets = [_tcp(1000.0 + i * 10, '10.0.0.2', 20000 + i, '10.0.0.80', 80, 'S') for i in range(3)]
+        for i in range(600):
+            ts = 2000.2 + i * (3.0 / 600)
+            if jitter_every and i % jitter_every == jitter_every - 1:
+                ts -= 1.0  # late packet from another interface, one window earlier
+            packets.append(_tcp(ts, f'172.16.{i % 250}.{i % 200 + 1}', 30000 + i, '10.0.0.80', 443, 'S'))
+        a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+        a.pcap_file = 'synthetic.pcap'
+        a.packets = packets
+        a.analysis_results = {}
+        return a
+
+    def test_out_of_order_packets_do_not_fragment_incident(self):
+        result = self._flood(jitter_every=50).detect_attacks()
+        one_sec = [i for i in result['incidents'] if i['window_seconds'] == 1.0]
+        assert len(one_sec) == 1
+        assert one_sec[0]['window_count'] == 3
+
+    def test_incident_event_points_at_first_flood_packet(self):
+        a = self._flood()
+        a.analysis_results['attack_analysis'] = a.detect_attacks()
+        incident = next(i for i in a.analysis_results['attack_analysis']['incidents'] if i['window_seconds'] == 1.0)
+        assert incident['first_packet_index'] == 3
+        events = a._compose_expert_info([], [], a.analysis_results['attack_analysis'])
+        assert [e['packetIndex'] for e in events if e['timestamp'] == incident['start']] == [3]
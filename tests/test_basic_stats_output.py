@@ -0,0 +1,75 @@
+"""Tests for the compact basic_stats representation written by save_results.
+
+Per-packet sizes and intervals must be summarized as fixed-bin histograms and
+quantiles in the results JSON; raw arrays only go to binary sidecar files.
+"""
+
+import json
+import os
+from array import array
+
+import pytest
+from scapy.all import Ether, IP, UDP
+from network_analyzer import NetworkAnalyzer
+
+
+def _make_analyzer(keep_series=False):
+    packets = []
+    for i in range(200):
+        pkt = Ether() / IP(src='10.0.0.1', dst='10.0.0.2') / UDP(sport=5000, dport=53) / (b'x' * (i % 50))
+        pkt.time = 100.0 + i * 0.01
+        packets.append(pkt)
+    a = NetworkAnalyzer('synthetic.pcap', keep_per_packet_series=keep_series)
+    a.packets = packets
+    return a
+
+
+class TestCompactBasicStats:
+    def test_no_raw_lists_in_results(self):
+        a = _make_analyzer()
+        stats = a.basic_statistics()
+        assert 'packet_sizes' not in stats
+        assert 'time_intervals' not in stats
+        assert 'series_sidecar' not in stats
+
+    def test_histograms_cover_every_value(self):
+        stats = _make_analyzer().basic_statistics()
+        sizes = stats['packet_size_histogram']
+        intervals = stats['time_interval_histogram_ms']
+        assert sum(sizes['counts']) + sizes['underflow'] + sizes['overflow'] == 200
+        assert sum(intervals['counts']) + intervals['underflow'] + intervals['overflow'] == 199
+        assert len(sizes['edges']) == len(sizes['counts']) + 1
+
+    def test_histogram_bins_are_fixed(self):
+        small = _make_analyzer().basic_statistics()
+        a = _make_analyzer()
+        a.packets = a.packets[:10]
+        other = a.basic_statistics()
+        assert small['packet_size_histogram']['edges'] == other['packet_size_histogram']['edges']
+
+    def test_summary_matches_data(self):
+        stats = _make_analyzer().basic_statistics()
+        assert stats['packet_size_summary']['min'] == 42
+        assert stats['packet_size_summary']['max'] == 91
+        assert stats['time_interval_summary']['p50_ms'] == pytest.approx(10, rel=0.02)
+        assert stats['total_bytes'] == sum(42 + i % 50 for i in range(200))
+
+    def test_sidecar_written_when_series_kept(self, tmp_path):
+        a = _make_analyzer(keep_series=True)
+        stats = a.basic_statistics()
+        output = tmp_path / 'network_analysis_results.json'
+        a.save_results(output_file=str(output), public_output_dir=str(tmp_path))
+
+        with open(output, encoding='utf-8') as handle:
+            section = json.load(handle)['sections']['basic_stats']['file']
+        with open(tmp_path / section, encoding='utf-8') as handle:
+            saved = json.load(handle)
+        assert 'packet_sizes' not in saved
+        meta = saved['series_sidecar']['packet_sizes']
+        assert meta['count'] == 200
+
+        sizes = array('I')
+        with open(tmp_path / meta['file'], 'rb') as handle:
+            sizes.fromfile(handle, meta['count'])
+        assert list(sizes) == [42 + i % 50 for i in range(200)]
+        assert os.path.getsize(tmp_path / saved['series_sidecar']['time_intervals']['file']) == 199 * 8
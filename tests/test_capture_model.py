@@ -0,0 +1,121 @@
+"""Tests for the capture model handed from analysis workers to the API (capture_model)."""
+
+import os
+import pickle
+
+import pytest
+from scapy.all import Ether, IP, TCP, UDP, Raw, rdpcap, wrpcap, wrpcapng
+
+from capture_model import NO_FLOW, LazyPacketList, open_capture_model, save_capture_model, scan_record_offsets
+from network_analyzer import NetworkAnalyzer
+
+
+def _packets():
+    packets = []
+    seq = 1000
+    for i in range(30):
+        payload = f'GET /{i} HTTP/1.1\r\nHost: example\r\n\r\n'.encode()
+        pkt = Ether() / IP(src='10.0.0.1', dst='10.0.0.2') / TCP(sport=40000, dport=80, flags='PA', seq=seq) / Raw(payload)
+        seq += len(payload)
+        pkt.time = 100.0 + i * 0.01
+        packets.append(pkt)
+        dns = Ether() / IP(src='10.0.0.3', dst='8.8.8.8') / UDP(sport=5353 + i, dport=53) / Raw(b'x' * i)
+        dns.time = 100.005 + i * 0.01
+        packets.append(dns)
+    return packets
+
+
+@pytest.fixture(params=['pcap', 'pcapng'])
+def capture(request, tmp_path):
+    path = tmp_path / f'capture.{request.param}'
+    (wrpcap if request.param == 'pcap' else wrpcapng)(str(path), _packets())
+    return str(path)
+
+
+def _loaded(path):
+    analyzer = NetworkAnalyzer(path)
+    assert analyzer.load_packets()
+    return analyzer
+
+
+class TestScanRecordOffsets:
+    def test_one_offset_per_packet(self, capture):
+        offsets = scan_record_offsets(capture)
+        assert len(offsets) == 60
+        assert list(offsets) == sorted(offsets)
+
+    def test_unknown_format(self, tmp_path):
+        path = tmp_path / 'notes.txt'
+        path.write_bytes(b'not a capture file')
+        assert scan_record_offsets(str(path)) is None
+
+
+class TestLazyPacketList:
+    def test_random_access_matches_rdpcap(self, capture):
+        expected = rdpcap(capture)
+        lazy = LazyPacketList(capture, scan_record_offsets(capture), cache_size=4)
+        assert len(lazy) == len(expected)
+        for index in (59, 0, 31, 7, -1):
+            assert bytes(lazy[index]) == bytes(expected[index])
+            assert float(lazy[index].time) == float(expected[index].time)
+        assert [bytes(p) for p in lazy] == [bytes(p) for p in expected]
+        with pytest.raises(IndexError):
+            lazy[60]
+        lazy.close()
+
+    def test_decoded_packets_are_bounded(self, capture):
+        lazy = LazyPacketList(capture, scan_record_offsets(capture), cache_size=4)
+        for index in range(20):
+            lazy[index]
+        assert len(lazy._cache) == 4
+
+
+class TestAnalyzerFromCaptureModel:
+    def test_model_survives_pickling(self, capture):
+        model = pickle.loads(pickle.dumps(_loaded(capture).build_capture_model()))
+        assert len(model) == 60
+        assert model.path == capture
+
+    def test_queries_match_eager_analyzer(self, capture):
+        eager = _loaded(capture)
+        lazy = NetworkAnalyzer.from_capture_model(eager.build_capture_model())
+        connection_id = 'tcp-10.0.0.1-40000-10.0.0.2-80'
+
+        indices = eager._find_packets_by_connection_id(connection_id)
+        assert lazy._find_packets_by_connection_id(connection_id) == indices
+        for index in sorted(indices)[:5]:
+            assert lazy._extract_packet_deep_detail(index) == eager._extract_packet_deep_detail(index)
+        assert lazy.reassemble_tcp_stream(connection_id) == eager.reassemble_tcp_stream(connection_id)
+
+    def test_no_model_when_record_count_differs(self, capture):
+        analyzer = _loaded(capture)
+        analyzer.packets = analyzer.packets[:10]
+        assert analyzer.build_capture_model() is None
+
+
+class TestMappedCaptureModel:
+    def test_round_trip(self, capture, tmp_path):
+        eager = _loaded(capture)
+        model = eager.build_capture_model()
+        save_capture_model(model, str(tmp_path / 'model'))
+
+        mapped = open_capture_model(str(tmp_path / 'model'), capture)
+        assert list(mapped.offsets) == list(model.offsets)
+        assert {key: list(v) for key, v in mapped.flow_index.items()} == \
+            {key: list(v) for key, v in model.flow_index.items()}
+        assert list(mapped.columns['time']) == [float(p.time) for p in eager.packets]
+        assert list(mapped.columns['wirelen']) == [len(p) for p in eager.packets]
+        assert NO_FLOW not in list(mapped.columns['flow'])
+
+        lazy = NetworkAnalyzer.from_capture_model(mapped)
+        connection_id = 'tcp-10.0.0.1-40000-10.0.0.2-80'
+        assert lazy._find_packets_by_connection_id(connection_id) == eager._find_packets_by_connection_id(connection_id)
+        assert lazy.reassemble_tcp_stream(connection_id) == eager.reassemble_tcp_stream(connection_id)
+        assert lazy._extract_packet_deep_detail(59) == eager._extract_packet_deep_detail(59)
+
+    def test_stale_or_missing_model_is_ignored(self, capture, tmp_path):
+        assert open_capture_model(str(tmp_path / 'model'), capture) is None
+        save_capture_model(_loaded(capture).build_capture_model(), str(tmp_path / 'model'))
+        stat = os.stat(capture)
+        os.utime(capture, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert open_capture_model(str(tmp_path / 'model'), capture) is None
@@ -0,0 +1,80 @@
+"""Tests for the binary column tables (columnar_store)."""
+
+import pytest
+
+import columnar_store
+from columnar_store import FORMAT_ARROW, FORMAT_COLS, columns_from_records, open_table, write_table
+
+RECORDS = [
+    {'id': 1, 'time': 1.5, 'name': 'alpha', 'tags': ['a'], 'extra': None},
+    {'id': 2, 'time': 2, 'name': 'βeta', 'tags': [], 'extra': {'k': 1}},
+    {'id': 3, 'time': 3.25, 'name': '', 'tags': ['c', 'd']},
+]
+
+
+def _formats():
+    return [FORMAT_COLS] + ([FORMAT_ARROW] if columnar_store.pa is not None else [])
+
+
+@pytest.fixture(params=_formats())
+def fmt(request):
+    return request.param
+
+
+class TestColumnsFromRecords:
+    def test_union_of_keys_with_gaps(self):
+        columns = columns_from_records(RECORDS, extra={'double': lambda r: r['id'] * 2})
+        assert list(columns) == ['id', 'time', 'name', 'tags', 'extra', 'double']
+        assert columns['extra'] == [None, {'k': 1}, None]
+        assert columns['double'] == [2, 4, 6]
+
+
+class TestColumnTable:
+    def test_round_trip_and_kinds(self, tmp_path, fmt):
+        path = write_table(str(tmp_path / 'table'), columns_from_records(RECORDS), fmt=fmt)
+        table = open_table(path)
+        assert table.num_rows == 3
+        assert table.kinds == {'id': 'int', 'time': 'float', 'name': 'str', 'tags': 'json', 'extra': 'json'}
+        assert list(table.column('time')) == [1.5, 2.0, 3.25]
+        assert table.rows(columns=['id', 'name', 'tags']) == [
+            {'id': 1, 'name': 'alpha', 'tags': ['a']},
+            {'id': 2, 'name': 'βeta', 'tags': []},
+            {'id': 3, 'name': '', 'tags': ['c', 'd']},
+        ]
+        assert table.rows(columns=['extra'], start=1, stop=2) == [{'extra': {'k': 1}}]
+
+    def test_empty_table(self, tmp_path, fmt):
+        table = open_table(write_table(str(tmp_path / 'empty'), {'id': []}, fmt=fmt))
+        assert table.num_rows == 0
+        assert table.rows() == []
+
+    def test_large_ints_fall_back_to_json(self, tmp_path):
+        table = open_table(write_table(str(tmp_path / 'big'), {'n': [1, 2 ** 70]}, fmt=FORMAT_COLS))
+        assert table.kinds['n'] == 'json'
+        assert list(table.column('n')) == [1, 2 ** 70]
+
+    def test_unequal_columns_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            write_table(str(tmp_path / 'bad'), {'a': [1], 'b': []}, fmt=FORMAT_COLS)
+
+    def test_missing_or_foreign_file(self, tmp_path):
+        assert open_table(str(tmp_path / 'missing.cols')) is None
+        other = tmp_path / 'other.cols'
+        other.write_bytes(b'not a table at all')
+        assert open_table(str(other)) is None
+
+
+class TestArrowTable:
+    def test_columns_are_views_of_the_file(self, tmp_path):
+        pytest.importorskip('pyarrow')
+        columns = {'id': list(range(1000)), 'time': [i / 4 for i in range(1000)],
+                   'name': [f'n{i}' for i in range(1000)], 'tags': [[i] for i in range(1000)]}
+        table = open_table(write_table(str(tmp_path / 'table'), columns, fmt=FORMAT_ARROW))
+        ids = table.column('id')
+        assert isinstance(ids, memoryview) and ids.format == 'q'
+        assert list(ids) == columns['id']
+        assert list(table.column('time')) == columns['time']
+        names = table.column('name')
+        assert len(names) == 1000 and names[999] == 'n999' and names[-1] == 'n999'
+        assert table.column('tags')[10:12] == [[10], [11]]
+        assert table.rows(columns=['id', 'name'], start=998) == [{'id': 998, 'name': 'n998'}, {'id': 999, 'name': 'n999'}]
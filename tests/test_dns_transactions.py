@@ -0,0 +1,129 @@
+"""Tests for the DNS transaction table (Phase 13).
+
+Queries and responses are matched on (txid, client, server, qname); retries,
+timeouts, unsolicited responses and per-server rates come from the same pass.
+"""
+
+import pytest
+from scapy.all import Ether, IP, UDP, DNS, DNSQR, DNSRR
+from network_analyzer import NetworkAnalyzer
+
+CLIENT = '192.168.1.10'
+RESOLVER = '8.8.8.8'
+BACKUP = '1.1.1.1'
+
+
+def _query(ts, txid, name, server=RESOLVER, sport=5353):
+    pkt = Ether() / IP(src=CLIENT, dst=server) / UDP(sport=sport, dport=53) / DNS(id=txid, rd=1, qd=DNSQR(qname=name))
+    pkt.time = ts
+    return pkt
+
+
+def _response(ts, txid, name, server=RESOLVER, rcode=0, answers=1, dport=5353):
+    an = None
+    for i in range(answers):
+        rr = DNSRR(rrname=name, type='A', rdata=f'10.0.0.{i + 1}', ttl=60)
+        an = rr if an is None else an / rr
+    dns = DNS(id=txid, qr=1, rcode=rcode, qd=DNSQR(qname=name), an=an)
+    pkt = Ether() / IP(src=server, dst=CLIENT) / UDP(sport=53, dport=dport) / dns
+    pkt.time = ts
+    return pkt
+
+
+@pytest.fixture
+def analyzer():
+    packets = [
+        _query(1.000, 1, 'example.com'),
+        _response(1.020, 1, 'example.com', answers=2),
+        # Retried twice before the answer arrives
+        _query(2.000, 2, 'slow.example'),
+        _query(3.000, 2, 'slow.example'),
+        _query(4.000, 2, 'slow.example'),
+        _response(4.050, 2, 'slow.example'),
+        # Same txid, different name: a separate transaction
+        _query(5.000, 2, 'other.example'),
+        _response(5.010, 2, 'other.example', rcode=3, answers=0),
+        _query(6.000, 3, 'broken.example', server=BACKUP),
+        _response(6.200, 3, 'broken.example', server=BACKUP, rcode=2, answers=0),
+        # Never answered
+        _query(7.000, 4, 'lost.example', server=BACKUP),
+        # Response without a matching query
+        _response(20.000, 99, 'reflected.example', answers=3),
+    ]
+    a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+    a.packets = packets
+    a.analysis_results = {}
+    return a
+
+
+class TestDnsTransactions:
+    def _rows(self, analyzer):
+        return analyzer._get_dns_transactions()['rows']
+
+    def test_matching_and_latency(self, analyzer):
+        first = self._rows(analyzer)[0]
+        assert first['qname'] == 'example.com.'
+        assert first['status'] == 'answered'
+        assert first['latencyMs'] == pytest.approx(20, abs=0.01)
+        assert first['answerCount'] == 2
+        assert first['responsePacket'] == 1
+
+    def test_retries_measured_from_last_attempt(self, analyzer):
+        slow = next(r for r in self._rows(analyzer) if r['qname'] == 'slow.example.')
+        assert slow['retries'] == 2
+        assert slow['latencyMs'] == pytest.approx(50, abs=0.01)
+
+    def test_qname_distinguishes_reused_txid(self, analyzer):
+        other = next(r for r in self._rows(analyzer) if r['qname'] == 'other.example.')
+        assert other['rcode'] == 'Name Error (NXDOMAIN)'
+
+    def test_timeout_and_unsolicited(self, analyzer):
+        statuses = {r['qname']: r['status'] for r in self._rows(analyzer)}
+        assert statuses['lost.example.'] == 'timeout'
+        assert statuses['reflected.example.'] == 'unsolicited'
+
+    def test_retried_query_does_not_hold_back_expiry(self, analyzer):
+        analyzer.packets = [
+            _query(0.0, 10, 'retried.example'),
+            _query(1.0, 11, 'abandoned.example'),
+            _query(4.0, 10, 'retried.example'),
+            # Abandoned query is past the timeout even though the retry is not
+            _response(6.5, 11, 'abandoned.example'),
+        ]
+        rows = self._rows(analyzer)
+        statuses = [(r['qname'], r['status']) for r in rows]
+        assert ('abandoned.example.', 'timeout') in statuses
+        assert ('abandoned.example.', 'unsolicited') in statuses
+
+    def test_analyze_dns_rates_and_servers(self, analyzer):
+        result = analyzer.analyze_dns()
+        summary = result['summary']
+        assert summary['queries'] == 5
+        assert summary['answered'] == 4
+        assert summary['timeouts'] == 1
+        assert summary['unsolicited_responses'] == 1
+        assert summary['nxdomain_rate'] == 0.25
+        assert summary['servfail_rate'] == 0.25
+        assert result['servers'][BACKUP]['servfail_rate'] == 1.0
+        assert result['servers'][RESOLVER]['latency_ms']['max'] == pytest.approx(50, abs=0.01)
+        table = result['transactions']
+        assert table['total'] == 6
+        assert len(table['rows'][0]) == len(table['columns'])
+        assert 'dns_analysis' in analyzer.analysis_results
+
+    def test_amplification_from_same_pass(self, analyzer):
+        amp = analyzer._detect_dns_amplification()
+        assert amp['total_queries'] == 7
+        assert amp['total_responses'] == 5
+        assert amp['response_source_count'] == 2
+        assert amp['target_ip'] == CLIENT
+        assert amp['amplification_ratio'] > 1
+
+    def test_dns_timelines_per_conversation(self, analyzer):
+        timelines = analyzer._build_dns_timelines()
+        ids = sorted(t['id'] for t in timelines)
+        assert ids == [f'udp-{CLIENT}-5353-{BACKUP}-53', f'udp-{CLIENT}-5353-{RESOLVER}-53']
+        resolver = next(t for t in timelines if t['id'].endswith(f'{RESOLVER}-53'))
+        assert resolver['protocolType'] == 'dns-query'
+        assert resolver['metrics']['transactionCount'] == 4
+        assert resolver['metrics']['packetCount'] == 9
@@ -0,0 +1,79 @@
+"""Tests for the single-pass generic TCP fallback timelines (flood-* / tcp-data-*)."""
+
+import pytest
+from scapy.all import Ether, IP, TCP, Raw
+from network_analyzer import NetworkAnalyzer
+
+
+def _tcp(ts, src, sport, dst, dport, flags, payload=b''):
+    pkt = Ether() / IP(src=src, dst=dst) / TCP(sport=sport, dport=dport, flags=flags)
+    if payload:
+        pkt = pkt / Raw(payload)
+    pkt.time = ts
+    return pkt
+
+
+def _analyzer(packets):
+    a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+    a.pcap_file = 'synthetic.pcap'
+    a.packets = packets
+    a.analysis_results = {}
+    return a
+
+
+@pytest.fixture(scope='module')
+def timelines():
+    packets = []
+    # SYN flood with a fresh source port per packet; every third SYN is answered
+    for i in range(150):
+        packets.append(_tcp(1 + i * 0.01, '10.0.0.66', 10000 + i, '10.0.0.80', 80, 'S'))
+        if i % 3 == 0:
+            packets.append(_tcp(1 + i * 0.01 + 0.001, '10.0.0.80', 80, '10.0.0.66', 10000 + i, 'SA'))
+    # one ordinary bidirectional connection
+    for i in range(40):
+        packets.append(_tcp(5 + i * 0.01, '10.0.0.2', 5555, '10.0.0.22', 22, 'PA', b'x'))
+        packets.append(_tcp(5 + i * 0.01 + 0.002, '10.0.0.22', 22, '10.0.0.2', 5555, 'A'))
+    packets.sort(key=lambda p: p.time)
+    return {t['id']: t for t in _analyzer(packets)._extract_generic_tcp_connections()}
+
+
+class TestGenericTcpTimelines:
+    def test_flood_timeline(self, timelines):
+        flood = timelines['flood-10.0.0.66-0-10.0.0.80-80']
+        assert flood['protocolType'] == 'syn-flood'
+        assert flood['metrics']['packetCount'] == 150
+        assert flood['metrics']['uniquePorts'] == 150
+        assert [len(stage['packetRefs']) for stage in flood['stages']] == [10, 10, 10]
+        assert flood['allPacketRefs'] == sorted(flood['allPacketRefs'])
+        assert len(flood['allPacketRefs']) == 150
+
+    def test_flood_directions_not_repeated_as_connections(self, timelines):
+        # each answered SYN leaves only its SYN-ACK behind, which is below the 2-packet floor
+        assert not any(tid.startswith('tcp-data-10.0.0.66') or tid.startswith('tcp-data-10.0.0.80')
+                       for tid in timelines)
+
+    def test_normal_connection(self, timelines):
+        conn = timelines['tcp-data-10.0.0.2-5555-10.0.0.22-22']
+        assert conn['metrics']['packetCount'] == 80
+        refs = conn['stages'][0]['packetRefs'] + conn['stages'][1]['packetRefs']
+        assert len(refs) == 80 and refs == sorted(refs)
+
+
+class TestBoundedRefs:
+    def test_refs_and_sample_are_capped(self):
+        packets = [_tcp(i * 0.001, '10.0.0.66', 1024 + i, '10.0.0.80', 443, 'S') for i in range(3000)]
+        packets += [_tcp(10 + i * 0.001, '10.0.0.2', 5555, '10.0.0.22', 22, 'PA', b'x') for i in range(1000)]
+        a = _analyzer(packets)
+        a.GENERIC_TCP_MAX_PACKET_REFS = 50
+        a.FLOOD_SAMPLE_SIZE = 100
+        result = {t['id']: t for t in a._extract_generic_tcp_connections()}
+
+        flood = result['flood-10.0.0.66-0-10.0.0.80-443']
+        assert flood['metrics']['packetCount'] == 3000
+        assert len(flood['allPacketRefs']) == 100
+        assert flood['allPacketRefs'][-1] > 1500
+
+        conn = result['tcp-data-10.0.0.2-5555-10.0.0.22-22']
+        refs = conn['stages'][0]['packetRefs'] + conn['stages'][1]['packetRefs']
+        assert conn['metrics']['packetCount'] == 1000
+        assert refs == list(range(3000, 3050))
@@ -0,0 +1,137 @@
+"""Tests for the stream-based HTTP/1.x parser and per-connection HTTP timelines."""
+
+import pytest
+from scapy.all import Ether, IP, TCP
+from http_parser import HttpMessageParser, looks_like_http, pair_transactions, parse_http_stream
+from network_analyzer import NetworkAnalyzer
+
+
+class TestHttpMessageParser:
+    def test_pipelined_requests(self):
+        requests, responses = parse_http_stream(
+            b'GET /a HTTP/1.1\r\nHost: x\r\n\r\nGET /b HTTP/1.1\r\nHost: x\r\n\r\n',
+            b'HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello'
+            b'HTTP/1.1 404 Not Found\r\nContent-Length: 3\r\n\r\nnope',
+        )
+        pairs = pair_transactions(requests, responses)
+        assert [(req['path'], resp['status']) for req, resp, _ in pairs] == [('/a', 200), ('/b', 404)]
+        assert responses[0]['bodyLength'] == 5
+
+    def test_chunked_body_with_trailer(self):
+        parser = HttpMessageParser('response')
+        parser.expect('GET')
+        body = b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n4\r\nWiki\r\n5;ext=1\r\npedia\r\n0\r\nX-T: 1\r\n\r\n'
+        messages = parser.feed(body)
+        assert len(messages) == 1
+        assert messages[0]['chunked']
+        assert messages[0]['bodyLength'] == 9
+        assert messages[0]['end'] == len(body)
+
+    def test_incremental_feed_byte_by_byte(self):
+        data = b'POST /up HTTP/1.1\r\nContent-Length: 4\r\n\r\ndataGET / HTTP/1.1\r\n\r\n'
+        parser = HttpMessageParser('request')
+        messages = []
+        for i in range(len(data)):
+            messages.extend(parser.feed(data[i:i + 1]))
+        assert [m['method'] for m in messages] == ['POST', 'GET']
+        assert messages[0]['bodyLength'] == 4
+        assert messages[1]['start'] == messages[0]['end']
+
+    def test_head_response_has_no_body(self):
+        requests, responses = parse_http_stream(
+            b'HEAD / HTTP/1.1\r\n\r\nGET / HTTP/1.1\r\n\r\n',
+            b'HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\nHTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok',
+        )
+        assert len(responses) == 2
+        assert responses[0]['bodyLength'] == 0
+
+    def test_close_delimited_and_interim_responses(self):
+        requests, responses = parse_http_stream(
+            b'GET / HTTP/1.0\r\n\r\n',
+            b'HTTP/1.1 100 Continue\r\n\r\nHTTP/1.0 200 OK\r\n\r\nbody until close',
+        )
+        pairs = pair_transactions(requests, responses)
+        request, response, interim = pairs[0]
+        assert response['status'] == 200
+        assert response['bodyLength'] == len(b'body until close')
+        assert [m['status'] for m in interim] == [100]
+
+    def test_non_http_stream_stops_parsing(self):
+        parser = HttpMessageParser('request')
+        assert parser.feed(b'\x16\x03\x01\x02\x00\x01\x00\x01\xfc') == []
+        assert parser.failed
+        assert not looks_like_http(b'\x16\x03\x01')
+
+    def test_unanswered_request(self):
+        pairs = pair_transactions(*parse_http_stream(b'GET / HTTP/1.1\r\n\r\n', b''))
+        assert pairs[0][1] is None
+
+
+def _tcp(ts, src, dst, flags, seq, payload=b''):
+    pkt = Ether() / IP(src=src[0], dst=dst[0]) / TCP(sport=src[1], dport=dst[1], flags=flags, seq=seq, ack=1)
+    if payload:
+        pkt = pkt / payload
+    pkt.time = ts
+    return pkt
+
+
+@pytest.fixture
+def keepalive_analyzer():
+    client, server = ('10.0.0.5', 51000), ('10.0.0.80', 8080)
+    req1 = b'GET /one HTTP/1.1\r\nHost: h\r\n\r\n'
+    req2 = b'GET /two HTTP/1.1\r\nHost: h\r\n\r\n'
+    resp1 = b'HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\nabc'
+    resp2 = b'HTTP/1.1 500 Internal Server Error\r\nContent-Length: 0\r\n\r\n'
+    packets = [
+        _tcp(10.000, client, server, 'S', 100),
+        _tcp(10.001, server, client, 'SA', 900),
+        _tcp(10.002, client, server, 'A', 101),
+        _tcp(10.010, client, server, 'PA', 101, req1),
+        # Response split across two segments
+        _tcp(10.050, server, client, 'PA', 901, resp1[:20]),
+        _tcp(10.060, server, client, 'PA', 921, resp1[20:]),
+        _tcp(11.000, client, server, 'PA', 101 + len(req1), req2),
+        _tcp(11.200, server, client, 'PA', 901 + len(resp1), resp2),
+    ]
+    a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+    a.packets = packets
+    a.analysis_results = {}
+    return a
+
+
+class TestHttpTimelines:
+    def test_one_timeline_per_connection(self, keepalive_analyzer):
+        timelines = keepalive_analyzer._detect_http_requests()
+        assert len(timelines) == 1
+        timeline = timelines[0]
+        assert timeline['id'] == 'http-10.0.0.5-51000-10.0.0.80-8080'
+        assert timeline['metrics']['transactionCount'] == 2
+        assert timeline['stages'][0]['label'] == 'GET /one'
+        assert timeline['stages'][2]['label'] == '200 OK'
+
+    def test_transaction_timing(self, keepalive_analyzer):
+        txns = keepalive_analyzer._detect_http_requests()[0]['metrics']['transactions']
+        first, second = txns
+        assert first['ttfbMs'] == pytest.approx(40, abs=0.01)
+        assert first['durationMs'] == pytest.approx(50, abs=0.01)
+        assert first['responseBodyBytes'] == 3
+        assert second['status'] == 500
+        assert second['ttfbMs'] == pytest.approx(200, abs=0.01)
+
+    def test_packet_details_use_flow_parse(self, keepalive_analyzer):
+        details = keepalive_analyzer._extract_packet_details(3)
+        assert details['http']['method'] == 'GET'
+        assert details['http']['path'] == '/one'
+        assert keepalive_analyzer._extract_packet_details(4)['http']['status'] == 200
+        # Continuation segment of the response carries no new message
+        assert 'http' not in keepalive_analyzer._extract_packet_details(5)
+
+    def test_packet_details_parse_only_their_flow(self, keepalive_analyzer):
+        other = _tcp(10.5, ('10.0.0.6', 52000), ('10.0.0.81', 80), 'PA', 1, b'GET /x HTTP/1.1\r\n\r\n')
+        keepalive_analyzer.packets.append(other)
+        assert keepalive_analyzer._extract_packet_details(3)['http']['path'] == '/one'
+        assert keepalive_analyzer._extract_packet_details(6)['http']['path'] == '/two'
+        # No capture-wide pass: only the requested packet's flow was parsed
+        assert getattr(keepalive_analyzer, '_http_by_packet', None) is None
+        flow = NetworkAnalyzer._flow_key('10.0.0.5', 51000, '10.0.0.80', 8080)
+        assert keepalive_analyzer._http_flow_cache.keys() == [flow]
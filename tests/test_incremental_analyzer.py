@@ -0,0 +1,120 @@
+"""Tests for IncrementalAnalyzer: batched feed() must match the batch pipeline."""
+
+import json
+
+import pytest
+from scapy.all import ARP, DNS, DNSQR, ICMP, IP, TCP, UDP, Ether
+from incremental_analyzer import IncrementalAnalyzer
+from network_analyzer import NetworkAnalyzer
+
+SECTIONS = ('basic_stats', 'connections', 'packet_loss', 'latency', 'attack_analysis', 'expert_info',
+            'performance_score', 'geo_info', 'dns_analysis')
+
+
+def _packets():
+    packets = []
+    t = [1000.0]
+
+    def add(pkt, dt=0.001):
+        t[0] += dt
+        pkt = Ether(bytes(pkt))  # fill in lengths, as in a packet read from a capture
+        pkt.time = t[0]
+        packets.append(pkt)
+
+    c, s = '10.0.0.2', '10.0.0.80'
+    add(Ether() / IP(src=c, dst=s) / TCP(sport=41000, dport=80, flags='S', seq=999))
+    add(Ether() / IP(src=s, dst=c) / TCP(sport=80, dport=41000, flags='SA', seq=9, ack=1000))
+    add(Ether() / IP(src=c, dst=s) / TCP(sport=41000, dport=80, flags='A', seq=1000, ack=10))
+    seq = 1000
+    for i in range(20):
+        add(Ether() / IP(src=c, dst=s) / TCP(sport=41000, dport=80, flags='PA', seq=seq, ack=10) / (b'x' * 100))
+        seq += 5100 if i == 10 else 100
+    add(Ether() / IP(src=c, dst=s) / TCP(sport=41000, dport=80, flags='PA', seq=1200, ack=10) / (b'x' * 100))
+    add(Ether() / IP(src=s, dst=c) / TCP(sport=80, dport=41000, flags='A', seq=10, ack=seq, window=0))
+    add(Ether() / IP(src=s, dst=c) / TCP(sport=80, dport=41000, flags='R', seq=10))
+    add(Ether() / IP(src=c, dst=s, ttl=1) / UDP(sport=3333, dport=33434))
+    add(Ether() / ARP(op=2, psrc='10.0.0.1', hwsrc='aa:aa:aa:aa:aa:01'))
+    add(Ether() / ARP(op=2, psrc='10.0.0.1', hwsrc='aa:aa:aa:aa:aa:02'))
+    for i in range(3):
+        add(Ether() / IP(src=c, dst=s) / ICMP(type=8, id=9, seq=i))
+        add(Ether() / IP(src=s, dst=c) / ICMP(type=0, id=9, seq=i), 0.02)
+    for i in range(4):
+        add(Ether() / IP(src=c, dst='8.8.8.8') / UDP(sport=6000 + i, dport=53) / DNS(id=100 + i, qd=DNSQR(qname=f'h{i}.test')))
+        if i % 2:
+            add(Ether() / IP(src='8.8.8.8', dst=c) / UDP(sport=53, dport=6000 + i)
+                / DNS(id=100 + i, qr=1, qd=DNSQR(qname=f'h{i}.test')))
+    for port in range(1, 80):
+        add(Ether() / IP(src='10.9.9.9', dst=s) / TCP(sport=50000, dport=port, flags='S'), 0.002)
+        add(Ether() / IP(src=s, dst='10.9.9.9') / TCP(sport=port, dport=50000, flags='RA'), 0.0005)
+    # the last DNS query is still in flight when the capture ends
+    add(Ether() / IP(src=c, dst='8.8.8.8') / UDP(sport=6100, dport=53) / DNS(id=300, qd=DNSQR(qname='late.test')))
+    return packets
+
+
+def _normalize(section):
+    return json.loads(json.dumps(section, default=str, sort_keys=True))
+
+
+@pytest.fixture(scope='module')
+def packets():
+    return _packets()
+
+
+@pytest.fixture(scope='module')
+def batch_results(packets):
+    a = NetworkAnalyzer('synthetic.pcap')
+    a.packets = packets
+    a.basic_statistics()
+    a.detect_packet_loss()
+    a.analyze_latency()
+    a.detect_attacks()
+    a.extract_expert_info()
+    a.compute_performance_score()
+    a.enrich_geo_info()
+    a.analyze_dns()
+    return a.analysis_results
+
+
+class TestIncrementalAnalyzer:
+    @pytest.mark.parametrize('batch_size', [1, 7, 1000])
+    def test_close_matches_batch_pipeline(self, packets, batch_results, batch_size):
+        inc = IncrementalAnalyzer('synthetic.pcap')
+        for start in range(0, len(packets), batch_size):
+            inc.feed(packets[start:start + batch_size])
+        results = inc.close()
+        for section in SECTIONS:
+            assert _normalize(results[section]) == _normalize(batch_results[section]), section
+
+    def test_snapshot_is_partial_and_not_mutated_by_later_batches(self, packets):
+        inc = IncrementalAnalyzer('live')
+        inc.feed(packets[:30])
+        first = inc.snapshot()
+        frozen = _normalize(first)
+        assert first['basic_stats']['total_packets'] == 30
+
+        inc.feed(packets[30:])
+        second = inc.snapshot()
+        assert _normalize(first) == frozen
+        assert second['basic_stats']['total_packets'] == len(packets)
+        assert second['attack_analysis']['port_scans']['counts']['vertical'] == 1
+        assert 'protocol_timelines' in second
+
+    def test_in_flight_dns_queries(self, packets):
+        inc = IncrementalAnalyzer('live')
+        inc.feed(packets)
+        statuses = [row[-1] for row in inc.snapshot()['dns_analysis']['transactions']['rows']]
+        assert 'pending' not in statuses
+        late = inc.close()['dns_analysis']['summary']
+        assert late['timeouts'] == 3
+
+    def test_empty_snapshot(self):
+        assert IncrementalAnalyzer('live').snapshot() == {}
+
+    def test_closed_analyzer_rejects_packets(self, packets):
+        inc = IncrementalAnalyzer('live')
+        inc.feed(packets[:5])
+        inc.close()
+        with pytest.raises(RuntimeError):
+            inc.feed(packets[5:10])
+        with pytest.raises(TypeError):
+            inc.load_packets()
@@ -0,0 +1,57 @@
+"""Tests for ByteBudgetLRU (memory_cache)."""
+
+from memory_cache import ByteBudgetLRU
+
+
+class TestByteBudgetLRU:
+    def test_evicts_least_recently_used_over_budget(self):
+        cache = ByteBudgetLRU(max_bytes=100)
+        cache.put('a', 1, 40)
+        cache.put('b', 2, 40)
+        assert cache.get('a') == 1  # a is now most recent
+        cache.put('c', 3, 40)
+        assert cache.keys() == ['a', 'c']
+        assert cache.nbytes == 80
+        assert cache.stats()['evictions'] == 1
+
+    def test_entry_limit(self):
+        cache = ByteBudgetLRU(max_bytes=10**9, max_entries=2)
+        for key in 'abc':
+            cache.put(key, key, 1)
+        assert cache.keys() == ['b', 'c']
+
+    def test_oversized_entry_is_rejected(self):
+        cache = ByteBudgetLRU(max_bytes=10)
+        cache.put('small', 1, 5)
+        assert not cache.put('big', 2, 11)
+        assert 'big' not in cache
+        assert cache.keys() == ['small']
+
+    def test_replace_updates_size(self):
+        cache = ByteBudgetLRU(max_bytes=100)
+        cache.put('a', 1, 30)
+        cache.put('a', 2, 50)
+        assert cache.get('a') == 2
+        assert cache.nbytes == 50
+        assert len(cache) == 1
+
+    def test_stale_entry_counts_as_miss(self):
+        cache = ByteBudgetLRU(max_bytes=100)
+        cache.put('a', {'mtime': 1}, 10)
+        assert cache.get('a', is_fresh=lambda value: value['mtime'] == 2) is None
+        assert 'a' not in cache
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['invalidations']) == (0, 1, 1)
+        assert stats['bytes'] == 0
+
+    def test_hit_ratio_and_discard(self):
+        cache = ByteBudgetLRU(max_bytes=100)
+        cache.put(('s1', 'x'), 1, 10)
+        cache.put(('s2', 'x'), 2, 10)
+        cache.get(('s1', 'x'))
+        cache.get('missing')
+        assert cache.stats()['hit_ratio'] == 0.5
+        assert cache.discard_where(lambda key: key[0] == 's1') == 1
+        assert cache.keys() == [('s2', 'x')]
+        assert cache.pop(('s2', 'x')) == 2
+        assert cache.nbytes == 0
@@ -8,7 +8,7 @@ Validates the three-dimensional network performance scoring:
 
 import pytest
 from unittest.mock import MagicMock
-from network_analyzer import NetworkAnalyzer
+from network_analyzer import NetworkAnalyzer, _LatencyAccumulator
 
 
 @pytest.fixture
@@ -205,3 +205,76 @@ class TestPerformanceEdgeCases:
 
         assert result['overall'] == 0
         assert result['grade'] == 'F'
+
+
+class TestLatencyScorePercentiles:
+    """The latency score uses the p50/p90 of latency['rtt_summary']."""
+
+    def _analyzer(self, latency):
+        a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+        a.packets = [MagicMock(time=0.0), MagicMock(time=1.0)]
+        a.analysis_results = {
+            'basic_stats': {'total_packets': 10, 'protocols': {'TCP': 10}, 'packet_sizes': [100] * 10},
+            'latency': latency,
+            'packet_loss': [],
+        }
+        return a
+
+    def test_rtt_summary_is_used(self):
+        summary = {'count': 100, 'min': 20.0, 'max': 5000.0, 'mean': 500.0, 'std': 1000.0,
+                   'p50': 20.0, 'p90': 20.0, 'p99': 5000.0, 'p999': 5000.0}
+        result = self._analyzer({'tcp_handshakes': [], 'ping_responses': [], 'rtt_summary': summary})
+        latency = result.compute_performance_score()['latency']
+        assert latency['sample_count'] == 100
+        assert latency['avg_rtt_ms'] == 500.0
+        assert latency['p99_rtt_ms'] == 5000.0
+        assert latency['score'] == 90.0  # scored on p50/p90 = 20 ms, not on the 500 ms mean
+
+    def test_outliers_do_not_dominate(self):
+        rtts = [{'rtt': 20.0, 'time': float(i)} for i in range(95)] + [{'rtt': 3000.0, 'time': 99.0}] * 5
+        latency = self._analyzer({'tcp_handshakes': [], 'ping_responses': rtts}).compute_performance_score()['latency']
+        assert latency['avg_rtt_ms'] > 150
+        assert latency['score'] > 85
+
+    def test_latency_series_only_kept_on_request(self):
+        from scapy.all import Ether, IP, ICMP
+        packets = []
+        for i in range(20):
+            request = Ether() / IP(src='10.0.0.1', dst='10.0.0.2') / ICMP(type=8, id=i)
+            reply = Ether() / IP(src='10.0.0.2', dst='10.0.0.1') / ICMP(type=0, id=i)
+            request.time, reply.time = float(i), i + 0.02
+            packets.extend([request, reply])
+        a = self._analyzer({})
+        a.packets = packets
+        a.KEEP_PER_PACKET_SERIES = False
+        latency = a.analyze_latency()
+        assert latency['ping_responses'] == [] and latency['tcp_handshakes'] == []
+        assert latency['ping_summary']['count'] == 20
+        a.analysis_results['latency'] = latency
+        assert a.compute_performance_score()['latency']['sample_count'] == 20
+
+        a.KEEP_PER_PACKET_SERIES = True
+        assert len(a.analyze_latency()['ping_responses']) == 20
+
+    def test_handshakes_are_timed_and_not_kept(self):
+        from scapy.all import Ether, IP, TCP
+
+        def tcp(ts, src, dst, sport, dport, flags):
+            pkt = Ether() / IP(src=src, dst=dst) / TCP(sport=sport, dport=dport, flags=flags)
+            pkt.time = ts
+            return pkt
+
+        accumulator = _LatencyAccumulator()
+        accumulator.MAX_PENDING_HANDSHAKES = 100
+        for i in range(20):
+            accumulator.observe(tcp(i, '10.0.0.1', '10.0.0.2', 40000 + i, 80, 'S'))
+            accumulator.observe(tcp(i + 0.02, '10.0.0.2', '10.0.0.1', 80, 40000 + i, 'SA'))
+            accumulator.observe(tcp(i + 0.03, '10.0.0.1', '10.0.0.2', 40000 + i, 80, 'A'))
+        assert not accumulator._handshakes
+        assert accumulator.result()['handshake_summary']['count'] == 20
+        assert accumulator.result()['handshake_summary']['p50'] == pytest.approx(30, rel=0.05)
+
+        # Spoofed SYNs that never complete only occupy a bounded table
+        for i in range(1000):
+            accumulator.observe(tcp(100 + i * 1e-3, f'172.16.{i // 256}.{i % 256}', '10.0.0.2', 1024 + i, 80, 'S'))
+        assert len(accumulator._handshakes) == 100
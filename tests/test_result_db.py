@@ -0,0 +1,92 @@
+"""Tests for the per-session SQLite result store (result_db)."""
+
+import sqlite3
+
+import pytest
+
+from result_db import _PAGE_QUERY, connection_packet_indices, open_result_db, with_relative_time, write_result_db
+
+
+def _results():
+    summary = {i: {'index': i, 'timestamp': 100.0 + i, 'length': 60, 'tcp_flags': 'ACK'} for i in range(250)}
+    summary[300] = {'index': 300, 'timestamp': 99.5, 'length': 80, 'tcp_flags': ''}
+    return {
+        'connection_packets': {
+            'tcp-10.0.0.1-40000-10.0.0.2-80': list(range(250)),
+            'tcp-teardown-10.0.0.1-40000-10.0.0.2-80': [248, 249],
+            'udp-10.0.0.3-5353-8.8.8.8-53': [300],
+            'tcp-empty-10.0.0.9-1-10.0.0.2-80': [],
+        },
+        'packet_summary': summary,
+        'connections': [{'protocol': 'TCP', 'src_ip': '10.0.0.1', 'src_port': 40000,
+                         'dst_ip': '10.0.0.2', 'dst_port': 80, 'packet_count': 250}],
+        'expert_info': [{'severity': 'warning', 'type': 'SYN Flood', 'message': 'm', 'packetIndex': 0,
+                         'timestamp': 100.0, 'stream': ''}],
+        'protocol_timelines': {'timelines': [{'id': 'tcp-10.0.0.1-40000-10.0.0.2-80', 'protocol': 'TCP',
+                                              'protocolType': 'tcp-handshake', 'startEpochMs': 100000,
+                                              'endEpochMs': 100250, 'stages': []}]},
+    }
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / 'results.sqlite'
+    write_result_db(str(path), _results())
+    conn = open_result_db(str(path))
+    yield conn
+    conn.close()
+
+
+class TestResultDb:
+    def test_pages_match_list_slices(self, db):
+        connection_id = 'tcp-10.0.0.1-40000-10.0.0.2-80'
+        indices = _results()['connection_packets'][connection_id]
+        for offset, limit in [(0, 100), (100, 100), (200, 100), (240, 5), (400, 10)]:
+            total, first_timestamp, page = connection_packet_indices(db, connection_id, offset, limit)
+            assert (total, first_timestamp) == (250, 100.0)
+            assert page == indices[offset:offset + limit]
+
+    def test_first_timestamp_is_per_connection(self, db):
+        assert connection_packet_indices(db, 'tcp-teardown-10.0.0.1-40000-10.0.0.2-80') == (2, 348.0, [248, 249])
+        packets = with_relative_time([{'timestamp': 348.0}, {'timestamp': 349.0}], 348.0)
+        assert [packet['relativeTime'] for packet in packets] == ['0.000s', '1.000s']
+
+    def test_unknown_and_empty_connections(self, db):
+        assert connection_packet_indices(db, 'tcp-10.9.9.9-1-10.9.9.8-2') is None
+        assert connection_packet_indices(db, 'tcp-empty-10.0.0.9-1-10.0.0.2-80') == (0, None, [])
+
+    def test_negative_limit_returns_nothing(self, db):
+        assert connection_packet_indices(db, 'udp-10.0.0.3-5353-8.8.8.8-53', 0, -1) == (1, 99.5, [])
+
+    def test_page_is_a_primary_key_range(self, db):
+        plan = db.execute('EXPLAIN QUERY PLAN ' + _PAGE_QUERY, ('x', 500, 100)).fetchall()
+        assert any('PRIMARY KEY (connection_id=? AND seq>?)' in row[-1] for row in plan)
+        assert not any('TEMP B-TREE' in row[-1] for row in plan)
+
+    def test_late_page_reads_only_its_rows(self, db):
+        steps = []
+        db.set_progress_handler(lambda: steps.append(1), 1)
+        connection_packet_indices(db, 'tcp-10.0.0.1-40000-10.0.0.2-80', 0, 10)
+        first = len(steps)
+        steps.clear()
+        connection_packet_indices(db, 'tcp-10.0.0.1-40000-10.0.0.2-80', 240, 10)
+        db.set_progress_handler(None, 1)
+        assert len(steps) <= first * 1.5
+
+    def test_only_paged_tables_are_stored(self, db):
+        tables = {name for name, in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert tables == {'meta', 'connections', 'packets'}
+        # Pages are read by (connection_id, seq), the primary key; no secondary indexes
+        assert db.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall() == []
+
+    def test_store_is_read_only(self, db):
+        with pytest.raises(sqlite3.OperationalError):
+            db.execute('DELETE FROM packets')
+
+    def test_missing_or_other_version(self, tmp_path):
+        assert open_result_db(str(tmp_path / 'missing.sqlite')) is None
+        path = tmp_path / 'results.sqlite'
+        write_result_db(str(path), {})
+        with sqlite3.connect(str(path)) as conn:
+            conn.execute("UPDATE meta SET value = '0' WHERE key = 'version'")
+        assert open_result_db(str(path)) is None
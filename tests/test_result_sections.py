@@ -0,0 +1,150 @@
+"""Tests for the per-section result files and column tables written by save_results."""
+
+import json
+
+from scapy.all import Ether, IP, TCP, Raw
+from columnar_store import open_table
+from network_analyzer import NetworkAnalyzer
+
+
+def _make_analyzer():
+    packets = []
+    for i in range(50):
+        pkt = Ether(bytes(Ether() / IP(src='10.0.0.1', dst='10.0.0.2') / TCP(sport=40000, dport=80, flags='A')))
+        pkt.time = 100.0 + i * 0.01
+        packets.append(pkt)
+    a = NetworkAnalyzer('synthetic.pcap')
+    a.packets = packets
+    a.basic_statistics()
+    a.detect_attacks()
+    a.compute_performance_score()
+    a.enrich_geo_info()
+    return a
+
+
+class TestResultSections:
+    def test_sections_match_results(self, tmp_path):
+        a = _make_analyzer()
+        output = tmp_path / 'network_analysis_results.json'
+        a.save_results(output_file=str(output), public_output_dir=str(tmp_path))
+        expected = json.loads(json.dumps(a.analysis_results, default=str))
+
+        sections_dir = tmp_path / NetworkAnalyzer.RESULT_SECTIONS_DIR
+        with open(sections_dir / NetworkAnalyzer.RESULT_MANIFEST_FILE, encoding='utf-8') as handle:
+            manifest = json.load(handle)
+        assert manifest['version'] == 1
+        assert set(manifest['sections']) == set(expected)
+        for name, entry in manifest['sections'].items():
+            path = sections_dir / entry['file']
+            assert path.stat().st_size == entry['bytes']
+            with open(path, encoding='utf-8') as handle:
+                assert json.load(handle) == expected[name]
+
+    def test_combined_file_only_lists_sections(self, tmp_path):
+        a = _make_analyzer()
+        output = tmp_path / 'network_analysis_results.json'
+        a.save_results(output_file=str(output), public_output_dir=str(tmp_path))
+
+        with open(output, encoding='utf-8') as handle:
+            combined = json.load(handle)
+        assert set(combined) == {'version', 'sections'}
+        assert set(combined['sections']) == set(a.analysis_results)
+        entry = combined['sections']['geo_info']
+        assert entry['file'] == 'sections/geo_info.json'
+        assert (tmp_path / entry['file']).stat().st_size == entry['bytes']
+        assert not (tmp_path / 'protocol_timeline_sample.json').exists()
+
+    def test_sections_copied_to_separate_public_dir(self, tmp_path):
+        a = _make_analyzer()
+        public = tmp_path / 'public'
+        a.save_results(output_file=str(tmp_path / 'out' / 'results.json'), public_output_dir=str(public))
+        with open(public / 'sections' / 'manifest.json', encoding='utf-8') as handle:
+            manifest = json.load(handle)
+        assert 'geo_info' in manifest['sections']
+        assert (tmp_path / 'out' / 'sections' / 'geo_info.json').exists()
+
+
+class TestResultTables:
+    def test_tables_written_and_connection_packets_kept_out_of_json(self, tmp_path):
+        a = _make_analyzer()
+        a.extract_expert_info()
+        summary = [
+            {'index': 0, 'timestamp': 100.0, 'length': 54, 'tcp_flags': 'ACK'},
+            {'index': 1, 'timestamp': 100.01, 'length': 54, 'tcp_flags': 'PSH|ACK'},
+        ]
+        a.analysis_results['packet_summary'] = {row['index']: row for row in summary}
+        a.analysis_results['connection_packets'] = {
+            'tcp-10.0.0.1-40000-10.0.0.2-80': [0, 1],
+            'tcp-teardown-10.0.0.1-40000-10.0.0.2-80': [1],
+        }
+        a.save_results(output_file=str(tmp_path / 'network_analysis_results.json'), public_output_dir=str(tmp_path))
+
+        with open(tmp_path / 'network_analysis_results.json', encoding='utf-8') as handle:
+            combined = json.load(handle)['sections']
+        assert 'connection_packets' not in combined and 'packet_summary' not in combined
+        with open(tmp_path / 'tables' / 'manifest.json', encoding='utf-8') as handle:
+            manifest = json.load(handle)
+        assert manifest['tables']['packets']['rows'] == 2
+        assert manifest['tables']['connection_packets']['rows'] == 3
+        # Flows, expert events, timelines etc. are served from their sections only
+        assert set(manifest['tables']) == {'packets', 'connection_packets'}
+
+        packets = open_table(str(tmp_path / 'tables' / manifest['tables']['packets']['file']))
+        assert packets.rows() == summary
+        memberships = open_table(str(tmp_path / 'tables' / manifest['tables']['connection_packets']['file']))
+        assert list(memberships.column('packet_index')) == [0, 1, 1]
+
+
+class TestConnectionPacketDetails:
+    def _http_exchange(self):
+        def tcp(ts, src, sport, dst, dport, flags, seq, ack, payload=b''):
+            pkt = Ether() / IP(src=src, dst=dst) / TCP(sport=sport, dport=dport, flags=flags, seq=seq, ack=ack)
+            if payload:
+                pkt = pkt / Raw(payload)
+            pkt = Ether(bytes(pkt))
+            pkt.time = ts
+            return pkt
+
+        c, s = '10.0.0.1', '10.0.0.2'
+        req = b'GET / HTTP/1.1\r\nHost: x\r\n\r\n'
+        resp = b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok'
+        return [
+            tcp(1.00, c, 40000, s, 80, 'S', 100, 0),
+            tcp(1.01, s, 80, c, 40000, 'SA', 500, 101),
+            tcp(1.02, c, 40000, s, 80, 'A', 101, 501),
+            tcp(1.03, c, 40000, s, 80, 'PA', 101, 501, req),
+            tcp(1.04, s, 80, c, 40000, 'PA', 501, 101 + len(req), resp),
+            tcp(1.05, c, 40000, s, 80, 'FA', 101 + len(req), 501 + len(resp)),
+            tcp(1.06, s, 80, c, 40000, 'FA', 501 + len(resp), 102 + len(req)),
+            tcp(1.07, c, 40000, s, 80, 'A', 102 + len(req), 502 + len(resp)),
+        ]
+
+    def test_analysis_does_not_extract_details(self):
+        a = NetworkAnalyzer('synthetic.pcap')
+        a.packets = self._http_exchange()
+        calls = []
+        extract = a._extract_packet_details
+        a._extract_packet_details = lambda idx: calls.append(idx) or extract(idx)
+        a.generate_protocol_timelines()
+        assert calls == []
+
+        connection_packets = a.analysis_results['connection_packets']
+        referenced = {idx for indices in connection_packets.values() for idx in indices}
+        summary = a.analysis_results['packet_summary']
+        assert set(summary) == referenced
+        for idx in referenced:
+            detail = extract(idx)
+            assert summary[idx] == {'index': idx, 'timestamp': detail['timestamp'], 'length': detail['length'],
+                                    'tcp_flags': detail['headers']['tcp']['flags']}
+
+    def test_relative_time_per_connection(self):
+        a = NetworkAnalyzer('synthetic.pcap')
+        a.packets = self._http_exchange()
+        a.generate_protocol_timelines()
+        for connection_id, indices in a.analysis_results['connection_packets'].items():
+            packets = a.connection_packet_details(connection_id)
+            assert [p['index'] for p in packets] == indices
+            assert packets[0]['relativeTime'] == '0.000s'
+            page = a.connection_packet_details(connection_id, offset=1, limit=1)
+            assert page == packets[1:2]
+        assert a.connection_packet_details('tcp-unknown') is None
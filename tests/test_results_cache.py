@@ -0,0 +1,174 @@
+"""Tests for the per-session caches in analysis_server (parsed results, loaded analyzers)."""
+
+import json
+import os
+
+import pytest
+
+pytest.importorskip('itsdangerous')  # SessionMiddleware dependency
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+
+import analysis_server  # noqa: E402
+from memory_cache import ByteBudgetLRU  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(analysis_server, '_results_cache', ByteBudgetLRU(64 * 1024 * 1024))
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return path
+
+
+class TestLoadSessionJson:
+
+    def test_missing_file_returns_none(self, tmp_path):
+        assert analysis_server._load_session_json('s1', tmp_path / 'missing.json') is None
+
+    def test_second_load_reuses_parse(self, tmp_path, monkeypatch):
+        path = _write(tmp_path / 'network_analysis_results.json', {'geo_info': {'a': 1}})
+        first = analysis_server._load_session_json('s1', path)
+
+        def fail(*args, **kwargs):
+            raise AssertionError('file parsed twice')
+        monkeypatch.setattr(analysis_server.json, 'load', fail)
+        assert analysis_server._load_session_json('s1', path) is first
+
+    def test_rewritten_file_is_reparsed(self, tmp_path):
+        path = _write(tmp_path / 'network_analysis_results.json', {'v': 1})
+        assert analysis_server._load_session_json('s1', path) == {'v': 1}
+        _write(path, {'v': 2, 'extra': True})
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert analysis_server._load_session_json('s1', path) == {'v': 2, 'extra': True}
+        assert len(analysis_server._results_cache) == 1
+        assert analysis_server._results_cache.stats()['invalidations'] == 1
+
+    def test_byte_budget_evicts_least_recently_used(self, tmp_path, monkeypatch):
+        files = []
+        for name in ('a', 'b', 'c'):
+            directory = tmp_path / name
+            directory.mkdir()
+            files.append(_write(directory / 'network_analysis_results.json', {'pad': 'x' * 100}))
+        size = files[0].stat().st_size
+        monkeypatch.setattr(analysis_server, '_results_cache', ByteBudgetLRU(size * 2))
+
+        analysis_server._load_session_json('a', files[0])
+        analysis_server._load_session_json('b', files[1])
+        analysis_server._load_session_json('a', files[0])  # a is now most recent
+        analysis_server._load_session_json('c', files[2])
+
+        keys = [key[0] for key in analysis_server._results_cache.keys()]
+        assert keys == ['a', 'c']
+        assert analysis_server._results_cache.nbytes == size * 2
+        assert analysis_server._results_cache.stats()['evictions'] == 1
+
+    def test_file_over_budget_is_not_cached(self, tmp_path, monkeypatch):
+        path = _write(tmp_path / 'network_analysis_results.json', {'pad': 'x' * 100})
+        monkeypatch.setattr(analysis_server, '_results_cache', ByteBudgetLRU(10))
+        assert analysis_server._load_session_json('s1', path) == {'pad': 'x' * 100}
+        assert not len(analysis_server._results_cache)
+
+    def test_evict_session(self, tmp_path):
+        results = _write(tmp_path / 'network_analysis_results.json', {'v': 1})
+        timeline = _write(tmp_path / 'protocol_timeline_sample.json', {'timelines': []})
+        analysis_server._load_session_json('s1', results)
+        analysis_server._load_session_json('s1', timeline)
+        analysis_server._load_session_json('s2', results)
+
+        analysis_server._evict_session_results('s1')
+        assert analysis_server._results_cache.keys() == [('s2', 'network_analysis_results.json')]
+        assert analysis_server._results_cache.nbytes == results.stat().st_size
+
+
+class TestLoadSessionSection:
+
+    def _save(self, session_dir, results):
+        a = analysis_server.NetworkAnalyzer('synthetic.pcap')
+        a.analysis_results = results
+        a.save_results(output_file=str(session_dir / 'network_analysis_results.json'),
+                       public_output_dir=str(session_dir))
+
+    def test_reads_only_the_section_file(self, tmp_path):
+        self._save(tmp_path, {'geo_info': {'10.0.0.1': {'type': 'private'}}, 'latency': {'avg': 1}})
+        geo = analysis_server._load_session_section('s1', tmp_path, 'geo_info')
+        assert geo == {'10.0.0.1': {'type': 'private'}}
+        names = {key[1] for key in analysis_server._results_cache.keys()}
+        assert names == {'manifest.json', 'geo_info.json'}
+
+    def test_missing_section_is_none(self, tmp_path):
+        self._save(tmp_path, {'latency': {'avg': 1}})
+        assert analysis_server._load_session_section('s1', tmp_path, 'tls_info') is None
+
+    def test_falls_back_to_combined_file(self, tmp_path):
+        _write(tmp_path / 'network_analysis_results.json', {'performance_score': {'overall': 90}})
+        assert analysis_server._load_session_section('s1', tmp_path, 'performance_score') == {'overall': 90}
+        assert analysis_server._load_session_section('s1', tmp_path, 'geo_info') is None
+        assert analysis_server._load_session_section('s2', tmp_path / 'empty', 'geo_info') is None
+
+
+class _FakeAnalyzer:
+    def __init__(self, packet_count):
+        self.packets = [None] * packet_count
+
+
+class TestAnalyzerCache:
+
+    @pytest.fixture(autouse=True)
+    def analyzer_cache(self, monkeypatch):
+        cache = ByteBudgetLRU(max_bytes=10 * 1024 * 1024, max_entries=8)
+        monkeypatch.setattr(analysis_server, '_analyzer_cache', cache)
+        monkeypatch.setattr(analysis_server, '_MATCHED_CACHE_MAX_BYTES', 1024)
+        monkeypatch.setattr(analysis_server.NetworkAnalyzer, 'STREAM_CACHE_MAX_BYTES', 2048)
+        monkeypatch.setattr(analysis_server.NetworkAnalyzer, 'HTTP_FLOW_CACHE_MAX_BYTES', 512)
+        return cache
+
+    def _pcap(self, directory, size=100):
+        directory.mkdir()
+        path = directory / 'uploaded.pcap'
+        path.write_bytes(b'x' * size)
+        return path
+
+    def test_hit_returns_same_analyzer_and_lookup_cache(self, tmp_path, analyzer_cache):
+        pcap = self._pcap(tmp_path / 's1')
+        analyzer = _FakeAnalyzer(10)
+        matched = analysis_server._put_cached_analyzer('s1', pcap, analyzer)
+        matched.put('conn', {1, 2}, 100)
+
+        cached_analyzer, cached_matched = analysis_server._get_cached_analyzer('s1', pcap)
+        assert cached_analyzer is analyzer
+        assert cached_matched.get('conn') == {1, 2}
+        # packets + connection lookups + stream and HTTP cache ceilings
+        expected = 100 + 10 * analysis_server._ANALYZER_BYTES_PER_PACKET + 1024 + 2048 + 512
+        assert analyzer_cache.nbytes == expected
+        assert analyzer_cache.stats()['hits'] == 1
+
+    def test_changed_pcap_is_a_miss(self, tmp_path, analyzer_cache):
+        pcap = self._pcap(tmp_path / 's1')
+        analysis_server._put_cached_analyzer('s1', pcap, _FakeAnalyzer(1))
+        stat = pcap.stat()
+        os.utime(pcap, (stat.st_atime, stat.st_mtime + 5))
+        assert analysis_server._get_cached_analyzer('s1', pcap) is None
+        assert len(analyzer_cache) == 0
+
+    def test_byte_budget_evicts_least_recently_used_session(self, tmp_path, analyzer_cache, monkeypatch):
+        per_entry = 100 + 100 * analysis_server._ANALYZER_BYTES_PER_PACKET + 1024 + 2048 + 512
+        monkeypatch.setattr(analysis_server, '_analyzer_cache', ByteBudgetLRU(max_bytes=per_entry * 2))
+        pcaps = {name: self._pcap(tmp_path / name) for name in ('a', 'b', 'c')}
+        analysis_server._put_cached_analyzer('a', pcaps['a'], _FakeAnalyzer(100))
+        analysis_server._put_cached_analyzer('b', pcaps['b'], _FakeAnalyzer(100))
+        assert analysis_server._get_cached_analyzer('a', pcaps['a']) is not None
+        analysis_server._put_cached_analyzer('c', pcaps['c'], _FakeAnalyzer(100))
+
+        assert analysis_server._analyzer_cache.keys() == ['a', 'c']
+        assert analysis_server._analyzer_cache.stats()['evictions'] == 1
+
+    def test_lookup_cache_is_bounded(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(analysis_server, '_MATCHED_CACHE_MAX', 3)
+        pcap = self._pcap(tmp_path / 's1')
+        matched = analysis_server._put_cached_analyzer('s1', pcap, _FakeAnalyzer(1))
+        for index in range(5):
+            matched.put(f'conn-{index}', {index}, analysis_server._matched_indices_bytes({index}))
+        assert matched.keys() == ['conn-2', 'conn-3', 'conn-4']
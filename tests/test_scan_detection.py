@@ -0,0 +1,138 @@
+"""Tests for per-source scan detection (scan_detector.py) and its use in detect_attacks."""
+
+import pytest
+from scapy.all import Ether, IP, TCP
+from network_analyzer import NetworkAnalyzer
+from scan_detector import PortBitmap, ScanDetector
+from sketches import LinearCounter
+
+SYN, RST_ACK, SYN_ACK = 0x02, 0x14, 0x12
+
+
+def _vertical(det, src, dst, ts=0.0, ports=range(1, 201)):
+    for i, port in enumerate(ports):
+        det.observe(ts + i * 0.01, src, dst, port, SYN)
+        det.observe(ts + i * 0.01 + 0.001, dst, src, 40000, RST_ACK)
+
+
+class TestBitmaps:
+    def test_port_bitmap_promotes_and_counts_exactly(self):
+        bitmap = PortBitmap(promote_at=8)
+        for port in list(range(1000)) + list(range(500)):
+            bitmap.add(port)
+        assert len(bitmap) == 1000
+        assert 999 in bitmap and 1000 not in bitmap
+        assert bitmap._small is None
+
+    def test_linear_counter_is_near_exact_for_small_counts(self):
+        counter = LinearCounter(1024)
+        for i in range(200):
+            counter.add(f'10.0.{i // 256}.{i % 256}')
+        assert abs(len(counter) - 200) <= 10
+
+
+class TestScanDetector:
+    def test_vertical_scan(self):
+        det = ScanDetector()
+        _vertical(det, '10.0.0.5', '10.0.0.80')
+        result = det.close()
+        assert result['counts']['vertical'] == 1
+        scan = result['scans'][0]
+        assert scan['source'] == '10.0.0.5'
+        assert scan['target'] == '10.0.0.80'
+        assert scan['peak_ports'] == 200
+
+    def test_horizontal_sweep(self):
+        det = ScanDetector()
+        for i in range(100):
+            det.observe(i * 0.05, '10.0.0.9', f'192.168.1.{i + 1}', 22, SYN)
+        result = det.close()
+        assert result['counts']['horizontal'] == 1
+        assert result['scans'][0]['peak_hosts'] >= 90
+
+    def test_answered_connections_are_not_a_sweep(self):
+        det = ScanDetector()
+        for i in range(100):
+            server = f'203.0.113.{i + 1}'
+            det.observe(i * 0.05, '10.0.0.2', server, 443, SYN)
+            det.observe(i * 0.05 + 0.01, server, '10.0.0.2', 50000 + i, SYN_ACK)
+        assert not det.close()['detected']
+
+    def test_distributed_scan(self):
+        det = ScanDetector()
+        # 20 sources each probe 10 ports of one target: no source crosses the single-source thresholds
+        for s in range(20):
+            for p in range(10):
+                det.observe(s * 0.5 + p * 0.01, f'172.16.0.{s + 1}', '10.0.0.80', 1000 + s * 10 + p, SYN)
+        result = det.close()
+        assert result['counts'] == {'vertical': 0, 'horizontal': 0, 'block': 0, 'distributed': 1}
+        scan = result['scans'][0]
+        assert scan['target'] == '10.0.0.80'
+        assert scan['peak_ports'] == 200
+        assert scan['peak_sources'] >= 18
+
+    def test_windows_reset_and_merge_per_source(self):
+        det = ScanDetector(window_seconds=10)
+        _vertical(det, '10.0.0.5', '10.0.0.80', ts=0.0, ports=range(1, 61))
+        _vertical(det, '10.0.0.5', '10.0.0.80', ts=100.0, ports=range(61, 121))
+        # 30 ports per window later on stay below the threshold
+        _vertical(det, '10.0.0.5', '10.0.0.80', ts=200.0, ports=range(1, 31))
+        scan = det.close()['scans'][0]
+        assert scan['windows'] == 2
+        assert scan['peak_ports'] == 60
+        assert scan['first_seen'] == 0.0 and scan['last_seen'] == pytest.approx(100.59)
+
+    def test_source_table_is_bounded(self):
+        det = ScanDetector(max_sources=16, max_targets=16)
+        _vertical(det, '10.0.0.5', '10.0.0.80')
+        for i in range(5000):
+            det.observe(10 + i * 0.001, f'172.{i // 65536}.{(i // 256) % 256}.{i % 256}', '10.0.0.80', 80, SYN)
+            assert len(det._sources) <= 16 and len(det._targets) <= 16
+        result = det.close()
+        assert result['evicted_sources'] > 4000
+        # the scanner evicted early is still reported
+        assert any(scan['source'] == '10.0.0.5' for scan in result['scans'])
+
+    def test_snapshot_leaves_windows_open(self):
+        det = ScanDetector(window_seconds=10)
+        _vertical(det, '10.0.0.5', '10.0.0.80', ts=0.0, ports=range(1, 61))
+        _vertical(det, '10.0.0.5', '10.0.0.80', ts=100.0, ports=range(61, 121))
+        snapshot = det.snapshot()
+        assert snapshot['scans'][0]['windows'] == 2
+        assert det.snapshot() == snapshot
+        assert len(det._sources) == 1
+        # the open window keeps growing and is counted once at close
+        _vertical(det, '10.0.0.5', '10.0.0.80', ts=105.0, ports=range(121, 141))
+        scan = det.close()['scans'][0]
+        assert scan['windows'] == 2
+        assert scan['peak_ports'] == 80
+
+
+def _tcp(ts, src, sport, dst, dport, flags):
+    pkt = Ether() / IP(src=src, dst=dst) / TCP(sport=sport, dport=dport, flags=flags)
+    pkt.time = ts
+    return pkt
+
+
+class TestDetectAttacksIntegration:
+    def test_scans_reported_in_attack_analysis(self):
+        packets = []
+        # Stay under the SYN Flood rule's 100-SYN floor so the verdict is the scan
+        for i in range(60):
+            packets.append(_tcp(1000 + i * 0.01, '10.0.0.5', 40000, '10.0.0.80', i + 1, 'S'))
+            packets.append(_tcp(1000 + i * 0.01 + 0.001, '10.0.0.80', i + 1, '10.0.0.5', 40000, 'RA'))
+        for i in range(35):
+            packets.append(_tcp(1002 + i * 0.01, '10.0.0.6', 40001, f'10.0.1.{i + 1}', 3389, 'S'))
+        packets.sort(key=lambda p: p.time)
+
+        a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+        a.pcap_file = 'synthetic.pcap'
+        a.packets = packets
+        a.analysis_results = {}
+        result = a.detect_attacks()
+
+        scans = result['port_scans']
+        assert scans['counts']['vertical'] == 1
+        assert scans['counts']['horizontal'] == 1
+        assert result['metrics']['port_scans'] == 2
+        assert result['attack_detection']['type'] == 'Port Scan'
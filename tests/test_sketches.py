@@ -0,0 +1,231 @@
+"""Tests for the bounded-memory counting helpers in sketches.py.
+
+Validates HyperLogLog accuracy, exact/approximate mode switching of
+DistinctCounter, heavy-hitter retention in TopKCounter, QuantileSketch
+accuracy, LogHistogram binning and ReservoirSample bounds.
+"""
+
+import pytest
+from sketches import (DistinctCounter, HyperLogLog, LogHistogram, QuantileSketch, ReservoirSample, TopKCounter,
+                      distinct_counter, frequency_counter)
+
+
+class TestHyperLogLog:
+    def test_empty_sketch_counts_zero(self):
+        assert HyperLogLog().count() == 0
+
+    def test_small_cardinality_is_near_exact(self):
+        hll = HyperLogLog()
+        hll.update(range(100))
+        assert abs(hll.count() - 100) <= 3
+
+    def test_large_cardinality_within_error_bound(self):
+        hll = HyperLogLog(precision=12)
+        hll.update(f'10.{i // 65536}.{(i // 256) % 256}.{i % 256}' for i in range(50000))
+        # ~1.6% standard error at p=12; allow 5%
+        assert abs(hll.count() - 50000) / 50000 < 0.05
+
+    def test_duplicates_do_not_inflate_count(self):
+        hll = HyperLogLog()
+        for _ in range(10):
+            hll.update(range(500))
+        assert abs(hll.count() - 500) / 500 < 0.05
+
+    def test_register_memory_is_fixed(self):
+        hll = HyperLogLog(precision=10)
+        hll.update(range(100000))
+        assert len(hll.registers) == 1024
+
+    def test_merge_equals_union(self):
+        a, b = HyperLogLog(), HyperLogLog()
+        a.update(range(0, 3000))
+        b.update(range(2000, 5000))
+        a.merge(b)
+        assert abs(a.count() - 5000) / 5000 < 0.05
+
+    def test_merge_rejects_different_precision(self):
+        with pytest.raises(ValueError):
+            HyperLogLog(10).merge(HyperLogLog(12))
+
+    def test_invalid_precision(self):
+        with pytest.raises(ValueError):
+            HyperLogLog(3)
+
+
+class TestDistinctCounter:
+    def test_exact_mode_counts_exactly(self):
+        dc = DistinctCounter('exact')
+        for port in range(5000):
+            dc.add(port)
+        assert len(dc) == 5000
+        assert not dc.is_approximate
+
+    def test_auto_mode_stays_exact_below_threshold(self):
+        dc = distinct_counter('auto')
+        for port in range(100):
+            dc.add(port)
+        assert len(dc) == 100
+        assert 99 in dc
+
+    def test_auto_mode_promotes_to_hll(self):
+        dc = DistinctCounter('auto', promote_at=256)
+        for i in range(10000):
+            dc.add(('10.0.0.1', i))
+        assert dc.is_approximate
+        assert abs(len(dc) - 10000) / 10000 < 0.05
+
+    def test_approx_mode_uses_hll_from_start(self):
+        dc = DistinctCounter('approx')
+        dc.add('a')
+        assert dc.is_approximate
+        assert len(dc) == 1
+
+    def test_merge_exact_into_approx(self):
+        a = DistinctCounter('approx')
+        b = DistinctCounter('exact')
+        for i in range(1000):
+            a.add(i)
+            b.add(i + 500)
+        a.merge(b)
+        assert abs(len(a) - 1500) / 1500 < 0.05
+
+    def test_unknown_mode_rejected(self):
+        with pytest.raises(ValueError):
+            DistinctCounter('fast')
+
+
+class TestTopKCounter:
+    def test_behaves_like_counter_below_capacity(self):
+        tk = TopKCounter(capacity=10)
+        for key in ['a', 'b', 'a', 'c', 'a']:
+            tk.add(key)
+        assert tk['a'] == 3
+        assert tk.total == 5
+        assert tk.most_common(1) == [('a', 3)]
+
+    def test_keeps_heavy_hitter_under_random_flood(self):
+        tk = TopKCounter(capacity=64)
+        for i in range(20000):
+            tk.add('attacker')
+            tk.add(f'spoofed-{i}')
+        assert len(tk) <= 128
+        assert tk.most_common(1)[0] == ('attacker', 20000)
+        assert tk.total == 40000
+
+    def test_exact_mode_never_prunes(self):
+        tk = frequency_counter('exact', capacity=4)
+        for i in range(100):
+            tk.add(i)
+        assert len(tk) == 100
+
+
+class TestQuantileSketch:
+    def test_empty_sketch(self):
+        qs = QuantileSketch()
+        assert qs.quantile(0.5) == 0
+        assert qs.summary()['count'] == 0
+
+    def test_quantiles_within_relative_accuracy(self):
+        values = [((i * 7919) % 10007) / 10.0 + 0.1 for i in range(20000)]
+        qs = QuantileSketch(relative_accuracy=0.01)
+        qs.update(values)
+        ordered = sorted(values)
+        for q in (0.5, 0.9, 0.99):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            assert abs(qs.quantile(q) - exact) / exact <= 0.02
+
+    def test_exact_aggregates(self):
+        qs = QuantileSketch()
+        qs.update([1, 2, 3, 4])
+        assert qs.count == 4
+        assert qs.min == 1 and qs.max == 4
+        assert qs.mean == 2.5
+        assert qs.std == pytest.approx(1.118, abs=1e-3)
+
+    def test_bins_are_bounded(self):
+        qs = QuantileSketch(max_bins=64)
+        qs.update(10 ** (i / 100) for i in range(-600, 600))
+        assert len(qs.bins) <= 64
+        assert qs.quantile(0.99) == pytest.approx(10 ** 5.87, rel=0.02)
+
+    def test_zero_and_negative_values_share_zero_bucket(self):
+        qs = QuantileSketch()
+        qs.update([0, -0.5, 0, 5])
+        assert qs.zero_count == 3
+        assert qs.quantile(0.25) == 0
+
+    def test_merge_matches_single_sketch(self):
+        a, b, whole = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for i in range(1, 1001):
+            (a if i % 2 else b).add(i)
+            whole.add(i)
+        a.merge(b)
+        assert a.count == whole.count
+        assert a.quantile(0.9) == whole.quantile(0.9)
+
+    def test_summary_scales_values(self):
+        qs = QuantileSketch()
+        qs.update([0.010, 0.020, 0.030])
+        summary = qs.summary(scale=1000)
+        assert summary['count'] == 3
+        assert summary['max'] == pytest.approx(30)
+        assert summary['p50'] == pytest.approx(20, rel=0.02)
+
+
+class TestLogHistogram:
+    def test_values_land_in_their_bin(self):
+        hist = LogHistogram(1, 65536, bins_per_decade=4)
+        for value in (1, 1.5, 10, 99.9, 1500, 65535):
+            hist.add(value)
+        d = hist.to_dict()
+        for value in (1, 1.5, 10, 99.9, 1500, 65535):
+            single = LogHistogram(1, 65536, bins_per_decade=4)
+            single.add(value)
+            idx = single.counts.index(1)
+            assert single.edges[idx] <= value < single.edges[idx + 1]
+        assert sum(d['counts']) == 6
+
+    def test_out_of_range_values(self):
+        hist = LogHistogram(1, 100)
+        hist.update([0, 0.5, 100, 1000, 50])
+        assert hist.underflow == 2
+        assert hist.overflow == 2
+        assert sum(hist.counts) == 1
+
+    def test_merge_requires_same_bins(self):
+        a, b = LogHistogram(1, 1000), LogHistogram(1, 1000)
+        a.update([5, 50])
+        b.update([5, 500])
+        a.merge(b)
+        assert sum(a.counts) == 4
+        with pytest.raises(ValueError):
+            a.merge(LogHistogram(1, 1000, bins_per_decade=2))
+
+    def test_invalid_range(self):
+        with pytest.raises(ValueError):
+            LogHistogram(0, 10)
+
+
+class TestReservoirSample:
+    def test_keeps_everything_below_size(self):
+        sample = ReservoirSample(size=10)
+        for i in range(7):
+            sample.add(i)
+        assert sample.items == list(range(7))
+        assert sample.seen == 7
+
+    def test_size_is_bounded_and_spread_over_stream(self):
+        sample = ReservoirSample(size=200)
+        for i in range(100000):
+            sample.add(i)
+        assert len(sample) == 200
+        assert sample.seen == 100000
+        # a uniform sample reaches well into the second half of the stream
+        assert sum(1 for i in sample.items if i >= 50000) > 60
+
+    def test_seeded_sample_is_reproducible(self):
+        a, b = ReservoirSample(size=50, seed=7), ReservoirSample(size=50, seed=7)
+        for i in range(5000):
+            a.add(i)
+            b.add(i)
+        assert a.items == b.items
@@ -0,0 +1,185 @@
+"""Tests for sequence-ordered TCP reassembly and paged Follow TCP Stream output."""
+
+import pytest
+from scapy.all import Ether, IP, TCP
+from network_analyzer import NetworkAnalyzer
+from tcp_reassembly import TcpStreamReassembler, printable_ascii
+
+CLIENT = ('10.0.0.1', 40000)
+SERVER = ('10.0.0.2', 80)
+
+
+class TestTcpStreamReassembler:
+    def test_orders_by_sequence_not_arrival(self):
+        r = TcpStreamReassembler(CLIENT)
+        r.add(CLIENT, 100, b'', syn=True)
+        r.add(CLIENT, 106, b'world', packetIndex=1, timestamp=1.0)
+        r.add(CLIENT, 101, b'hello', packetIndex=2, timestamp=2.0)
+        r.finish()
+        assert bytes(r.client_stream.buffer) == b'helloworld'
+
+    def test_retransmission_and_overlap_dropped(self):
+        r = TcpStreamReassembler(CLIENT)
+        r.add(CLIENT, 0, b'', syn=True)
+        r.add(CLIENT, 1, b'abcdef', packetIndex=1, timestamp=1.0)
+        r.add(CLIENT, 1, b'abcdef', packetIndex=2, timestamp=2.0)
+        r.add(CLIENT, 4, b'defghi', packetIndex=3, timestamp=3.0)
+        r.finish()
+        stream = r.client_stream
+        assert bytes(stream.buffer) == b'abcdefghi'
+        assert stream.duplicate_bytes == 9
+        retransmitted = [seg['packetIndex'] for seg in stream.segments if seg['retransmission']]
+        assert retransmitted == [2, 3]
+
+    def test_sequence_wraparound(self):
+        isn = 2 ** 32 - 4
+        r = TcpStreamReassembler(CLIENT)
+        r.add(CLIENT, isn, b'', syn=True)
+        r.add(CLIENT, (isn + 7) % 2 ** 32, b'DEF', packetIndex=2, timestamp=2.0)
+        r.add(CLIENT, isn + 1, b'ABC', packetIndex=1, timestamp=1.0)
+        r.add(CLIENT, (isn + 4) % 2 ** 32, b'123', packetIndex=3, timestamp=3.0)
+        r.finish()
+        assert bytes(r.client_stream.buffer) == b'ABC123DEF'
+
+    def test_unfilled_gap_is_recorded(self):
+        r = TcpStreamReassembler(CLIENT)
+        r.add(SERVER, 10, b'', syn=True)
+        r.add(SERVER, 11, b'head', packetIndex=1, timestamp=1.0)
+        r.add(SERVER, 25, b'tail', packetIndex=2, timestamp=2.0)
+        r.finish()
+        stream = r.server_stream
+        assert bytes(stream.buffer) == b'headtail'
+        assert stream.gaps == [{'offset': 4, 'missing': 10}]
+
+    def test_midstream_capture_reordered_start(self):
+        r = TcpStreamReassembler(CLIENT)
+        r.add(CLIENT, 5000, b'second', packetIndex=1, timestamp=1.0)
+        r.add(CLIENT, 4995, b'first', packetIndex=2, timestamp=2.0)
+        r.finish()
+        assert bytes(r.client_stream.buffer) == b'firstsecond'
+
+    def test_max_bytes_truncates(self):
+        r = TcpStreamReassembler(CLIENT, max_bytes=4)
+        r.add(CLIENT, 1, b'abcdef', packetIndex=1, timestamp=1.0)
+        r.finish()
+        assert bytes(r.client_stream.buffer) == b'abcd'
+        assert r.client_stream.truncated
+
+    def test_nothing_is_queued_past_max_bytes(self):
+        r = TcpStreamReassembler(CLIENT, max_bytes=100)
+        r.add(CLIENT, 0, b'', syn=True)
+        for i in range(1000):
+            if i % 7 == 3:
+                continue  # lost segments leave holes throughout the stream
+            r.add(CLIENT, 1 + i * 50, b'x' * 50, packetIndex=i, timestamp=float(i))
+        stream = r.client_stream
+        assert stream.truncated
+        assert not stream._pending and not stream._heap
+        r.finish()
+        assert len(stream.buffer) == 100
+        assert stream.gaps == []
+
+    def test_printable_ascii(self):
+        assert printable_ascii(b'GET /\r\n\x00') == 'GET /...'
+
+
+def _tcp(ts, src, dst, flags, seq, payload=b''):
+    pkt = Ether() / IP(src=src[0], dst=dst[0]) / TCP(sport=src[1], dport=dst[1], flags=flags, seq=seq)
+    if payload:
+        pkt = pkt / payload
+    pkt.time = ts
+    return pkt
+
+
+@pytest.fixture
+def analyzer():
+    body = bytes(range(256)) * 40  # 10240 bytes of server data
+    packets = [
+        _tcp(1.0, CLIENT, SERVER, 'S', 1000),
+        _tcp(1.1, SERVER, CLIENT, 'SA', 5000),
+        _tcp(1.2, CLIENT, SERVER, 'PA', 1001, b'GET / HTTP/1.1\r\n\r\n'),
+    ]
+    # Server response in 1024-byte segments, delivered out of order with one retransmission
+    chunks = [(5001 + i, body[i:i + 1024]) for i in range(0, len(body), 1024)]
+    chunks[2], chunks[3] = chunks[3], chunks[2]
+    chunks.append(chunks[0])
+    for n, (seq, chunk) in enumerate(chunks):
+        packets.append(_tcp(2.0 + n * 0.01, SERVER, CLIENT, 'PA', seq, chunk))
+    packets.append(_tcp(3.0, ('10.0.0.9', 1234), SERVER, 'S', 1))
+
+    a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+    a.packets = packets
+    a.analysis_results = {}
+    a.expected_body = body
+    return a
+
+
+class TestReassembleTcpStream:
+    conn_id = 'tcp-10.0.0.1-40000-10.0.0.2-80'
+
+    def test_full_stream_in_one_page(self, analyzer):
+        result = analyzer.reassemble_tcp_stream(self.conn_id)
+        assert bytes.fromhex(result['serverData']['hex']) == analyzer.expected_body
+        assert result['clientData']['ascii'] == 'GET / HTTP/1.1....'
+        assert result['serverData']['duplicateBytes'] == 1024
+        assert result['totalSegments'] == 12
+        assert not result['hasMore']
+
+    def test_pages_are_byte_addressable(self, analyzer):
+        pages = []
+        offset = 0
+        while True:
+            result = analyzer.reassemble_tcp_stream(self.conn_id, offset=offset, limit=4000)
+            pages.append(bytes.fromhex(result['serverData']['hex']))
+            assert result['serverData']['offset'] == offset
+            assert result['serverData']['totalLength'] == len(analyzer.expected_body)
+            if not result['hasMore']:
+                break
+            offset += 4000
+        assert b''.join(pages) == analyzer.expected_body
+        assert len(pages) == 3
+
+    def test_page_lists_only_overlapping_segments(self, analyzer):
+        result = analyzer.reassemble_tcp_stream(self.conn_id, offset=8192, limit=1024)
+        server_segments = [seg for seg in result['segments'] if seg['direction'] == 'server']
+        assert [seg['streamOffset'] for seg in server_segments] == [8192]
+
+    def test_unknown_connection(self, analyzer):
+        assert analyzer.reassemble_tcp_stream('tcp-10.9.9.9-1-10.9.9.8-2') is None
+
+    def test_flow_index_built_once(self, analyzer):
+        first = analyzer._find_packets_by_connection_id(self.conn_id)
+        analyzer.packets = []  # index must be reused, not rebuilt from the (now empty) capture
+        assert analyzer._find_packets_by_connection_id(self.conn_id) == first
+        assert 14 not in first
+
+    def test_stream_cache_is_byte_bounded(self, analyzer):
+        analyzer.reassemble_tcp_stream(self.conn_id)
+        cache = analyzer._stream_cache
+        assert cache.keys() == [self.conn_id]
+        assert cache.nbytes >= len(analyzer.expected_body)
+        reassembled = cache.get(self.conn_id)
+        analyzer.reassemble_tcp_stream(self.conn_id, offset=4000)
+        assert cache.get(self.conn_id) is reassembled  # later pages reuse it
+
+    def test_stream_over_budget_is_served_but_not_kept(self, analyzer, monkeypatch):
+        monkeypatch.setattr(NetworkAnalyzer, 'STREAM_CACHE_MAX_BYTES', 4096)
+        result = analyzer.reassemble_tcp_stream(self.conn_id)
+        assert bytes.fromhex(result['serverData']['hex']) == analyzer.expected_body
+        assert len(analyzer._stream_cache) == 0
+
+    def test_decoding_stops_once_both_directions_are_full(self, analyzer):
+        class CountingList(list):
+            reads = 0
+
+            def __getitem__(self, idx):
+                CountingList.reads += 1
+                return super().__getitem__(idx)
+
+        analyzer.packets = CountingList(analyzer.packets + [_tcp(4.0 + n, CLIENT, SERVER, 'PA', 1019 + n * 10, b'y' * 10)
+                                                            for n in range(200)])
+        indices = sorted(analyzer._find_packets_by_connection_id(self.conn_id))
+        CountingList.reads = 0
+        reassembler = analyzer._reassemble_packets(indices, max_bytes=64)
+        assert reassembler.client_stream.truncated and reassembler.server_stream.truncated
+        assert CountingList.reads < 40  # of 215 packets in the flow
@@ -0,0 +1,137 @@
+"""Tests for TLS handshake parsing over reassembled streams and JA3/JA4 (Phase 10)."""
+
+import hashlib
+
+import pytest
+from scapy.all import Ether, IP, TCP
+from network_analyzer import NetworkAnalyzer
+from tls_parser import is_grease, ja3, ja4, parse_client_hello, parse_stream
+
+
+def _ext(ext_type, data):
+    return ext_type.to_bytes(2, 'big') + len(data).to_bytes(2, 'big') + data
+
+
+def _u16s(values):
+    return b''.join(v.to_bytes(2, 'big') for v in values)
+
+
+def client_hello_body(sni='example.com', key_share_bytes=32):
+    name = sni.encode()
+    sni_ext = (len(name) + 3).to_bytes(2, 'big') + b'\x00' + len(name).to_bytes(2, 'big') + name
+    alpn = b'\x02h2\x08http/1.1'
+    extensions = b''.join([
+        _ext(0x0a0a, b''),                                          # GREASE
+        _ext(0x0000, sni_ext),
+        _ext(0x000a, _u16s([6]) + _u16s([0x1a1a, 0x001d, 0x0017, 0x11ec])),
+        _ext(0x000b, b'\x01\x00'),
+        _ext(0x000d, _u16s([6]) + _u16s([0x0403, 0x0804, 0x0401])),
+        _ext(0x0010, len(alpn).to_bytes(2, 'big') + alpn),
+        _ext(0x002b, b'\x04' + _u16s([0x0304, 0x0303])),
+        _ext(0x0033, _u16s([key_share_bytes + 4]) + _u16s([0x11ec, key_share_bytes]) + b'\x42' * key_share_bytes),
+    ])
+    ciphers = [0x2a2a, 0x1301, 0x1302, 0xc02f]
+    return (b'\x03\x03' + b'\x11' * 32 + b'\x00' + _u16s([len(ciphers) * 2]) + _u16s(ciphers)
+            + b'\x01\x00' + len(extensions).to_bytes(2, 'big') + extensions)
+
+
+def server_hello_body():
+    extensions = _ext(0x002b, _u16s([0x0304])) + _ext(0x0033, _u16s([0x001d, 4]) + b'\x00' * 4)
+    return (b'\x03\x03' + b'\x22' * 32 + b'\x00' + _u16s([0x1301]) + b'\x00'
+            + len(extensions).to_bytes(2, 'big') + extensions)
+
+
+def handshake_record(hs_type, body):
+    message = bytes([hs_type]) + len(body).to_bytes(3, 'big') + body
+    return b'\x16\x03\x01' + len(message).to_bytes(2, 'big') + message
+
+
+class TestTlsParser:
+    def test_client_hello_fields(self):
+        hello = parse_client_hello(client_hello_body())
+        assert hello['sni'] == 'example.com'
+        assert hello['alpn'] == ['h2', 'http/1.1']
+        assert hello['supported_versions'] == [0x0304, 0x0303]
+        assert 0x0a0a in hello['extensions']
+
+    def test_handshake_split_across_records(self):
+        message = b'\x01' + (40).to_bytes(3, 'big') + b'\x00' * 40
+        stream = (b'\x16\x03\x01\x00\x14' + message[:20] + b'\x16\x03\x01\x00\x18' + message[20:])
+        handshakes = parse_stream(stream)['handshakes']
+        assert [(t, len(body)) for t, body, _ in handshakes] == [(1, 40)]
+
+    def test_grease_detection(self):
+        assert is_grease(0x0a0a) and is_grease(0xfafa)
+        assert not is_grease(0x0a1a) and not is_grease(0x1301)
+
+    def test_ja3_excludes_grease(self):
+        text, digest = ja3(parse_client_hello(client_hello_body()))
+        assert text == '771,4865-4866-49199,0-10-11-13-16-43-51,29-23-4588,0'
+        assert digest == hashlib.md5(text.encode()).hexdigest()
+
+    def test_ja4(self):
+        fingerprint = ja4(parse_client_hello(client_hello_body()))
+        prefix, cipher_hash, ext_hash = fingerprint.split('_')
+        assert prefix == 't13d0307h2'
+        assert cipher_hash == hashlib.sha256(b'1301,1302,c02f').hexdigest()[:12]
+        expected_ext = '000a,000b,000d,002b,0033_0403,0804,0401'
+        assert ext_hash == hashlib.sha256(expected_ext.encode()).hexdigest()[:12]
+
+    def test_ja4_without_sni_or_alpn(self):
+        hello = parse_client_hello(client_hello_body())
+        hello['sni'] = None
+        hello['alpn'] = []
+        assert ja4(hello).startswith('t13i0307' + '00')
+
+
+def _tcp(ts, src, dst, flags, seq, payload=b''):
+    pkt = Ether() / IP(src=src[0], dst=dst[0]) / TCP(sport=src[1], dport=dst[1], flags=flags, seq=seq, ack=1)
+    if payload:
+        pkt = pkt / payload
+    pkt.time = ts
+    return pkt
+
+
+@pytest.fixture
+def analyzer():
+    client, server = ('10.1.1.5', 50123), ('198.51.100.7', 8443)  # not port 443
+    hello = handshake_record(1, client_hello_body(sni='pq.example', key_share_bytes=1200))
+    reply = handshake_record(2, server_hello_body()) + b'\x14\x03\x03\x00\x01\x01' + b'\x17\x03\x03\x00\x04abcd'
+    packets = [
+        _tcp(1.0, client, server, 'S', 0),
+        _tcp(1.01, server, client, 'SA', 0),
+        _tcp(1.02, client, server, 'A', 1),
+    ]
+    # ClientHello split over three segments, middle one arriving last
+    parts = [(1, hello[:500]), (501, hello[500:1000]), (1001, hello[1000:])]
+    for n, (seq, chunk) in enumerate([parts[0], parts[2], parts[1]]):
+        packets.append(_tcp(1.03 + n * 0.001, client, server, 'PA', seq, chunk))
+    packets.append(_tcp(1.05, server, client, 'PA', 1, reply))
+    a = NetworkAnalyzer.__new__(NetworkAnalyzer)
+    a.packets = packets
+    a.analysis_results = {}
+    return a
+
+
+class TestExtractTlsInfo:
+    def test_fragmented_client_hello_on_non_standard_port(self, analyzer):
+        result = analyzer.extract_tls_info()
+        assert result['summary']['total_tls_connections'] == 1
+        session = result['tls_sessions'][0]
+        assert session['connection_id'] == '198.51.100.7:8443-10.1.1.5:50123'
+        assert session['client_hello']['sni'] == 'pq.example'
+        assert session['client_hello']['segments'] == 3
+        assert session['client_hello']['tls_version'] == 'TLS 1.3'
+        assert session['client_hello']['ja4'].startswith('t13d0307h2_')
+
+    def test_server_hello_and_state(self, analyzer):
+        session = analyzer.extract_tls_info()['tls_sessions'][0]
+        assert session['server_hello']['tls_version'] == 'TLS 1.3'
+        assert session['server_hello']['cipher_suite'].startswith('0x1301')
+        assert session['handshake_complete']
+        assert session['has_app_data']
+
+    def test_fingerprint_summary(self, analyzer):
+        summary = analyzer.extract_tls_info()['summary']
+        assert summary['unique_snis'] == ['pq.example']
+        assert summary['ja4_fingerprints'][0]['count'] == 1
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TLS record / handshake parsing over reassembled byte streams, plus JA3/JA4.
+
+Works on the first few KB of each direction of a TCP connection, so a
+ClientHello split over several segments (e.g. with large post-quantum key
+shares) parses the same as one that fits in a single packet. Only plaintext
+handshake messages are read; nothing here needs a TLS library.
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+RECORD_CHANGE_CIPHER_SPEC = 0x14
+RECORD_ALERT = 0x15
+RECORD_HANDSHAKE = 0x16
+RECORD_APPLICATION_DATA = 0x17
+
+HANDSHAKE_CLIENT_HELLO = 1
+HANDSHAKE_SERVER_HELLO = 2
+
+EXT_SERVER_NAME = 0x0000
+EXT_SUPPORTED_GROUPS = 0x000a
+EXT_EC_POINT_FORMATS = 0x000b
+EXT_SIGNATURE_ALGORITHMS = 0x000d
+EXT_ALPN = 0x0010
+EXT_SUPPORTED_VERSIONS = 0x002b
+
+_JA4_VERSIONS = {0x0304: '13', 0x0303: '12', 0x0302: '11', 0x0301: '10', 0x0300: 's3', 0x0002: 's2'}
+
+
+def is_grease(value: int) -> bool:
+    """GREASE values (RFC 8701) are 0x?a?a with both bytes equal; fingerprints skip them."""
+    return (value & 0x0f0f) == 0x0a0a and (value >> 8) == (value & 0xff)
+
+
+def looks_like_tls(data: bytes) -> bool:
+    """True if ``data`` starts with a plausible TLS record header."""
+    return (len(data) >= 5 and RECORD_CHANGE_CIPHER_SPEC <= data[0] <= RECORD_APPLICATION_DATA
+            and data[1] == 3 and data[2] <= 4)
+
+
+def iter_records(data):
+    """Yield ``(content_type, offset, fragment)`` for each complete TLS record."""
+    view = memoryview(data)
+    offset = 0
+    while offset + 5 <= len(view):
+        content_type = view[offset]
+        if not RECORD_CHANGE_CIPHER_SPEC <= content_type <= RECORD_APPLICATION_DATA or view[offset + 1] != 3:
+            return
+        length = int.from_bytes(view[offset + 3:offset + 5], 'big')
+        end = offset + 5 + length
+        if end > len(view):
+            return
+        yield content_type, offset, view[offset + 5:end]
+        offset = end
+
+
+def parse_stream(data) -> dict:
+    """Summarize one direction: record types seen and plaintext handshake messages.
+
+    Handshake messages may span several records; their fragments are joined
+    before parsing. Returns ``{'record_types': set, 'handshakes': [(type, body, end_offset)]}``
+    where ``end_offset`` is where the message's last record ends in the stream.
+    """
+    record_types = set()
+    handshakes = []
+    pending = bytearray()
+    for content_type, offset, fragment in iter_records(data):
+        record_types.add(content_type)
+        if content_type != RECORD_HANDSHAKE:
+            continue
+        pending += fragment
+        record_end = offset + 5 + len(fragment)
+        while len(pending) >= 4:
+            length = int.from_bytes(pending[1:4], 'big')
+            if len(pending) < 4 + length:
+                break
+            handshakes.append((pending[0], bytes(pending[4:4 + length]), record_end))
+            del pending[:4 + length]
+    return {'record_types': record_types, 'handshakes': handshakes}
+
+
+class _Reader:
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def take(self, n: int) -> bytes:
+        if self.pos + n > len(self.data):
+            raise ValueError('truncated TLS message')
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return chunk
+
+    def uint(self, n: int) -> int:
+        return int.from_bytes(self.take(n), 'big')
+
+    def vector(self, length_bytes: int) -> bytes:
+        return self.take(self.uint(length_bytes))
+
+    @property
+    def remaining(self) -> int:
+        return len(self.data) - self.pos
+
+
+def _u16_list(data: bytes) -> list:
+    return [int.from_bytes(data[i:i + 2], 'big') for i in range(0, len(data) - 1, 2)]
+
+
+def _parse_extensions(reader: _Reader) -> list:
+    extensions = []
+    if reader.remaining < 2:
+        return extensions
+    block = _Reader(reader.vector(2))
+    while block.remaining >= 4:
+        ext_type = block.uint(2)
+        extensions.append((ext_type, block.vector(2)))
+    return extensions
+
+
+def parse_client_hello(body: bytes) -> dict:
+    """Parse a ClientHello handshake body; raises ValueError if truncated."""
+    reader = _Reader(body)
+    legacy_version = reader.uint(2)
+    reader.take(32)                      # random
+    reader.vector(1)                     # legacy_session_id
+    ciphers = _u16_list(reader.vector(2))
+    reader.vector(1)                     # compression methods
+    extensions = _parse_extensions(reader)
+
+    hello = {
+        'legacy_version': legacy_version,
+        'ciphers': ciphers,
+        'extensions': [ext_type for ext_type, _ in extensions],
+        'sni': None,
+        'supported_versions': [],
+        'groups': [],
+        'ec_point_formats': [],
+        'signature_algorithms': [],
+        'alpn': [],
+    }
+    for ext_type, data in extensions:
+        try:
+            if ext_type == EXT_SERVER_NAME and len(data) >= 5:
+                name_len = int.from_bytes(data[3:5], 'big')
+                hello['sni'] = data[5:5 + name_len].decode('ascii', errors='replace')
+            elif ext_type == EXT_SUPPORTED_VERSIONS and data:
+                hello['supported_versions'] = _u16_list(data[1:1 + data[0]])
+            elif ext_type == EXT_SUPPORTED_GROUPS:
+                hello['groups'] = _u16_list(data[2:])
+            elif ext_type == EXT_EC_POINT_FORMATS and data:
+                hello['ec_point_formats'] = list(data[1:1 + data[0]])
+            elif ext_type == EXT_SIGNATURE_ALGORITHMS:
+                hello['signature_algorithms'] = _u16_list(data[2:])
+            elif ext_type == EXT_ALPN:
+                protocols = _Reader(data[2:])
+                while protocols.remaining:
+                    hello['alpn'].append(protocols.vector(1).decode('ascii', errors='replace'))
+        except (IndexError, ValueError):
+            continue
+    return hello
+
+
+def parse_server_hello(body: bytes) -> dict:
+    """Parse a ServerHello handshake body; raises ValueError if truncated."""
+    reader = _Reader(body)
+    legacy_version = reader.uint(2)
+    reader.take(32)
+    reader.vector(1)
+    cipher = reader.uint(2)
+    reader.uint(1)                       # compression method
+    extensions = _parse_extensions(reader)
+    selected_version = None
+    for ext_type, data in extensions:
+        if ext_type == EXT_SUPPORTED_VERSIONS and len(data) >= 2:
+            selected_version = int.from_bytes(data[:2], 'big')
+    return {
+        'legacy_version': legacy_version,
+        'cipher': cipher,
+        'extensions': [ext_type for ext_type, _ in extensions],
+        'selected_version': selected_version,
+    }
+
+
+def client_version(hello: dict) -> int:
+    """Highest non-GREASE supported_versions entry, else the legacy version."""
+    versions = [v for v in hello['supported_versions'] if not is_grease(v)]
+    return max(versions) if versions else hello['legacy_version']
+
+
+def _join(values) -> str:
+    return '-'.join(str(v) for v in values)
+
+
+def ja3(hello: dict) -> tuple:
+    """JA3 string and MD5 for a parsed ClientHello (GREASE removed)."""
+    text = ','.join([
+        str(hello['legacy_version']),
+        _join(c for c in hello['ciphers'] if not is_grease(c)),
+        _join(e for e in hello['extensions'] if not is_grease(e)),
+        _join(g for g in hello['groups'] if not is_grease(g)),
+        _join(hello['ec_point_formats']),
+    ])
+    return text, hashlib.md5(text.encode()).hexdigest()
+
+
+def ja3s(hello: dict) -> tuple:
+    """JA3S string and MD5 for a parsed ServerHello."""
+    text = ','.join([str(hello['legacy_version']), str(hello['cipher']), _join(hello['extensions'])])
+    return text, hashlib.md5(text.encode()).hexdigest()
+
+
+def _sha256_12(text: str) -> str:
+    if not text:
+        return '0' * 12
+    return hashlib.sha256(text.encode()).hexdigest()[:12]
+
+
+def _alpn_code(alpn: list) -> str:
+    if not alpn or not alpn[0]:
+        return '00'
+    value = alpn[0]
+    first, last = value[0], value[-1]
+    if first.isascii() and first.isalnum() and last.isascii() and last.isalnum():
+        return first + last
+    hex_value = value.encode('latin-1', errors='replace').hex()
+    return hex_value[0] + hex_value[-1]
+
+
+def ja4(hello: dict, transport: str = 't') -> str:
+    """JA4 client fingerprint (``t`` = TCP, ``q`` = QUIC) for a parsed ClientHello."""
+    ciphers = [c for c in hello['ciphers'] if not is_grease(c)]
+    extensions = [e for e in hello['extensions'] if not is_grease(e)]
+    prefix = (
+        transport
+        + _JA4_VERSIONS.get(client_version(hello), '00')
+        + ('d' if hello['sni'] else 'i')
+        + f'{min(len(ciphers), 99):02d}'
+        + f'{min(len(extensions), 99):02d}'
+        + _alpn_code(hello['alpn'])
+    )
+    cipher_hash = _sha256_12(','.join(f'{c:04x}' for c in sorted(ciphers)))
+    ext_text = ','.join(f'{e:04x}' for e in sorted(extensions) if e not in (EXT_SERVER_NAME, EXT_ALPN))
+    sig_algs = [s for s in hello['signature_algorithms'] if not is_grease(s)]
+    if sig_algs:
+        ext_text += '_' + ','.join(f'{s:04x}' for s in sig_algs)
+    return f'{prefix}_{cipher_hash}_{_sha256_12(ext_text)}'